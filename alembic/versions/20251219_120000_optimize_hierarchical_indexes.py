@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '20251219_120000_optimize_hierarchical_indexes'
-down_revision: Union[str, Sequence[str], None] = '20251219_000001_remove_legacy_unit_column'
+down_revision: Union[str, Sequence[str], None] = '20251219000001'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
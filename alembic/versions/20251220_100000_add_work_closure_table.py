@@ -0,0 +1,38 @@
+"""Add work closure table
+
+Revision ID: 20251220_100000
+Revises: 20251219_150000
+Create Date: 2025-12-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.data.repositories import work_closure_repository
+
+# revision identifiers, used by Alembic.
+revision = '20251220_100000_add_work_closure_table'
+down_revision = '20251219_150000_add_user_settings_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add closure table for the works hierarchy and backfill it from parent_id"""
+    
+    op.create_table(
+        'work_closure',
+        sa.Column('ancestor_id', sa.Integer(), sa.ForeignKey('works.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), sa.ForeignKey('works.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('idx_work_closure_descendant', 'work_closure', ['descendant_id', 'depth'])
+    
+    work_closure_repository.rebuild(op.get_bind())
+
+
+def downgrade():
+    """Remove work closure table"""
+    op.drop_index('idx_work_closure_descendant', table_name='work_closure')
+    op.drop_table('work_closure')
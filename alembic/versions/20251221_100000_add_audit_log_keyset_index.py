@@ -0,0 +1,52 @@
+"""Add audit log keyset index
+
+Revision ID: 20251221_100000
+Revises: 20251220_100000
+Create Date: 2025-12-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251221_100000_add_audit_log_keyset_index'
+down_revision = '20251220_100000_add_work_closure_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create audit_logs where missing and index it for keyset pagination"""
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('audit_logs'):
+        op.create_table(
+            'audit_logs',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('user_id', sa.Integer()),
+            sa.Column('username', sa.Text()),
+            sa.Column('action', sa.Text()),
+            sa.Column('resource_type', sa.String(50)),
+            sa.Column('resource_id', sa.Integer()),
+            sa.Column('details', sa.Text()),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.now())
+        )
+        op.create_index('idx_audit_logs_created_at', 'audit_logs', ['created_at'])
+    else:
+        # (resource_type, resource_id) is a prefix of the new index
+        existing = {index['name'] for index in inspector.get_indexes('audit_logs')}
+        if 'idx_audit_logs_resource' in existing:
+            op.drop_index('idx_audit_logs_resource', table_name='audit_logs')
+        if 'idx_audit_logs_created_at' not in existing:
+            op.create_index('idx_audit_logs_created_at', 'audit_logs', ['created_at'])
+    
+    op.create_index(
+        'idx_audit_logs_resource_created', 'audit_logs',
+        ['resource_type', 'resource_id', 'created_at']
+    )
+
+
+def downgrade():
+    """Restore the (resource_type, resource_id) index"""
+    op.drop_index('idx_audit_logs_resource_created', table_name='audit_logs')
+    op.create_index('idx_audit_logs_resource', 'audit_logs', ['resource_type', 'resource_id'])
@@ -0,0 +1,39 @@
+"""Add change counters for cross-process cache invalidation
+
+Revision ID: 20251222_100000
+Revises: 20251221_100000
+Create Date: 2025-12-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.data.repositories import change_counter_repository
+
+# revision identifiers, used by Alembic.
+revision = '20251222_100000_add_change_counters'
+down_revision = '20251221_100000_add_audit_log_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add change_counters and, on SQLite, the triggers that maintain them"""
+    
+    op.create_table(
+        'change_counters',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0')
+    )
+    
+    change_counter_repository.ensure_installed(op.get_bind(), create_missing_table=False)
+
+
+def downgrade():
+    """Remove change counters"""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for table in change_counter_repository.TRACKED_TABLES:
+            for suffix in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER IF EXISTS trg_change_counter_{table}_{suffix}")
+    op.drop_table('change_counters')
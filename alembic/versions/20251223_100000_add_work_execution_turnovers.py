@@ -0,0 +1,50 @@
+"""Add monthly turnovers of the work execution register
+
+Revision ID: 20251223_100000
+Revises: 20251222_100000
+Create Date: 2025-12-23 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.data.repositories import work_execution_turnover_repository
+
+# revision identifiers, used by Alembic.
+revision = '20251223_100000_add_work_execution_turnovers'
+down_revision = '20251222_100000_add_change_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add work_execution_turnovers, backfill it and, on SQLite, install its triggers"""
+    
+    op.create_table(
+        'work_execution_turnovers',
+        sa.Column('month', sa.String(7), nullable=False),
+        sa.Column('object_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('estimate_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('work_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('quantity_income', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('quantity_expense', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('sum_income', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('sum_expense', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('movement_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('month', 'object_id', 'estimate_id', 'work_id')
+    )
+    op.create_index(
+        'idx_work_turnovers_dimensions', 'work_execution_turnovers', ['object_id', 'estimate_id', 'work_id']
+    )
+    
+    work_execution_turnover_repository.ensure_consistent(op.get_bind(), create_missing_table=False)
+
+
+def downgrade():
+    """Remove work execution turnovers"""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for suffix in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER IF EXISTS trg_work_turnover_{suffix}")
+    op.drop_index('idx_work_turnovers_dimensions', table_name='work_execution_turnovers')
+    op.drop_table('work_execution_turnovers')
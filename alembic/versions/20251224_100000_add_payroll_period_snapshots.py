@@ -0,0 +1,47 @@
+"""Add month-close snapshots of the payroll register
+
+Revision ID: 20251224_100000
+Revises: 20251223_100000
+Create Date: 2025-12-24 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251224_100000_add_payroll_period_snapshots'
+down_revision = '20251223_100000_add_work_execution_turnovers'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add payroll_period_snapshots and payroll_closed_periods (every month starts open)"""
+    
+    op.create_table(
+        'payroll_period_snapshots',
+        sa.Column('month', sa.String(7), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('object_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('estimate_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hours_worked', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('record_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('month', 'employee_id', 'object_id', 'estimate_id')
+    )
+    op.create_index(
+        'idx_payroll_snapshots_employee', 'payroll_period_snapshots', ['employee_id', 'object_id', 'estimate_id']
+    )
+    op.create_table(
+        'payroll_closed_periods',
+        sa.Column('month', sa.String(7), nullable=False),
+        sa.Column('closed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('month')
+    )
+
+
+def downgrade():
+    """Remove payroll period snapshots"""
+    op.drop_table('payroll_closed_periods')
+    op.drop_index('idx_payroll_snapshots_employee', table_name='payroll_period_snapshots')
+    op.drop_table('payroll_period_snapshots')
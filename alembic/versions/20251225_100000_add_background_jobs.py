@@ -0,0 +1,48 @@
+"""Add the background job table
+
+Revision ID: 20251225_100000
+Revises: 20251224_100000
+Create Date: 2025-12-25 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251225_100000_add_background_jobs'
+down_revision = '20251224_100000_add_payroll_period_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add background_jobs for the job queue"""
+    
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', sa.String(36), nullable=False),
+        sa.Column('job_type', sa.String(100), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('parameters', sa.Text(), nullable=True),
+        sa.Column('current', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('owner', sa.String(255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_background_jobs_status', 'background_jobs', ['status'])
+    op.create_index('idx_background_jobs_created_at', 'background_jobs', ['created_at'])
+
+
+def downgrade():
+    """Remove background jobs"""
+    op.drop_index('idx_background_jobs_created_at', table_name='background_jobs')
+    op.drop_index('idx_background_jobs_status', table_name='background_jobs')
+    op.drop_table('background_jobs')
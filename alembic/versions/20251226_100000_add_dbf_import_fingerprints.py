@@ -0,0 +1,32 @@
+"""Add the DBF import fingerprint table
+
+Revision ID: 20251226_100000
+Revises: 20251225_100000
+Create Date: 2025-12-26 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20251226_100000_add_dbf_import_fingerprints'
+down_revision = '20251225_100000_add_background_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add dbf_import_fingerprints for delta re-imports from 1C"""
+    
+    op.create_table(
+        'dbf_import_fingerprints',
+        sa.Column('entity_type', sa.String(32), nullable=False),
+        sa.Column('record_key', sa.String(255), nullable=False),
+        sa.Column('fingerprint', sa.String(32), nullable=False),
+        sa.PrimaryKeyConstraint('entity_type', 'record_key')
+    )
+
+
+def downgrade():
+    """Remove DBF import fingerprints"""
+    op.drop_table('dbf_import_fingerprints')
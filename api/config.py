@@ -24,6 +24,18 @@ class Settings(BaseSettings):
     # API
     API_PREFIX: str = "/api"
     
+    # Multi-worker mode: set for the workers once the master process has
+    # created/migrated the schema (see prepare_database_for_workers)
+    SKIP_SCHEMA_CHECKS: bool = False
+    
+    # How often a worker checks whether other processes changed cached tables
+    CACHE_POLL_INTERVAL_SECONDS: float = 1.0
+    
+    # Response compression (brotli when installed and accepted, else gzip)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -4,6 +4,7 @@ API Dependencies
 This package contains FastAPI dependency injection functions:
 - auth: Get current user from JWT token
 - database: Database connection and session management
+- conditional: ETags and 304 Not Modified for GET endpoints
 - repositories: Repository instance providers
 - services: Service instance providers
 
@@ -0,0 +1,111 @@
+"""
+Conditional GET dependencies
+
+Document and reference payloads are rebuilt from several tables on every
+request. Their weak ETags are derived from the change counters of those
+tables, which costs one small SELECT; when the client's If-None-Match still
+matches, the request is answered with 304 Not Modified before the endpoint
+runs any of its own queries.
+
+Usage:
+    @router.get("/estimates/{estimate_id}")
+    async def get_estimate(
+        estimate_id: int,
+        etag: Optional[str] = Depends(conditional_get('estimates', 'estimate_lines')),
+        ...
+    )
+"""
+from fastapi import Depends, HTTPException, Request, Response, status
+from typing import Callable, Dict, Iterable, Optional
+import hashlib
+import logging
+
+from api.models.auth import UserInfo
+from api.dependencies.auth import get_current_user
+from api.dependencies.database import get_db_connection
+from src.data.repositories import change_counter_repository
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from the parts that determine a response"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def check_not_modified(request: Request, response: Response, etag: str) -> None:
+    """
+    Answer with 304 if the client already has this version, else set the ETag
+
+    Raises:
+        HTTPException: 304 Not Modified with the ETag header
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {_opaque_tag(tag) for tag in if_none_match.split(",")}
+        if "*" in tags or _opaque_tag(etag) in tags:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+
+def etag_header(etag: Optional[str]) -> Optional[Dict[str, str]]:
+    """Headers for endpoints that return a Response object themselves"""
+    return {"ETag": etag} if etag else None
+
+
+def read_versions(db, counters: Iterable[str]) -> Optional[Dict[str, int]]:
+    """Versions of the given change counters, None if any of them is unavailable"""
+    try:
+        versions = change_counter_repository.get_versions(db)
+    except Exception as e:
+        logger.debug(f"Change counters unavailable, responses are not tagged: {e}")
+        return None
+    if any(counter not in versions for counter in counters):
+        return None
+    return {counter: versions[counter] for counter in counters}
+
+
+def conditional_get(*counters: str, per_user: bool = False) -> Callable:
+    """
+    Create a dependency that tags responses with the given counters' versions
+
+    Args:
+        counters: Change counters of every table the response is built from
+        per_user: The response depends on the current user (e.g. role filters)
+
+    Returns:
+        Dependency returning the ETag (None when counters are unavailable)
+        and raising 304 Not Modified for a matching If-None-Match
+    """
+    def tag(request: Request, response: Response, db, user_id) -> Optional[str]:
+        versions = read_versions(db, counters)
+        if versions is None:
+            return None
+        etag = make_etag(request.url.path, request.url.query, user_id, sorted(versions.items()))
+        check_not_modified(request, response, etag)
+        return etag
+
+    if per_user:
+        async def dependency(
+            request: Request,
+            response: Response,
+            current_user: UserInfo = Depends(get_current_user),
+            db = Depends(get_db_connection)
+        ) -> Optional[str]:
+            return tag(request, response, db, current_user.id)
+    else:
+        async def dependency(
+            request: Request,
+            response: Response,
+            db = Depends(get_db_connection)
+        ) -> Optional[str]:
+            return tag(request, response, db, None)
+
+    return dependency
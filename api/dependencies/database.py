@@ -3,9 +3,7 @@ Database dependencies for FastAPI
 
 Provides database session management through dependency injection.
 """
-import sys
 import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from typing import Generator
 from sqlalchemy.orm import Session
@@ -20,6 +18,13 @@ logger = logging.getLogger(__name__)
 _db_manager: DatabaseManager = None
 
 
+def get_database_source() -> str:
+    """Get the config file (or legacy database path) the database is initialized from"""
+    if os.path.exists(settings.DATABASE_CONFIG_PATH):
+        return settings.DATABASE_CONFIG_PATH
+    return settings.DATABASE_PATH
+
+
 def get_db_manager() -> DatabaseManager:
     """Get or initialize the database manager singleton
     
@@ -37,13 +42,13 @@ def get_db_manager() -> DatabaseManager:
         # Try to initialize with config file first, fall back to legacy path
         try:
             # Check if config file exists
-            if os.path.exists(settings.DATABASE_CONFIG_PATH):
-                logger.info(f"Initializing database from config: {settings.DATABASE_CONFIG_PATH}")
-                _db_manager.initialize(settings.DATABASE_CONFIG_PATH)
+            database_source = get_database_source()
+            if database_source == settings.DATABASE_CONFIG_PATH:
+                logger.info(f"Initializing database from config: {database_source}")
             else:
                 # Fall back to legacy database path
-                logger.info(f"Config file not found, using legacy database path: {settings.DATABASE_PATH}")
-                _db_manager.initialize(settings.DATABASE_PATH)
+                logger.info(f"Config file not found, using legacy database path: {database_source}")
+            _db_manager.initialize(database_source, check_schema=not settings.SKIP_SCHEMA_CHECKS)
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
             raise DatabaseConnectionError(f"Failed to initialize database: {e}")
@@ -51,6 +56,34 @@ def get_db_manager() -> DatabaseManager:
     return _db_manager
 
 
+def prepare_database_for_workers() -> None:
+    """Create/migrate the schema once in the master process of a multi-worker server
+    
+    Workers started afterwards inherit SKIP_SCHEMA_CHECKS and only connect.
+    The master's connections are closed so it holds no locks while serving.
+    """
+    global _db_manager
+    
+    db_manager = get_db_manager()
+    
+    # Sibling workers share the job table, so only the master may fail leftovers;
+    # jobs of processes still running (e.g. the desktop app) are kept
+    from src.data.repositories.background_job_repository import BackgroundJobRepository
+    from src.services.job_queue import owner_is_gone
+    BackgroundJobRepository(db_manager.get_engine()).fail_interrupted(owner_is_gone)
+    
+    if db_manager._engine is not None:
+        db_manager._engine.dispose()
+    if db_manager._connection is not None:
+        db_manager._connection.close()
+        db_manager._connection = None
+    _db_manager = None
+    
+    os.environ['SKIP_SCHEMA_CHECKS'] = '1'
+    settings.SKIP_SCHEMA_CHECKS = True
+    logger.info("Database schema prepared for workers")
+
+
 def get_db() -> Generator[Session, None, None]:
     """FastAPI dependency to get database session
     
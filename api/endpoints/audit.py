@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
 from api.dependencies.auth import get_current_user
 from api.models.auth import UserInfo
 from src.services.audit_service import AuditService
 from pydantic import BaseModel
 from datetime import datetime
+import base64
 import math
 
 router = APIRouter(prefix="/audit", tags=["Audit"])
@@ -23,26 +25,63 @@ class AuditLogListResponse(BaseModel):
     data: List[AuditLogSchema]
     pagination: Dict[str, Any]
 
+
+def encode_cursor(log) -> str:
+    """Opaque keyset position of a log entry (created_at, id)"""
+    raw = f"{log.created_at.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(400, "Invalid cursor")
+
 @router.get("/logs", response_model=AuditLogListResponse)
 async def get_audit_logs(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     resource_type: Optional[str] = None,
     resource_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; switches to keyset pagination"),
     current_user: UserInfo = Depends(get_current_user)
 ):
     if current_user.role != 'admin':
         raise HTTPException(403, "Only admins can view audit logs")
         
     service = AuditService()
-    logs, total = service.get_logs(
-        limit=page_size, 
-        offset=(page-1)*page_size,
-        resource_type=resource_type,
-        resource_id=resource_id
-    )
     
-    total_pages = math.ceil(total / page_size) if page_size > 0 else 0
+    # The service first waits for queued entries to be written, keep that off the event loop
+    if cursor:
+        # Keyset page: no OFFSET scan and no COUNT over the whole log
+        logs = await run_in_threadpool(
+            service.get_logs_before,
+            limit=page_size,
+            resource_type=resource_type,
+            resource_id=resource_id,
+            before=decode_cursor(cursor)
+        )
+        pagination = {"page_size": page_size}
+    else:
+        logs, total = await run_in_threadpool(
+            service.get_logs,
+            limit=page_size, 
+            offset=(page-1)*page_size,
+            resource_type=resource_type,
+            resource_id=resource_id
+        )
+        
+        total_pages = math.ceil(total / page_size) if page_size > 0 else 0
+        pagination = {
+            "page": page,
+            "page_size": page_size,
+            "total_items": total,
+            "total_pages": total_pages
+        }
+    
+    pagination["next_cursor"] = encode_cursor(logs[-1]) if len(logs) == page_size else None
     
     return {
         "data": [
@@ -57,10 +96,5 @@ async def get_audit_logs(
                 created_at=log.created_at
             ) for log in logs
         ],
-        "pagination": {
-            "page": page,
-            "page_size": page_size,
-            "total_items": total,
-            "total_pages": total_pages
-        }
+        "pagination": pagination
     }
@@ -5,10 +5,6 @@ This module provides API endpoints for bulk operations on work records,
 including bulk unit assignments, validation, and hierarchical queries.
 """
 
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 
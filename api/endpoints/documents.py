@@ -1,12 +1,12 @@
 """
 Document endpoints for estimates and daily reports
 """
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query, UploadFile, File
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from dataclasses import asdict
 from datetime import date
 import math
 import tempfile
@@ -16,18 +16,65 @@ from api.models.documents import (
     Estimate, EstimateCreate, EstimateUpdate,
     EstimateLine, EstimateLineCreate,
     DailyReport, DailyReportCreate, DailyReportUpdate,
-    DailyReportLine, DailyReportLineCreate
+    DailyReportLine, DailyReportLineCreate,
+    DocumentBatchGetRequest, DocumentLinesPatch, MAX_BATCH_GET_DOCUMENTS
 )
 from api.models.auth import UserInfo
 from api.models.references import PaginationInfo
 from api.dependencies.auth import get_current_user
 from api.dependencies.database import get_db_connection
+from api.dependencies.conditional import conditional_get, etag_header
+from api.endpoints.jobs import get_queue
+from api.responses import FastJSONResponse
 from api.config import settings
+from src.services.reference_snapshot import attach_reference_names, get_reference_snapshot
+from src.services.document_line_patch import (
+    LinePatchConflict, LinePatchError, apply_line_patch, line_sync_columns
+)
+from src.services.material_requirements import (
+    RequirementSource, get_material_requirements, iter_csv, iter_xlsx
+)
+from src.services.job_queue import JobQueue
+from src.services.job_types import upload_directory
 
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 
+def parse_id_list(ids: Optional[str]) -> Optional[List[int]]:
+    """Parse a comma-separated ids query parameter, None when not given"""
+    if not ids:
+        return None
+    try:
+        return [int(value) for value in ids.split(',') if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma-separated integers"
+        )
+
+
+REQUIREMENT_EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def material_requirements_response(requirements: dict, format: str, filename: str):
+    """JSON response or streamed CSV/XLSX export of material requirements"""
+    if format == 'json':
+        return FastJSONResponse({"success": True, "data": requirements})
+    
+    chunks = iter_csv(requirements) if format == 'csv' else iter_xlsx(requirements)
+    return StreamingResponse(
+        chunks,
+        media_type=REQUIREMENT_EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{format}"'
+        }
+    )
+
+
 def create_pagination_info(page: int, page_size: int, total_items: int) -> PaginationInfo:
     """Create pagination info"""
     total_pages = math.ceil(total_items / page_size) if page_size > 0 else 0
@@ -39,6 +86,30 @@ def create_pagination_info(page: int, page_size: int, total_items: int) -> Pagin
     )
 
 
+# Display names resolved from the reference snapshots instead of joins:
+# {id column: (reference table, name key)}
+ESTIMATE_REFERENCE_NAMES = {
+    'customer_id': ('counterparties', 'customer_name'),
+    'object_id': ('objects', 'object_name'),
+    'contractor_id': ('organizations', 'contractor_name'),
+    'responsible_id': ('persons', 'responsible_name'),
+}
+DAILY_REPORT_REFERENCE_NAMES = {
+    'foreman_id': ('persons', 'foreman_name'),
+}
+TIMESHEET_REFERENCE_NAMES = {
+    'object_id': ('objects', 'object_name'),
+    'foreman_id': ('persons', 'foreman_name'),
+}
+
+# Change counters of the tables each response is built from (ETags)
+ESTIMATE_LIST_COUNTERS = ('estimates', 'counterparties', 'objects', 'organizations', 'persons')
+ESTIMATE_COUNTERS = ESTIMATE_LIST_COUNTERS + ('estimate_lines', 'work_contents')
+DAILY_REPORT_LIST_COUNTERS = ('daily_reports', 'estimates', 'persons')
+DAILY_REPORT_COUNTERS = DAILY_REPORT_LIST_COUNTERS + ('daily_report_lines', 'daily_report_executors', 'work_contents')
+TIMESHEET_COUNTERS = ('timesheets', 'timesheet_lines', 'estimates', 'objects', 'persons')
+
+
 def calculate_totals(lines: List[EstimateLineCreate]) -> tuple[float, float]:
     """Calculate total sum and labor from estimate lines"""
     total_sum = 0.0
@@ -52,48 +123,99 @@ def calculate_totals(lines: List[EstimateLineCreate]) -> tuple[float, float]:
     return total_sum, total_labor
 
 
-def get_estimate_with_joins(db, estimate_id: int) -> Optional[dict]:
-    """Get estimate with joined reference names"""
+def apply_document_line_patch(db, document_type: str, document_id: int, data: DocumentLinesPatch) -> dict:
+    """Apply a line patch, answering malformed patches with 400 and stale ones with 409"""
+    try:
+        result = apply_line_patch(
+            db, document_type, document_id, [operation.model_dump() for operation in data.operations]
+        )
+    except LinePatchConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except LinePatchError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return asdict(result)
+
+
+def id_placeholders(ids: List[int]) -> str:
+    """Placeholders for an IN list of document IDs"""
+    return ','.join('?' * len(ids))
+
+
+def batch_response(documents: Dict[int, dict], ids: List[int], fields: Optional[List[str]]) -> dict:
+    """
+    Build a batch fetch response keyed by document ID
+
+    Args:
+        documents: Found documents keyed by ID
+        ids: Requested IDs
+        fields: Header fields to return (all when None); lines are kept if loaded
+    """
+    if fields is not None:
+        keep = set(fields) | {'id', 'lines'}
+        documents = {
+            document_id: {key: value for key, value in document.items() if key in keep}
+            for document_id, document in documents.items()
+        }
+    return {
+        "success": True,
+        "data": documents,
+        "missing": [document_id for document_id in ids if document_id not in documents],
+    }
+
+
+def get_estimates_with_joins(db, estimate_ids: List[int]) -> Dict[int, dict]:
+    """Get estimates with joined reference names, keyed by ID"""
+    if not estimate_ids:
+        return {}
+    
     cursor = db.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT 
             e.*,
-            c.name as customer_name,
-            o.name as object_name,
-            org.name as contractor_name,
-            p.full_name as responsible_name,
             base.number as base_document_number,
             base.number as base_document_name
         FROM estimates e
-        LEFT JOIN counterparties c ON e.customer_id = c.id
-        LEFT JOIN objects o ON e.object_id = o.id
-        LEFT JOIN organizations org ON e.contractor_id = org.id
-        LEFT JOIN persons p ON e.responsible_id = p.id
         LEFT JOIN estimates base ON e.base_document_id = base.id
-        WHERE e.id = ?
-    """, (estimate_id,))
+        WHERE e.id IN ({id_placeholders(estimate_ids)})
+    """, list(estimate_ids))
     
-    row = cursor.fetchone()
-    if not row:
-        return None
-    
-    return dict(row)
+    rows = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], ESTIMATE_REFERENCE_NAMES)
+    return {row['id']: row for row in rows}
 
 
-def get_estimate_lines_with_joins(db, estimate_id: int) -> List[dict]:
-    """Get estimate lines with joined work names"""
+def get_estimate_with_joins(db, estimate_id: int) -> Optional[dict]:
+    """Get estimate with joined reference names"""
+    return get_estimates_with_joins(db, [estimate_id]).get(estimate_id)
+
+
+def get_estimates_lines_with_joins(db, estimate_ids: List[int]) -> Dict[int, List[dict]]:
+    """Get lines of several estimates with joined work names, keyed by estimate ID"""
+    lines = {estimate_id: [] for estimate_id in estimate_ids}
+    if not estimate_ids:
+        return lines
+    
     cursor = db.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT 
             el.*,
             w.name as work_name
         FROM estimate_lines el
         LEFT JOIN works w ON el.work_id = w.id
-        WHERE el.estimate_id = ?
-        ORDER BY el.line_number
-    """, (estimate_id,))
+        WHERE el.estimate_id IN ({id_placeholders(estimate_ids)})
+        ORDER BY el.estimate_id, el.line_number
+    """, list(estimate_ids))
+    
+    for row in cursor.fetchall():
+        lines[row['estimate_id']].append(dict(row))
     
-    return [dict(row) for row in cursor.fetchall()]
+    return lines
+
+
+def get_estimate_lines_with_joins(db, estimate_id: int) -> List[dict]:
+    """Get estimate lines with joined work names"""
+    return get_estimates_lines_with_joins(db, [estimate_id])[estimate_id]
 
 
 # Estimate endpoints
@@ -111,6 +233,7 @@ async def list_estimates(
     sort_by: str = Query("date", regex="^(date|number|id)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get(*ESTIMATE_LIST_COUNTERS)),
     db = Depends(get_db_connection)
 ):
     """Get list of estimates with pagination and filtering"""
@@ -150,14 +273,18 @@ async def list_estimates(
         params.append(date_to.isoformat())
     
     where_sql = " AND ".join(where_clauses)
+    # Names are only joined to search by them; the page gets them from the snapshots
+    search_joins = """
+        LEFT JOIN counterparties c ON e.customer_id = c.id
+        LEFT JOIN objects o ON e.object_id = o.id
+    """ if search else ""
     
     # Get total count
     cursor = db.cursor()
     count_query = f"""
         SELECT COUNT(*) as count
         FROM estimates e
-        LEFT JOIN counterparties c ON e.customer_id = c.id
-        LEFT JOIN objects o ON e.object_id = o.id
+        {search_joins}
         WHERE {where_sql}
     """
     cursor.execute(count_query, params)
@@ -167,17 +294,10 @@ async def list_estimates(
     query = f"""
         SELECT 
             e.*,
-            c.name as customer_name,
-            o.name as object_name,
-            org.name as contractor_name,
-            p.full_name as responsible_name,
             base.number as base_document_number,
             base.number as base_document_name
         FROM estimates e
-        LEFT JOIN counterparties c ON e.customer_id = c.id
-        LEFT JOIN objects o ON e.object_id = o.id
-        LEFT JOIN organizations org ON e.contractor_id = org.id
-        LEFT JOIN persons p ON e.responsible_id = p.id
+        {search_joins}
         LEFT JOIN estimates base ON e.base_document_id = base.id
         WHERE {where_sql}
         ORDER BY e.{sort_by} {sort_order.upper()}
@@ -186,22 +306,61 @@ async def list_estimates(
     params.extend([page_size, offset])
     cursor.execute(query, params)
     
-    items = [dict(row) for row in cursor.fetchall()]
+    items = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], ESTIMATE_REFERENCE_NAMES)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": items,
         "pagination": create_pagination_info(page, page_size, total)
-    }
+    }, headers=etag_header(etag))
+
+
+@router.get("/estimates/hierarchy-rollups")
+async def get_estimate_hierarchy_rollups(
+    ids: Optional[str] = Query(None, description="Comma-separated general estimate IDs (default: all)"),
+    include_works: bool = False,
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get plan counts, planned and executed totals per general estimate"""
+    from src.data.repositories.estimate_hierarchy_repository import load_hierarchy_rollups
+    
+    rollups = load_hierarchy_rollups(db, parse_id_list(ids), include_works=include_works)
+    return FastJSONResponse({"success": True, "data": rollups})
+
+
+@router.get("/estimates/material-requirements")
+async def get_estimates_material_requirements(
+    ids: str = Query(..., description="Comma-separated estimate IDs"),
+    format: str = Query("json", regex="^(json|csv|xlsx)$"),
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get materials, cost items and labor required by the lines of estimates"""
+    estimate_ids = parse_id_list(ids)
+    if not estimate_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No estimate IDs given")
+    if len(set(estimate_ids)) > MAX_BATCH_GET_DOCUMENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many estimates, the limit is {MAX_BATCH_GET_DOCUMENTS}"
+        )
+    
+    requirements = get_material_requirements(db, RequirementSource.estimates(estimate_ids))
+    return material_requirements_response(requirements, format, "material_requirements")
 
 
-@router.post("/estimates/import-excel", status_code=status.HTTP_201_CREATED)
+@router.post("/estimates/import-excel", status_code=status.HTTP_202_ACCEPTED)
 async def import_estimate_from_excel(
     file: UploadFile = File(...),
     current_user: UserInfo = Depends(get_current_user),
-    db = Depends(get_db_connection)
+    queue: JobQueue = Depends(get_queue)
 ):
-    """Import estimate from Excel file"""
+    """Queue an estimate import from an Excel file
+    
+    The import runs as a background job; follow it through /jobs/{id}
+    (or /jobs/{id}/events), its result holds the created estimate_id.
+    """
     # Check file extension
     if not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(
@@ -209,85 +368,15 @@ async def import_estimate_from_excel(
             detail="Файл должен быть в формате Excel (.xlsx или .xls)"
         )
     
-    # Save uploaded file to temp location
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
-        # Import estimate using service
-        import sys
-        import os
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        from src.services.excel_import_service import ExcelImportService
-        
-        import_service = ExcelImportService()
-        estimate, error = import_service.import_estimate(tmp_file_path)
-        
-        # Clean up temp file
-        os_module.unlink(tmp_file_path)
-        
-        if not estimate:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error or "Не удалось импортировать смету"
-            )
-        
-        # Save estimate to database
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            INSERT INTO estimates (
-                number, date, customer_id, object_id, contractor_id, 
-                responsible_id, total_sum, total_labor
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            estimate.number, estimate.date.isoformat(), estimate.customer_id, estimate.object_id,
-            estimate.contractor_id, estimate.responsible_id, estimate.total_sum, estimate.total_labor
-        ))
-        
-        estimate_id = cursor.lastrowid
-        
-        # Insert lines
-        for line in estimate.lines:
-            cursor.execute("""
-                INSERT INTO estimate_lines (
-                    estimate_id, line_number, work_id, quantity, unit, price,
-                    labor_rate, sum, planned_labor, is_group, group_name,
-                    parent_group_id, is_collapsed
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                estimate_id, line.line_number, line.work_id, line.quantity,
-                line.unit, line.price, line.labor_rate, line.sum, line.planned_labor,
-                1 if line.is_group else 0, line.group_name, line.parent_group_id,
-                1 if line.is_collapsed else 0
-            ))
-        
-        db.commit()
-        
-        # Get created estimate with joins
-        estimate_data = get_estimate_with_joins(db, estimate_id)
-        estimate_data['lines'] = get_estimate_lines_with_joins(db, estimate_id)
-        
-        return {"success": True, "data": estimate_data, "message": "Смета успешно импортирована"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        db.rollback()
-        # Clean up temp file if it exists
-        if 'tmp_file_path' in locals():
-            try:
-                os_module.unlink(tmp_file_path)
-            except:
-                pass
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при импорте: {str(e)}"
-        )
+    # The job deletes the file once it is imported
+    with tempfile.NamedTemporaryFile(delete=False, dir=upload_directory(),
+                                     suffix=os_module.path.splitext(file.filename)[1]) as tmp_file:
+        tmp_file.write(await file.read())
+    
+    job = await run_in_threadpool(
+        queue.submit, 'estimate_excel_import', {'file_path': tmp_file.name}, current_user.id
+    )
+    return {"success": True, "data": job, "message": "Импорт сметы поставлен в очередь"}
 
 
 @router.post("/daily-reports/import-excel", status_code=status.HTTP_201_CREATED)
@@ -349,16 +438,17 @@ async def import_daily_report_from_excel(
         report_id = cursor.lastrowid
         
         # Insert lines
+        line_sync = line_sync_columns(db, 'daily_report_lines')
         for line in daily_report.lines:
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO daily_report_lines (
-                    daily_report_id, line_number, work_id, planned_labor, actual_labor, deviation_percent
+                    daily_report_id, line_number, work_id, planned_labor, actual_labor, deviation_percent{line_sync.names}
                 )
-                VALUES (?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?{line_sync.placeholders})
             """, (
                 report_id, line.line_number, line.work_id, 
                 line.planned_labor, line.actual_labor, line.deviation_percent
-            ))
+            ) + line_sync.values())
         
         db.commit()
         
@@ -366,17 +456,15 @@ async def import_daily_report_from_excel(
         cursor.execute("""
             SELECT 
                 dr.id, dr.number, dr.date, dr.estimate_id, dr.foreman_id, dr.is_posted,
-                e.number as estimate_number,
-                p.full_name as foreman_name
+                e.number as estimate_number
             FROM daily_reports dr
             LEFT JOIN estimates e ON dr.estimate_id = e.id
-            LEFT JOIN persons p ON dr.foreman_id = p.id
             WHERE dr.id = ?
         """, (report_id,))
         
         report_data = cursor.fetchone()
         if report_data:
-            report_dict = dict(report_data)
+            report_dict = attach_reference_names(db, [dict(report_data)], DAILY_REPORT_REFERENCE_NAMES)[0]
             
             # Get lines
             cursor.execute("""
@@ -456,20 +544,21 @@ async def create_estimate(
         estimate_id = cursor.lastrowid
         
         # Insert lines
+        line_sync = line_sync_columns(db, 'estimate_lines')
         for line in data.lines:
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO estimate_lines (
                     estimate_id, line_number, work_id, quantity, unit, price,
                     labor_rate, sum, planned_labor, is_group, group_name,
-                    parent_group_id, is_collapsed
+                    parent_group_id, is_collapsed{line_sync.names}
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?{line_sync.placeholders})
             """, (
                 estimate_id, line.line_number, line.work_id, line.quantity,
                 line.unit, line.price, line.labor_rate, line.sum, line.planned_labor,
                 1 if line.is_group else 0, line.group_name, line.parent_group_id,
                 1 if line.is_collapsed else 0
-            ))
+            ) + line_sync.values())
             
         # Log audit
         try:
@@ -506,6 +595,7 @@ async def create_estimate(
 async def get_estimate(
     estimate_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get(*ESTIMATE_COUNTERS)),
     db = Depends(get_db_connection)
 ):
     """Get estimate by ID with lines and joined fields"""
@@ -520,7 +610,28 @@ async def get_estimate(
     # Get lines
     estimate['lines'] = get_estimate_lines_with_joins(db, estimate_id)
     
-    return {"success": True, "data": estimate}
+    return FastJSONResponse({"success": True, "data": estimate}, headers=etag_header(etag))
+
+
+@router.post("/estimates/batch-get")
+async def batch_get_estimates(
+    request: DocumentBatchGetRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get several estimates with lines in two queries, keyed by ID"""
+    ids = list(dict.fromkeys(request.ids))
+    estimates = {
+        estimate_id: estimate
+        for estimate_id, estimate in get_estimates_with_joins(db, ids).items()
+        if not estimate.get('marked_for_deletion')
+    }
+    
+    if request.include_lines:
+        for estimate_id, lines in get_estimates_lines_with_joins(db, list(estimates)).items():
+            estimates[estimate_id]['lines'] = lines
+    
+    return FastJSONResponse(batch_response(estimates, ids, request.fields))
 
 
 @router.put("/estimates/{estimate_id}")
@@ -592,20 +703,21 @@ async def update_estimate(
             cursor.execute("DELETE FROM estimate_lines WHERE estimate_id = ?", (estimate_id,))
             
             # Insert new lines
+            line_sync = line_sync_columns(db, 'estimate_lines')
             for line in data.lines:
-                cursor.execute("""
+                cursor.execute(f"""
                     INSERT INTO estimate_lines (
                         estimate_id, line_number, work_id, quantity, unit, price,
                         labor_rate, sum, planned_labor, is_group, group_name,
-                        parent_group_id, is_collapsed
+                        parent_group_id, is_collapsed{line_sync.names}
                     )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?{line_sync.placeholders})
                 """, (
                     estimate_id, line.line_number, line.work_id, line.quantity,
                     line.unit, line.price, line.labor_rate, line.sum, line.planned_labor,
                     1 if line.is_group else 0, line.group_name, line.parent_group_id,
                     1 if line.is_collapsed else 0
-                ))
+                ) + line_sync.values())
         
         # Log audit
         try:
@@ -646,6 +758,70 @@ async def update_estimate(
         )
 
 
+@router.patch("/estimates/{estimate_id}/lines")
+async def patch_estimate_lines(
+    estimate_id: int,
+    data: DocumentLinesPatch,
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Insert, update, delete or move individual estimate lines"""
+    cursor = db.cursor()
+    
+    cursor.execute("SELECT id, number FROM estimates WHERE id = ? AND marked_for_deletion = 0", (estimate_id,))
+    existing = cursor.fetchone()
+    if not existing:
+        raise HTTPException(status_code=404, detail="Estimate not found")
+    
+    changes = apply_document_line_patch(db, 'estimate', estimate_id, data)
+    
+    try:
+        # Totals of non-group lines, as calculate_totals does for full updates
+        cursor.execute("""
+            UPDATE estimates
+            SET total_sum = (
+                    SELECT COALESCE(SUM(sum), 0) FROM estimate_lines
+                    WHERE estimate_id = ? AND COALESCE(is_group, 0) = 0
+                ),
+                total_labor = (
+                    SELECT COALESCE(SUM(planned_labor), 0) FROM estimate_lines
+                    WHERE estimate_id = ? AND COALESCE(is_group, 0) = 0
+                ),
+                modified_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (estimate_id, estimate_id, estimate_id))
+        
+        # Log audit
+        try:
+            from src.services.audit_service import AuditService
+            AuditService().log(
+                user_id=current_user.id,
+                username=current_user.username,
+                action="update",
+                resource_type="estimate",
+                resource_id=estimate_id,
+                details=f"Updated lines of estimate {existing['number']}: {changes}"
+            )
+        except Exception as e:
+            print(f"Audit log error: {e}")
+        
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update estimate lines: {str(e)}"
+        )
+    
+    cursor.execute("SELECT total_sum, total_labor FROM estimates WHERE id = ?", (estimate_id,))
+    totals = cursor.fetchone()
+    
+    return {
+        "success": True,
+        "data": dict(changes, total_sum=totals['total_sum'], total_labor=totals['total_labor'])
+    }
+
+
 @router.delete("/estimates/{estimate_id}")
 async def delete_estimate(
     estimate_id: int,
@@ -680,42 +856,62 @@ async def delete_estimate(
 
 
 # Daily Report helper functions
-def get_daily_report_with_joins(db, report_id: int) -> Optional[dict]:
-    """Get daily report with joined reference names"""
+def get_daily_reports_with_joins(db, report_ids: List[int]) -> Dict[int, dict]:
+    """Get daily reports with joined reference names, keyed by ID"""
+    if not report_ids:
+        return {}
+    
     cursor = db.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT 
             dr.*,
-            e.number as estimate_number,
-            p.full_name as foreman_name
+            e.number as estimate_number
         FROM daily_reports dr
         LEFT JOIN estimates e ON dr.estimate_id = e.id
-        LEFT JOIN persons p ON dr.foreman_id = p.id
-        WHERE dr.id = ?
-    """, (report_id,))
-    
-    row = cursor.fetchone()
-    if not row:
-        return None
+        WHERE dr.id IN ({id_placeholders(report_ids)})
+    """, list(report_ids))
     
-    return dict(row)
+    rows = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], DAILY_REPORT_REFERENCE_NAMES)
+    return {row['id']: row for row in rows}
 
 
-def get_daily_report_lines_with_joins(db, report_id: int) -> List[dict]:
-    """Get daily report lines with joined work names and executor names"""
+def get_daily_report_with_joins(db, report_id: int) -> Optional[dict]:
+    """Get daily report with joined reference names"""
+    return get_daily_reports_with_joins(db, [report_id]).get(report_id)
+
+
+def get_daily_reports_lines_with_joins(db, report_ids: List[int]) -> Dict[int, List[dict]]:
+    """Get lines of several daily reports with work and executor names, keyed by report ID"""
+    lines = {report_id: [] for report_id in report_ids}
+    if not report_ids:
+        return lines
+    
     cursor = db.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT 
             drl.*,
             w.name as work_name
         FROM daily_report_lines drl
         LEFT JOIN works w ON drl.work_id = w.id
-        WHERE drl.daily_report_id = ?
-        ORDER BY drl.line_number
-    """, (report_id,))
-    
-    lines = []
+        WHERE drl.daily_report_id IN ({id_placeholders(report_ids)})
+        ORDER BY drl.daily_report_id, drl.line_number
+    """, list(report_ids))
+    rows = cursor.fetchall()
+    
+    # Executors of all lines at once instead of one query per line
+    cursor.execute(f"""
+        SELECT dre.report_line_id, dre.executor_id
+        FROM daily_report_executors dre
+        JOIN daily_report_lines drl ON dre.report_line_id = drl.id
+        WHERE drl.daily_report_id IN ({id_placeholders(report_ids)})
+    """, list(report_ids))
+    executor_ids = {}
     for row in cursor.fetchall():
+        executor_ids.setdefault(row['report_line_id'], []).append(row['executor_id'])
+    
+    persons = get_reference_snapshot(db, 'persons')
+    
+    for row in rows:
         line = dict(row)
         
         # Map deviation_percent to deviation for frontend compatibility
@@ -724,30 +920,23 @@ def get_daily_report_lines_with_joins(db, report_id: int) -> List[dict]:
         elif 'deviation_percent' in line:
             line['deviation'] = line['deviation_percent']
         
-        # Get executor names for this line
-        cursor.execute("""
-            SELECT p.full_name
-            FROM daily_report_executors dre
-            JOIN persons p ON dre.executor_id = p.id
-            WHERE dre.report_line_id = ?
-        """, (line['id'],))
-        
-        line['executor_names'] = [r['full_name'] for r in cursor.fetchall()]
-        
-        # Get executor IDs
-        cursor.execute("""
-            SELECT executor_id
-            FROM daily_report_executors
-            WHERE report_line_id = ?
-        """, (line['id'],))
-        
-        line['executor_ids'] = [r['executor_id'] for r in cursor.fetchall()]
+        # Executor names come from the persons snapshot
+        line['executor_ids'] = executor_ids.get(line['id'], [])
+        line['executor_names'] = [
+            persons.name(executor_id) for executor_id in line['executor_ids']
+            if persons.get(executor_id) is not None
+        ]
         
-        lines.append(line)
+        lines[line['daily_report_id']].append(line)
     
     return lines
 
 
+def get_daily_report_lines_with_joins(db, report_id: int) -> List[dict]:
+    """Get daily report lines with joined work names and executor names"""
+    return get_daily_reports_lines_with_joins(db, [report_id])[report_id]
+
+
 # Daily Report endpoints
 @router.get("/daily-reports")
 async def list_daily_reports(
@@ -761,6 +950,7 @@ async def list_daily_reports(
     sort_by: str = Query("date", regex="^(date|id)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get(*DAILY_REPORT_LIST_COUNTERS)),
     db = Depends(get_db_connection)
 ):
     """Get list of daily reports with pagination and filtering"""
@@ -792,6 +982,8 @@ async def list_daily_reports(
         params.append(date_to.isoformat())
     
     where_sql = " AND ".join(where_clauses)
+    # Foreman names are only joined to search by them
+    search_joins = "LEFT JOIN persons p ON dr.foreman_id = p.id" if search else ""
     
     # Get total count
     cursor = db.cursor()
@@ -799,7 +991,7 @@ async def list_daily_reports(
         SELECT COUNT(*) as count
         FROM daily_reports dr
         LEFT JOIN estimates e ON dr.estimate_id = e.id
-        LEFT JOIN persons p ON dr.foreman_id = p.id
+        {search_joins}
         WHERE {where_sql}
     """
     cursor.execute(count_query, params)
@@ -809,11 +1001,10 @@ async def list_daily_reports(
     query = f"""
         SELECT 
             dr.*,
-            e.number as estimate_number,
-            p.full_name as foreman_name
+            e.number as estimate_number
         FROM daily_reports dr
         LEFT JOIN estimates e ON dr.estimate_id = e.id
-        LEFT JOIN persons p ON dr.foreman_id = p.id
+        {search_joins}
         WHERE {where_sql}
         ORDER BY dr.{sort_by} {sort_order.upper()}
         LIMIT ? OFFSET ?
@@ -821,13 +1012,13 @@ async def list_daily_reports(
     params.extend([page_size, offset])
     cursor.execute(query, params)
     
-    items = [dict(row) for row in cursor.fetchall()]
+    items = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], DAILY_REPORT_REFERENCE_NAMES)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": items,
         "pagination": create_pagination_info(page, page_size, total)
-    }
+    }, headers=etag_header(etag))
 
 
 @router.get("/daily-reports/autofill/{estimate_id}")
@@ -882,6 +1073,101 @@ async def autofill_daily_report_from_estimate(
     return {"success": True, "data": lines}
 
 
+# Upper bound of documents rendered by one batch print request
+MAX_BATCH_PRINT_DOCUMENTS = 500
+
+
+@router.get("/daily-reports/print-batch")
+async def print_daily_reports_batch(
+    date_from: date,
+    date_to: date,
+    estimate_id: Optional[int] = None,
+    foreman_id: Optional[int] = None,
+    format: str = Query("pdf", regex="^(pdf|zip)$"),
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Print all daily reports of a period into one PDF or a zip of PDFs (month-end printing)"""
+    where_clauses = ["marked_for_deletion = 0", "date >= ?", "date <= ?"]
+    params = [date_from.isoformat(), date_to.isoformat()]
+    
+    if estimate_id:
+        where_clauses.append("estimate_id = ?")
+        params.append(estimate_id)
+    
+    if foreman_id:
+        where_clauses.append("foreman_id = ?")
+        params.append(foreman_id)
+    
+    cursor = db.cursor()
+    cursor.execute(f"""
+        SELECT id FROM daily_reports
+        WHERE {' AND '.join(where_clauses)}
+        ORDER BY date, id
+    """, params)
+    report_ids = [row['id'] for row in cursor.fetchall()]
+    
+    if not report_ids:
+        raise HTTPException(status_code=404, detail="No daily reports found for the period")
+    
+    if len(report_ids) > MAX_BATCH_PRINT_DOCUMENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many daily reports ({len(report_ids)}), the limit is {MAX_BATCH_PRINT_DOCUMENTS}"
+        )
+    
+    from src.services.print_render_cache import get_print_render_service
+    from api.dependencies.database import get_database_source
+    
+    try:
+        render_service = get_print_render_service(get_database_source())
+        content = await render_service.render_batch('daily_report', report_ids, format)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate print forms: {str(e)}"
+        )
+    
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate print forms"
+        )
+    
+    if format == "pdf":
+        media_type = "application/pdf"
+    else:
+        media_type = "application/zip"
+    filename = f"daily_reports_{date_from.isoformat()}_{date_to.isoformat()}.{format}"
+    
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
+
+
+@router.get("/daily-reports/material-requirements")
+async def get_daily_reports_material_requirements(
+    date_from: date,
+    date_to: date,
+    estimate_id: Optional[int] = None,
+    format: str = Query("json", regex="^(json|csv|xlsx)$"),
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get materials, cost items and labor consumed by the work reported in a period"""
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from is after date_to")
+    
+    source = RequirementSource.daily_reports(date_from, date_to, estimate_id)
+    requirements = get_material_requirements(db, source)
+    filename = f"material_consumption_{date_from.isoformat()}_{date_to.isoformat()}"
+    return material_requirements_response(requirements, format, filename)
+
+
 @router.post("/daily-reports", status_code=status.HTTP_201_CREATED)
 async def create_daily_report(
     data: DailyReportCreate,
@@ -901,23 +1187,24 @@ async def create_daily_report(
         report_id = cursor.lastrowid
         
         # Insert lines
+        line_sync = line_sync_columns(db, 'daily_report_lines')
         for line in data.lines:
             # Calculate deviation percent
             deviation = 0.0
             if line.planned_labor > 0:
                 deviation = ((line.actual_labor - line.planned_labor) / line.planned_labor) * 100
             
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO daily_report_lines (
                     daily_report_id, line_number, work_id, planned_labor, actual_labor,
-                    labor_deviation_percent, is_group, group_name, parent_group_id, is_collapsed
+                    labor_deviation_percent, is_group, group_name, parent_group_id, is_collapsed{line_sync.names}
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?{line_sync.placeholders})
             """, (
                 report_id, line.line_number, line.work_id, line.planned_labor,
                 line.actual_labor, deviation, 1 if line.is_group else 0,
                 line.group_name, line.parent_group_id, 1 if line.is_collapsed else 0
-            ))
+            ) + line_sync.values())
             
             line_id = cursor.lastrowid
             
@@ -948,6 +1235,7 @@ async def create_daily_report(
 async def get_daily_report(
     report_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get(*DAILY_REPORT_COUNTERS)),
     db = Depends(get_db_connection)
 ):
     """Get daily report by ID with lines and joined fields"""
@@ -962,7 +1250,28 @@ async def get_daily_report(
     # Get lines
     report['lines'] = get_daily_report_lines_with_joins(db, report_id)
     
-    return {"success": True, "data": report}
+    return FastJSONResponse({"success": True, "data": report}, headers=etag_header(etag))
+
+
+@router.post("/daily-reports/batch-get")
+async def batch_get_daily_reports(
+    request: DocumentBatchGetRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get several daily reports with lines and executors, keyed by ID"""
+    ids = list(dict.fromkeys(request.ids))
+    reports = {
+        report_id: report
+        for report_id, report in get_daily_reports_with_joins(db, ids).items()
+        if not report.get('marked_for_deletion')
+    }
+    
+    if request.include_lines:
+        for report_id, lines in get_daily_reports_lines_with_joins(db, list(reports)).items():
+            reports[report_id]['lines'] = lines
+    
+    return FastJSONResponse(batch_response(reports, ids, request.fields))
 
 
 @router.put("/daily-reports/{report_id}")
@@ -1000,23 +1309,24 @@ async def update_daily_report(
             cursor.execute("DELETE FROM daily_report_lines WHERE daily_report_id = ?", (report_id,))
             
             # Insert new lines
+            line_sync = line_sync_columns(db, 'daily_report_lines')
             for line in data.lines:
                 # Calculate deviation percent
                 deviation = 0.0
                 if line.planned_labor > 0:
                     deviation = ((line.actual_labor - line.planned_labor) / line.planned_labor) * 100
                 
-                cursor.execute("""
+                cursor.execute(f"""
                     INSERT INTO daily_report_lines (
                         daily_report_id, line_number, work_id, planned_labor, actual_labor,
-                        labor_deviation_percent, is_group, group_name, parent_group_id, is_collapsed
+                        labor_deviation_percent, is_group, group_name, parent_group_id, is_collapsed{line_sync.names}
                     )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?{line_sync.placeholders})
                 """, (
                     report_id, line.line_number, line.work_id, line.planned_labor,
                     line.actual_labor, deviation, 1 if line.is_group else 0,
                     line.group_name, line.parent_group_id, 1 if line.is_collapsed else 0
-                ))
+                ) + line_sync.values())
                 
                 line_id = cursor.lastrowid
                 
@@ -1043,6 +1353,37 @@ async def update_daily_report(
         )
 
 
+@router.patch("/daily-reports/{report_id}/lines")
+async def patch_daily_report_lines(
+    report_id: int,
+    data: DocumentLinesPatch,
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Insert, update, delete or move individual daily report lines"""
+    cursor = db.cursor()
+    
+    cursor.execute("SELECT id FROM daily_reports WHERE id = ? AND marked_for_deletion = 0", (report_id,))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=404, detail="Daily report not found")
+    
+    changes = apply_document_line_patch(db, 'daily_report', report_id, data)
+    
+    try:
+        cursor.execute(
+            "UPDATE daily_reports SET modified_at = CURRENT_TIMESTAMP WHERE id = ?", (report_id,)
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update daily report lines: {str(e)}"
+        )
+    
+    return {"success": True, "data": changes}
+
+
 @router.delete("/daily-reports/{report_id}")
 async def delete_daily_report(
     report_id: int,
@@ -1092,9 +1433,6 @@ async def post_estimate(
         )
     
     # Import here to avoid circular dependency
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1128,9 +1466,6 @@ async def unpost_estimate(
         )
     
     # Import here to avoid circular dependency
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1164,9 +1499,6 @@ async def post_daily_report(
         )
     
     # Import here to avoid circular dependency
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1200,9 +1532,6 @@ async def unpost_daily_report(
         )
     
     # Import here to avoid circular dependency
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1244,16 +1573,15 @@ async def print_estimate(
     estimate_number = row['number']
     
     # Import print form services
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.services.print_render_cache import get_print_render_service
+    from api.dependencies.database import get_database_source
     
     try:
+        # Rendered files are cached per document version and rendered off the event loop
+        render_service = get_print_render_service(get_database_source())
+        content = await render_service.render(db, 'estimate', estimate_id, format)
+        
         if format == "pdf":
-            from src.services.estimate_print_form import EstimatePrintForm
-            print_service = EstimatePrintForm()
-            content = print_service.generate(estimate_id)
-            
             if not content:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1264,10 +1592,6 @@ async def print_estimate(
             media_type = "application/pdf"
             
         else:  # excel
-            from src.services.excel_estimate_print_form import ExcelEstimatePrintForm
-            print_service = ExcelEstimatePrintForm()
-            content = print_service.generate(estimate_id)
-            
             if not content:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1316,9 +1640,6 @@ async def get_estimate_hierarchy_report(
     
     estimate_number = row['number']
     
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.hierarchy_report_service import HierarchyReportService
     
     try:
@@ -1375,16 +1696,15 @@ async def print_daily_report(
     estimate_number = row['estimate_number'] or "unknown"
     
     # Import print form services
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.services.print_render_cache import get_print_render_service
+    from api.dependencies.database import get_database_source
     
     try:
+        # Rendered files are cached per document version and rendered off the event loop
+        render_service = get_print_render_service(get_database_source())
+        content = await render_service.render(db, 'daily_report', report_id, format)
+        
         if format == "pdf":
-            from src.services.daily_report_print_form import DailyReportPrintForm
-            print_service = DailyReportPrintForm()
-            content = print_service.generate(report_id)
-            
             if not content:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1395,10 +1715,6 @@ async def print_daily_report(
             media_type = "application/pdf"
             
         else:  # excel
-            from src.services.excel_daily_report_print_form import ExcelDailyReportPrintForm
-            print_service = ExcelDailyReportPrintForm()
-            content = print_service.generate(report_id)
-            
             if not content:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1433,45 +1749,48 @@ from api.models.documents import (
 )
 
 
-def get_timesheet_with_joins(db, timesheet_id: int) -> Optional[dict]:
-    """Get timesheet with joined reference names"""
+def get_timesheets_with_joins(db, timesheet_ids: List[int]) -> Dict[int, dict]:
+    """Get timesheets with joined reference names, keyed by ID"""
+    if not timesheet_ids:
+        return {}
+    
     cursor = db.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT 
             t.*,
-            o.name as object_name,
-            e.number as estimate_number,
-            p.full_name as foreman_name
+            e.number as estimate_number
         FROM timesheets t
-        LEFT JOIN objects o ON t.object_id = o.id
         LEFT JOIN estimates e ON t.estimate_id = e.id
-        LEFT JOIN persons p ON t.foreman_id = p.id
-        WHERE t.id = ?
-    """, (timesheet_id,))
+        WHERE t.id IN ({id_placeholders(timesheet_ids)})
+    """, list(timesheet_ids))
     
-    row = cursor.fetchone()
-    if not row:
-        return None
-    
-    return dict(row)
+    rows = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], TIMESHEET_REFERENCE_NAMES)
+    return {row['id']: row for row in rows}
 
 
-def get_timesheet_lines_with_joins(db, timesheet_id: int) -> List[dict]:
-    """Get timesheet lines with joined employee names"""
+def get_timesheet_with_joins(db, timesheet_id: int) -> Optional[dict]:
+    """Get timesheet with joined reference names"""
+    return get_timesheets_with_joins(db, [timesheet_id]).get(timesheet_id)
+
+
+def get_timesheets_lines_with_joins(db, timesheet_ids: List[int]) -> Dict[int, List[dict]]:
+    """Get lines of several timesheets with employee names, keyed by timesheet ID"""
+    lines = {timesheet_id: [] for timesheet_id in timesheet_ids}
+    if not timesheet_ids:
+        return lines
+    
     cursor = db.cursor()
-    cursor.execute("""
-        SELECT 
-            tl.*,
-            p.full_name as employee_name
+    cursor.execute(f"""
+        SELECT tl.*
         FROM timesheet_lines tl
-        LEFT JOIN persons p ON tl.employee_id = p.id
-        WHERE tl.timesheet_id = ?
-        ORDER BY tl.line_number
-    """, (timesheet_id,))
+        WHERE tl.timesheet_id IN ({id_placeholders(timesheet_ids)})
+        ORDER BY tl.timesheet_id, tl.line_number
+    """, list(timesheet_ids))
     
-    lines = []
-    for row in cursor.fetchall():
-        line = dict(row)
+    rows = [dict(row) for row in cursor.fetchall()]
+    attach_reference_names(db, rows, {'employee_id': ('persons', 'employee_name')})
+    
+    for line in rows:
         # Convert day columns to days dict
         days = {}
         for day in range(1, 32):
@@ -1479,14 +1798,20 @@ def get_timesheet_lines_with_joins(db, timesheet_id: int) -> List[dict]:
             if day_col in line and line[day_col] > 0:
                 days[day] = line[day_col]
         line['days'] = days
-        lines.append(line)
+        lines[line['timesheet_id']].append(line)
     
     return lines
 
 
+def get_timesheet_lines_with_joins(db, timesheet_id: int) -> List[dict]:
+    """Get timesheet lines with joined employee names"""
+    return get_timesheets_lines_with_joins(db, [timesheet_id])[timesheet_id]
+
+
 @router.get("/timesheets", response_model=List[Timesheet])
 async def get_timesheets(
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get(*TIMESHEET_COUNTERS, per_user=True)),
     db=Depends(get_db_connection)
 ):
     """Get all timesheets for current user"""
@@ -1497,13 +1822,9 @@ async def get_timesheets(
         cursor.execute("""
             SELECT 
                 t.*,
-                o.name as object_name,
-                e.number as estimate_number,
-                p.full_name as foreman_name
+                e.number as estimate_number
             FROM timesheets t
-            LEFT JOIN objects o ON t.object_id = o.id
             LEFT JOIN estimates e ON t.estimate_id = e.id
-            LEFT JOIN persons p ON t.foreman_id = p.id
             WHERE t.marked_for_deletion = 0
             ORDER BY t.date DESC, t.number DESC
         """)
@@ -1520,23 +1841,22 @@ async def get_timesheets(
         cursor.execute("""
             SELECT 
                 t.*,
-                o.name as object_name,
-                e.number as estimate_number,
-                p.full_name as foreman_name
+                e.number as estimate_number
             FROM timesheets t
-            LEFT JOIN objects o ON t.object_id = o.id
             LEFT JOIN estimates e ON t.estimate_id = e.id
-            LEFT JOIN persons p ON t.foreman_id = p.id
             WHERE t.marked_for_deletion = 0
               AND t.foreman_id = ?
             ORDER BY t.date DESC, t.number DESC
         """, (person_id,))
     
+    rows = attach_reference_names(db, [dict(row) for row in cursor.fetchall()], TIMESHEET_REFERENCE_NAMES)
+    
+    # Lines of all timesheets in one query
+    lines = get_timesheets_lines_with_joins(db, [row['id'] for row in rows])
+    
     timesheets = []
-    for row in cursor.fetchall():
-        timesheet_dict = dict(row)
-        # Get lines
-        timesheet_dict['lines'] = get_timesheet_lines_with_joins(db, timesheet_dict['id'])
+    for timesheet_dict in rows:
+        timesheet_dict['lines'] = lines[timesheet_dict['id']]
         timesheets.append(Timesheet(**timesheet_dict))
     
     return timesheets
@@ -1545,6 +1865,7 @@ async def get_timesheets(
 @router.get("/timesheets/{timesheet_id}", response_model=Timesheet)
 async def get_timesheet(
     timesheet_id: int,
+    etag: Optional[str] = Depends(conditional_get(*TIMESHEET_COUNTERS)),
     db=Depends(get_db_connection)
 ):
     """Get timesheet by ID"""
@@ -1562,6 +1883,23 @@ async def get_timesheet(
     return Timesheet(**timesheet_dict)
 
 
+@router.post("/timesheets/batch-get")
+async def batch_get_timesheets(
+    request: DocumentBatchGetRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection)
+):
+    """Get several timesheets with lines, keyed by ID"""
+    ids = list(dict.fromkeys(request.ids))
+    timesheets = get_timesheets_with_joins(db, ids)
+    
+    if request.include_lines:
+        for timesheet_id, lines in get_timesheets_lines_with_joins(db, list(timesheets)).items():
+            timesheets[timesheet_id]['lines'] = lines
+    
+    return FastJSONResponse(batch_response(timesheets, ids, request.fields))
+
+
 @router.post("/timesheets", status_code=status.HTTP_201_CREATED)
 async def create_timesheet(
     data: TimesheetCreate,
@@ -1603,6 +1941,7 @@ async def create_timesheet(
     timesheet_id = cursor.lastrowid
     
     # Insert lines
+    line_sync = line_sync_columns(db, 'timesheet_lines')
     for line in data.lines:
         # Calculate totals
         total_hours = sum(line.days.values())
@@ -1620,14 +1959,14 @@ async def create_timesheet(
                 day_08, day_09, day_10, day_11, day_12, day_13, day_14,
                 day_15, day_16, day_17, day_18, day_19, day_20, day_21,
                 day_22, day_23, day_24, day_25, day_26, day_27, day_28,
-                day_29, day_30, day_31, total_hours, total_amount
+                day_29, day_30, day_31, total_hours, total_amount{line_sync.names}
             ) VALUES (
                 ?, ?, ?, ?,
                 ?, ?, ?, ?, ?, ?, ?,
                 ?, ?, ?, ?, ?, ?, ?,
                 ?, ?, ?, ?, ?, ?, ?,
                 ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?
+                ?, ?, ?, ?, ?{line_sync.placeholders}
             )
         """, (
             timesheet_id, line.line_number, line.employee_id, line.hourly_rate,
@@ -1642,7 +1981,7 @@ async def create_timesheet(
             day_values['day_25'], day_values['day_26'], day_values['day_27'],
             day_values['day_28'], day_values['day_29'], day_values['day_30'],
             day_values['day_31'], total_hours, total_amount
-        ))
+        ) + line_sync.values())
     
     db.commit()
     
@@ -1702,6 +2041,7 @@ async def update_timesheet(
     
     # Insert new lines
     if data.lines:
+        line_sync = line_sync_columns(db, 'timesheet_lines')
         for line in data.lines:
             # Calculate totals
             total_hours = sum(line.days.values())
@@ -1719,14 +2059,14 @@ async def update_timesheet(
                     day_08, day_09, day_10, day_11, day_12, day_13, day_14,
                     day_15, day_16, day_17, day_18, day_19, day_20, day_21,
                     day_22, day_23, day_24, day_25, day_26, day_27, day_28,
-                    day_29, day_30, day_31, total_hours, total_amount
+                    day_29, day_30, day_31, total_hours, total_amount{line_sync.names}
                 ) VALUES (
                     ?, ?, ?, ?,
                     ?, ?, ?, ?, ?, ?, ?,
                     ?, ?, ?, ?, ?, ?, ?,
                     ?, ?, ?, ?, ?, ?, ?,
                     ?, ?, ?, ?, ?, ?, ?,
-                    ?, ?, ?, ?, ?
+                    ?, ?, ?, ?, ?{line_sync.placeholders}
                 )
             """, (
                 timesheet_id, line.line_number, line.employee_id, line.hourly_rate,
@@ -1741,7 +2081,7 @@ async def update_timesheet(
                 day_values['day_25'], day_values['day_26'], day_values['day_27'],
                 day_values['day_28'], day_values['day_29'], day_values['day_30'],
                 day_values['day_31'], total_hours, total_amount
-            ))
+            ) + line_sync.values())
     
     db.commit()
     
@@ -1749,6 +2089,41 @@ async def update_timesheet(
     return await get_timesheet(timesheet_id, db)
 
 
+@router.patch("/timesheets/{timesheet_id}/lines")
+async def patch_timesheet_lines(
+    timesheet_id: int,
+    data: DocumentLinesPatch,
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection)
+):
+    """Insert, update, delete or move individual timesheet lines"""
+    cursor = db.cursor()
+    
+    cursor.execute("SELECT id, is_posted FROM timesheets WHERE id = ?", (timesheet_id,))
+    row = cursor.fetchone()
+    
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Timesheet not found"
+        )
+    
+    if row['is_posted']:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot update posted timesheet"
+        )
+    
+    changes = apply_document_line_patch(db, 'timesheet', timesheet_id, data)
+    
+    cursor.execute(
+        "UPDATE timesheets SET modified_at = datetime('now') WHERE id = ?", (timesheet_id,)
+    )
+    db.commit()
+    
+    return {"success": True, "data": changes}
+
+
 @router.delete("/timesheets/{timesheet_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_timesheet(
     timesheet_id: int,
@@ -1852,6 +2227,29 @@ class BulkPostRequest(BaseModel):
     ids: List[int]
 
 
+from api.services.bulk_operation_service import bulk_operation_service
+from api.services.bulk_handlers import register_default_handlers
+
+register_default_handlers()
+
+
+async def bulk_delete_documents(operation_type: str, ids: List[int], db) -> dict:
+    """Mark unposted documents for deletion with set-based checks and updates"""
+    result = await bulk_operation_service.execute_operation(operation_type, ids, {'db': db})
+    if not result.success:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при групповом удалении: {'; '.join(result.errors)}"
+        )
+    
+    return {
+        "success": True,
+        "deleted_count": result.processed,
+        "errors": result.errors,
+        "message": f"Удалено документов: {result.processed}"
+    }
+
+
 @router.post("/estimates/bulk-delete")
 async def bulk_delete_estimates(
     request: BulkDeleteRequest,
@@ -1859,51 +2257,7 @@ async def bulk_delete_estimates(
     db = Depends(get_db_connection)
 ):
     """Bulk delete estimates"""
-    cursor = db.cursor()
-    deleted_count = 0
-    errors = []
-    
-    try:
-        for estimate_id in request.ids:
-            # Check if estimate exists and is not posted
-            cursor.execute("""
-                SELECT id, number, is_posted 
-                FROM estimates 
-                WHERE id = ? AND marked_for_deletion = 0
-            """, (estimate_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                errors.append(f"Смета ID {estimate_id} не найдена")
-                continue
-            
-            if row['is_posted']:
-                errors.append(f"Смета {row['number']} проведена, удаление невозможно")
-                continue
-            
-            # Mark as deleted
-            cursor.execute("""
-                UPDATE estimates
-                SET marked_for_deletion = 1, modified_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (estimate_id,))
-            deleted_count += 1
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "deleted_count": deleted_count,
-            "errors": errors,
-            "message": f"Удалено документов: {deleted_count}"
-        }
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при групповом удалении: {str(e)}"
-        )
+    return await bulk_delete_documents('estimates:delete', request.ids, db)
 
 
 @router.post("/estimates/bulk-post")
@@ -1920,9 +2274,6 @@ async def bulk_post_estimates(
             detail="Только администраторы могут проводить документы"
         )
     
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1958,9 +2309,6 @@ async def bulk_unpost_estimates(
             detail="Только администраторы могут отменять проведение документов"
         )
     
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -1989,51 +2337,7 @@ async def bulk_delete_daily_reports(
     db = Depends(get_db_connection)
 ):
     """Bulk delete daily reports"""
-    cursor = db.cursor()
-    deleted_count = 0
-    errors = []
-    
-    try:
-        for report_id in request.ids:
-            # Check if report exists and is not posted
-            cursor.execute("""
-                SELECT id, date, is_posted 
-                FROM daily_reports 
-                WHERE id = ? AND marked_for_deletion = 0
-            """, (report_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                errors.append(f"Отчет ID {report_id} не найден")
-                continue
-            
-            if row['is_posted']:
-                errors.append(f"Отчет от {row['date']} проведен, удаление невозможно")
-                continue
-            
-            # Mark as deleted
-            cursor.execute("""
-                UPDATE daily_reports
-                SET marked_for_deletion = 1, modified_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (report_id,))
-            deleted_count += 1
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "deleted_count": deleted_count,
-            "errors": errors,
-            "message": f"Удалено документов: {deleted_count}"
-        }
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при групповом удалении: {str(e)}"
-        )
+    return await bulk_delete_documents('daily_reports:delete', request.ids, db)
 
 
 @router.post("/daily-reports/bulk-post")
@@ -2050,9 +2354,6 @@ async def bulk_post_daily_reports(
             detail="Только администраторы могут проводить документы"
         )
     
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -2088,9 +2389,6 @@ async def bulk_unpost_daily_reports(
             detail="Только администраторы могут отменять проведение документов"
         )
     
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.services.document_posting_service import DocumentPostingService
     
     posting_service = DocumentPostingService()
@@ -2119,51 +2417,7 @@ async def bulk_delete_timesheets(
     db = Depends(get_db_connection)
 ):
     """Bulk delete timesheets"""
-    cursor = db.cursor()
-    deleted_count = 0
-    errors = []
-    
-    try:
-        for timesheet_id in request.ids:
-            # Check if timesheet exists and is not posted
-            cursor.execute("""
-                SELECT id, number, is_posted 
-                FROM timesheets 
-                WHERE id = ? AND marked_for_deletion = 0
-            """, (timesheet_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                errors.append(f"Табель ID {timesheet_id} не найден")
-                continue
-            
-            if row['is_posted']:
-                errors.append(f"Табель {row['number']} проведен, удаление невозможно")
-                continue
-            
-            # Mark as deleted
-            cursor.execute("""
-                UPDATE timesheets
-                SET marked_for_deletion = 1
-                WHERE id = ?
-            """, (timesheet_id,))
-            deleted_count += 1
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "deleted_count": deleted_count,
-            "errors": errors,
-            "message": f"Удалено документов: {deleted_count}"
-        }
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при групповом удалении: {str(e)}"
-        )
+    return await bulk_delete_documents('timesheets:delete', request.ids, db)
 
 
 @router.post("/timesheets/bulk-post")
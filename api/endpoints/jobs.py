@@ -0,0 +1,166 @@
+"""
+Background job endpoints
+
+Long-running operations (DBF import, migrations, bulk posting) are
+submitted here and run on the job queue; clients follow their progress
+through GET /jobs/{id}/events (Server-Sent Events). Excel imports are
+queued by POST /documents/estimates/import-excel.
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from api.dependencies.auth import get_current_user
+from api.models.auth import UserInfo
+from src.data.repositories.background_job_repository import FINISHED_STATUSES
+from src.services.job_queue import JobQueue, get_job_queue, get_job_type, get_job_types, job_event
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Seconds between reads of the job table while no in-process event arrives
+# (jobs running in another worker process only report through the table)
+POLL_INTERVAL = 1.0
+# Seconds between keep-alive comments while a job reports no progress
+HEARTBEAT_INTERVAL = 15.0
+
+
+class JobRequest(BaseModel):
+    job_type: str
+    parameters: Dict[str, Any] = {}
+
+
+def get_queue() -> JobQueue:
+    return get_job_queue()
+
+
+def _check_access(job: Optional[Dict[str, Any]], current_user: UserInfo) -> Dict[str, Any]:
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задание не найдено")
+    if current_user.role != 'admin' and job['created_by'] != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа к заданию")
+    return job
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['status']}\ndata: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
+
+
+@router.get("/types")
+async def list_job_types(current_user: UserInfo = Depends(get_current_user)):
+    """List the job types that can be submitted"""
+    return {
+        "data": [
+            {"name": job_type.name, "title": job_type.title, "admin_only": job_type.admin_only}
+            for job_type in get_job_types() if job_type.submittable
+        ]
+    }
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    request: JobRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    queue: JobQueue = Depends(get_queue)
+):
+    """Queue a background job"""
+    job_type = get_job_type(request.job_type)
+    if job_type is None or not job_type.submittable:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный тип задания: {request.job_type}"
+        )
+    if job_type.admin_only and current_user.role != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Только администраторы могут запускать это задание"
+        )
+
+    try:
+        job_type.validate(request.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    job = await run_in_threadpool(queue.submit, request.job_type, request.parameters, current_user.id)
+    return {"success": True, "data": job}
+
+
+@router.get("")
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    current_user: UserInfo = Depends(get_current_user),
+    queue: JobQueue = Depends(get_queue)
+):
+    """List recent jobs; non-admins only see their own"""
+    created_by = None if current_user.role == 'admin' else current_user.id
+    jobs = await run_in_threadpool(queue.list, limit, created_by, status_filter)
+    return {"data": jobs}
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: UserInfo = Depends(get_current_user),
+    queue: JobQueue = Depends(get_queue)
+):
+    """Get the state of a job"""
+    job = _check_access(await run_in_threadpool(queue.get, job_id), current_user)
+    return {"data": job}
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    current_user: UserInfo = Depends(get_current_user),
+    queue: JobQueue = Depends(get_queue)
+):
+    """Request cancellation of a queued or running job"""
+    _check_access(await run_in_threadpool(queue.get, job_id), current_user)
+    if not await run_in_threadpool(queue.cancel, job_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Задание уже завершено")
+    return {"success": True, "message": "Отмена задания запрошена"}
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    current_user: UserInfo = Depends(get_current_user),
+    queue: JobQueue = Depends(get_queue)
+):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    _check_access(await run_in_threadpool(queue.get, job_id), current_user)
+
+    async def events():
+        # Subscribe before reading the state so no event falls in between;
+        # events arrive on this loop, so waiting holds no threadpool thread
+        subscription = queue.subscribe(job_id, loop=asyncio.get_running_loop())
+        try:
+            last = job_event(await run_in_threadpool(queue.get, job_id))
+            yield _sse(last)
+            idle = 0.0
+            while last['status'] not in FINISHED_STATUSES:
+                event = await subscription.get_async(POLL_INTERVAL)
+                if event is None:
+                    event = job_event(await run_in_threadpool(queue.get, job_id))
+                    if event == last:
+                        idle += POLL_INTERVAL
+                        if idle >= HEARTBEAT_INTERVAL:
+                            idle = 0.0
+                            yield ": keep-alive\n\n"
+                        continue
+                idle = 0.0
+                last = event
+                yield _sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
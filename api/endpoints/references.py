@@ -1,11 +1,8 @@
 """
 Reference data endpoints - rewritten to use direct DB access
 """
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional
 import uuid
@@ -21,7 +18,10 @@ from api.models.references import (
 )
 from api.dependencies.auth import get_current_user
 from api.dependencies.database import get_db_connection
+from api.dependencies.conditional import check_not_modified, conditional_get, etag_header, make_etag
+from api.responses import FastJSONResponse
 from api.config import settings
+from src.data.repositories import work_closure_repository
 from api.validation.work_validation_direct import (
     validate_work_name_direct,
     validate_group_work_constraints_direct,
@@ -46,24 +46,56 @@ def create_pagination_info(page: int, page_size: int, total_items: int) -> Pagin
 
 def _get_work_hierarchy_path(cursor, work_id: int) -> list[str]:
     """Get hierarchy path for a work item"""
-    path = []
-    current_id = work_id
-    
-    # Prevent infinite loops
-    visited = set()
-    
-    while current_id is not None and current_id not in visited:
-        visited.add(current_id)
-        cursor.execute("SELECT name, parent_id FROM works WHERE id = ?", (current_id,))
-        row = cursor.fetchone()
-        
-        if row:
-            path.insert(0, row['name'])
-            current_id = row['parent_id']
-        else:
-            break
-    
-    return path
+    return work_closure_repository.get_paths(cursor, [work_id])[work_id]
+
+
+# Columns of the reference snapshots exposed to clients
+SNAPSHOT_COLUMNS = ('id', 'parent_id', 'is_group', 'marked_for_deletion')
+
+
+@router.get("/snapshot")
+async def get_reference_snapshot(
+    request: Request,
+    response: Response,
+    tables: Optional[str] = Query(None, description="Comma-separated table names (default: all)"),
+    current_user: UserInfo = Depends(get_current_user),
+    db = Depends(get_db_connection)
+):
+    """Get whole small reference tables for client-side id -> name resolution
+
+    The weak ETag is built from the tables' change counters; a matching
+    If-None-Match is answered with 304 Not Modified.
+    """
+    from src.services.reference_snapshot import SNAPSHOT_TABLES, get_reference_snapshot_cache
+
+    names = [name.strip() for name in tables.split(',') if name.strip()] if tables else list(SNAPSHOT_TABLES)
+    unknown = [name for name in names if name not in SNAPSHOT_TABLES]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown reference tables: {', '.join(unknown)}"
+        )
+
+    snapshots = get_reference_snapshot_cache().get_many(db, names)
+
+    if all(snapshot.version is not None for snapshot in snapshots.values()):
+        check_not_modified(
+            request, response,
+            make_etag(request.url.path, sorted((name, snapshot.version) for name, snapshot in snapshots.items()))
+        )
+
+    data = {}
+    for name, snapshot in snapshots.items():
+        columns = SNAPSHOT_COLUMNS + (snapshot.name_column,)
+        data[name] = {
+            "version": snapshot.version,
+            "items": [
+                {column: row[column] for column in columns if column in row}
+                for row in snapshot.rows.values()
+            ]
+        }
+
+    return {"success": True, "data": {"tables": data}}
 
 
 # Counterparties endpoints
@@ -76,6 +108,7 @@ async def list_counterparties(
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     is_deleted: Optional[bool] = Query(None, alias="isDeleted"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('counterparties')),
     db = Depends(get_db_connection)
 ):
     """Get list of counterparties"""
@@ -165,6 +198,7 @@ async def create_counterparty(
 async def get_counterparty(
     item_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('counterparties')),
     db = Depends(get_db_connection)
 ):
     """Get counterparty by ID"""
@@ -222,6 +256,7 @@ async def list_objects(
     sort_by: str = Query("name", regex="^(name|id)$"),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('objects')),
     db = Depends(get_db_connection)
 ):
     """Get list of objects"""
@@ -289,6 +324,7 @@ async def create_object(
 async def get_object(
     item_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('objects')),
     db = Depends(get_db_connection)
 ):
     """Get object by ID"""
@@ -360,7 +396,9 @@ async def list_works(
     include_unit_info: bool = Query(True),
     hierarchy_mode: str = Query("flat", regex="^(flat|tree|breadcrumb)$"),
     parent_id: Optional[int] = Query(None),
+    group_id: Optional[int] = Query(None, description="Only works anywhere under this group"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('work_contents', 'units')),
     db = Depends(get_db_connection)
 ):
     """Enhanced works listing with proper unit joins and hierarchy options
@@ -368,6 +406,7 @@ async def list_works(
     Args:
         hierarchy_mode: Display mode - 'flat' (all works), 'tree' (hierarchical), 'breadcrumb' (with path)
         parent_id: Filter by parent ID (None for root level in tree mode)
+        group_id: Filter by group at any depth (uses the work closure table)
         include_unit_info: Include unit information from units table
     """
     offset = (page - 1) * page_size
@@ -393,6 +432,12 @@ async def list_works(
         else:
             where_clauses.append("w.parent_id IS NULL")
     
+    if group_id is not None:
+        where_clauses.append(
+            "w.id IN (SELECT descendant_id FROM work_closure WHERE ancestor_id = ? AND depth > 0)"
+        )
+        params.append(group_id)
+    
     if search:
         where_clauses.append("w.name LIKE ?")
         params.append(f"%{search}%")
@@ -441,8 +486,9 @@ async def list_works(
     
     # Add hierarchy information for breadcrumb mode
     if hierarchy_mode == "breadcrumb":
+        paths = work_closure_repository.get_paths(cursor, [item['id'] for item in items])
         for item in items:
-            item['hierarchy_path'] = _get_work_hierarchy_path(cursor, item['id'])
+            item['hierarchy_path'] = paths[item['id']]
             item['level'] = len(item['hierarchy_path']) - 1
     
     # Add children count for tree mode
@@ -454,13 +500,13 @@ async def list_works(
             )
             item['children_count'] = cursor.fetchone()['count']
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": items,
         "pagination": create_pagination_info(page, page_size, total),
         "hierarchy_mode": hierarchy_mode,
         "parent_id": parent_id
-    }
+    }, headers=etag_header(etag))
 
 
 @router.post("/works", status_code=status.HTTP_201_CREATED)
@@ -501,9 +547,9 @@ async def create_work(
         "INSERT INTO works (name, unit, unit_id, price, labor_rate, is_group, parent_id, uuid, marked_for_deletion) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
         (data.name, data.unit, data.unit_id, data.price or 0.0, data.labor_rate or 0.0, data.is_group, data.parent_id, item_uuid)
     )
-    db.commit()
-    
     item_id = cursor.lastrowid
+    work_closure_repository.insert_work(cursor, item_id, data.parent_id)
+    db.commit()
     
     # Return work with proper unit information
     cursor.execute("""
@@ -525,6 +571,7 @@ async def get_work(
     item_id: int,
     include_unit_info: bool = Query(True),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('work_contents', 'units')),
     db = Depends(get_db_connection)
 ):
     """Get work by ID with enhanced unit information"""
@@ -595,7 +642,7 @@ async def update_work(
     cursor = db.cursor()
     
     # Check if exists and check UUID
-    cursor.execute("SELECT uuid FROM works WHERE id = ?", (item_id,))
+    cursor.execute("SELECT uuid, parent_id FROM works WHERE id = ?", (item_id,))
     row = cursor.fetchone()
     if not row:
          raise HTTPException(status_code=404, detail="Work not found")
@@ -614,6 +661,8 @@ async def update_work(
         "UPDATE works SET name = ?, unit = ?, unit_id = ?, price = ?, labor_rate = ?, is_group = ?, parent_id = ?, modified_at = CURRENT_TIMESTAMP WHERE id = ?",
         (data.name, data.unit, data.unit_id, data.price or 0.0, data.labor_rate or 0.0, data.is_group, data.parent_id, item_id)
     )
+    if row['parent_id'] != data.parent_id:
+        work_closure_repository.move_work(cursor, item_id, data.parent_id)
     db.commit()
     
     # Return work with proper unit information
@@ -740,10 +789,6 @@ async def start_unit_migration(
     
     try:
         # Import migration service
-        import sys
-        import os
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        
         from src.services.migration_workflow_service import MigrationWorkflowService
         from src.data.database_manager import DatabaseManager
         
@@ -896,6 +941,7 @@ async def list_persons(
     sort_by: str = Query("full_name", regex="^(full_name|id)$"),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('persons')),
     db = Depends(get_db_connection)
 ):
     """Get list of persons"""
@@ -963,6 +1009,7 @@ async def create_person(
 async def get_person(
     item_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('persons')),
     db = Depends(get_db_connection)
 ):
     """Get person by ID"""
@@ -1031,6 +1078,7 @@ async def list_organizations(
     sort_by: str = Query("name", regex="^(name|id)$"),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('organizations')),
     db = Depends(get_db_connection)
 ):
     """Get list of organizations"""
@@ -1094,6 +1142,7 @@ async def create_organization(
 async def get_organization(
     item_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('organizations')),
     db = Depends(get_db_connection)
 ):
     """Get organization by ID"""
@@ -1152,6 +1201,7 @@ async def list_units(
     sort_order: str = Query("asc"),
     is_deleted: Optional[bool] = Query(None, alias="isDeleted"),
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('units')),
     db = Depends(get_db_connection)
 ):
     """Get list of units"""
@@ -1229,6 +1279,7 @@ async def create_unit(
 async def get_unit(
     item_id: int,
     current_user: UserInfo = Depends(get_current_user),
+    etag: Optional[str] = Depends(conditional_get('units')),
     db = Depends(get_db_connection)
 ):
     """Get unit by ID"""
@@ -1607,6 +1658,7 @@ async def import_works_from_csv(
                                 (work_type, parent_id)
                             )
                             work_parent_id = cursor.lastrowid
+                            work_closure_repository.insert_work(cursor, work_parent_id, parent_id)
                             db.commit()
                         
                         work_groups[cache_key] = work_parent_id
@@ -1631,6 +1683,7 @@ async def import_works_from_csv(
                        VALUES (?, ?, ?, 0, ?, 0)""",
                     (work_name, unit, price, work_parent_id)
                 )
+                work_closure_repository.insert_work(cursor, cursor.lastrowid, work_parent_id)
                 db.commit()
                 added += 1
             
@@ -1684,6 +1737,7 @@ async def bulk_move_works(
     
     for work_id in request.work_ids:
         try:
+            work_closure_repository.move_work(cursor, work_id, request.new_parent_id)
             cursor.execute(
                 "UPDATE works SET parent_id = ? WHERE id = ?",
                 (request.new_parent_id, work_id)
@@ -1808,6 +1862,8 @@ async def permanent_delete_marked_works(
         )
     
     try:
+        cursor.execute("SELECT id FROM works WHERE marked_for_deletion = 1")
+        work_closure_repository.delete_works(cursor, [row['id'] for row in cursor.fetchall()])
         cursor.execute("DELETE FROM works WHERE marked_for_deletion = 1")
         db.commit()
         
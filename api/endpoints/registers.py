@@ -1,12 +1,6 @@
 """
 Register endpoints for work execution and other registers
 """
-import sys
-import os
-
-sys.path.insert(
-    0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from typing import List, Optional
@@ -18,9 +12,12 @@ from api.models.references import PaginationInfo
 from api.dependencies.auth import get_current_user
 from api.dependencies.database import get_db_connection
 from api.config import settings
+from api.responses import FastJSONResponse
 from src.data.repositories.work_execution_register_repository import (
     WorkExecutionRegisterRepository,
 )
+from src.data.repositories.work_execution_turnover_repository import load_variance
+from src.data.repositories import payroll_snapshot_repository
 
 
 router = APIRouter(prefix="/registers", tags=["Registers"])
@@ -101,6 +98,57 @@ async def get_work_execution_register(
     }
 
 
+@router.get("/work-execution/variance")
+async def get_work_execution_variance(
+    group_by: str = Query(
+        "object,estimate,work",
+        description="Comma-separated dimensions: object, estimate, work, month",
+    ),
+    period_from: Optional[date] = None,
+    period_to: Optional[date] = None,
+    object_id: Optional[int] = None,
+    estimate_id: Optional[int] = None,
+    work_id: Optional[int] = None,
+    sort_by: Optional[str] = None,
+    sort_order: str = Query("asc", regex="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection),
+):
+    """
+    Get plan vs fact per object, estimate, work and/or month
+
+    Plan is the register income (posted estimates), fact its expense (posted
+    daily reports). Periods are applied by whole months. Drill down by
+    filtering on a row's keys and grouping by the next dimension.
+    """
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    filters = {
+        "object_id": object_id,
+        "estimate_id": estimate_id,
+        "work_id": work_id,
+        "month_from": period_from,
+        "month_to": period_to,
+    }
+
+    try:
+        result = load_variance(
+            db, dimensions, filters, sort_by, sort_order,
+            limit=page_size, offset=(page - 1) * page_size,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return FastJSONResponse({
+        "success": True,
+        "data": result["rows"],
+        "totals": result["totals"],
+        "dimensions": dimensions,
+        "pagination": create_pagination_info(page, page_size, result["total"]),
+    })
+
+
 @router.get("/work-execution/movements")
 async def get_work_execution_movements(
     period_from: date,
@@ -173,3 +221,83 @@ async def get_work_execution_movements(
         "data": movements,
         "pagination": create_pagination_info(page, page_size, total),
     }
+
+
+@router.get("/payroll")
+async def get_payroll_totals(
+    group_by: str = Query(
+        "employee",
+        description="Comma-separated dimensions: employee, object, estimate, month",
+    ),
+    period_from: Optional[date] = None,
+    period_to: Optional[date] = None,
+    employee_id: Optional[int] = None,
+    object_id: Optional[int] = None,
+    estimate_id: Optional[int] = None,
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection),
+):
+    """
+    Get payroll hours and amounts per employee, object, estimate and/or month
+
+    Closed months are read from their snapshots, open months from the
+    register. Periods are applied by whole months.
+    """
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    filters = {
+        "employee_id": employee_id,
+        "object_id": object_id,
+        "estimate_id": estimate_id,
+        "month_from": period_from,
+        "month_to": period_to,
+    }
+
+    try:
+        rows = payroll_snapshot_repository.load_totals(db, dimensions, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return FastJSONResponse({
+        "success": True,
+        "data": rows,
+        "dimensions": dimensions,
+        "closed_through": payroll_snapshot_repository.closed_through(db),
+    })
+
+
+@router.post("/payroll/close")
+async def close_payroll_period(
+    month: str = Query(..., regex=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection),
+):
+    """Close payroll through month (YYYY-MM), snapshotting every open month up to it"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can close payroll periods")
+
+    closed = payroll_snapshot_repository.close_period(db, month)
+    db.commit()
+    return {
+        "success": True,
+        "months_closed": closed,
+        "closed_through": payroll_snapshot_repository.closed_through(db),
+    }
+
+
+@router.post("/payroll/reopen")
+async def reopen_payroll_period(
+    month: str = Query(..., regex=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    current_user: UserInfo = Depends(get_current_user),
+    db=Depends(get_db_connection),
+):
+    """Reopen payroll from month (YYYY-MM) on"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can reopen payroll periods")
+
+    reopened = payroll_snapshot_repository.reopen_period(db, month)
+    db.commit()
+    return {
+        "success": True,
+        "months_reopened": reopened,
+        "closed_through": payroll_snapshot_repository.closed_through(db),
+    }
@@ -1,7 +1,3 @@
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 from typing import List, Optional, Dict
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from api.dependencies.auth import get_current_user
@@ -8,10 +8,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from api.config import settings
 from api.endpoints import auth
+from api.middleware.compression import CompressionMiddleware
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,10 +34,49 @@ async def startup_event():
         from api.dependencies.database import get_db_manager
         db_manager = get_db_manager()
         logger.info("Database initialized successfully on startup")
+        
+        # Baseline for detecting changes made by other workers
+        from src.services.cache_invalidation import get_cache_invalidation_channel
+        channel = get_cache_invalidation_channel()
+        channel.poll_interval = settings.CACHE_POLL_INTERVAL_SECONDS
+        channel.poll(db_manager.get_engine(), force=True)
+        
+        # Jobs of a previous run cannot resume: their worker threads are gone.
+        # Behind a multi-worker master this already happened before the fork.
+        if not settings.SKIP_SCHEMA_CHECKS:
+            from src.services.job_queue import get_job_queue
+            get_job_queue().recover_interrupted()
     except Exception as e:
         logger.error(f"Failed to initialize database on startup: {e}")
         # Don't fail startup - let individual requests handle the error
         pass
+    
+    # Register print form fonts in the background so the first print is fast
+    import asyncio
+    asyncio.get_running_loop().run_in_executor(None, _warm_up_print_forms)
+
+
+def _warm_up_print_forms():
+    """Register print form fonts and styles"""
+    try:
+        from src.services.print_form_generator import warm_up_print_forms
+        warm_up_print_forms()
+        logger.info("Print form fonts registered")
+    except Exception as e:
+        logger.error(f"Failed to warm up print forms: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop print form render workers, background jobs and write pending audit entries"""
+    from src.services.print_render_cache import shutdown_print_render_service
+    shutdown_print_render_service()
+    
+    from src.services.job_queue import shutdown_job_queue
+    shutdown_job_queue()
+    
+    from src.services.audit_service import shutdown_audit_log_writer
+    shutdown_audit_log_writer()
 
 
 # Configure CORS - Must be done BEFORE adding routes
@@ -49,10 +89,39 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Compress large responses (brotli or gzip, see api/middleware/compression.py)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+)
+
+
+@app.middleware("http")
+async def poll_cache_invalidation(request: Request, call_next):
+    """Drop in-process caches made stale by other workers or the desktop client"""
+    from src.services.cache_invalidation import get_cache_invalidation_channel
+    channel = get_cache_invalidation_channel()
+    
+    if channel.is_due():
+        try:
+            from starlette.concurrency import run_in_threadpool
+            from api.dependencies.database import get_db_manager
+            await run_in_threadpool(channel.poll, get_db_manager().get_engine())
+        except Exception as e:
+            logger.warning(f"Cache invalidation poll failed: {e}")
+    
+    return await call_next(request)
+
+
 # Custom exception handlers
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """Handle HTTP exceptions with consistent JSON format"""
+    if exc.status_code == status.HTTP_304_NOT_MODIFIED:
+        # Conditional GET hit: no body, but keep the ETag
+        return Response(status_code=exc.status_code, headers=exc.headers)
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -107,19 +176,47 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
 
-# Include routers
-from api.endpoints import references, documents, registers, costs_materials, work_specifications, sync, audit, bulk_work_operations, panel_configuration, table_part_settings
-app.include_router(auth.router, prefix=settings.API_PREFIX)
-app.include_router(references.router, prefix=settings.API_PREFIX)
-app.include_router(documents.router, prefix=settings.API_PREFIX)
-app.include_router(registers.router, prefix=settings.API_PREFIX)
-app.include_router(costs_materials.router, prefix=settings.API_PREFIX, tags=["costs-materials"])
-app.include_router(work_specifications.router, prefix=settings.API_PREFIX)
-app.include_router(sync.router, prefix=settings.API_PREFIX, tags=["synchronization"])
-app.include_router(audit.router, prefix=settings.API_PREFIX)
-app.include_router(bulk_work_operations.router, prefix=settings.API_PREFIX)
-app.include_router(panel_configuration.router, prefix=settings.API_PREFIX)
-app.include_router(table_part_settings.router, prefix=settings.API_PREFIX)
+# Routers in registration order: (module, extra include_router arguments).
+# Endpoint modules must stay cheap to import: heavy libraries (reportlab,
+# openpyxl) are imported inside the print/import handlers on first use.
+ROUTERS = [
+    ("api.endpoints.references", {}),
+    ("api.endpoints.documents", {}),
+    ("api.endpoints.registers", {}),
+    ("api.endpoints.costs_materials", {"tags": ["costs-materials"]}),
+    ("api.endpoints.work_specifications", {}),
+    ("api.endpoints.sync", {"tags": ["synchronization"]}),
+    ("api.endpoints.audit", {}),
+    ("api.endpoints.bulk_work_operations", {}),
+    ("api.endpoints.panel_configuration", {}),
+    ("api.endpoints.table_part_settings", {}),
+    ("api.endpoints.jobs", {}),
+]
+
+# Seconds spent importing each router module, for the cold start profile
+ROUTER_IMPORT_TIMES = {}
+
+
+def include_routers(application: FastAPI):
+    """Import the endpoint modules and register their routers"""
+    import importlib
+    import time
+    
+    application.include_router(auth.router, prefix=settings.API_PREFIX)
+    
+    for module_name, include_kwargs in ROUTERS:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        ROUTER_IMPORT_TIMES[module_name] = time.perf_counter() - start
+        application.include_router(module.router, prefix=settings.API_PREFIX, **include_kwargs)
+    
+    logger.debug("Router import times: " + ", ".join(
+        f"{name.rsplit('.', 1)[-1]}={seconds * 1000:.0f}ms"
+        for name, seconds in ROUTER_IMPORT_TIMES.items()
+    ))
+
+
+include_routers(app)
 
 
 
@@ -6,4 +6,5 @@ This package contains middleware components for request processing:
 - cors: CORS configuration
 - error_handler: Global error handling
 - validation: Request validation middleware
+- compression: gzip/brotli response compression
 """
@@ -9,7 +9,7 @@ These models handle validation, serialization, and documentation for:
 The models follow a pattern of Base -> Create/Update -> Full model with ID.
 """
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Any, Dict, List, Literal, Optional
 from datetime import date, datetime
 from enum import Enum
 
@@ -259,6 +259,31 @@ class Timesheet(TimesheetBase):
         from_attributes = True
 
 
+# Batch Fetch Models
+MAX_BATCH_GET_DOCUMENTS = 200
+
+
+class DocumentBatchGetRequest(BaseModel):
+    """Model for fetching several documents of one type in a single request"""
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_GET_DOCUMENTS)
+    include_lines: bool = True
+    fields: Optional[List[str]] = None  # Header fields to return, all when omitted
+
+
+# Line Patch Models
+class LinePatchOperation(BaseModel):
+    """One change of a document's lines, keyed by line uuid"""
+    op: Literal['insert', 'update', 'delete', 'move']
+    uuid: str = Field(..., min_length=1, max_length=36)
+    values: Dict[str, Any] = Field(default_factory=dict)  # Changed columns (insert/update)
+    line_number: Optional[int] = Field(default=None, ge=1)  # New position (insert/move)
+
+
+class DocumentLinesPatch(BaseModel):
+    """Model for changing some lines of a document without resending the rest"""
+    operations: List[LinePatchOperation] = Field(..., min_length=1)
+
+
 # Payroll Register Models
 class PayrollRecord(BaseModel):
     """Model for payroll register record"""
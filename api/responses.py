@@ -0,0 +1,57 @@
+"""
+Fast JSON responses for large payloads
+
+Endpoints that return plain dicts go through FastAPI's jsonable_encoder,
+which walks every value of every row in Python before json.dumps runs; for
+a 10,000-row page that dominates the request. FastJSONResponse serializes
+the content directly with orjson (falling back to the standard library when
+it is not installed), so hot endpoints return it instead of a dict:
+
+    return FastJSONResponse({"success": True, "data": items}, headers=etag_header(etag))
+
+Returned responses bypass FastAPI's response handling, so headers such as
+the ETag have to be passed explicitly.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+import json
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Serialize the types found in API payloads besides plain JSON types"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
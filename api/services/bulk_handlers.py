@@ -1,17 +1,88 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from api.services.bulk_operation_service import BulkOperationHandler, BulkOperationResult, bulk_operation_service
-import sqlite3
-import sys
-import os
 
-class BulkDeleteHandler(BulkOperationHandler):
-    """Handler for bulk delete (mark for deletion) operations"""
+
+# SQLite allows 999 host parameters per statement in older builds
+MAX_IDS_PER_STATEMENT = 500
+
+ALLOWED_TABLES = ['counterparties', 'objects', 'works', 'persons', 'organizations', 'units', 'estimates', 'timesheets', 'daily_reports']
+DOCUMENT_TABLES = ['estimates', 'timesheets', 'daily_reports']
+
+
+def chunked(ids: List[int], size: int = MAX_IDS_PER_STATEMENT) -> Iterator[List[int]]:
+    """Split ids into chunks that fit into one statement"""
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class SetBasedBulkHandler(BulkOperationHandler):
+    """Base for handlers that check and change all ids with set queries
+    
+    Subclasses describe the operation instead of looping over ids:
+    - scope: condition a row must meet to be found (None: any row)
+    - validations: (condition, message) pairs; rows matching a condition are
+      rejected with message.format(id=..., label=<label_column value>)
+    - apply(): changes a chunk of the remaining ids with one statement
+    
+    Ids are processed in chunks of MAX_IDS_PER_STATEMENT and errors are still
+    reported per id, in request order. A chunk whose statement fails (e.g. on
+    a foreign key) is retried id by id to name the offending rows.
+    """
+    allowed_tables = ALLOWED_TABLES
+    scope: Optional[str] = None
+    label_column = 'id'
+    not_found_message = "ID {id}: Not found"
+    validations: Tuple[Tuple[str, str], ...] = ()
     
     def __init__(self, table_name: str):
         self.table_name = table_name
+    
+    def select_ids(self, cursor, ids: List[int], condition: Optional[str] = None) -> Dict[int, Any]:
+        """Ids (with their label) of the rows among ids that meet condition"""
+        found = {}
+        for chunk in chunked(ids):
+            query = f"SELECT id, {self.label_column} FROM {self.table_name} WHERE id IN ({', '.join('?' * len(chunk))})"
+            if condition:
+                query += f" AND ({condition})"
+            cursor.execute(query, chunk)
+            found.update((row[0], row[1]) for row in cursor.fetchall())
+        return found
+    
+    def validate(self, cursor, ids: List[int]) -> Tuple[List[int], Dict[int, str]]:
+        """Split ids into the ones to apply and the rejected ones with their errors"""
+        found = self.select_ids(cursor, ids, self.scope)
+        errors = {item_id: self.not_found_message.format(id=item_id) for item_id in ids if item_id not in found}
+        valid = [item_id for item_id in ids if item_id in found]
         
+        for condition, message in self.validations:
+            if not valid:
+                break
+            rejected = self.select_ids(cursor, valid, condition)
+            errors.update(
+                (item_id, message.format(id=item_id, label=label)) for item_id, label in rejected.items()
+            )
+            valid = [item_id for item_id in valid if item_id not in rejected]
+        return valid, errors
+    
+    def apply(self, cursor, ids: List[int]) -> int:
+        """Change one chunk of validated ids, returns the number of rows changed"""
+        raise NotImplementedError("Subclasses must implement apply method")
+    
+    def result_message(self, processed: int, total: int) -> str:
+        return f"Processed {processed} of {total} items"
+    
+    def _apply_chunk(self, cursor, chunk: List[int], errors: Dict[int, str]) -> int:
+        try:
+            return self.apply(cursor, chunk)
+        except Exception as e:
+            if len(chunk) == 1:
+                errors[chunk[0]] = f"ID {chunk[0]}: {str(e)}"
+                return 0
+        # A failed statement leaves the transaction intact, retry id by id
+        return sum(self._apply_chunk(cursor, [item_id], errors) for item_id in chunk)
+    
     async def execute(self, ids: List[int], context: Dict[str, Any] = None) -> BulkOperationResult:
-        db = context.get('db')
+        db = (context or {}).get('db')
         if not db:
             return BulkOperationResult(
                 success=False,
@@ -19,165 +90,96 @@ class BulkDeleteHandler(BulkOperationHandler):
                 processed=0,
                 errors=["Database connection missing"]
             )
-            
-        cursor = db.cursor()
-        processed = 0
-        errors = []
         
-        # Validate table name to prevent SQL injection
-        allowed_tables = ['counterparties', 'objects', 'works', 'persons', 'organizations', 'units', 'estimates', 'timesheets', 'daily_reports']
-        if self.table_name not in allowed_tables:
-             return BulkOperationResult(
+        # Validate table name to prevent SQL injection (it is interpolated into the queries)
+        if self.table_name not in self.allowed_tables:
+            return BulkOperationResult(
                 success=False,
                 message=f"Invalid table name: {self.table_name}",
                 processed=0,
                 errors=["Security violation: Invalid table name"]
             )
-            
-        for item_id in ids:
-            try:
-                # We use parameterized query for ID, but table name is interpolated (validated above)
-                query = f"UPDATE {self.table_name} SET marked_for_deletion = 1 WHERE id = ?"
-                cursor.execute(query, (item_id,))
-                
-                if cursor.rowcount > 0:
-                    processed += 1
-                else:
-                    errors.append(f"ID {item_id}: Item not found or update failed")
-                    
-            except Exception as e:
-                errors.append(f"ID {item_id}: {str(e)}")
         
+        ids = list(dict.fromkeys(ids))
+        cursor = db.cursor()
+        processed = 0
         try:
+            valid, errors = self.validate(cursor, ids)
+            for chunk in chunked(valid):
+                processed += self._apply_chunk(cursor, chunk, errors)
             db.commit()
         except Exception as e:
+            db.rollback()
             return BulkOperationResult(
                 success=False,
-                message="Transaction commit failed",
+                message="Bulk operation failed, no changes were made",
                 processed=0,
                 errors=[str(e)]
             )
-            
+        
         return BulkOperationResult(
             success=True,
-            message=f"Marked {processed} of {len(ids)} items for deletion",
+            message=self.result_message(processed, len(ids)),
             processed=processed,
-            errors=errors
+            errors=[errors[item_id] for item_id in ids if item_id in errors]
         )
 
-class BulkPermanentDeleteHandler(BulkOperationHandler):
-    """Handler for permanent delete operations"""
+
+class BulkDeleteHandler(SetBasedBulkHandler):
+    """Handler for bulk delete (mark for deletion) operations"""
     
-    def __init__(self, table_name: str):
-        self.table_name = table_name
+    not_found_message = "ID {id}: Item not found or update failed"
+    
+    def apply(self, cursor, ids: List[int]) -> int:
+        cursor.execute(
+            f"UPDATE {self.table_name} SET marked_for_deletion = 1 WHERE id IN ({', '.join('?' * len(ids))})",
+            ids
+        )
+        return cursor.rowcount
+    
+    def result_message(self, processed: int, total: int) -> str:
+        return f"Marked {processed} of {total} items for deletion"
 
-    async def execute(self, ids: List[int], context: Dict[str, Any] = None) -> BulkOperationResult:
-        db = context.get('db')
-        if not db:
-             return BulkOperationResult(
-                success=False,
-                message="Database connection missing",
-                processed=0,
-                errors=["Database connection missing"]
-            )
 
-        cursor = db.cursor()
-        processed = 0
-        errors = []
-        
-        allowed_tables = ['counterparties', 'objects', 'works', 'persons', 'organizations', 'units', 'estimates', 'timesheets', 'daily_reports']
-        if self.table_name not in allowed_tables:
-             return BulkOperationResult(
-                success=False,
-                message=f"Invalid table name: {self.table_name}",
-                processed=0,
-                errors=["Security violation: Invalid table name"]
-            )
+class BulkPermanentDeleteHandler(SetBasedBulkHandler):
+    """Handler for permanent delete operations"""
+    
+    def apply(self, cursor, ids: List[int]) -> int:
+        if self.table_name == 'works':
+            from src.data.repositories import work_closure_repository
+            work_closure_repository.delete_works(cursor, ids)
+        cursor.execute(f"DELETE FROM {self.table_name} WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        return cursor.rowcount
+    
+    def result_message(self, processed: int, total: int) -> str:
+        return f"Permanently deleted {processed} items"
 
-        if ids:
-            for item_id in ids:
-                try:
-                    query = f"DELETE FROM {self.table_name} WHERE id = ?"
-                    cursor.execute(query, (item_id,))
-                    if cursor.rowcount > 0:
-                        processed += 1
-                    else:
-                        errors.append(f"ID {item_id}: Not found")
-                except Exception as e:
-                    errors.append(f"ID {item_id}: {str(e)}")
-        
-        db.commit()
-        
-        return BulkOperationResult(
-            success=True,
-            message=f"Permanently deleted {processed} items",
-            processed=processed,
-            errors=errors
-        )
 
 class BulkDocumentDeleteHandler(BulkDeleteHandler):
-    """Handler for bulk delete of documents (checks is_posted)"""
+    """Handler for bulk delete of documents (posted documents are rejected)"""
     
-    async def execute(self, ids: List[int], context: Dict[str, Any] = None) -> BulkOperationResult:
-        db = context.get('db')
-        if not db:
-            return BulkOperationResult(success=False, message="No DB", processed=0, errors=["No DB"])
-            
-        cursor = db.cursor()
-        processed = 0
-        errors = []
-        
-        if self.table_name not in ['estimates', 'timesheets', 'daily_reports']:
-             return BulkOperationResult(success=False, message="Invalid table", processed=0, errors=["Invalid table"])
-
-        for item_id in ids:
-            try:
-                # Check is_posted
-                cursor.execute(f"SELECT is_posted, number FROM {self.table_name} WHERE id = ?", (item_id,))
-                row = cursor.fetchone()
-                if not row:
-                    errors.append(f"ID {item_id}: Not found")
-                    continue
-                
-                # Check column name/index for is_posted. Assuming it exists.
-                # In sqlite3 row is dict-like if configured, or tuple.
-                # If dict factory is used (common in this project), row['is_posted'].
-                # If tuple, we need index.
-                # Let's assume dict access if row is not tuple, or handle both.
-                is_posted = False
-                number = "Unknown"
-                
-                if isinstance(row, dict) or hasattr(row, 'keys'):
-                    is_posted = row['is_posted']
-                    number = row.get('number', str(item_id))
-                elif isinstance(row, sqlite3.Row):
-                    is_posted = row['is_posted']
-                    number = row['number']
-                else:
-                    # Fallback for tuple
-                    # SELECT id, number, is_posted -> 0, 1, 2
-                    number = row[1]
-                    is_posted = row[2]
-
-                if is_posted:
-                    errors.append(f"Document {number} is posted, cannot delete")
-                    continue
-
-                # Delete (Mark)
-                cursor.execute(f"UPDATE {self.table_name} SET marked_for_deletion = 1, modified_at = CURRENT_TIMESTAMP WHERE id = ?", (item_id,))
-                processed += 1
-                
-            except Exception as e:
-                errors.append(f"ID {item_id}: {str(e)}")
-        
-        db.commit()
-        
-        return BulkOperationResult(
-            success=True,
-            message=f"Marked {processed} of {len(ids)} documents for deletion",
-            processed=processed,
-            errors=errors
+    allowed_tables = DOCUMENT_TABLES
+    scope = "marked_for_deletion = 0"
+    
+    def __init__(self, table_name: str, not_found_message: str = "ID {id}: Not found",
+                 posted_message: str = "Document {label} is posted, cannot delete",
+                 label_column: str = 'number'):
+        super().__init__(table_name)
+        self.not_found_message = not_found_message
+        self.label_column = label_column
+        self.validations = (("is_posted = 1", posted_message),)
+    
+    def apply(self, cursor, ids: List[int]) -> int:
+        cursor.execute(
+            f"UPDATE {self.table_name} SET marked_for_deletion = 1, modified_at = CURRENT_TIMESTAMP "
+            f"WHERE id IN ({', '.join('?' * len(ids))})",
+            ids
         )
+        return cursor.rowcount
+    
+    def result_message(self, processed: int, total: int) -> str:
+        return f"Marked {processed} of {total} documents for deletion"
+
 
 class BulkPostHandler(BulkOperationHandler):
     """Handler for bulk posting documents"""
@@ -190,7 +192,6 @@ class BulkPostHandler(BulkOperationHandler):
         # It is in src/services/document_posting_service.py
         # Import lazily to avoid circular deps or path issues
         try:
-            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
             from src.services.document_posting_service import DocumentPostingService
         except ImportError:
             return BulkOperationResult(success=False, message="Posting service not found", processed=0, errors=["Service missing"])
@@ -234,7 +235,6 @@ class BulkUnpostHandler(BulkOperationHandler):
 
     async def execute(self, ids: List[int], context: Dict[str, Any] = None) -> BulkOperationResult:
         try:
-            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
             from src.services.document_posting_service import DocumentPostingService
         except ImportError:
             return BulkOperationResult(success=False, message="Posting service not found", processed=0, errors=["Service missing"])
@@ -271,7 +271,10 @@ class BulkUnpostHandler(BulkOperationHandler):
         )
 
 def register_default_handlers():
-    """Register default bulk operation handlers"""
+    """Register default bulk operation handlers (once; both routers call this)"""
+    if bulk_operation_service.get_handler('counterparties:delete'):
+        return
+    
     # Delete (Mark for deletion) handlers
     bulk_operation_service.register_handler('counterparties:delete', BulkDeleteHandler('counterparties'))
     bulk_operation_service.register_handler('objects:delete', BulkDeleteHandler('objects'))
@@ -280,9 +283,15 @@ def register_default_handlers():
     bulk_operation_service.register_handler('organizations:delete', BulkDeleteHandler('organizations'))
     
     # Document Delete handlers
-    bulk_operation_service.register_handler('estimates:delete', BulkDocumentDeleteHandler('estimates'))
-    bulk_operation_service.register_handler('daily_reports:delete', BulkDocumentDeleteHandler('daily_reports'))
-    bulk_operation_service.register_handler('timesheets:delete', BulkDocumentDeleteHandler('timesheets'))
+    bulk_operation_service.register_handler('estimates:delete', BulkDocumentDeleteHandler(
+        'estimates', "Смета ID {id} не найдена", "Смета {label} проведена, удаление невозможно"
+    ))
+    bulk_operation_service.register_handler('daily_reports:delete', BulkDocumentDeleteHandler(
+        'daily_reports', "Отчет ID {id} не найден", "Отчет от {label} проведен, удаление невозможно", 'date'
+    ))
+    bulk_operation_service.register_handler('timesheets:delete', BulkDocumentDeleteHandler(
+        'timesheets', "Табель ID {id} не найден", "Табель {label} проведен, удаление невозможно"
+    ))
 
     # Permanent delete handlers
     bulk_operation_service.register_handler('counterparties:permanent_delete', BulkPermanentDeleteHandler('counterparties'))
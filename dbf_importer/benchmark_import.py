@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Сравнение последовательного и параллельного импорта выгрузки 1С
+
+Импортирует все сущности дважды во временные копии базы данных: с чтением
+DBF в текущем процессе (как раньше, сущность за сущностью) и с чтением в
+пуле процессов. Печатает время этапов по сущностям.
+
+    python benchmark_import.py [директория с DBF] [limit]
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import DB_PATH, DBF_DEFAULT_PATH
+from core.database import DatabaseManager
+from core.importer import DBFImporter
+from core.scheduler import IMPORT_ORDER, ImportScheduler
+
+
+def run_import(dbf_directory: str, max_workers, limit):
+    """Импорт в копию базы данных, возвращает результаты и планировщик"""
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "benchmark.db")
+        shutil.copyfile(DB_PATH, db_path)
+
+        importer = DBFImporter()
+        importer.db_manager = DatabaseManager(f"sqlite:///{db_path}")
+        scheduler = ImportScheduler(importer, max_workers=max_workers)
+        try:
+            results = scheduler.run(dbf_directory, IMPORT_ORDER, clear_existing=True, limit=limit)
+        finally:
+            importer.db_manager.engine.dispose()
+        return results, scheduler
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    dbf_directory = sys.argv[1] if len(sys.argv) > 1 else DBF_DEFAULT_PATH
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    for label, max_workers in (("Последовательное чтение", 0), ("Пул процессов", None)):
+        results, scheduler = run_import(dbf_directory, max_workers, limit)
+        print(f"\n{label}: {results}")
+        print(scheduler.format_timings())
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ DBF_DEFAULT_PATH = "F:\\traeRepo\\Vibe1Co\\Erection\\8-NSM320-1Cv7"  # Путь
 # Настройки импорта
 BATCH_SIZE = 100  # Размер пакета для импорта данных
 PROGRESS_UPDATE_INTERVAL = 10  # Интервал обновления прогресса (в записях)
+READ_WORKERS = None  # Процессы чтения DBF при полном импорте (None - по числу ядер, 0 - без пула)
 
 # Настройки UI
 WINDOW_TITLE = "DBF Importer"
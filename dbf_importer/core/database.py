@@ -3,15 +3,35 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
 
-from config.settings import DATABASE_URL
+from config.settings import DATABASE_URL, BATCH_SIZE
+from .fingerprints import FINGERPRINT_TABLE, fingerprint_table
 
 logger = logging.getLogger(__name__)
 
+# Ключ сопоставления записей при upsert, если это не id
+UPSERT_KEYS = {
+    "cost_item_materials": ("work_id", "cost_item_id", "material_id"),
+}
+
+# Размер пакета upsert по типу СУБД: SQLite пишет локально и выигрывает от
+# крупных транзакций, PostgreSQL и MSSQL ограничены сетью и числом параметров
+UPSERT_BATCH_SIZES = {
+    "sqlite": 5000,
+    "postgresql": 2000,
+    "mssql": 1000,
+}
+
+# Число ID в одном DELETE ... IN (...): ниже лимита параметров SQLite и MSSQL
+DELETE_CHUNK_SIZE = 500
+
+# Таблица замыкания дерева работ приложения (src/data/repositories/work_closure_repository.py)
+WORK_CLOSURE_TABLE = "work_closure"
+
 
 class DatabaseManager:
     """Класс для управления подключением к базе данных"""
@@ -20,6 +40,7 @@ class DatabaseManager:
         self.database_url = database_url
         self.engine = create_engine(self.database_url)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._fingerprint_table_ready = False
     
     def get_session(self) -> Session:
         """Создает и возвращает сессию базы данных"""
@@ -184,6 +205,162 @@ class DatabaseManager:
             if session:
                 session.close()
     
+    @property
+    def batch_size(self) -> int:
+        """Размер пакета импорта для текущей СУБД"""
+        return UPSERT_BATCH_SIZES.get(self.engine.dialect.name, BATCH_SIZE)
+    
+    def upsert_records(self, table_name: str, records: List[Dict[str, Any]],
+                       key_columns: Optional[Sequence[str]] = None) -> bool:
+        """
+        Вставляет или обновляет записи пакетом средствами СУБД
+        
+        SQLite и PostgreSQL: INSERT ... ON CONFLICT DO UPDATE через executemany,
+        MSSQL: MERGE из временной таблицы. Для остальных СУБД - update_or_insert_records.
+        Записи без значения ключа вставляются, при повторе ключа в пакете
+        побеждает последняя запись.
+        
+        Args:
+            table_name: Имя таблицы
+            records: Список записей для вставки/обновления
+            key_columns: Столбцы ключа (по умолчанию UPSERT_KEYS или id)
+            
+        Returns:
+            True в случае успеха, False в случае ошибки
+        """
+        dialect = self.engine.dialect.name
+        key_columns = tuple(key_columns or UPSERT_KEYS.get(table_name, ("id",)))
+        if dialect not in UPSERT_BATCH_SIZES:
+            return self.update_or_insert_records(table_name, records, key_columns[0])
+        
+        try:
+            with self.engine.begin() as conn:
+                for columns, group in self._group_by_columns(records, key_columns):
+                    keys = tuple(key for key in key_columns if key in columns)
+                    if dialect == "mssql":
+                        self._merge_records(conn, table_name, columns, keys, group)
+                    else:
+                        self._insert_on_conflict(conn, table_name, columns, keys, group)
+            logger.info(f"Обработано {len(records)} записей для таблицы {table_name}")
+            return True
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при обработке записей для таблицы {table_name}: {e}")
+            return False
+    
+    @staticmethod
+    def _group_by_columns(records: List[Dict[str, Any]],
+                          key_columns: Tuple[str, ...]) -> List[Tuple[Tuple[str, ...], List[Dict[str, Any]]]]:
+        """Группирует записи по набору столбцов, без повторов ключа внутри группы"""
+        groups: Dict[Tuple[str, ...], Dict[Any, Dict[str, Any]]] = {}
+        for position, record in enumerate(records):
+            columns = tuple(record.keys())
+            if all(record.get(key) is None for key in key_columns):
+                # Без ключа сопоставить не с чем: только вставка
+                columns = tuple(column for column in columns if column not in key_columns)
+                record = {column: record[column] for column in columns}
+                key = ("insert", position)
+            else:
+                key = tuple(record.get(column) for column in key_columns)
+            groups.setdefault(columns, {})[key] = record
+        return [(columns, list(group.values())) for columns, group in groups.items()]
+    
+    @staticmethod
+    def _insert_on_conflict(conn, table_name: str, columns: Tuple[str, ...],
+                            keys: Tuple[str, ...], records: List[Dict[str, Any]]):
+        """INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+, PostgreSQL)"""
+        column_list = ", ".join(columns)
+        values = ", ".join(f":{column}" for column in columns)
+        updates = [column for column in columns if column not in keys]
+        
+        if not keys:
+            conn.execute(text(f"INSERT INTO {table_name} ({column_list}) VALUES ({values})"), records)
+            return
+        
+        # NULL в ключе не вызывает конфликт уникальности: такие записи сопоставляются явно
+        nullable = [record for record in records if any(record[key] is None for key in keys)]
+        keyed = [record for record in records if all(record[key] is not None for key in keys)]
+        
+        if keyed:
+            conflict = (
+                f"DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in updates)}"
+                if updates else "DO NOTHING"
+            )
+            conn.execute(text(
+                f"INSERT INTO {table_name} ({column_list}) VALUES ({values}) "
+                f"ON CONFLICT ({', '.join(keys)}) {conflict}"
+            ), keyed)
+        
+        # Условие сопоставления строится для каждого набора NULL-столбцов ключа,
+        # чтобы сравнения по остальным столбцам шли по индексу
+        null_patterns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for record in nullable:
+            null_keys = tuple(key for key in keys if record[key] is None)
+            null_patterns.setdefault(null_keys, []).append(record)
+        
+        for null_keys, group in null_patterns.items():
+            match = " AND ".join(
+                f"{key} IS NULL" if key in null_keys else f"{key} = :{key}" for key in keys
+            )
+            if updates:
+                conn.execute(text(
+                    f"UPDATE {table_name} SET {', '.join(f'{column} = :{column}' for column in updates)} "
+                    f"WHERE {match}"
+                ), group)
+            conn.execute(text(
+                f"INSERT INTO {table_name} ({column_list}) SELECT {values} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} WHERE {match})"
+            ), group)
+    
+    @staticmethod
+    def _merge_records(conn, table_name: str, columns: Tuple[str, ...],
+                       keys: Tuple[str, ...], records: List[Dict[str, Any]]):
+        """MERGE из временной таблицы (MSSQL)"""
+        column_list = ", ".join(columns)
+        values = ", ".join(f":{column}" for column in columns)
+        identity_insert = "id" in columns and conn.execute(
+            text("SELECT COLUMNPROPERTY(OBJECT_ID(:table_name), 'id', 'IsIdentity')"),
+            {"table_name": table_name}
+        ).scalar() == 1
+        
+        if not keys:
+            if identity_insert:
+                conn.execute(text(f"SET IDENTITY_INSERT {table_name} ON"))
+            conn.execute(text(f"INSERT INTO {table_name} ({column_list}) VALUES ({values})"), records)
+            if identity_insert:
+                conn.execute(text(f"SET IDENTITY_INSERT {table_name} OFF"))
+            return
+        
+        # UNION ALL не переносит свойство IDENTITY во временную таблицу
+        conn.execute(text(
+            f"SELECT TOP 0 {column_list} INTO #upsert_stage FROM {table_name} "
+            f"UNION ALL SELECT TOP 0 {column_list} FROM {table_name}"
+        ))
+        try:
+            conn.execute(text(f"INSERT INTO #upsert_stage ({column_list}) VALUES ({values})"), records)
+            
+            match = " AND ".join(
+                f"(target.{key} = source.{key} OR (target.{key} IS NULL AND source.{key} IS NULL))"
+                for key in keys
+            )
+            updates = [column for column in columns if column not in keys]
+            update_clause = (
+                f"WHEN MATCHED THEN UPDATE SET {', '.join(f'{column} = source.{column}' for column in updates)} "
+                if updates else ""
+            )
+            if identity_insert:
+                conn.execute(text(f"SET IDENTITY_INSERT {table_name} ON"))
+            conn.execute(text(
+                f"MERGE {table_name} WITH (HOLDLOCK) AS target USING #upsert_stage AS source ON {match} "
+                f"{update_clause}"
+                f"WHEN NOT MATCHED THEN INSERT ({column_list}) "
+                f"VALUES ({', '.join(f'source.{column}' for column in columns)});"
+            ))
+            if identity_insert:
+                conn.execute(text(f"SET IDENTITY_INSERT {table_name} OFF"))
+        finally:
+            conn.execute(text("DROP TABLE #upsert_stage"))
+    
     def delete_records_by_ids(self, table_name: str, ids: List[Any], 
                               id_field: str = "id") -> bool:
         """
@@ -197,25 +374,51 @@ class DatabaseManager:
         Returns:
             True в случае успеха, False в случае ошибки
         """
+        if not self._execute_by_ids(f"DELETE FROM {table_name}", table_name, ids, id_field):
+            return False
+        logger.info(f"Удалено {len(ids)} записей из таблицы {table_name}")
+        return True
+    
+    def mark_records_for_deletion(self, table_name: str, ids: List[Any],
+                                  id_field: str = "id") -> bool:
+        """
+        Помечает записи на удаление (marked_for_deletion = 1) по списку ID
+        
+        Справочники не удаляются физически: на них ссылаются документы.
+        
+        Args:
+            table_name: Имя таблицы
+            ids: Список ID записей
+            id_field: Имя поля ID
+            
+        Returns:
+            True в случае успеха, False в случае ошибки
+        """
+        if not self._execute_by_ids(f"UPDATE {table_name} SET marked_for_deletion = 1",
+                                    table_name, ids, id_field):
+            return False
+        logger.info(f"Помечено на удаление {len(ids)} записей в таблице {table_name}")
+        return True
+    
+    def _execute_by_ids(self, statement: str, table_name: str, ids: List[Any], id_field: str) -> bool:
+        """Выполняет statement с условием WHERE id_field IN (...) частями по DELETE_CHUNK_SIZE ID"""
         session = None
         try:
             session = self.get_session()
             if not ids:
                 return True
             
-            # Формирование запроса на удаление
-            placeholders = ", ".join([f":id_{i}" for i in range(len(ids))])
-            params = {f"id_{i}": id for i, id in enumerate(ids)}
-            delete_query = f"DELETE FROM {table_name} WHERE {id_field} IN ({placeholders})"
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                chunk = ids[start:start + DELETE_CHUNK_SIZE]
+                placeholders = ", ".join([f":id_{i}" for i in range(len(chunk))])
+                params = {f"id_{i}": id for i, id in enumerate(chunk)}
+                session.execute(text(f"{statement} WHERE {id_field} IN ({placeholders})"), params)
             
-            session.execute(text(delete_query), params)
             session.commit()
-            
-            logger.info(f"Удалено {len(ids)} записей из таблицы {table_name}")
             return True
             
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при удалении записей из таблицы {table_name}: {e}")
+            logger.error(f"Ошибка при изменении записей таблицы {table_name}: {e}")
             if session:
                 session.rollback()
             return False
@@ -223,6 +426,168 @@ class DatabaseManager:
             if session:
                 session.close()
     
+    def delete_records_by_keys(self, table_name: str, keys: List[Dict[str, Any]]) -> bool:
+        """
+        Удаляет записи из таблицы по значениям составного ключа
+        
+        Args:
+            table_name: Имя таблицы
+            keys: Значения столбцов ключа удаляемых записей (None - IS NULL)
+            
+        Returns:
+            True в случае успеха, False в случае ошибки
+        """
+        if not keys:
+            return True
+        
+        # Запрос строится для каждого набора NULL-столбцов, как и в upsert
+        null_patterns: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[Dict[str, Any]]] = {}
+        for key in keys:
+            columns = tuple(key.keys())
+            null_columns = tuple(column for column in columns if key[column] is None)
+            null_patterns.setdefault((columns, null_columns), []).append(key)
+        
+        try:
+            with self.engine.begin() as conn:
+                for (columns, null_columns), group in null_patterns.items():
+                    match = " AND ".join(
+                        f"{column} IS NULL" if column in null_columns else f"{column} = :{column}"
+                        for column in columns
+                    )
+                    conn.execute(text(f"DELETE FROM {table_name} WHERE {match}"), group)
+            logger.info(f"Удалено {len(keys)} записей из таблицы {table_name}")
+            return True
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при удалении записей из таблицы {table_name}: {e}")
+            return False
+    
+    def ensure_fingerprint_table(self) -> bool:
+        """Создает таблицу отпечатков записей для дельта-импорта, если ее нет"""
+        if self._fingerprint_table_ready:
+            return True
+        try:
+            fingerprint_table.create(self.engine, checkfirst=True)
+            self._fingerprint_table_ready = True
+            return True
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при создании таблицы {FINGERPRINT_TABLE}: {e}")
+            return False
+    
+    def load_fingerprints(self, entity_type: str) -> Dict[str, str]:
+        """
+        Загружает отпечатки записей предыдущего импорта сущности
+        
+        Returns:
+            Словарь record_key -> отпечаток (пустой, если отпечатков нет)
+        """
+        if not self.ensure_fingerprint_table():
+            return {}
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    text(f"SELECT record_key, fingerprint FROM {FINGERPRINT_TABLE} "
+                         f"WHERE entity_type = :entity_type"),
+                    {"entity_type": entity_type}
+                )
+                return {row[0]: row[1] for row in rows}
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при загрузке отпечатков для типа {entity_type}: {e}")
+            return {}
+    
+    def save_fingerprints(self, entity_type: str, fingerprints: Dict[str, str],
+                          deleted_keys: Sequence[str] = (), replace: bool = False) -> bool:
+        """
+        Сохраняет отпечатки записанных записей сущности
+        
+        Args:
+            entity_type: Тип сущности
+            fingerprints: record_key -> отпечаток новых и измененных записей
+            deleted_keys: Ключи записей, удаленных из выгрузки
+            replace: Заменить все отпечатки сущности (после очистки таблицы)
+            
+        Returns:
+            True в случае успеха, False в случае ошибки
+        """
+        if not self.ensure_fingerprint_table():
+            return False
+        
+        key_columns = ("entity_type", "record_key")
+        columns = key_columns + ("fingerprint",)
+        records = [
+            {"entity_type": entity_type, "record_key": key, "fingerprint": value}
+            for key, value in fingerprints.items()
+        ]
+        stale = [{"entity_type": entity_type, "record_key": key} for key in deleted_keys]
+        delete_key = f"DELETE FROM {FINGERPRINT_TABLE} WHERE entity_type = :entity_type AND record_key = :record_key"
+        insert = text(f"INSERT INTO {FINGERPRINT_TABLE} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join(f':{column}' for column in columns)})")
+        on_conflict = self.engine.dialect.name in ("sqlite", "postgresql")
+        
+        try:
+            with self.engine.begin() as conn:
+                if replace:
+                    conn.execute(text(f"DELETE FROM {FINGERPRINT_TABLE} WHERE entity_type = :entity_type"),
+                                 {"entity_type": entity_type})
+                if stale:
+                    conn.execute(text(delete_key), stale)
+                for start in range(0, len(records), self.batch_size):
+                    batch = records[start:start + self.batch_size]
+                    if replace:
+                        conn.execute(insert, batch)
+                    elif on_conflict:
+                        self._insert_on_conflict(conn, FINGERPRINT_TABLE, columns, key_columns, batch)
+                    else:
+                        conn.execute(text(delete_key), batch)
+                        conn.execute(insert, batch)
+            return True
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при сохранении отпечатков для типа {entity_type}: {e}")
+            return False
+    
+    def rebuild_work_closure(self) -> bool:
+        """
+        Пересчитывает таблицу замыкания дерева работ по works.parent_id
+        
+        Импорт пишет works сырым SQL мимо событий ORM приложения, которые
+        ведут work_closure, поэтому после записи работ таблица строится заново.
+        
+        Returns:
+            True в случае успеха или если таблицы замыкания нет, False в случае ошибки
+        """
+        if not self.table_exists(WORK_CLOSURE_TABLE):
+            # Приложение создаст и заполнит таблицу при запуске
+            return True
+        
+        # Остановка на исходном предке сохраняет конечность при циклах в parent_id
+        closure_cte = """
+            closure(ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM works
+                UNION ALL
+                SELECT c.ancestor_id, w.id, c.depth + 1
+                FROM closure c
+                JOIN works w ON w.parent_id = c.descendant_id
+                WHERE w.id <> c.ancestor_id
+            )
+        """
+        insert = f"INSERT INTO {WORK_CLOSURE_TABLE} (ancestor_id, descendant_id, depth)"
+        select = "SELECT ancestor_id, descendant_id, depth FROM closure"
+        
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(f"DELETE FROM {WORK_CLOSURE_TABLE}"))
+                if self.engine.dialect.name == "mssql":
+                    conn.execute(text(f"WITH {closure_cte} {insert} {select}"))
+                else:
+                    conn.execute(text(f"{insert} WITH RECURSIVE {closure_cte} {select}"))
+            logger.info(f"Пересчитана таблица {WORK_CLOSURE_TABLE}")
+            return True
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при пересчете таблицы {WORK_CLOSURE_TABLE}: {e}")
+            return False
+    
     def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
         """
         Получает информацию о столбцах таблицы
@@ -0,0 +1,109 @@
+"""
+Отпечатки записей для инкрементального (дельта) импорта
+
+Для каждой импортированной записи хранится хеш ее преобразованных полей,
+ключом служит ID записи в 1С. При повторном импорте записи с прежним
+отпечатком пропускаются, записываются только новые и измененные, а
+записи, которых больше нет в выгрузке, помечаются на удаление (строки
+состава удаляются).
+"""
+
+import ast
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Column, MetaData, String, Table
+
+FINGERPRINT_TABLE = "dbf_import_fingerprints"
+
+# Поля ключа записи, если это не id (у SC20 нет собственного ID в маппинге)
+RECORD_KEYS = {
+    "composition": ("work_id", "cost_item_name", "material_id"),
+}
+
+metadata = MetaData()
+
+fingerprint_table = Table(
+    FINGERPRINT_TABLE, metadata,
+    Column("entity_type", String(32), primary_key=True),
+    Column("record_key", String(255), primary_key=True),
+    Column("fingerprint", String(32), nullable=False),
+)
+
+
+def record_key(entity_type: str, record: Dict[str, Any]) -> Optional[str]:
+    """Ключ записи в таблице отпечатков; None, если у записи нет ключа"""
+    fields = RECORD_KEYS.get(entity_type, ("id",))
+    values = [record.get(name) for name in fields]
+    if all(value is None for value in values):
+        return None
+    if len(values) == 1:
+        return str(values[0])
+    # Составной ключ - repr кортежа, разбирается обратно через ast.literal_eval
+    return repr(tuple(values))
+
+
+def parse_record_key(entity_type: str, key: str) -> Dict[str, Any]:
+    """Значения полей ключа, из которых получен record_key"""
+    fields = RECORD_KEYS.get(entity_type, ("id",))
+    if len(fields) == 1:
+        return {fields[0]: int(key)}
+    return dict(zip(fields, ast.literal_eval(key)))
+
+
+def fingerprint(record: Dict[str, Any]) -> str:
+    """Хеш всех полей преобразованной записи"""
+    # Значения - числа, строки, bool и None: repr у них однозначен и в разы быстрее json
+    payload = repr(sorted(record.items()))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class RecordDelta:
+    """Изменения выгрузки относительно сохраненных отпечатков"""
+    # Новые и измененные записи, а также записи без ключа
+    changed: List[Dict[str, Any]] = field(default_factory=list)
+    # record_key -> новый отпечаток для changed
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    # Ключи записей, которых нет в выгрузке
+    deleted: List[str] = field(default_factory=list)
+    # Число неизмененных записей
+    skipped: int = 0
+
+
+def compute_delta(entity_type: str, records: List[Dict[str, Any]],
+                  stored: Dict[str, str], with_deletes: bool = True) -> RecordDelta:
+    """
+    Сравнивает записи выгрузки с сохраненными отпечатками
+
+    Args:
+        entity_type: Тип сущности
+        records: Преобразованные записи в том виде, в котором они пишутся в базу
+        stored: record_key -> отпечаток предыдущего импорта
+        with_deletes: Считать удаленными сохраненные ключи, которых нет в records
+            (только для полной выгрузки, не для импорта с limit)
+    """
+    current: Dict[str, Dict[str, Any]] = {}
+    keyless = []
+    for record in records:
+        key = record_key(entity_type, record)
+        if key is None:
+            keyless.append(record)
+        else:
+            # Как и в upsert, при повторе ключа побеждает последняя запись
+            current[key] = record
+
+    delta = RecordDelta()
+    for key, record in current.items():
+        record_fingerprint = fingerprint(record)
+        if stored.get(key) == record_fingerprint:
+            delta.skipped += 1
+        else:
+            delta.changed.append(record)
+            delta.fingerprints[key] = record_fingerprint
+    delta.changed.extend(keyless)
+
+    if with_deletes:
+        delta.deleted = [key for key in stored if key not in current]
+    return delta
@@ -3,17 +3,45 @@
 """
 
 import logging
-from typing import List, Dict, Any, Callable, Optional
+from typing import List, Dict, Any, Callable, Optional, Set
 from pathlib import Path
 from sqlalchemy import text
 
 from .dbf_reader import DBFReader
 from .database import DatabaseManager
-from config.settings import DBF_FIELD_MAPPING, BATCH_SIZE
+from .fingerprints import RecordDelta, compute_delta, parse_record_key, record_key
+from .scheduler import IMPORT_ORDER, ImportScheduler
+from config.settings import DBF_FIELD_MAPPING, READ_WORKERS
 
 logger = logging.getLogger(__name__)
 
 
+def read_entity_data(dbf_reader: DBFReader, dbf_path: str, entity_type: str,
+                     limit: int = None) -> List[Dict[str, Any]]:
+    """
+    Читает и преобразует записи сущности из DBF файла или директории
+    
+    Не обращается к базе данных, поэтому может выполняться в отдельном процессе.
+    """
+    logger.info(f"Чтение данных из DBF для типа {entity_type}")
+    if Path(dbf_path).is_file():
+        raw_data = dbf_reader.read_dbf_file(dbf_path)
+    else:
+        raw_data = dbf_reader.read_dbf_directory(dbf_path, entity_type)
+    
+    if not raw_data:
+        return []
+    
+    # Применение ограничения на количество записей
+    if limit is not None and limit > 0:
+        raw_data = raw_data[:limit]
+        logger.info(f"Ограничение импорта до {limit} записей")
+    
+    # Преобразование данных
+    logger.info(f"Преобразование данных для типа {entity_type}")
+    return dbf_reader.transform_data(raw_data, entity_type)
+
+
 class DBFImporter:
     """Класс для импорта данных из DBF файлов в базу данных"""
     
@@ -22,9 +50,19 @@ class DBFImporter:
         self.db_manager = DatabaseManager()
         self.progress_callback = progress_callback
         self._unit_id_mapping = {}
+        # Время этапов последнего import_all_entities (см. ImportScheduler.timings)
+        self.stage_timings: Dict[str, Dict[str, float]] = {}
+        # Записано, удалено (справочники - помечено на удаление), пропущено без изменений
+        # и с ошибками по сущностям
+        self.import_stats: Dict[str, Dict[str, int]] = {}
+        # Ключи записанных и удаленных записей по сущностям (core.fingerprints.record_key)
+        self._changed_keys: Dict[str, Set[str]] = {}
+        # Записи последнего _import_data_in_batches, которые не удалось записать
+        self._failed_records: List[Dict[str, Any]] = []
     
     def import_entity(self, dbf_path: str, entity_type: str, 
-                     clear_existing: bool = False, limit: int = None) -> bool:
+                     clear_existing: bool = False, limit: int = None,
+                     delta: bool = False) -> bool:
         """
         Импортирует данные для указанного типа сущности
         
@@ -33,6 +71,7 @@ class DBFImporter:
             entity_type: Тип сущности (nomenclature->works, works, materials, cost_items)
             clear_existing: Флаг очистки существующих данных перед импортом
             limit: Ограничение на количество импортируемых записей (None - все записи)
+            delta: Записывать только записи, изменившиеся с прошлого импорта
             
         Returns:
             True в случае успеха, False в случае ошибки
@@ -41,8 +80,38 @@ class DBFImporter:
             if entity_type not in DBF_FIELD_MAPPING:
                 raise ValueError(f"Неизвестный тип сущности: {entity_type}")
             
+            data = read_entity_data(self.dbf_reader, dbf_path, entity_type, limit)
+            if not data:
+                logger.warning(f"Нет данных для импорта в файле {dbf_path}")
+                return True
+            
+            return self.write_entity(entity_type, data, clear_existing, delta=delta, complete=limit is None)
+            
+        except Exception as e:
+            logger.error(f"Ошибка при импорте данных для типа {entity_type}: {e}")
+            return False
+    
+    def write_entity(self, entity_type: str, data: List[Dict[str, Any]],
+                     clear_existing: bool = False, delta: bool = False,
+                     complete: bool = True) -> bool:
+        """
+        Записывает в базу данных уже прочитанные и преобразованные записи сущности
+        
+        Args:
+            entity_type: Тип сущности
+            data: Результат read_entity_data
+            clear_existing: Флаг очистки существующих данных перед импортом
+            delta: Пропускать записи с прежним отпечатком (core.fingerprints),
+                помечать на удаление записи, которых нет в выгрузке
+            complete: data - вся выгрузка, а не первые limit записей; иначе
+                отсутствующие записи не помечаются на удаление
+            
+        Returns:
+            True в случае успеха, False в случае ошибки
+        """
+        try:
             if entity_type == "composition":
-                return self._import_composition(dbf_path, clear_existing, limit)
+                return self._write_composition(data, clear_existing, delta, complete)
 
             table_name = DBF_FIELD_MAPPING[entity_type]["table"]
             
@@ -52,41 +121,12 @@ class DBFImporter:
                 return False
             
             # Очистка существующих данных, если требуется
-            if clear_existing:
-                logger.info(f"Очистка таблицы {table_name}")
-                session = self.db_manager.get_session()
-                try:
-                    session.execute(text(f"DELETE FROM {table_name}"))
-                    session.commit()
-                except Exception as e:
-                    logger.error(f"Ошибка при очистке таблицы {table_name}: {e}")
-                    session.rollback()
-                    return False
-                finally:
-                    session.close()
-            
-            # Чтение данных из DBF файла
-            logger.info(f"Чтение данных из DBF для типа {entity_type}")
-            if Path(dbf_path).is_file():
-                raw_data = self.dbf_reader.read_dbf_file(dbf_path)
-            else:
-                raw_data = self.dbf_reader.read_dbf_directory(dbf_path, entity_type)
-            
-            if not raw_data:
-                logger.warning(f"Нет данных для импорта в файле {dbf_path}")
-                return True
-            
-            # Применение ограничения на количество записей
-            if limit is not None and limit > 0:
-                raw_data = raw_data[:limit]
-                logger.info(f"Ограничение импорта до {limit} записей")
-            
-            # Преобразование данных
-            logger.info(f"Преобразование данных для типа {entity_type}")
-            data = self.dbf_reader.transform_data(raw_data, entity_type)
+            if clear_existing and not self._clear_table(table_name):
+                return False
             
             # Handle duplicate unit names to avoid UNIQUE constraint violation
             if entity_type == "units":
+                raw_count = len(data)
                 unique_units = {}
                 filtered_data = []
                 for record in data:
@@ -105,7 +145,7 @@ class DBFImporter:
                             pass
                 
                 data = filtered_data
-                logger.info(f"Обработано уникальных единиц измерения: {len(data)} (было {len(raw_data)})")
+                logger.info(f"Обработано уникальных единиц измерения: {len(data)} (было {raw_count})")
             
             
             # Map unit IDs for works using the stored mapping
@@ -135,124 +175,75 @@ class DBFImporter:
 
                 logger.info(f"Сопоставлены unit_id для работ: {len(data)}")
             
+            # Сравнение с отпечатками предыдущего импорта
+            changes = self._record_delta(entity_type, data, clear_existing, delta, complete)
+            deleted_keys = self._mark_missing(table_name, entity_type, changes.deleted)
+            
             # Импорт данных пакетами
             logger.info(f"Импорт данных в таблицу {table_name}")
-            return self._import_data_in_batches(data, table_name, entity_type)
+            written = self._import_data_in_batches(changes.changed, table_name, entity_type)
+            if table_name == "works" and (changes.changed or clear_existing):
+                # parent_id записан мимо событий ORM, которые ведут work_closure
+                self.db_manager.rebuild_work_closure()
+            if not written:
+                return False
+            
+            failed_keys = {record_key(entity_type, record) for record in self._failed_records}
+            self._save_fingerprints(entity_type, changes, deleted_keys, clear_existing, failed_keys)
+            return True
             
         except Exception as e:
             logger.error(f"Ошибка при импорте данных для типа {entity_type}: {e}")
             return False
     
-    def _import_composition(self, dbf_path: str, clear_existing: bool = False, limit: int = None) -> bool:
+    def _clear_table(self, table_name: str) -> bool:
+        """Удаляет все записи таблицы перед импортом"""
+        logger.info(f"Очистка таблицы {table_name}")
+        session = self.db_manager.get_session()
+        try:
+            session.execute(text(f"DELETE FROM {table_name}"))
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при очистке таблицы {table_name}: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
+    def _write_composition(self, data: List[Dict[str, Any]], clear_existing: bool = False,
+                           delta: bool = False, complete: bool = True) -> bool:
         """
         Special handling for composition import (SC20)
+        
+        Needs the works and materials referenced by SC20 to be imported first.
+        With delta, only changed rows are written and work_specifications are
+        rebuilt only for the works whose composition changed.
         """
         entity_type = "composition"
         table_name = DBF_FIELD_MAPPING[entity_type]["table"]
         
         try:
             # 1. Clear existing
-            if clear_existing:
-                logger.info(f"Очистка таблицы {table_name}")
-                session = self.db_manager.get_session()
-                try:
-                    session.execute(text(f"DELETE FROM {table_name}"))
-                    session.commit()
-                except Exception as e:
-                    logger.error(f"Ошибка при очистке таблицы {table_name}: {e}")
-                    session.rollback()
-                    return False
-                finally:
-                    session.close()
-
-            # 2. Read DBF
-            logger.info(f"Чтение данных из DBF для типа {entity_type}")
-            if Path(dbf_path).is_file():
-                raw_data = self.dbf_reader.read_dbf_file(dbf_path)
-            else:
-                raw_data = self.dbf_reader.read_dbf_directory(dbf_path, entity_type)
-            
-            if not raw_data:
-                logger.warning(f"Нет данных для импорта в файле {dbf_path}")
-                return True
-            
-            if limit is not None and limit > 0:
-                raw_data = raw_data[:limit]
+            if clear_existing and not self._clear_table(table_name):
+                return False
             
-            # 3. Transform data
-            logger.info(f"Преобразование данных для типа {entity_type}")
-            data = self.dbf_reader.transform_data(raw_data, entity_type)
+            changes = self._record_delta(entity_type, data, clear_existing, delta, complete)
             
-            # 4. Handle Cost Items (SC20 DESCR -> cost_items table)
-            # Get unique cost item names
-            unique_names = set()
-            for record in data:
-                name = record.get("cost_item_name")
-                if name:
-                    unique_names.add(name)
-            
-            # Get existing cost items map
-            db_session = self.db_manager.get_session()
-            cost_item_map = {} # name -> id
-            try:
-                rows = db_session.execute(text("SELECT id, description FROM cost_items")).fetchall()
-                for row in rows:
-                    if row[1]:
-                        cost_item_map[row[1]] = row[0]
-                
-                # Insert new cost items
-                new_items_count = 0
-                for name in unique_names:
-                    if name not in cost_item_map:
-                        # Insert
-                        result = db_session.execute(
-                            text("INSERT INTO cost_items (description, code, is_folder, marked_for_deletion, price, labor_coefficient) VALUES (:desc, :code, 0, 0, 0, 0)"), 
-                            {"desc": name, "code": name[:50]} # Use name as code for now
-                        )
-                        # Get ID (SQLite specific for now, but SQLAlchemy usually handles return)
-                        # For cross-db support, usually we need to select back or use returning.
-                        # Since we use execute, we can use cursor.lastrowid for SQLite.
-                        new_id = result.lastrowid
-                        cost_item_map[name] = new_id
-                        new_items_count += 1
-                
-                db_session.commit()
-                logger.info(f"Создано {new_items_count} новых элементов затрат")
-                
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении справочника затрат: {e}")
-                db_session.rollback()
+            # 2. Handle Cost Items (SC20 DESCR -> cost_items table)
+            cost_item_map = self._ensure_cost_items(changes.changed)
+            if cost_item_map is None:
                 return False
-            finally:
-                db_session.close()
-                
-            # 5. Prepare final data for cost_item_materials
-            final_data = []
-            for record in data:
-                name = record.get("cost_item_name")
-                cost_item_id = cost_item_map.get(name)
-                
-                if not cost_item_id:
-                    continue # Should not happen
-                
-                new_record = {
-                    "work_id": record.get("work_id"),
-                    "material_id": record.get("material_id"),
-                    "cost_item_id": cost_item_id,
-                    "quantity_per_unit": record.get("quantity_per_unit", 0.0)
-                }
-                
-                # Validate IDs
-                if not new_record["work_id"]:
-                    continue
                 
-                final_data.append(new_record)
+            # 3. Prepare final data for cost_item_materials
+            final_data = self._composition_rows(changes.changed, cost_item_map)
                 
-            # 6. Populate work_specifications (Task 14)
+            # 4. Populate work_specifications (Task 14)
             logger.info("Импорт данных в таблицу work_specifications")
             
-            # Clear work_specifications if clear_existing
+            deleted_keys = []
             if clear_existing:
+                # Clear work_specifications if clear_existing
                 db_session = self.db_manager.get_session()
                 try:
                     db_session.execute(text("DELETE FROM work_specifications"))
@@ -262,119 +253,294 @@ class DBFImporter:
                     db_session.rollback()
                 finally:
                     db_session.close()
-
-            # Need material details
-            db_session = self.db_manager.get_session()
-            material_map = {} # id -> {name, price, unit_id}
-            try:
-                rows = db_session.execute(text("SELECT id, description, price, unit_id FROM materials")).fetchall()
-                for row in rows:
-                    material_map[row[0]] = {
-                        'name': row[1],
-                        'price': row[2] or 0,
-                        'unit_id': row[3]
-                    }
-            except Exception as e:
-                logger.error(f"Error loading materials: {e}")
-            
-            # Cost Item details
-            cost_item_details = {} # id -> {name, price, unit_id}
-            try:
-                rows = db_session.execute(text("SELECT id, description, price, unit_id FROM cost_items")).fetchall()
-                for row in rows:
-                    cost_item_details[row[0]] = {
-                        'name': row[1],
-                        'price': row[2] or 0,
-                        'unit_id': row[3]
-                    }
-            except Exception as e:
-                logger.error(f"Error loading cost items: {e}")
-                
-            db_session.close()
-
-            spec_data = []
-            for record in final_data:
-                work_id = record['work_id']
-                material_id = record.get('material_id')
-                cost_item_id = record.get('cost_item_id')
-                qty = record.get('quantity_per_unit', 0)
+                spec_rows = final_data
+            elif delta:
+                # Строки, удаленные из SC20, и спецификации только затронутых работ
+                deleted_keys = changes.deleted
+                deleted_rows = []
+                for key in deleted_keys:
+                    row = parse_record_key(entity_type, key)
+                    cost_item_id = cost_item_map.get(row["cost_item_name"])
+                    if cost_item_id:
+                        deleted_rows.append({"work_id": row["work_id"], "cost_item_id": cost_item_id,
+                                             "material_id": row["material_id"]})
+                if not self.db_manager.delete_records_by_keys(table_name, deleted_rows):
+                    return False
                 
-                if material_id and material_id in material_map:
-                    mat = material_map[material_id]
-                    spec_data.append({
-                        'work_id': work_id,
-                        'component_type': 'Material',
-                        'component_name': mat['name'] or f"Material {material_id}",
-                        'unit_id': mat['unit_id'],
-                        'consumption_rate': qty,
-                        'unit_price': mat['price'],
-                        'material_id': material_id
-                    })
-                elif cost_item_id and cost_item_id in cost_item_details:
-                    ci = cost_item_details[cost_item_id]
-                    spec_data.append({
-                        'work_id': work_id,
-                        'component_type': 'Labor', # Defaulting to Labor for CostItems
-                        'component_name': ci['name'],
-                        'unit_id': ci['unit_id'],
-                        'consumption_rate': qty,
-                        'unit_price': ci['price']
-                    })
+                # В спецификации копируются наименование и цена материала
+                changed_materials = {
+                    parse_record_key("materials", key)["id"] for key in self._changed_keys.get("materials", ())
+                }
+                affected_works = {row["work_id"] for row in final_data} | {row["work_id"] for row in deleted_rows}
+                affected_works.update(
+                    record.get("work_id") for record in data if record.get("material_id") in changed_materials
+                )
+                affected_works.discard(None)
+                if not self.db_manager.delete_records_by_ids("work_specifications", sorted(affected_works), "work_id"):
+                    return False
+                spec_rows = self._composition_rows(
+                    [record for record in data if record.get("work_id") in affected_works], cost_item_map
+                )
+                logger.info(f"Спецификации пересобираются для {len(affected_works)} работ")
+            else:
+                spec_rows = final_data
 
+            spec_data = self._build_specifications(spec_rows)
             if spec_data:
                 if not self._import_data_in_batches(spec_data, 'work_specifications', 'work_specifications'):
                     logger.error("Ошибка при импорте work_specifications")
             
-            # 7. Batch Import for cost_item_materials (Backward compatibility)
+            # 5. Batch Import for cost_item_materials (Backward compatibility)
             logger.info(f"Импорт данных в таблицу {table_name}")
-            return self._import_data_in_batches(final_data, table_name, entity_type)
+            if not self._import_data_in_batches(final_data, table_name, entity_type):
+                return False
+            
+            cost_item_names = {cost_item_id: name for name, cost_item_id in cost_item_map.items()}
+            failed_keys = {
+                record_key(entity_type, {"work_id": row["work_id"],
+                                         "cost_item_name": cost_item_names.get(row["cost_item_id"]),
+                                         "material_id": row["material_id"]})
+                for row in self._failed_records
+            }
+            self._save_fingerprints(entity_type, changes, deleted_keys, clear_existing, failed_keys)
+            return True
             
         except Exception as e:
             logger.error(f"Ошибка при импорте композиции: {e}")
             return False
 
+    def _ensure_cost_items(self, data: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """
+        Создает элементы затрат (cost_items) для наименований из SC20
+        
+        Returns:
+            Словарь наименование -> id всех элементов затрат или None при ошибке
+        """
+        # Get unique cost item names
+        unique_names = set()
+        for record in data:
+            name = record.get("cost_item_name")
+            if name:
+                unique_names.add(name)
+        
+        # Get existing cost items map
+        db_session = self.db_manager.get_session()
+        cost_item_map = {} # name -> id
+        try:
+            rows = db_session.execute(text("SELECT id, description FROM cost_items")).fetchall()
+            for row in rows:
+                if row[1]:
+                    cost_item_map[row[1]] = row[0]
+            
+            # Insert new cost items
+            new_items_count = 0
+            for name in unique_names:
+                if name not in cost_item_map:
+                    # Insert
+                    result = db_session.execute(
+                        text("INSERT INTO cost_items (description, code, is_folder, marked_for_deletion, price, labor_coefficient) VALUES (:desc, :code, 0, 0, 0, 0)"), 
+                        {"desc": name, "code": name[:50]} # Use name as code for now
+                    )
+                    # Get ID (SQLite specific for now, but SQLAlchemy usually handles return)
+                    # For cross-db support, usually we need to select back or use returning.
+                    # Since we use execute, we can use cursor.lastrowid for SQLite.
+                    new_id = result.lastrowid
+                    cost_item_map[name] = new_id
+                    new_items_count += 1
+            
+            db_session.commit()
+            logger.info(f"Создано {new_items_count} новых элементов затрат")
+            return cost_item_map
+            
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении справочника затрат: {e}")
+            db_session.rollback()
+            return None
+        finally:
+            db_session.close()
+
+    @staticmethod
+    def _composition_rows(data: List[Dict[str, Any]], cost_item_map: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Строки cost_item_materials для записей SC20"""
+        final_data = []
+        for record in data:
+            name = record.get("cost_item_name")
+            cost_item_id = cost_item_map.get(name)
+            
+            if not cost_item_id:
+                continue # Should not happen
+            
+            new_record = {
+                "work_id": record.get("work_id"),
+                "material_id": record.get("material_id"),
+                "cost_item_id": cost_item_id,
+                "quantity_per_unit": record.get("quantity_per_unit", 0.0)
+            }
+            
+            # Validate IDs
+            if not new_record["work_id"]:
+                continue
+            
+            final_data.append(new_record)
+        return final_data
+
+    def _build_specifications(self, final_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Строки work_specifications для строк cost_item_materials"""
+        if not final_data:
+            return []
+        
+        # Need material details
+        db_session = self.db_manager.get_session()
+        material_map = {} # id -> {name, price, unit_id}
+        try:
+            rows = db_session.execute(text("SELECT id, description, price, unit_id FROM materials")).fetchall()
+            for row in rows:
+                material_map[row[0]] = {
+                    'name': row[1],
+                    'price': row[2] or 0,
+                    'unit_id': row[3]
+                }
+        except Exception as e:
+            logger.error(f"Error loading materials: {e}")
+        
+        # Cost Item details
+        cost_item_details = {} # id -> {name, price, unit_id}
+        try:
+            rows = db_session.execute(text("SELECT id, description, price, unit_id FROM cost_items")).fetchall()
+            for row in rows:
+                cost_item_details[row[0]] = {
+                    'name': row[1],
+                    'price': row[2] or 0,
+                    'unit_id': row[3]
+                }
+        except Exception as e:
+            logger.error(f"Error loading cost items: {e}")
+            
+        db_session.close()
+
+        spec_data = []
+        for record in final_data:
+            work_id = record['work_id']
+            material_id = record.get('material_id')
+            cost_item_id = record.get('cost_item_id')
+            qty = record.get('quantity_per_unit', 0)
+            
+            if material_id and material_id in material_map:
+                mat = material_map[material_id]
+                spec_data.append({
+                    'work_id': work_id,
+                    'component_type': 'Material',
+                    'component_name': mat['name'] or f"Material {material_id}",
+                    'unit_id': mat['unit_id'],
+                    'consumption_rate': qty,
+                    'unit_price': mat['price'],
+                    'material_id': material_id
+                })
+            elif cost_item_id and cost_item_id in cost_item_details:
+                ci = cost_item_details[cost_item_id]
+                spec_data.append({
+                    'work_id': work_id,
+                    'component_type': 'Labor', # Defaulting to Labor for CostItems
+                    'component_name': ci['name'],
+                    'unit_id': ci['unit_id'],
+                    'consumption_rate': qty,
+                    'unit_price': ci['price']
+                })
+        return spec_data
+
+    def _record_delta(self, entity_type: str, data: List[Dict[str, Any]], clear_existing: bool,
+                      delta: bool, complete: bool) -> RecordDelta:
+        """
+        Отбирает записи для записи в базу
+        
+        Без delta (или после очистки таблицы) пишутся все записи, но их
+        отпечатки все равно считаются, чтобы следующий дельта-импорт
+        сравнивал выгрузку с тем, что действительно записано.
+        """
+        stored = {}
+        if delta and not clear_existing:
+            stored = self.db_manager.load_fingerprints(entity_type)
+        changes = compute_delta(entity_type, data, stored, with_deletes=complete)
+        if delta:
+            logger.info(f"Изменения {entity_type}: новых и измененных {len(changes.changed)}, "
+                        f"удаленных {len(changes.deleted)}, без изменений {changes.skipped}")
+        return changes
+
+    def _mark_missing(self, table_name: str, entity_type: str, keys: List[str]) -> List[str]:
+        """
+        Помечает на удаление записи, которых нет в выгрузке; возвращает их ключи
+        
+        Работы, материалы и единицы измерения используются в документах, поэтому
+        физически удаляются только строки состава (см. _write_composition).
+        Если запись снова появится в выгрузке, она будет записана заново вместе
+        с ее признаком пометки на удаление.
+        """
+        if not keys:
+            return []
+        ids = [parse_record_key(entity_type, key)["id"] for key in keys]
+        if not self.db_manager.mark_records_for_deletion(table_name, ids):
+            # Отпечатки остаются: пометка повторится при следующем импорте
+            logger.warning(f"Не удалось пометить на удаление {len(ids)} записей в таблице {table_name}")
+            return []
+        return keys
+
+    def _save_fingerprints(self, entity_type: str, changes: RecordDelta, deleted_keys: List[str],
+                           replace: bool, failed_keys: Set[Optional[str]]):
+        """Сохраняет отпечатки записанных записей и статистику импорта сущности"""
+        fingerprints = {
+            key: value for key, value in changes.fingerprints.items() if key not in failed_keys
+        }
+        self.db_manager.save_fingerprints(entity_type, fingerprints, deleted_keys, replace)
+        self._changed_keys[entity_type] = set(fingerprints) | set(deleted_keys)
+        
+        stats = {
+            "written": len(changes.changed) - len(self._failed_records),
+            "deleted": len(deleted_keys),
+            "skipped": changes.skipped,
+            "failed": len(self._failed_records),
+        }
+        self.import_stats[entity_type] = stats
+        logger.info(f"{entity_type}: записано {stats['written']}, удалено {stats['deleted']}, "
+                    f"пропущено без изменений {stats['skipped']}, с ошибками {stats['failed']}")
+
     def import_all_entities(self, dbf_directory: str,
-                           clear_existing: bool = False, limit: int = None) -> Dict[str, bool]:
+                           clear_existing: bool = False, limit: int = None,
+                           max_workers: Optional[int] = READ_WORKERS,
+                           delta: bool = False) -> Dict[str, bool]:
         """
         Импортирует данные всех типов сущностей из указанной директории
         
+        DBF файлы читаются параллельно в пуле процессов, запись идет в одном
+        потоке в порядке зависимостей сущностей (см. core.scheduler).
+        
         Args:
             dbf_directory: Директория с DBF файлами
             clear_existing: Флаг очистки существующих данных перед импортом
             limit: Ограничение на количество импортируемых записей для каждой сущности
+            max_workers: Число процессов чтения (None - по числу сущностей и ядер,
+                0 - чтение в текущем процессе)
+            delta: Записывать только изменения с прошлого импорта (см. write_entity);
+                число пропущенных записей - в import_stats
             
         Returns:
             Словарь с результатами импорта для каждого типа сущности
         """
-        results = {}
-        
-        # Определение порядка импорта (сначала справочники, потом документы)
-        import_order = ["units", "materials", "nomenclature", "composition"]
-        
-        # First, read all units data to create mapping before any imports
-        logger.info("Создание сопоставления единиц измерения...")
-        self._create_unit_mapping(dbf_directory)
-        
-        for entity_type in import_order:
+        entity_types = []
+        for entity_type in IMPORT_ORDER:
             if entity_type not in DBF_FIELD_MAPPING:
                 logger.warning(f"Тип сущности {entity_type} не найден в настройках, пропуск")
                 continue
-
-            logger.info(f"Начало импорта сущности: {entity_type}")
-            
-            # Вызов callback для обновления прогресса
-            if self.progress_callback:
-                self.progress_callback(f"Импорт {entity_type}...", 0)
-            
-            # Импорт сущности
-            success = self.import_entity(dbf_directory, entity_type, clear_existing, limit)
-            results[entity_type] = success
-            
-            if success:
-                logger.info(f"Успешно импортирована сущность: {entity_type}")
-            else:
-                logger.error(f"Ошибка при импорте сущности: {entity_type}")
+            entity_types.append(entity_type)
         
+        self.import_stats = {}
+        self._changed_keys = {}
+        scheduler = ImportScheduler(self, max_workers=max_workers)
+        results = scheduler.run(dbf_directory, entity_types, clear_existing, limit, delta=delta)
+        self.stage_timings = scheduler.timings
+        logger.info("Время этапов импорта:\n" + scheduler.format_timings())
+        if delta:
+            skipped = sum(stats["skipped"] for stats in self.import_stats.values())
+            logger.info(f"Пропущено записей без изменений: {skipped}")
         return results
     
     def _create_unit_mapping(self, dbf_directory: str):
@@ -392,8 +558,20 @@ class DBFImporter:
                 return
             
             # Преобразуем данные
-            data = self.dbf_reader.transform_data(raw_data, "units")
+            self._build_unit_mapping(self.dbf_reader.transform_data(raw_data, "units"))
             
+        except Exception as e:
+            logger.error(f"Ошибка при создании сопоставления единиц измерения: {e}")
+            self._unit_id_mapping = {}
+    
+    def _build_unit_mapping(self, data: List[Dict[str, Any]]):
+        """
+        Создает сопоставление ID и имен единиц измерения из DBF с ID в базе данных
+        
+        Args:
+            data: Преобразованные записи SC46.DBF
+        """
+        try:
             # Создаем сопоставление ID
             self._unit_id_mapping = {}
             
@@ -457,24 +635,19 @@ class DBFImporter:
         try:
             total_records = len(data)
             processed_records = 0
+            batch_size = self.db_manager.batch_size
+            self._failed_records = []
             
             # Разделение данных на пакеты
-            for i in range(0, total_records, BATCH_SIZE):
-                batch = data[i:i + BATCH_SIZE]
+            for i in range(0, total_records, batch_size):
+                batch = data[i:i + batch_size]
                 
-                # Импорт пакета
-                success = self.db_manager.update_or_insert_records(table_name, batch)
+                # Импорт пакета одним upsert средствами СУБД
+                success = self.db_manager.upsert_records(table_name, batch)
                 
                 if not success:
-                    logger.warning(f"Ошибка при импорте пакета {i//BATCH_SIZE + 1}. Пробуем импортировать записи по одной.")
-                    # Если пакет не удалось импортировать, пробуем по одной записи
-                    for record in batch:
-                        try:
-                            single_success = self.db_manager.update_or_insert_records(table_name, [record])
-                            if not single_success:
-                                logger.error(f"Не удалось импортировать запись: {record}")
-                        except Exception as e:
-                            logger.error(f"Ошибка при импорте записи: {e}. Данные: {record}")
+                    logger.warning(f"Ошибка при импорте пакета {i//batch_size + 1}. Ищем ошибочные записи.")
+                    self._upsert_isolating_errors(table_name, batch)
                 
                 processed_records += len(batch)
                 
@@ -495,6 +668,23 @@ class DBFImporter:
             logger.error(f"Ошибка при пакетном импорте данных: {e}")
             return False
     
+    def _upsert_isolating_errors(self, table_name: str, batch: List[Dict[str, Any]]):
+        """
+        Повторяет неудачный пакет половинами, пока не останутся отдельные ошибочные записи
+        
+        Корректные записи по-прежнему пишутся пакетами: на одну ошибочную
+        запись приходится порядка log2(размер пакета) повторов, а не по
+        запросу на каждую запись пакета.
+        """
+        if len(batch) == 1:
+            logger.error(f"Не удалось импортировать запись: {batch[0]}")
+            self._failed_records.append(batch[0])
+            return
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            if not self.db_manager.upsert_records(table_name, half):
+                self._upsert_isolating_errors(table_name, half)
+    
     def validate_dbf_structure(self, dbf_path: str, entity_type: str) -> Dict[str, Any]:
         """
         Проверяет структуру DBF файла на соответствие ожидаемой
@@ -0,0 +1,214 @@
+"""
+Планировщик параллельного импорта всех сущностей из DBF
+
+Чтение и преобразование DBF файлов не зависят друг от друга и выполняются
+в пуле процессов. Запись идет через один писатель (DBFImporter в текущем
+процессе, пакетами) в порядке графа ENTITY_DEPENDENCIES: сущность
+записывается, как только ее файл прочитан и записаны все сущности, на
+ID которых она ссылается. Так состав работ (SC20) импортируется только
+после работ и материалов.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Порядок импорта всех сущностей (сначала справочники, потом состав работ)
+IMPORT_ORDER = ["units", "materials", "nomenclature", "composition"]
+
+# Сущности, которые должны быть записаны раньше (по ссылкам на их ID)
+ENTITY_DEPENDENCIES = {
+    "units": (),
+    "materials": ("units",),
+    "nomenclature": ("units",),
+    "composition": ("materials", "nomenclature"),
+}
+
+# Этапы, время которых собирается для каждой сущности
+STAGES = ("read", "wait", "write")
+
+
+def dependency_levels(entity_types: Sequence[str],
+                      dependencies: Dict[str, Sequence[str]] = ENTITY_DEPENDENCIES) -> List[List[str]]:
+    """
+    Группирует сущности по уровням графа зависимостей
+
+    Зависимости от сущностей вне entity_types не учитываются: их данные
+    должны уже быть в базе.
+
+    Raises:
+        ValueError: Граф зависимостей содержит цикл
+    """
+    remaining = {
+        entity_type: {dep for dep in dependencies.get(entity_type, ()) if dep in entity_types}
+        for entity_type in entity_types
+    }
+    levels = []
+    while remaining:
+        level = [entity_type for entity_type in entity_types
+                 if entity_type in remaining and not remaining[entity_type]]
+        if not level:
+            raise ValueError(f"Циклическая зависимость сущностей: {', '.join(remaining)}")
+        levels.append(level)
+        for entity_type in level:
+            del remaining[entity_type]
+        for deps in remaining.values():
+            deps.difference_update(level)
+    return levels
+
+
+def read_entity(dbf_directory: str, entity_type: str, limit: int = None) -> Tuple[List[Dict[str, Any]], float]:
+    """Читает и преобразует записи сущности; выполняется в процессе пула"""
+    from .dbf_reader import DBFReader
+    from .importer import read_entity_data
+
+    start = time.perf_counter()
+    data = read_entity_data(DBFReader(), dbf_directory, entity_type, limit)
+    return data, time.perf_counter() - start
+
+
+class ImportScheduler:
+    """Импорт набора сущностей: параллельное чтение, запись одним писателем"""
+
+    def __init__(self, importer, max_workers: Optional[int] = None,
+                 dependencies: Dict[str, Sequence[str]] = ENTITY_DEPENDENCIES,
+                 read_function: Callable[..., Tuple[List[Dict[str, Any]], float]] = read_entity):
+        self.importer = importer
+        self.max_workers = max_workers
+        self.dependencies = dependencies
+        # Должна быть функцией уровня модуля, чтобы ее можно было передать в процесс пула
+        self.read_function = read_function
+        # entity_type -> {stage: секунды}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.total_seconds = 0.0
+
+    def run(self, dbf_directory: str, entity_types: Sequence[str],
+            clear_existing: bool = False, limit: int = None, delta: bool = False) -> Dict[str, bool]:
+        """
+        Импортирует сущности из директории с DBF файлами
+
+        С delta записываются только изменения с прошлого импорта
+        (DBFImporter.write_entity).
+
+        Returns:
+            Словарь с результатами импорта для каждого типа сущности
+        """
+        started = time.perf_counter()
+        order = [entity_type for level in dependency_levels(entity_types, self.dependencies)
+                 for entity_type in level]
+        self.timings = {entity_type: dict.fromkeys(STAGES, 0.0) for entity_type in order}
+
+        if "nomenclature" in order and "units" not in order:
+            self.importer._create_unit_mapping(dbf_directory)
+
+        results: Dict[str, bool] = {}
+        executor = self._create_executor(len(order))
+        try:
+            # Единицы читаются целиком: сопоставление строится по всем записям SC46
+            futures = {
+                entity_type: self._submit(executor, dbf_directory, entity_type,
+                                          None if entity_type == "units" else limit)
+                for entity_type in order
+            }
+            pending = list(order)
+            while pending:
+                entity_type = self._next_ready(pending, futures)
+                pending.remove(entity_type)
+                results[entity_type] = self._write(entity_type, futures[entity_type], results,
+                                                   clear_existing, limit, delta)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        self.total_seconds = time.perf_counter() - started
+        return results
+
+    def format_timings(self) -> str:
+        """Время этапов по сущностям в виде текстовой таблицы"""
+        lines = [f"{'entity':<14}" + "".join(f"{stage:>10}" for stage in STAGES)]
+        for entity_type, stages in self.timings.items():
+            lines.append(f"{entity_type:<14}" + "".join(f"{stages[stage]:>9.2f}s" for stage in STAGES))
+        sequential = sum(stages["read"] + stages["write"] for stages in self.timings.values())
+        lines.append(f"total {self.total_seconds:.2f}s (sequential read + write {sequential:.2f}s)")
+        return "\n".join(lines)
+
+    def _create_executor(self, entity_count: int) -> Optional[Executor]:
+        workers = self.max_workers
+        if workers is None:
+            workers = min(entity_count, os.cpu_count() or 1)
+        if workers <= 0:
+            return None
+        try:
+            # spawn: импорт может идти в многопоточном процессе (Qt, фоновые задания API)
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"Пул процессов недоступен, чтение в текущем процессе: {e}")
+            return None
+
+    def _submit(self, executor: Optional[Executor], dbf_directory: str,
+                entity_type: str, limit: Optional[int]) -> Future:
+        if executor is not None:
+            return executor.submit(self.read_function, dbf_directory, entity_type, limit)
+        future = Future()
+        try:
+            future.set_result(self.read_function(dbf_directory, entity_type, limit))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _next_ready(self, pending: List[str], futures: Dict[str, Future]) -> str:
+        """Следующая сущность, чьи зависимости записаны, а файл уже прочитан"""
+        ready = [
+            entity_type for entity_type in pending
+            if not any(dep in pending for dep in self.dependencies.get(entity_type, ()))
+        ]
+        done = [entity_type for entity_type in ready if futures[entity_type].done()]
+        if not done:
+            start = time.perf_counter()
+            wait([futures[entity_type] for entity_type in ready], return_when=FIRST_COMPLETED)
+            done = [entity_type for entity_type in ready if futures[entity_type].done()]
+            self.timings[done[0]]["wait"] += time.perf_counter() - start
+        return done[0]
+
+    def _write(self, entity_type: str, future: Future, results: Dict[str, bool],
+               clear_existing: bool, limit: Optional[int], delta: bool = False) -> bool:
+        failed = [dep for dep in self.dependencies.get(entity_type, ()) if results.get(dep) is False]
+        if failed:
+            logger.error(f"Импорт {entity_type} пропущен: не импортированы {', '.join(failed)}")
+            return False
+
+        try:
+            data, read_seconds = future.result()
+        except Exception as e:
+            logger.error(f"Ошибка при чтении данных для типа {entity_type}: {e}")
+            return False
+        self.timings[entity_type]["read"] = read_seconds
+
+        if entity_type == "units":
+            self.importer._build_unit_mapping(data)
+            if limit is not None and limit > 0:
+                data = data[:limit]
+
+        logger.info(f"Начало импорта сущности: {entity_type}")
+        if self.importer.progress_callback:
+            self.importer.progress_callback(f"Импорт {entity_type}...", 0)
+
+        if not data:
+            logger.warning(f"Нет данных для импорта сущности {entity_type}")
+            return True
+
+        start = time.perf_counter()
+        success = self.importer.write_entity(entity_type, data, clear_existing,
+                                             delta=delta, complete=limit is None or limit <= 0)
+        self.timings[entity_type]["write"] = time.perf_counter() - start
+
+        if success:
+            logger.info(f"Успешно импортирована сущность: {entity_type}")
+        else:
+            logger.error(f"Ошибка при импорте сущности: {entity_type}")
+        return success
@@ -29,12 +29,14 @@ class ImportThread(QThread):
     import_finished = pyqtSignal(dict)  # результаты импорта
     error_occurred = pyqtSignal(str)  # сообщение об ошибке
     
-    def __init__(self, dbf_path: str, entity_types: list, clear_existing: bool = False, limit: int = None):
+    def __init__(self, dbf_path: str, entity_types: list, clear_existing: bool = False, limit: int = None,
+                 delta: bool = False):
         super().__init__()
         self.dbf_path = dbf_path
         self.entity_types = entity_types
         self.clear_existing = clear_existing
         self.limit = limit
+        self.delta = delta
         self.importer = DBFImporter(progress_callback=self.progress_callback)
     
     def progress_callback(self, message: str, progress: int):
@@ -59,7 +61,8 @@ class ImportThread(QThread):
                 progress = int((current_step / total_steps) * 100)
                 
                 self.progress_updated.emit(f"Импорт {entity_type}...", progress)
-                success = self.importer.import_entity(self.dbf_path, entity_type, self.clear_existing, self.limit)
+                success = self.importer.import_entity(self.dbf_path, entity_type, self.clear_existing, self.limit,
+                                                      delta=self.delta)
                 results[entity_type] = success
                 
                 if not success:
@@ -156,6 +159,10 @@ class MainWindow(QMainWindow):
         self.clear_data_check = QCheckBox("Очистить существующие данные перед импортом")
         settings_layout.addWidget(self.clear_data_check)
         
+        # Чекбокс дельта-импорта
+        self.delta_check = QCheckBox("Только изменения (пропускать записи, не изменившиеся с прошлого импорта)")
+        settings_layout.addWidget(self.delta_check)
+        
         # Опция ограничения количества записей
         limit_layout = QHBoxLayout()
         self.limit_check = QCheckBox("Ограничить количество записей")
@@ -312,7 +319,8 @@ class MainWindow(QMainWindow):
             self.dbf_path, 
             entity_types, 
             self.clear_data_check.isChecked(),
-            limit
+            limit,
+            self.delta_check.isChecked()
         )
         self.import_thread.progress_updated.connect(self.update_progress)
         self.import_thread.import_finished.connect(self.import_finished)
@@ -380,6 +388,14 @@ class MainWindow(QMainWindow):
         
         message = f"Импорт завершен. Успешно: {success_count}/{total_count}"
         
+        # Статистика записанных и пропущенных записей
+        if self.import_thread:
+            for entity, stats in self.import_thread.importer.import_stats.items():
+                self.log_message(
+                    f"{entity}: записано {stats['written']}, удалено {stats['deleted']}, "
+                    f"пропущено без изменений {stats['skipped']}"
+                )
+        
         if success_count == total_count:
             QMessageBox.information(self, "Успех", message)
             self.log_message(message)
@@ -1,5 +1,17 @@
 #!/usr/bin/env python3
-"""API Server Startup Script"""
+"""API Server Startup Script
+
+Usage:
+    api_server.py [--host HOST] [--port PORT] [--workers N]
+
+With more than one worker (--workers or [API] workers in env.ini) the
+schema is created/migrated once here, in the master process, before uvicorn
+starts the worker processes. Each worker keeps its own caches; they stay
+coherent through the change counters polled by the cache invalidation
+channel.
+"""
+import argparse
+import multiprocessing
 import uvicorn
 import os
 import sys
@@ -15,24 +27,35 @@ else:
 sys.path.insert(0, application_path)
 
 if __name__ == "__main__":
+    # Worker processes of a frozen executable start through this entry point
+    multiprocessing.freeze_support()
+
     # Load configuration
     import configparser
     config = configparser.ConfigParser()
     config_path = os.path.join(application_path, 'env.ini')
-    
+
     if os.path.exists(config_path):
         config.read(config_path)
-    
-    # Get host and port from config or use defaults
-    host = config.get('API', 'host', fallback='0.0.0.0')
-    port = config.getint('API', 'port', fallback=8000)
-    
-    print(f"Starting API server on {host}:{port}")
-    
+
+    # Get host, port and workers from command line, config or defaults
+    parser = argparse.ArgumentParser(description="Construction Time Management API server")
+    parser.add_argument('--host', default=config.get('API', 'host', fallback='0.0.0.0'))
+    parser.add_argument('--port', type=int, default=config.getint('API', 'port', fallback=8000))
+    parser.add_argument('--workers', type=int, default=config.getint('API', 'workers', fallback=1))
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from api.dependencies.database import prepare_database_for_workers
+        prepare_database_for_workers()
+
+    print(f"Starting API server on {args.host}:{args.port} with {args.workers} worker(s)")
+
     uvicorn.run(
         "api.main:app",
-        host=host,
-        port=port,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
         reload=False,
         log_level="info"
     )
@@ -479,45 +479,10 @@ class APIBuilder:
         """Create API startup script"""
         project_root = self.config.config.get('Paths', 'project_root')
         
-        script_content = '''#!/usr/bin/env python3
-"""API Server Startup Script"""
-import uvicorn
-import os
-import sys
-
-# Add project root to path
-if getattr(sys, 'frozen', False):
-    # Running as compiled executable
-    application_path = os.path.dirname(sys.executable)
-else:
-    # Running as script
-    application_path = os.path.dirname(os.path.abspath(__file__))
-
-sys.path.insert(0, application_path)
-
-if __name__ == "__main__":
-    # Load configuration
-    import configparser
-    config = configparser.ConfigParser()
-    config_path = os.path.join(application_path, 'env.ini')
-    
-    if os.path.exists(config_path):
-        config.read(config_path)
-    
-    # Get host and port from config or use defaults
-    host = config.get('API', 'host', fallback='0.0.0.0')
-    port = config.getint('API', 'port', fallback=8000)
-    
-    print(f"Starting API server on {host}:{port}")
-    
-    uvicorn.run(
-        "api.main:app",
-        host=host,
-        port=port,
-        reload=False,
-        log_level="info"
-    )
-'''
+        # The checked-in startup script supports single and multi-worker mode
+        template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+        with open(template_path, 'r', encoding='utf-8') as f:
+            script_content = f.read()
         
         script_path = 'api_server.py'
         with open(script_path, 'w') as f:
@@ -0,0 +1,19 @@
+"""Gunicorn settings for running the API with several workers (Linux)
+
+    gunicorn -c deploy-to-prod/gunicorn.conf.py api.main:app
+
+Run from the project (or deployment output) root. API_HOST, API_PORT and
+API_WORKERS override the defaults below.
+"""
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('API_HOST', '0.0.0.0')}:{os.environ.get('API_PORT', '8000')}"
+workers = int(os.environ.get('API_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+
+def on_starting(server):
+    """Create/migrate the schema once, before the workers are forked"""
+    from api.dependencies.database import prepare_database_for_workers
+    prepare_database_for_workers()
@@ -28,6 +28,25 @@ class DatabaseConfig:
     DEFAULT_POOL_TIMEOUT = 30
     DEFAULT_POOL_RECYCLE = 3600
     
+    # SQLite engine profiles
+    SQLITE_PROFILE_PRODUCTION = "production"
+    SQLITE_PROFILE_COMPATIBILITY = "compatibility"  # NullPool, SQLite defaults
+    DEFAULT_SQLITE_PROFILE = SQLITE_PROFILE_PRODUCTION
+    DEFAULT_SQLITE_POOL_SIZE = 5
+    DEFAULT_SQLITE_MAX_OVERFLOW = 10
+    DEFAULT_SQLITE_JOURNAL_MODE = "WAL"
+    DEFAULT_SQLITE_SYNCHRONOUS = "NORMAL"
+    DEFAULT_SQLITE_CACHE_SIZE_KB = 65536
+    DEFAULT_SQLITE_MMAP_SIZE_MB = 256
+    DEFAULT_SQLITE_TEMP_STORE = "MEMORY"
+    DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+    DEFAULT_SQLITE_OPTIMIZE_INTERVAL = 3600
+    
+    # Allowed PRAGMA values (they are interpolated into SQL)
+    SQLITE_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+    SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+    SQLITE_TEMP_STORES = ("DEFAULT", "FILE", "MEMORY")
+    
     def __init__(self, config_path: str = "env.ini"):
         """Initialize database configuration from INI file
         
@@ -84,16 +103,74 @@ class DatabaseConfig:
         """Set default configuration (SQLite)"""
         self.db_type = self.DEFAULT_DB_TYPE
         self.config_data = {
-            'db_path': self.DEFAULT_SQLITE_PATH
+            'db_path': self.DEFAULT_SQLITE_PATH,
+            **self.default_sqlite_settings()
+        }
+    
+    @classmethod
+    def default_sqlite_settings(cls) -> Dict[str, Any]:
+        """Get SQLite engine profile settings used when env.ini has none"""
+        return {
+            'sqlite_profile': cls.DEFAULT_SQLITE_PROFILE,
+            'sqlite_pool_size': cls.DEFAULT_SQLITE_POOL_SIZE,
+            'sqlite_max_overflow': cls.DEFAULT_SQLITE_MAX_OVERFLOW,
+            'sqlite_pool_timeout': cls.DEFAULT_POOL_TIMEOUT,
+            'sqlite_journal_mode': cls.DEFAULT_SQLITE_JOURNAL_MODE,
+            'sqlite_synchronous': cls.DEFAULT_SQLITE_SYNCHRONOUS,
+            'sqlite_cache_size_kb': cls.DEFAULT_SQLITE_CACHE_SIZE_KB,
+            'sqlite_mmap_size_mb': cls.DEFAULT_SQLITE_MMAP_SIZE_MB,
+            'sqlite_temp_store': cls.DEFAULT_SQLITE_TEMP_STORE,
+            'sqlite_busy_timeout_ms': cls.DEFAULT_SQLITE_BUSY_TIMEOUT_MS,
+            'sqlite_optimize_interval': cls.DEFAULT_SQLITE_OPTIMIZE_INTERVAL
         }
     
     def _load_sqlite_config(self, config: configparser.ConfigParser) -> None:
         """Load SQLite configuration"""
         self.config_data = {
             'db_path': config.get('Database', 'sqlite_path', 
-                                  fallback=self.DEFAULT_SQLITE_PATH)
+                                  fallback=self.DEFAULT_SQLITE_PATH),
+            'sqlite_profile': self._get_choice(
+                config, 'sqlite_profile', self.DEFAULT_SQLITE_PROFILE,
+                (self.SQLITE_PROFILE_PRODUCTION, self.SQLITE_PROFILE_COMPATIBILITY)
+            ),
+            'sqlite_pool_size': config.getint('Database', 'sqlite_pool_size',
+                                             fallback=self.DEFAULT_SQLITE_POOL_SIZE),
+            'sqlite_max_overflow': config.getint('Database', 'sqlite_max_overflow',
+                                                fallback=self.DEFAULT_SQLITE_MAX_OVERFLOW),
+            'sqlite_pool_timeout': config.getint('Database', 'sqlite_pool_timeout',
+                                                fallback=self.DEFAULT_POOL_TIMEOUT),
+            'sqlite_journal_mode': self._get_choice(
+                config, 'sqlite_journal_mode', self.DEFAULT_SQLITE_JOURNAL_MODE,
+                self.SQLITE_JOURNAL_MODES
+            ),
+            'sqlite_synchronous': self._get_choice(
+                config, 'sqlite_synchronous', self.DEFAULT_SQLITE_SYNCHRONOUS,
+                self.SQLITE_SYNCHRONOUS_MODES
+            ),
+            'sqlite_cache_size_kb': config.getint('Database', 'sqlite_cache_size_kb',
+                                                 fallback=self.DEFAULT_SQLITE_CACHE_SIZE_KB),
+            'sqlite_mmap_size_mb': config.getint('Database', 'sqlite_mmap_size_mb',
+                                                fallback=self.DEFAULT_SQLITE_MMAP_SIZE_MB),
+            'sqlite_temp_store': self._get_choice(
+                config, 'sqlite_temp_store', self.DEFAULT_SQLITE_TEMP_STORE,
+                self.SQLITE_TEMP_STORES
+            ),
+            'sqlite_busy_timeout_ms': config.getint('Database', 'sqlite_busy_timeout_ms',
+                                                   fallback=self.DEFAULT_SQLITE_BUSY_TIMEOUT_MS),
+            'sqlite_optimize_interval': config.getint('Database', 'sqlite_optimize_interval',
+                                                     fallback=self.DEFAULT_SQLITE_OPTIMIZE_INTERVAL)
         }
     
+    def _get_choice(self, config: configparser.ConfigParser, key: str,
+                    default: str, allowed: tuple) -> str:
+        """Read an enumerated option, falling back to the default if it is not allowed"""
+        value = config.get('Database', key, fallback=default).strip()
+        for option in allowed:
+            if value.lower() == option.lower():
+                return option
+        logger.warning(f"Invalid value '{value}' for {key}. Using '{default}'.")
+        return default
+    
     def _load_postgresql_config(self, config: configparser.ConfigParser) -> None:
         """Load PostgreSQL configuration"""
         self.config_data = {
@@ -144,6 +221,13 @@ class DatabaseConfig:
         """Get the configuration data dictionary"""
         return self.config_data.copy()
     
+    def get_sqlite_settings(self) -> Dict[str, Any]:
+        """Get the SQLite engine profile settings, defaults for the keys not configured"""
+        return {
+            key: self.config_data.get(key, default)
+            for key, default in self.default_sqlite_settings().items()
+        }
+    
     def is_sqlite(self) -> bool:
         """Check if SQLite is configured"""
         return self.db_type == self.SQLITE
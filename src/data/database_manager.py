@@ -1,6 +1,7 @@
 """Database manager with multi-backend support using SQLAlchemy"""
 import sqlite3
 import logging
+import time
 from typing import Optional
 from contextlib import contextmanager
 from sqlalchemy import create_engine, event, Engine, text
@@ -25,18 +26,21 @@ class DatabaseManager:
     _config: Optional[DatabaseConfig] = None
     _connection: Optional[sqlite3.Connection] = None  # For backward compatibility
     _schema_manager: Optional[SchemaManager] = None
+    _last_sqlite_optimize: float = 0.0
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
-    def initialize(self, config_path: str = "env.ini") -> bool:
+    def initialize(self, config_path: str = "env.ini", check_schema: bool = True) -> bool:
         """Initialize database from configuration
         
         Args:
             config_path: Path to configuration file (default: env.ini)
                         For backward compatibility, can also be a direct database path
+            check_schema: Create/migrate the schema and backfill derived tables.
+                          API workers skip it when the master process already did.
                         
         Returns:
             True if initialization successful, False otherwise
@@ -84,13 +88,9 @@ class DatabaseManager:
             try:
                 self._engine = create_engine(connection_string, **engine_kwargs)
                 
-                # Enable foreign key support for SQLite
+                # Enable foreign key support and the engine profile for SQLite
                 if self._config.is_sqlite():
-                    @event.listens_for(self._engine, "connect")
-                    def set_sqlite_pragma(dbapi_conn, connection_record):
-                        cursor = dbapi_conn.cursor()
-                        cursor.execute("PRAGMA foreign_keys=ON")
-                        cursor.close()
+                    self._configure_sqlite_engine(self._engine, self._config.get_config_data())
                 
                 # Test the connection by attempting to connect
                 try:
@@ -141,7 +141,13 @@ class DatabaseManager:
                 self._schema_manager = SchemaManager(self._engine)
                 
                 # Create tables if needed (this will test the connection)
-                self._create_tables_sqlalchemy()
+                if check_schema:
+                    self._create_tables_sqlalchemy()
+                    self._ensure_work_closure(create_missing_table=self._config.is_sqlite())
+                    self._ensure_change_counters(create_missing_table=self._config.is_sqlite())
+                    self._ensure_work_execution_turnovers(create_missing_table=self._config.is_sqlite())
+                    self._ensure_payroll_snapshots(create_missing_table=self._config.is_sqlite())
+                    self._ensure_background_jobs(create_missing_table=self._config.is_sqlite())
                 
             except DatabaseConnectionError:
                 # Re-raise connection errors as-is
@@ -155,10 +161,12 @@ class DatabaseManager:
             
             # For backward compatibility with SQLite, maintain a connection
             if self._config.is_sqlite():
-                db_path = self._config.get_config_data()['db_path']
+                config_data = self._config.get_config_data()
+                db_path = config_data['db_path']
                 try:
                     self._connection = sqlite3.connect(db_path, check_same_thread=False)
                     self._connection.row_factory = sqlite3.Row
+                    self._apply_sqlite_pragmas(self._connection, self._get_sqlite_pragmas(config_data))
                 except Exception as e:
                     logger.error(f"Failed to create SQLite connection for backward compatibility: {e}")
                     raise DatabaseConnectionError(
@@ -173,7 +181,7 @@ class DatabaseManager:
             # Fall back to SQLite with default path
             logger.warning("Falling back to SQLite with default configuration")
             try:
-                return self._initialize_legacy("construction.db")
+                return self._initialize_legacy("construction.db", config_path)
             except Exception as fallback_error:
                 logger.error(f"Fallback initialization also failed: {fallback_error}")
                 raise DatabaseConnectionError(
@@ -188,11 +196,12 @@ class DatabaseManager:
             logger.error(f"Unexpected error during database initialization: {e}")
             raise DatabaseConnectionError(f"Database initialization failed: {e}")
     
-    def _initialize_legacy(self, db_path: str) -> bool:
+    def _initialize_legacy(self, db_path: str, config_path: str = "env.ini") -> bool:
         """Legacy initialization for backward compatibility
         
         Args:
             db_path: Path to SQLite database file
+            config_path: Configuration file with the SQLite engine profile
             
         Returns:
             True if initialization successful
@@ -200,11 +209,14 @@ class DatabaseManager:
         Raises:
             DatabaseConnectionError: If initialization fails
         """
+        sqlite_settings = DatabaseConfig(config_path).get_sqlite_settings()
+        
         try:
             # Create SQLite connection for backward compatibility
             try:
                 self._connection = sqlite3.connect(db_path, check_same_thread=False)
                 self._connection.row_factory = sqlite3.Row
+                self._apply_sqlite_pragmas(self._connection, self._get_sqlite_pragmas(sqlite_settings))
                 logger.debug(f"SQLite connection created: {db_path}")
             except sqlite3.Error as e:
                 logger.error(f"Failed to create SQLite connection to {db_path}: {e}")
@@ -215,14 +227,12 @@ class DatabaseManager:
             # Also create SQLAlchemy engine for new code
             try:
                 connection_string = f"sqlite:///{db_path}"
-                self._engine = create_engine(connection_string, poolclass=NullPool)
+                self._engine = create_engine(
+                    connection_string, **self._get_sqlite_engine_kwargs(sqlite_settings)
+                )
                 
-                # Enable foreign key support
-                @event.listens_for(self._engine, "connect")
-                def set_sqlite_pragma(dbapi_conn, connection_record):
-                    cursor = dbapi_conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys=ON")
-                    cursor.close()
+                # Enable foreign key support and the engine profile
+                self._configure_sqlite_engine(self._engine, sqlite_settings)
                 
                 # Test the connection
                 with self._engine.connect() as conn:
@@ -245,6 +255,11 @@ class DatabaseManager:
             try:
                 self._create_tables()
                 self._create_indices()
+                self._ensure_work_closure(create_missing_table=True)
+                self._ensure_change_counters(create_missing_table=True)
+                self._ensure_work_execution_turnovers(create_missing_table=True)
+                self._ensure_payroll_snapshots(create_missing_table=True)
+                self._ensure_background_jobs(create_missing_table=True)
                 logger.debug("Database tables and indices created")
             except Exception as e:
                 logger.error(f"Failed to create tables and indices: {e}")
@@ -275,9 +290,7 @@ class DatabaseManager:
         }
         
         if self._config.is_sqlite():
-            # SQLite doesn't need connection pooling
-            kwargs['poolclass'] = NullPool
-            kwargs['connect_args'] = {'check_same_thread': False}
+            kwargs.update(self._get_sqlite_engine_kwargs(self._config.get_config_data()))
             
         elif self._config.is_postgresql() or self._config.is_mssql():
             # Configure connection pooling for PostgreSQL and MSSQL
@@ -291,6 +304,104 @@ class DatabaseManager:
         
         return kwargs
     
+    def _get_sqlite_engine_kwargs(self, settings: dict) -> dict:
+        """Get pool configuration for the SQLite engine profile
+        
+        Args:
+            settings: SQLite settings from DatabaseConfig
+            
+        Returns:
+            Dictionary of engine configuration options
+        """
+        if settings.get('sqlite_profile') != DatabaseConfig.SQLITE_PROFILE_PRODUCTION:
+            # Compatibility profile: a new file connection per session
+            return {
+                'poolclass': NullPool,
+                'connect_args': {'check_same_thread': False}
+            }
+        
+        return {
+            'poolclass': QueuePool,
+            'pool_size': settings['sqlite_pool_size'],
+            'max_overflow': settings['sqlite_max_overflow'],
+            'pool_timeout': settings['sqlite_pool_timeout'],
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': settings['sqlite_busy_timeout_ms'] / 1000
+            }
+        }
+    
+    def _get_sqlite_pragmas(self, settings: dict) -> list:
+        """Get the tuning PRAGMAs of the SQLite engine profile
+        
+        Args:
+            settings: SQLite settings from DatabaseConfig
+            
+        Returns:
+            List of PRAGMA statements (empty for the compatibility profile)
+        """
+        if settings.get('sqlite_profile') != DatabaseConfig.SQLITE_PROFILE_PRODUCTION:
+            return []
+        
+        return [
+            f"PRAGMA journal_mode={settings['sqlite_journal_mode']}",
+            f"PRAGMA synchronous={settings['sqlite_synchronous']}",
+            # Negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size={-int(settings['sqlite_cache_size_kb'])}",
+            f"PRAGMA mmap_size={int(settings['sqlite_mmap_size_mb']) * 1024 * 1024}",
+            f"PRAGMA temp_store={settings['sqlite_temp_store']}",
+            f"PRAGMA busy_timeout={int(settings['sqlite_busy_timeout_ms'])}"
+        ]
+    
+    def _apply_sqlite_pragmas(self, dbapi_conn, pragmas: list):
+        """Execute PRAGMA statements on a raw SQLite connection"""
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+    
+    def _configure_sqlite_engine(self, engine: Engine, settings: dict):
+        """Register connection hooks of the SQLite engine profile
+        
+        Every new pooled connection gets foreign keys and the profile PRAGMAs.
+        With the production profile, PRAGMA optimize runs on connection
+        check-in at most once per sqlite_optimize_interval seconds.
+        """
+        tuning_pragmas = self._get_sqlite_pragmas(settings)
+        pragmas = ["PRAGMA foreign_keys=ON"] + tuning_pragmas
+        
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragma(dbapi_conn, connection_record):
+            self._apply_sqlite_pragmas(dbapi_conn, pragmas)
+        
+        optimize_interval = settings.get('sqlite_optimize_interval', 0)
+        if tuning_pragmas and optimize_interval > 0:
+            self._last_sqlite_optimize = time.monotonic()
+            
+            @event.listens_for(engine, "checkin")
+            def optimize_periodically(dbapi_conn, connection_record):
+                if dbapi_conn is None:
+                    return
+                if time.monotonic() - self._last_sqlite_optimize < optimize_interval:
+                    return
+                self._last_sqlite_optimize = time.monotonic()
+                try:
+                    self._apply_sqlite_pragmas(dbapi_conn, ["PRAGMA optimize"])
+                except sqlite3.Error as e:
+                    logger.warning(f"PRAGMA optimize failed: {e}")
+    
+    def optimize_sqlite(self):
+        """Run PRAGMA optimize now (e.g. before shutdown); no-op for other backends"""
+        if self._engine is None or self._engine.dialect.name != 'sqlite':
+            return
+        
+        with self._engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+        self._last_sqlite_optimize = time.monotonic()
+        logger.debug("SQLite PRAGMA optimize completed")
+    
     def get_engine(self) -> Engine:
         """Get the SQLAlchemy engine
         
@@ -514,6 +625,92 @@ class DatabaseManager:
                     f"Failed to create database tables: {e}"
                 )
     
+    def _ensure_work_closure(self, create_missing_table: bool):
+        """Create and backfill the works closure table when it is missing or incomplete
+        
+        Args:
+            create_missing_table: Create the table directly (SQLite databases
+                                  that predate it); other backends rely on migrations
+        """
+        from .repositories import work_closure_repository
+        
+        try:
+            with self._engine.begin() as conn:
+                if work_closure_repository.ensure_consistent(conn, create_missing_table):
+                    logger.info("Work closure table rebuilt")
+        except Exception as e:
+            logger.warning(f"Failed to prepare work closure table: {e}")
+    
+    def _ensure_change_counters(self, create_missing_table: bool):
+        """Create the cache change counters and, on SQLite, the triggers that bump them
+        
+        Args:
+            create_missing_table: Create the table directly (SQLite databases
+                                  that predate it); other backends rely on migrations
+        """
+        from .repositories import change_counter_repository
+        
+        try:
+            with self._engine.begin() as conn:
+                change_counter_repository.ensure_installed(conn, create_missing_table)
+        except Exception as e:
+            logger.warning(f"Failed to prepare change counters: {e}")
+    
+    def _ensure_work_execution_turnovers(self, create_missing_table: bool):
+        """Create and backfill the monthly register turnovers when they lag the register
+        
+        Args:
+            create_missing_table: Create the table directly (SQLite databases
+                                  that predate it); other backends rely on migrations
+        """
+        from .repositories import work_execution_turnover_repository
+        
+        try:
+            with self._engine.begin() as conn:
+                if work_execution_turnover_repository.ensure_consistent(conn, create_missing_table):
+                    logger.info("Work execution turnovers rebuilt")
+        except Exception as e:
+            logger.warning(f"Failed to prepare work execution turnovers: {e}")
+    
+    def _ensure_payroll_snapshots(self, create_missing_table: bool):
+        """Create the payroll period snapshot tables on SQLite databases that predate them
+        
+        Args:
+            create_missing_table: Create the tables directly; other backends
+                                  rely on migrations
+        """
+        if not create_missing_table:
+            return
+        
+        from .repositories import payroll_snapshot_repository
+        
+        try:
+            with self._engine.begin() as conn:
+                payroll_snapshot_repository.create_tables(conn)
+        except Exception as e:
+            logger.warning(f"Failed to prepare payroll snapshots: {e}")
+    
+    def _ensure_background_jobs(self, create_missing_table: bool):
+        """Create the background job table on SQLite databases that predate it
+        
+        Args:
+            create_missing_table: Create the table directly; other backends
+                                  rely on migrations
+        """
+        if not create_missing_table:
+            return
+        
+        from .models.sqlalchemy_models import BackgroundJob
+        
+        try:
+            BackgroundJob.__table__.create(bind=self._engine, checkfirst=True)
+            with self._engine.begin() as conn:
+                columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(background_jobs)")}
+                if 'owner' not in columns:
+                    conn.exec_driver_sql("ALTER TABLE background_jobs ADD COLUMN owner VARCHAR(255)")
+        except Exception as e:
+            logger.warning(f"Failed to prepare background jobs: {e}")
+    
     def execute_query(self, query: str, params: tuple = None):
         """Execute a SELECT query and return results
         
@@ -963,7 +1160,8 @@ class DatabaseManager:
             "CREATE INDEX IF NOT EXISTS idx_daily_reports_estimate ON daily_reports(estimate_id)",
             # Audit Logs
             "CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at)",
-            "CREATE INDEX IF NOT EXISTS idx_audit_logs_resource ON audit_logs(resource_type, resource_id)",
+            "DROP INDEX IF EXISTS idx_audit_logs_resource",
+            "CREATE INDEX IF NOT EXISTS idx_audit_logs_resource_created ON audit_logs(resource_type, resource_id, created_at)",
             # Register indices
             "CREATE INDEX IF NOT EXISTS idx_register_recorder ON work_execution_register(recorder_type, recorder_id)",
             "CREATE INDEX IF NOT EXISTS idx_register_dimensions ON work_execution_register(period, object_id, estimate_id, work_id)",
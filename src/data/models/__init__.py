@@ -25,6 +25,7 @@ from .sqlalchemy_models import (
     Counterparty,
     Object,
     Work,
+    WorkClosure,
     Estimate,
     EstimateLine,
     DailyReport,
@@ -61,6 +62,7 @@ __all__ = [
     'Counterparty',
     'Object',
     'Work',
+    'WorkClosure',
     'Estimate',
     'EstimateLine',
     'DailyReport',
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
@@ -11,4 +11,4 @@ class AuditLog:
     resource_type: str = "" # estimate, daily_report, etc.
     resource_id: int = 0
     details: str = "" # JSON or text description
-    created_at: datetime = datetime.now()
+    created_at: datetime = field(default_factory=datetime.now)
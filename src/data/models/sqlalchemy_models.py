@@ -261,6 +261,22 @@ class Work(Base):
         return f"<Work(id={self.id}, name='{self.name}', unit_id={self.unit_id})>"
 
 
+class WorkClosure(Base):
+    """Closure table of the works hierarchy (one row per ancestor/descendant pair)"""
+    __tablename__ = 'work_closure'
+    
+    ancestor_id = Column(Integer, ForeignKey('works.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('works.id', ondelete='CASCADE'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_work_closure_descendant', 'descendant_id', 'depth'),
+    )
+    
+    def __repr__(self):
+        return f"<WorkClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})>"
+
+
 # ============================================================================
 # Document Models (Документы)
 # ============================================================================
@@ -569,6 +585,28 @@ class WorkExecutionRegister(Base):
         return f"<WorkExecutionRegister(id={self.id}, recorder_type='{self.recorder_type}', recorder_id={self.recorder_id})>"
 
 
+class WorkExecutionTurnover(Base):
+    """Monthly turnovers of the work execution register (0 marks a missing dimension)"""
+    __tablename__ = 'work_execution_turnovers'
+    
+    month = Column(String(7), primary_key=True)
+    object_id = Column(Integer, primary_key=True, default=0)
+    estimate_id = Column(Integer, primary_key=True, default=0)
+    work_id = Column(Integer, primary_key=True, default=0)
+    quantity_income = Column(Float, nullable=False, default=0.0)
+    quantity_expense = Column(Float, nullable=False, default=0.0)
+    sum_income = Column(Float, nullable=False, default=0.0)
+    sum_expense = Column(Float, nullable=False, default=0.0)
+    movement_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_work_turnovers_dimensions', 'object_id', 'estimate_id', 'work_id'),
+    )
+    
+    def __repr__(self):
+        return f"<WorkExecutionTurnover(month='{self.month}', estimate_id={self.estimate_id}, work_id={self.work_id})>"
+
+
 class PayrollRegister(Base):
     """Payroll accumulation register (Регистр начислений и удержаний)"""
     __tablename__ = 'payroll_register'
@@ -602,10 +640,120 @@ class PayrollRegister(Base):
         return f"<PayrollRegister(id={self.id}, employee_id={self.employee_id}, work_date={self.work_date})>"
 
 
+class PayrollPeriodSnapshot(Base):
+    """Payroll totals of a closed month (0 marks a missing dimension)"""
+    __tablename__ = 'payroll_period_snapshots'
+    
+    month = Column(String(7), primary_key=True)
+    employee_id = Column(Integer, primary_key=True, default=0)
+    object_id = Column(Integer, primary_key=True, default=0)
+    estimate_id = Column(Integer, primary_key=True, default=0)
+    hours_worked = Column(Float, nullable=False, default=0.0)
+    amount = Column(Float, nullable=False, default=0.0)
+    record_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_payroll_snapshots_employee', 'employee_id', 'object_id', 'estimate_id'),
+    )
+    
+    def __repr__(self):
+        return f"<PayrollPeriodSnapshot(month='{self.month}', employee_id={self.employee_id})>"
+
+
+class PayrollClosedPeriod(Base):
+    """Closed payroll month; its totals are read from the snapshots"""
+    __tablename__ = 'payroll_closed_periods'
+    
+    month = Column(String(7), primary_key=True)
+    closed_at = Column(DateTime, nullable=False, default=func.now())
+    
+    def __repr__(self):
+        return f"<PayrollClosedPeriod(month='{self.month}')>"
+
+
 # ============================================================================
 # System Models
 # ============================================================================
 
+class AuditLogEntry(Base):
+    """Audit log entry model (who changed which document and how)"""
+    __tablename__ = 'audit_logs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer)
+    username = Column(Text)
+    action = Column(Text)
+    resource_type = Column(String(50))
+    resource_id = Column(Integer)
+    details = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('idx_audit_logs_created_at', 'created_at'),
+        # Backs the keyset-paginated listing of one document's history
+        Index('idx_audit_logs_resource_created', 'resource_type', 'resource_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<AuditLogEntry(id={self.id}, action='{self.action}', resource='{self.resource_type}:{self.resource_id}')>"
+
+
+class ChangeCounter(Base):
+    """Per-table change counter used to invalidate caches across processes"""
+    __tablename__ = 'change_counters'
+    
+    name = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ChangeCounter(name='{self.name}', version={self.version})>"
+
+
+class BackgroundJob(Base):
+    """Long-running operation executed by the background job queue"""
+    __tablename__ = 'background_jobs'
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    parameters = Column(Text)  # JSON
+    current = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    message = Column(Text)
+    result = Column(Text)  # JSON
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(Integer)
+    owner = Column(String(255))  # host:pid of the process running the job
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_background_jobs_status', 'status'),
+        Index('idx_background_jobs_created_at', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', job_type='{self.job_type}', status='{self.status}')>"
+
+
+class DbfImportFingerprint(Base):
+    """Hash of the mapped fields of a record imported from 1C DBF files
+    
+    Written by dbf_importer (core/fingerprints.py), which also creates the
+    table when missing; delta re-imports skip records whose hash is unchanged.
+    """
+    __tablename__ = 'dbf_import_fingerprints'
+    
+    entity_type = Column(String(32), primary_key=True)
+    record_key = Column(String(255), primary_key=True)  # 1C ID, or the repr of the composition key tuple
+    fingerprint = Column(String(32), nullable=False)
+    
+    def __repr__(self):
+        return f"<DbfImportFingerprint(entity_type='{self.entity_type}', record_key='{self.record_key}')>"
+
+
 class UserSetting(Base):
     """User settings model (form preferences, etc.)"""
     __tablename__ = 'user_settings'
@@ -4,6 +4,9 @@ from .estimate_repository import EstimateRepository
 from .user_repository import UserRepository
 from .reference_repository import ReferenceRepository
 from .work_repository import WorkRepository
+from . import work_closure_repository
+from . import change_counter_repository
+from . import sql_connection
 from .work_specification_repository import WorkSpecificationRepository
 
 __all__ = [
@@ -11,5 +14,8 @@ __all__ = [
     'UserRepository',
     'ReferenceRepository',
     'WorkRepository',
+    'work_closure_repository',
+    'change_counter_repository',
+    'sql_connection',
     'WorkSpecificationRepository',
 ]
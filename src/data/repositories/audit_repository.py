@@ -1,82 +1,129 @@
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
+from sqlalchemy import and_, func, insert, or_, select
 from ..database_manager import DatabaseManager
 from ..models.audit import AuditLog
+from ..models.sqlalchemy_models import AuditLogEntry
+
+# 7 bound parameters per row keeps a multi-row INSERT under SQLite's
+# 999 variable limit (and MSSQL's 2100)
+INSERT_CHUNK_SIZE = 140
+
+_COLUMNS = ('user_id', 'username', 'action', 'resource_type', 'resource_id', 'details', 'created_at')
+
 
 class AuditRepository:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.db = DatabaseManager()
+        self._engine = engine
+
+    def _get_engine(self):
+        return self._engine if self._engine is not None else self.db.get_engine()
+
+    @staticmethod
+    def _to_row(log: AuditLog) -> dict:
+        return {column: getattr(log, column) for column in _COLUMNS}
 
     def create(self, log: AuditLog) -> AuditLog:
-        query = """
-            INSERT INTO audit_logs (
-                user_id, username, action, resource_type, resource_id, details, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        params = (
-            log.user_id,
-            log.username,
-            log.action,
-            log.resource_type,
-            log.resource_id,
-            log.details,
-            log.created_at
-        )
-        
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        log.id = cursor.lastrowid
-        conn.commit()
+        with self._get_engine().begin() as conn:
+            result = conn.execute(insert(AuditLogEntry.__table__).values(self._to_row(log)))
+            log.id = result.inserted_primary_key[0]
         return log
 
-    def get_logs(self, 
-                 limit: int = 100, 
-                 offset: int = 0, 
-                 resource_type: Optional[str] = None,
-                 resource_id: Optional[int] = None) -> Tuple[List[AuditLog], int]:
-        
-        where_clauses = []
-        params = []
-        
+    def create_many(self, logs: Sequence[AuditLog]) -> int:
+        """Write entries in one transaction with multi-row INSERT statements
+
+        Returns:
+            Number of entries written
+        """
+        if not logs:
+            return 0
+
+        table = AuditLogEntry.__table__
+        with self._get_engine().begin() as conn:
+            for start in range(0, len(logs), INSERT_CHUNK_SIZE):
+                chunk = logs[start:start + INSERT_CHUNK_SIZE]
+                conn.execute(insert(table).values([self._to_row(log) for log in chunk]))
+        return len(logs)
+
+    @staticmethod
+    def _filters(resource_type: Optional[str], resource_id: Optional[int]) -> list:
+        table = AuditLogEntry.__table__
+        conditions = []
         if resource_type:
-            where_clauses.append("resource_type = ?")
-            params.append(resource_type)
-            
+            conditions.append(table.c.resource_type == resource_type)
         if resource_id:
-            where_clauses.append("resource_id = ?")
-            params.append(resource_id)
-            
-        where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-        
+            conditions.append(table.c.resource_id == resource_id)
+        return conditions
+
+    def _fetch(self, query) -> List[AuditLog]:
+        with self._get_engine().connect() as conn:
+            rows = conn.execute(query).fetchall()
+
+        return [
+            AuditLog(
+                id=row.id,
+                user_id=row.user_id,
+                username=row.username,
+                action=row.action,
+                resource_type=row.resource_type,
+                resource_id=row.resource_id,
+                details=row.details,
+                created_at=row.created_at or datetime.now()
+            )
+            for row in rows
+        ]
+
+    def get_logs(self,
+                 limit: int = 100,
+                 offset: int = 0,
+                 resource_type: Optional[str] = None,
+                 resource_id: Optional[int] = None) -> Tuple[List[AuditLog], int]:
+
+        table = AuditLogEntry.__table__
+        conditions = self._filters(resource_type, resource_id)
+
         # Get count
-        count_query = f"SELECT COUNT(*) FROM audit_logs {where_sql}"
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()[0]
-        
+        with self._get_engine().connect() as conn:
+            total = conn.execute(
+                select(func.count()).select_from(table).where(*conditions)
+            ).scalar()
+
         # Get data
-        query = f"""
-            SELECT id, user_id, username, action, resource_type, resource_id, details, created_at
-            FROM audit_logs
-            {where_sql}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
+        query = (
+            select(table)
+            .where(*conditions)
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        return self._fetch(query), total
+
+    def get_logs_before(self,
+                        limit: int = 100,
+                        resource_type: Optional[str] = None,
+                        resource_id: Optional[int] = None,
+                        before: Optional[Tuple[datetime, int]] = None) -> List[AuditLog]:
+        """Return the newest entries older than the (created_at, id) keyset position
+
+        Unlike OFFSET paging the cost does not grow with the page number: the
+        position is a range condition on idx_audit_logs_created_at or, for one
+        resource, idx_audit_logs_resource_created.
         """
-        cursor.execute(query, params + [limit, offset])
-        
-        logs = []
-        for row in cursor.fetchall():
-            logs.append(AuditLog(
-                id=row[0],
-                user_id=row[1],
-                username=row[2],
-                action=row[3],
-                resource_type=row[4],
-                resource_id=row[5],
-                details=row[6],
-                created_at=datetime.fromisoformat(str(row[7])) if row[7] else datetime.now()
+        table = AuditLogEntry.__table__
+        conditions = self._filters(resource_type, resource_id)
+
+        if before is not None:
+            created_at, log_id = before
+            conditions.append(or_(
+                table.c.created_at < created_at,
+                and_(table.c.created_at == created_at, table.c.id < log_id)
             ))
-            
-        return logs, total
+
+        query = (
+            select(table)
+            .where(*conditions)
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+            .limit(limit)
+        )
+        return self._fetch(query)
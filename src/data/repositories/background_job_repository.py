@@ -0,0 +1,139 @@
+"""Repository for the persistent state of background jobs"""
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+
+from ..database_manager import DatabaseManager
+from ..models.sqlalchemy_models import BackgroundJob
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class BackgroundJobRepository:
+    def __init__(self, engine=None):
+        self.db = DatabaseManager()
+        self._engine = engine
+
+    def _get_engine(self):
+        return self._engine if self._engine is not None else self.db.get_engine()
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        job = dict(row._mapping)
+        job['parameters'] = json.loads(job['parameters']) if job['parameters'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def create(self, job_id: str, job_type: str, parameters: Dict[str, Any],
+               created_by: Optional[int] = None, owner: Optional[str] = None) -> Dict[str, Any]:
+        table = BackgroundJob.__table__
+        with self._get_engine().begin() as conn:
+            conn.execute(insert(table).values(
+                id=job_id,
+                job_type=job_type,
+                status='queued',
+                parameters=json.dumps(parameters, default=str),
+                current=0,
+                cancel_requested=False,
+                created_by=created_by,
+                owner=owner,
+                created_at=datetime.now()
+            ))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        table = BackgroundJob.__table__
+        with self._get_engine().connect() as conn:
+            row = conn.execute(select(table).where(table.c.id == job_id)).first()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50, created_by: Optional[int] = None,
+             status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the newest jobs first"""
+        table = BackgroundJob.__table__
+        query = select(table).order_by(table.c.created_at.desc()).limit(limit)
+        if created_by is not None:
+            query = query.where(table.c.created_by == created_by)
+        if status:
+            query = query.where(table.c.status == status)
+        with self._get_engine().connect() as conn:
+            return [self._to_dict(row) for row in conn.execute(query).fetchall()]
+
+    def mark_running(self, job_id: str) -> bool:
+        """Move a queued job to running; False if it was cancelled meanwhile"""
+        table = BackgroundJob.__table__
+        with self._get_engine().begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status == 'queued', table.c.cancel_requested == False)  # noqa: E712
+                .values(status='running', started_at=datetime.now())
+            )
+        return result.rowcount > 0
+
+    def update_progress(self, job_id: str, current: int, total: Optional[int],
+                        message: Optional[str]) -> bool:
+        """Store progress and return whether cancellation was requested"""
+        table = BackgroundJob.__table__
+        with self._get_engine().begin() as conn:
+            conn.execute(
+                update(table).where(table.c.id == job_id)
+                .values(current=current, total=total, message=message)
+            )
+            cancel_requested = conn.execute(
+                select(table.c.cancel_requested).where(table.c.id == job_id)
+            ).scalar()
+        return bool(cancel_requested)
+
+    def finish(self, job_id: str, status: str, result: Any = None,
+               error: Optional[str] = None, message: Optional[str] = None) -> None:
+        table = BackgroundJob.__table__
+        values = {
+            'status': status,
+            'result': json.dumps(result, default=str) if result is not None else None,
+            'error': error,
+            'finished_at': datetime.now(),
+        }
+        if message is not None:
+            values['message'] = message
+        with self._get_engine().begin() as conn:
+            conn.execute(update(table).where(table.c.id == job_id).values(**values))
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Flag an active job for cancellation; False if it already finished"""
+        table = BackgroundJob.__table__
+        with self._get_engine().begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status.in_(ACTIVE_STATUSES))
+                .values(cancel_requested=True)
+            )
+        return result.rowcount > 0
+
+    def fail_interrupted(self, is_interrupted: Callable[[Optional[str]], bool] = lambda owner: True) -> int:
+        """Fail jobs left queued or running by a process that has ended
+
+        Args:
+            is_interrupted: Called with a job's owner (host:pid); only jobs
+                            it returns True for are failed
+
+        Returns:
+            Number of jobs marked failed
+        """
+        table = BackgroundJob.__table__
+        with self._get_engine().begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.owner).where(table.c.status.in_(ACTIVE_STATUSES))
+            ).fetchall()
+            job_ids = [row.id for row in rows if is_interrupted(row.owner)]
+            if not job_ids:
+                return 0
+            result = conn.execute(
+                update(table)
+                .where(table.c.id.in_(job_ids), table.c.status.in_(ACTIVE_STATUSES))
+                .values(status='failed', error='Interrupted by a restart', finished_at=datetime.now())
+            )
+        return result.rowcount
@@ -0,0 +1,179 @@
+"""
+Repository for per-table change counters
+
+change_counters holds one version number per tracked table that is bumped
+by every write to it. Processes that cache table contents (API workers, the
+desktop client) compare the counters with the versions their caches were
+built from, which costs one small SELECT instead of reloading the tables.
+
+On SQLite the counters are maintained by triggers, so raw SQL writers are
+covered without any changes. Other backends bump them from ORM flushes
+(see _on_after_flush) or explicitly with record_change().
+"""
+import logging
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.data.repositories.sql_connection import dialect_name, execute
+
+logger = logging.getLogger(__name__)
+
+# Counter -> columns whose updates count as a change (None: any column).
+# A counter is named after its table unless listed in COUNTER_TABLES.
+TRACKED_TABLES: Dict[str, Optional[Tuple[str, ...]]] = {
+    'works': ('parent_id', 'marked_for_deletion'),
+    # Reference snapshots (src/services/reference_snapshot.py)
+    'units': None,
+    'persons': None,
+    'objects': None,
+    'organizations': None,
+    'counterparties': None,
+    # Document ETags (api/dependencies/conditional.py)
+    'work_contents': None,
+    'estimates': None,
+    'estimate_lines': None,
+    'daily_reports': None,
+    'daily_report_lines': None,
+    'daily_report_executors': None,
+    'timesheets': None,
+    'timesheet_lines': None,
+    # Material requirements (src/services/material_requirements.py)
+    'work_specifications': None,
+    'cost_item_materials': None,
+    'materials': None,
+    'cost_items': None,
+}
+
+# Counters over a table of another name: counter -> table
+COUNTER_TABLES: Dict[str, str] = {
+    'work_contents': 'works',
+}
+
+
+def counter_table(name: str) -> str:
+    """Table whose writes bump the counter"""
+    return COUNTER_TABLES.get(name, name)
+
+
+def create_table(connection) -> None:
+    """Create the counters table on SQLite databases that predate it"""
+    execute(connection, """
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name VARCHAR(100) PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _ensure_rows(connection, names: Iterable[str]) -> None:
+    for name in names:
+        exists = execute(
+            connection, "SELECT 1 FROM change_counters WHERE name = :name", {'name': name}
+        ).fetchone()
+        if not exists:
+            execute(
+                connection,
+                "INSERT INTO change_counters (name, version) VALUES (:name, 0)",
+                {'name': name}
+            )
+
+
+def install_sqlite_triggers(connection, tracked_tables: Optional[Dict[str, Optional[Tuple[str, ...]]]] = None) -> None:
+    """Create the triggers that bump the tracked counters
+
+    Counters of tables missing from the database get neither triggers nor
+    a row, so readers treat them as unknown rather than as never changing.
+    """
+    tracked_tables = TRACKED_TABLES if tracked_tables is None else tracked_tables
+    existing = {
+        row[0] for row in execute(connection, "SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    }
+    tracked_tables = {name: columns for name, columns in tracked_tables.items() if counter_table(name) in existing}
+    _ensure_rows(connection, tracked_tables)
+
+    for name, columns in tracked_tables.items():
+        table = counter_table(name)
+        bump = f"UPDATE change_counters SET version = version + 1 WHERE name = '{name}';"
+        update_of = f" OF {', '.join(columns)}" if columns else ""
+        for suffix, event_sql in (
+            ('insert', f"AFTER INSERT ON {table}"),
+            ('update', f"AFTER UPDATE{update_of} ON {table}"),
+            ('delete', f"AFTER DELETE ON {table}"),
+        ):
+            execute(connection, f"""
+                CREATE TRIGGER IF NOT EXISTS trg_change_counter_{name}_{suffix}
+                {event_sql}
+                BEGIN {bump} END
+            """)
+
+
+def ensure_installed(connection, create_missing_table: bool = True) -> None:
+    """Prepare the counters (and on SQLite the triggers) for all tracked tables"""
+    if create_missing_table:
+        create_table(connection)
+    if dialect_name(connection) == 'sqlite':
+        install_sqlite_triggers(connection)
+    else:
+        _ensure_rows(connection, TRACKED_TABLES)
+
+
+def record_change(connection, name: str) -> None:
+    """Bump a counter from application code
+
+    Does nothing on SQLite, where the triggers have already counted the write.
+    """
+    if dialect_name(connection) == 'sqlite':
+        return
+
+    result = execute(
+        connection,
+        "UPDATE change_counters SET version = version + 1 WHERE name = :name",
+        {'name': name}
+    )
+    if result.rowcount == 0:
+        execute(
+            connection,
+            "INSERT INTO change_counters (name, version) VALUES (:name, 1)",
+            {'name': name}
+        )
+
+
+def get_versions(connection) -> Dict[str, int]:
+    """Return all counters as {name: version}"""
+    rows = execute(connection, "SELECT name, version FROM change_counters").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def _changed_counters(session: Session) -> Set[str]:
+    by_table: Dict[str, list] = {}
+    for name, columns in TRACKED_TABLES.items():
+        by_table.setdefault(counter_table(name), []).append((name, columns))
+
+    changed = set()
+    for obj in (*session.new, *session.deleted):
+        changed.update(name for name, _ in by_table.get(getattr(obj, '__tablename__', None), ()))
+    for obj in session.dirty:
+        counters = by_table.get(getattr(obj, '__tablename__', None), ())
+        if not counters:
+            continue
+        state = inspect(obj)
+        for name, columns in counters:
+            keys = columns or [attr.key for attr in state.mapper.column_attrs]
+            if any(state.attrs[key].history.has_changes() for key in keys if key in state.attrs):
+                changed.add(name)
+    return changed
+
+
+@event.listens_for(Session, 'after_flush')
+def _on_after_flush(session, flush_context):
+    """Bump the counters of tables written by an ORM flush (non-SQLite)"""
+    try:
+        if dialect_name(session) == 'sqlite':
+            return
+    except Exception:
+        # Sessions without a single bind are left to record_change()
+        return
+    for name in sorted(_changed_counters(session)):
+        record_change(session.connection(), name)
@@ -1,13 +1,169 @@
 """Estimate hierarchy repository"""
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 import logging
 from ..database_manager import DatabaseManager
 from ..models.estimate import Estimate, HierarchyNode, HierarchyTree, EstimateType
 from ..models.sqlalchemy_models import Estimate as EstimateModel
 from .estimate_repository import EstimateRepository
+from .sql_connection import execute
 
 logger = logging.getLogger(__name__)
 
+# Keeps IN (...) lists below SQLite's bound parameter limit
+_CHUNK_SIZE = 900
+
+
+def _id_list(base_ids: Sequence[int]):
+    params = {f'base_{i}': base_id for i, base_id in enumerate(base_ids)}
+    return ', '.join(f':{name}' for name in params), params
+
+
+def load_hierarchy_rollups(
+    connection,
+    base_ids: Optional[Sequence[int]] = None,
+    include_works: bool = False
+) -> List[Dict]:
+    """
+    Plan and execution totals per general estimate, aggregated in SQL
+
+    One query sums the plan estimates of every general estimate, one sums
+    the expense side of work_execution_register posted against the general
+    estimate or its plans. With include_works the register query is grouped
+    by work instead and a third query sums the plan lines per work, so the
+    number of queries does not depend on the number of plans.
+
+    Plans marked for deletion are counted, as in the plan listings and the
+    hierarchy tree; general estimates marked for deletion are only left out
+    when no base_ids are given.
+
+    Args:
+        connection: sqlite3 connection or SQLAlchemy Connection/Session
+        base_ids: General estimates to include (all when None)
+        include_works: Add a per-work breakdown under 'works'
+
+    Returns:
+        Dicts with id, number, date, total_sum, total_labor, plan_count,
+        plan_sum, plan_labor, executed_quantity, executed_sum (and works),
+        newest general estimates first
+    """
+    params = {'no': False}
+    general_filter = "AND g.marked_for_deletion = :no"
+    register_filter = plan_filter = ""
+    if base_ids is not None:
+        base_ids = list(dict.fromkeys(base_ids))
+        if not base_ids:
+            return []
+        if len(base_ids) > _CHUNK_SIZE:
+            return [
+                rollup
+                for start in range(0, len(base_ids), _CHUNK_SIZE)
+                for rollup in load_hierarchy_rollups(
+                    connection, base_ids[start:start + _CHUNK_SIZE], include_works
+                )
+            ]
+        ids, id_params = _id_list(base_ids)
+        params.update(id_params)
+        general_filter = f"AND g.id IN ({ids})"
+        register_filter = f"WHERE e.id IN ({ids}) OR e.base_document_id IN ({ids})"
+        plan_filter = f"AND p.base_document_id IN ({ids})"
+
+    rows = execute(connection, f"""
+        SELECT g.id, g.number, g.date, g.total_sum, g.total_labor,
+               COUNT(p.id) AS plan_count,
+               COALESCE(SUM(p.total_sum), 0) AS plan_sum,
+               COALESCE(SUM(p.total_labor), 0) AS plan_labor
+        FROM estimates g
+        LEFT JOIN estimates p ON p.base_document_id = g.id
+        WHERE g.base_document_id IS NULL {general_filter}
+        GROUP BY g.id, g.number, g.date, g.total_sum, g.total_labor
+        ORDER BY g.date DESC, g.id DESC
+    """, params).fetchall()
+
+    rollups = {}
+    for row in rows:
+        rollups[row[0]] = {
+            'id': row[0],
+            'number': row[1],
+            'date': row[2],
+            'total_sum': row[3] or 0.0,
+            'total_labor': row[4] or 0.0,
+            'plan_count': row[5],
+            'plan_sum': row[6],
+            'plan_labor': row[7],
+            'executed_quantity': 0.0,
+            'executed_sum': 0.0,
+        }
+        if include_works:
+            rollups[row[0]]['works'] = {}
+    if not rollups:
+        return []
+
+    # Movements of a plan estimate count towards its general estimate
+    work_columns = ", r.work_id, w.name" if include_works else ""
+    movements = execute(connection, f"""
+        SELECT COALESCE(e.base_document_id, e.id) AS general_id{work_columns},
+               COALESCE(SUM(r.quantity_expense), 0), COALESCE(SUM(r.sum_expense), 0)
+        FROM work_execution_register r
+        JOIN estimates e ON e.id = r.estimate_id
+        {"LEFT JOIN works w ON w.id = r.work_id" if include_works else ""}
+        {register_filter}
+        GROUP BY COALESCE(e.base_document_id, e.id){work_columns}
+    """, params).fetchall()
+
+    for row in movements:
+        rollup = rollups.get(row[0])
+        if rollup is None:
+            continue
+        rollup['executed_quantity'] += row[-2]
+        rollup['executed_sum'] += row[-1]
+        if include_works:
+            work = _work_rollup(rollup['works'], row[1], row[2])
+            work['executed_quantity'] = row[-2]
+            work['executed_sum'] = row[-1]
+
+    if include_works:
+        lines = execute(connection, f"""
+            SELECT p.base_document_id, el.work_id, w.name,
+                   COALESCE(SUM(el.quantity), 0), COALESCE(SUM(el.sum), 0),
+                   COALESCE(SUM(el.planned_labor), 0)
+            FROM estimate_lines el
+            JOIN estimates p ON p.id = el.estimate_id
+            LEFT JOIN works w ON w.id = el.work_id
+            WHERE p.base_document_id IS NOT NULL
+              AND (el.is_group IS NULL OR el.is_group = :no) {plan_filter}
+            GROUP BY p.base_document_id, el.work_id, w.name
+        """, params).fetchall()
+
+        for row in lines:
+            rollup = rollups.get(row[0])
+            if rollup is None:
+                continue
+            work = _work_rollup(rollup['works'], row[1], row[2])
+            work['planned_quantity'] = row[3]
+            work['planned_sum'] = row[4]
+            work['planned_labor'] = row[5]
+
+        for rollup in rollups.values():
+            rollup['works'] = sorted(
+                rollup['works'].values(), key=lambda work: (work['work_name'] or '', work['work_id'] or 0)
+            )
+
+    return list(rollups.values())
+
+
+def _work_rollup(works: Dict, work_id: Optional[int], work_name: Optional[str]) -> Dict:
+    if work_id not in works:
+        works[work_id] = {
+            'work_id': work_id,
+            'work_name': work_name,
+            'planned_quantity': 0.0,
+            'planned_sum': 0.0,
+            'planned_labor': 0.0,
+            'executed_quantity': 0.0,
+            'executed_sum': 0.0,
+        }
+    return works[work_id]
+
 
 class EstimateHierarchyRepository:
     def __init__(self):
@@ -23,13 +179,13 @@ class EstimateHierarchyRepository:
                     .order_by(EstimateModel.date.desc())\
                     .all()
                 
-                return [self.estimate_repo._model_to_dataclass(m) for m in models]
+                return [self.estimate_repo._model_to_dataclass(m, include_lines=False) for m in models]
         except Exception as e:
             logger.error(f"Failed to get general estimates: {e}")
             return []
 
     def get_plan_estimates_by_base(self, base_id: int) -> List[Estimate]:
-        """Get all plan estimates for a given base document"""
+        """Get all plan estimates for a given base document (headers without lines)"""
         try:
             with self.db_manager.session_scope() as session:
                 models = session.query(EstimateModel)\
@@ -37,11 +193,24 @@ class EstimateHierarchyRepository:
                     .order_by(EstimateModel.date.desc())\
                     .all()
                 
-                return [self.estimate_repo._model_to_dataclass(m) for m in models]
+                return [self.estimate_repo._model_to_dataclass(m, include_lines=False) for m in models]
         except Exception as e:
             logger.error(f"Failed to get plan estimates for base {base_id}: {e}")
             return []
 
+    def get_hierarchy_rollups(
+        self,
+        base_ids: Optional[Sequence[int]] = None,
+        include_works: bool = False
+    ) -> List[Dict]:
+        """Plan and execution totals per general estimate (see load_hierarchy_rollups)"""
+        try:
+            with self.db_manager.session_scope() as session:
+                return load_hierarchy_rollups(session, base_ids, include_works)
+        except Exception as e:
+            logger.error(f"Failed to get hierarchy rollups: {e}")
+            return []
+
     def validate_hierarchy_integrity(self, estimate_id: int, base_id: int) -> bool:
         """
         Validate hierarchy integrity rules.
@@ -115,14 +284,14 @@ class EstimateHierarchyRepository:
             return False
 
     def get_hierarchy_tree(self, root_id: int) -> Optional[HierarchyTree]:
-        """Get hierarchy tree for a given root estimate"""
+        """Get hierarchy tree for a given root estimate (headers without lines)"""
         try:
             with self.db_manager.session_scope() as session:
                 root_model = session.query(EstimateModel).filter(EstimateModel.id == root_id).first()
                 if not root_model:
                     return None
                 
-                root_estimate = self.estimate_repo._model_to_dataclass(root_model)
+                root_estimate = self.estimate_repo._model_to_dataclass(root_model, include_lines=False)
                 root_node = HierarchyNode(estimate=root_estimate, depth=0)
                 
                 # Find children
@@ -134,7 +303,7 @@ class EstimateHierarchyRepository:
                 max_depth = 0
                 
                 for child_model in children_models:
-                    child_estimate = self.estimate_repo._model_to_dataclass(child_model)
+                    child_estimate = self.estimate_repo._model_to_dataclass(child_model, include_lines=False)
                     child_node = HierarchyNode(estimate=child_estimate, depth=1)
                     root_node.children.append(child_node)
                     total_nodes += 1
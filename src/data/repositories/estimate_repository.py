@@ -158,11 +158,12 @@ class EstimateRepository:
             logger.error(f"Failed to find estimates by responsible {person_id}: {e}")
             return []
     
-    def _model_to_dataclass(self, estimate_model: EstimateModel) -> Estimate:
+    def _model_to_dataclass(self, estimate_model: EstimateModel, include_lines: bool = True) -> Estimate:
         """Convert SQLAlchemy model to dataclass
         
         Args:
             estimate_model: SQLAlchemy Estimate model instance
+            include_lines: Load and convert the lines (one query per estimate)
             
         Returns:
             Estimate dataclass instance
@@ -182,6 +183,9 @@ class EstimateRepository:
             estimate_type=estimate_model.estimate_type
         )
         
+        if not include_lines:
+            return estimate
+        
         # Convert lines
         lines = []
         for line_model in estimate_model.lines:
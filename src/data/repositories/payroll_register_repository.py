@@ -4,6 +4,7 @@ from datetime import date
 import logging
 from sqlalchemy.exc import IntegrityError
 from ..database_manager import DatabaseManager
+from . import payroll_snapshot_repository
 from ..models.sqlalchemy_models import PayrollRegister as PayrollRegisterModel
 
 logger = logging.getLogger(__name__)
@@ -32,6 +33,12 @@ class PayrollRegisterRepository:
                     )
                     session.add(record_model)
                 
+                # Posting into a closed month refreshes its snapshot rows
+                session.flush()
+                payroll_snapshot_repository.refresh(
+                    session, payroll_snapshot_repository.keys_of_records(records)
+                )
+                
                 # Transaction will be committed by session_scope
                 return True
                 
@@ -46,10 +53,12 @@ class PayrollRegisterRepository:
         """Delete all records by recorder using SQLAlchemy"""
         try:
             with self.db_manager.session_scope() as session:
+                keys = payroll_snapshot_repository.keys_of_recorder(session, recorder_type, recorder_id)
                 session.query(PayrollRegisterModel)\
                     .filter(PayrollRegisterModel.recorder_type == recorder_type)\
                     .filter(PayrollRegisterModel.recorder_id == recorder_id)\
                     .delete()
+                payroll_snapshot_repository.refresh(session, keys)
                 # Transaction will be committed by session_scope
                 return True
                 
@@ -121,6 +130,35 @@ class PayrollRegisterRepository:
         except Exception as e:
             logger.error(f"Failed to get payroll records for {recorder_type} {recorder_id}: {e}")
             return []
+    
+    def get_totals(self, dimensions: List[str], filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Get hours and amounts from closed-month snapshots plus open-month records
+        
+        Args:
+            dimensions: Grouping: 'employee', 'object', 'estimate', 'month'
+            filters: Dict with keys: employee_id, object_id, estimate_id, month_from, month_to
+            
+        Returns:
+            List of total rows ordered by the dimensions
+        """
+        with self.db_manager.session_scope() as session:
+            return payroll_snapshot_repository.load_totals(session, dimensions, filters)
+    
+    def close_period(self, month) -> int:
+        """Close payroll through month (date or 'YYYY-MM'), returns months closed"""
+        with self.db_manager.session_scope() as session:
+            return payroll_snapshot_repository.close_period(session, month)
+    
+    def reopen_period(self, month) -> int:
+        """Reopen payroll from month on, returns months reopened"""
+        with self.db_manager.session_scope() as session:
+            return payroll_snapshot_repository.reopen_period(session, month)
+    
+    def get_closed_through(self) -> Optional[str]:
+        """Get the last closed payroll month ('YYYY-MM')"""
+        with self.db_manager.session_scope() as session:
+            return payroll_snapshot_repository.closed_through(session)
 
     def _model_to_dict(self, model: PayrollRegisterModel) -> Dict:
         """Convert SQLAlchemy model to dict"""
@@ -0,0 +1,313 @@
+"""
+Repository for month-close snapshots of the payroll register
+
+Closing a month writes its per-(month, employee, object, estimate) totals to
+payroll_period_snapshots and records the month in payroll_closed_periods.
+Months are closed in order, so the closed period is always everything up to
+closed_through(); payroll totals then read the snapshots for it and only the
+register rows of the open months after it. Missing dimensions are stored as 0
+to keep the key usable.
+
+Closed months stay postable: reposting a timesheet into one refreshes just
+the snapshot rows of the keys it touched (see PayrollRegisterRepository
+write_records and delete_by_recorder).
+"""
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src.data.repositories.sql_connection import dialect_name, execute
+
+logger = logging.getLogger(__name__)
+
+MEASURES = ('hours_worked', 'amount', 'record_count')
+
+# Dimension -> (key column, name expression, name key) of total rows
+DIMENSIONS: Dict[str, Tuple[str, str, str]] = {
+    'employee': ('employee_id', 'p.full_name', 'employee_name'),
+    'object': ('object_id', 'o.name', 'object_name'),
+    'estimate': ('estimate_id', 'e.number', 'estimate_number'),
+    'month': ('month', 'c.month', 'month'),
+}
+
+SnapshotKey = Tuple[str, int, int, int]
+
+# Employees recomputed per statement when refreshing a closed month
+REFRESH_CHUNK_SIZE = 500
+
+
+def _month_sql(connection, column: str) -> str:
+    dialect = dialect_name(connection)
+    if dialect == 'sqlite':
+        return f"substr({column}, 1, 7)"
+    if dialect == 'postgresql':
+        return f"to_char({column}, 'YYYY-MM')"
+    return f"SUBSTRING(CAST({column} AS VARCHAR(10)), 1, 7)"
+
+
+def month_of(period) -> str:
+    """'YYYY-MM' of a date or ISO date string"""
+    if isinstance(period, date):
+        return period.strftime('%Y-%m')
+    return str(period)[:7]
+
+
+def _month_start(month: str) -> str:
+    return f"{month}-01"
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def create_tables(connection) -> None:
+    """Create the snapshot tables on SQLite databases that predate them"""
+    execute(connection, """
+        CREATE TABLE IF NOT EXISTS payroll_period_snapshots (
+            month VARCHAR(7) NOT NULL,
+            employee_id INTEGER NOT NULL DEFAULT 0,
+            object_id INTEGER NOT NULL DEFAULT 0,
+            estimate_id INTEGER NOT NULL DEFAULT 0,
+            hours_worked FLOAT NOT NULL DEFAULT 0,
+            amount FLOAT NOT NULL DEFAULT 0,
+            record_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, employee_id, object_id, estimate_id)
+        )
+    """)
+    execute(connection, """
+        CREATE INDEX IF NOT EXISTS idx_payroll_snapshots_employee
+        ON payroll_period_snapshots(employee_id, object_id, estimate_id)
+    """)
+    execute(connection, """
+        CREATE TABLE IF NOT EXISTS payroll_closed_periods (
+            month VARCHAR(7) NOT NULL PRIMARY KEY,
+            closed_at DATETIME NOT NULL
+        )
+    """)
+
+
+def closed_through(connection) -> Optional[str]:
+    """Last closed month ('YYYY-MM'), None while every month is open"""
+    return execute(connection, "SELECT MAX(month) FROM payroll_closed_periods").fetchone()[0]
+
+
+def _snapshot_select(connection, where: str) -> str:
+    month = _month_sql(connection, 'period')
+    return f"""
+        SELECT {month}, COALESCE(employee_id, 0), COALESCE(object_id, 0), COALESCE(estimate_id, 0),
+               SUM(COALESCE(hours_worked, 0)), SUM(COALESCE(amount, 0)), COUNT(*)
+        FROM payroll_register
+        WHERE {where}
+        GROUP BY {month}, COALESCE(employee_id, 0), COALESCE(object_id, 0), COALESCE(estimate_id, 0)
+    """
+
+
+def close_period(connection, month) -> int:
+    """Close every open month up to and including month
+
+    Returns:
+        Number of months closed (0 if month was already closed)
+    """
+    month = month_of(month)
+    last_closed = closed_through(connection)
+    if last_closed is not None and month <= last_closed:
+        return 0
+
+    if last_closed is not None:
+        first = _next_month(last_closed)
+    else:
+        earliest = execute(connection, "SELECT MIN(period) FROM payroll_register").fetchone()[0]
+        first = min(month_of(earliest), month) if earliest else month
+
+    params = {'start': _month_start(first), 'end': _month_start(_next_month(month))}
+    execute(connection, """
+        DELETE FROM payroll_period_snapshots WHERE month >= :first AND month <= :last
+    """, {'first': first, 'last': month})
+    execute(connection, f"""
+        INSERT INTO payroll_period_snapshots (
+            month, employee_id, object_id, estimate_id, {', '.join(MEASURES)}
+        )
+        {_snapshot_select(connection, "period >= :start AND period < :end")}
+    """, params)
+
+    months = [first]
+    while months[-1] < month:
+        months.append(_next_month(months[-1]))
+    closed_at = datetime.now()
+    for closed in months:
+        execute(connection, """
+            INSERT INTO payroll_closed_periods (month, closed_at) VALUES (:month, :closed_at)
+        """, {'month': closed, 'closed_at': closed_at})
+
+    logger.info(f"Payroll closed through {month} ({len(months)} months)")
+    return len(months)
+
+
+def reopen_period(connection, month) -> int:
+    """Reopen month and every later closed month, dropping their snapshots
+
+    Returns:
+        Number of months reopened
+    """
+    params = {'month': month_of(month)}
+    execute(connection, "DELETE FROM payroll_period_snapshots WHERE month >= :month", params)
+    result = execute(connection, "DELETE FROM payroll_closed_periods WHERE month >= :month", params)
+    return result.rowcount
+
+
+def keys_of_records(records: Iterable[Dict]) -> Set[SnapshotKey]:
+    """Snapshot keys of register record dicts"""
+    return {
+        (month_of(record['period']), record.get('employee_id') or 0,
+         record.get('object_id') or 0, record.get('estimate_id') or 0)
+        for record in records
+    }
+
+
+def keys_of_recorder(connection, recorder_type: str, recorder_id: int) -> Set[SnapshotKey]:
+    """Snapshot keys of a document's register rows (read them before deleting)"""
+    month = _month_sql(connection, 'period')
+    rows = execute(connection, f"""
+        SELECT DISTINCT {month}, COALESCE(employee_id, 0), COALESCE(object_id, 0), COALESCE(estimate_id, 0)
+        FROM payroll_register
+        WHERE recorder_type = :recorder_type AND recorder_id = :recorder_id
+    """, {'recorder_type': recorder_type, 'recorder_id': recorder_id}).fetchall()
+    return {tuple(row) for row in rows}
+
+
+def refresh(connection, keys: Iterable[SnapshotKey]) -> int:
+    """Recompute the snapshot rows of keys that fall into the closed period
+
+    Call after the register rows of the keys changed, in the same transaction.
+    Each touched month is recomputed with one statement for the touched
+    employees.
+
+    Returns:
+        Number of snapshot keys in the closed period
+    """
+    last_closed = closed_through(connection)
+    if last_closed is None:
+        return 0
+
+    employees_by_month: Dict[str, Set[int]] = {}
+    refreshed = 0
+    for month, employee_id, _, _ in set(keys):
+        if month <= last_closed:
+            employees_by_month.setdefault(month, set()).add(employee_id)
+            refreshed += 1
+
+    for month, employees in sorted(employees_by_month.items()):
+        employees = sorted(employees)
+        for start in range(0, len(employees), REFRESH_CHUNK_SIZE):
+            chunk = employees[start:start + REFRESH_CHUNK_SIZE]
+            params = {f'employee_{i}': employee_id for i, employee_id in enumerate(chunk)}
+            placeholders = ', '.join(f':{name}' for name in params)
+            params.update(month=month, start=_month_start(month), end=_month_start(_next_month(month)))
+            execute(connection, f"""
+                DELETE FROM payroll_period_snapshots
+                WHERE month = :month AND employee_id IN ({placeholders})
+            """, params)
+            execute(connection, f"""
+                INSERT INTO payroll_period_snapshots (
+                    month, employee_id, object_id, estimate_id, {', '.join(MEASURES)}
+                )
+                {_snapshot_select(connection, f"period >= :start AND period < :end "
+                                              f"AND COALESCE(employee_id, 0) IN ({placeholders})")}
+            """, params)
+
+    if refreshed:
+        logger.info(f"Payroll snapshots recomputed for {refreshed} keys in closed months")
+    return refreshed
+
+
+def load_totals(connection, dimensions: Sequence[str], filters: Optional[Dict] = None) -> List[Dict]:
+    """
+    Hours, amount and record count grouped by dimensions
+
+    Closed months come from the snapshots, open months from the register.
+
+    Args:
+        connection: sqlite3 connection, SQLAlchemy connection or session
+        dimensions: Subset of DIMENSIONS in grouping order, e.g. ['employee', 'month']
+        filters: Optional employee_id, object_id, estimate_id and month_from/month_to
+            ('YYYY-MM' or dates, applied by whole months)
+
+    Returns:
+        Rows ordered by the dimensions
+    """
+    unknown = [dimension for dimension in dimensions if dimension not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown payroll dimensions: {', '.join(unknown)}")
+    dimensions = list(dict.fromkeys(dimensions))
+    filters = filters or {}
+
+    snapshot_where, register_where, params = [], [], {}
+    for column in ('employee_id', 'object_id', 'estimate_id'):
+        if filters.get(column) is not None:
+            snapshot_where.append(f"{column} = :{column}")
+            register_where.append(f"{column} = :{column}")
+            params[column] = filters[column]
+    if filters.get('month_from'):
+        params['month_from'] = month_of(filters['month_from'])
+        params['period_from'] = _month_start(params['month_from'])
+        snapshot_where.append("month >= :month_from")
+        register_where.append("period >= :period_from")
+    if filters.get('month_to'):
+        params['month_to'] = month_of(filters['month_to'])
+        params['period_end'] = _month_start(_next_month(params['month_to']))
+        snapshot_where.append("month <= :month_to")
+        register_where.append("period < :period_end")
+
+    branches = []
+    last_closed = closed_through(connection)
+    if last_closed is not None:
+        params['open_from'] = _month_start(_next_month(last_closed))
+        register_where.append("period >= :open_from")
+        branches.append(f"""
+            SELECT month, employee_id, object_id, estimate_id, {', '.join(MEASURES)}
+            FROM payroll_period_snapshots
+            {f"WHERE {' AND '.join(snapshot_where)}" if snapshot_where else ""}
+        """)
+    branches.append(f"""
+        SELECT {_month_sql(connection, 'period')} AS month, COALESCE(employee_id, 0) AS employee_id,
+               COALESCE(object_id, 0) AS object_id, COALESCE(estimate_id, 0) AS estimate_id,
+               COALESCE(hours_worked, 0) AS hours_worked, COALESCE(amount, 0) AS amount, 1 AS record_count
+        FROM payroll_register
+        {f"WHERE {' AND '.join(register_where)}" if register_where else ""}
+    """)
+    combined = ' UNION ALL '.join(branches)
+
+    keys = [DIMENSIONS[dimension][0] for dimension in dimensions]
+    joins = []
+    if 'employee' in dimensions:
+        joins.append("LEFT JOIN persons p ON p.id = c.employee_id")
+    if 'object' in dimensions:
+        joins.append("LEFT JOIN objects o ON o.id = c.object_id")
+    if 'estimate' in dimensions:
+        joins.append("LEFT JOIN estimates e ON e.id = c.estimate_id")
+    names = [
+        f"{DIMENSIONS[dimension][1]} AS {DIMENSIONS[dimension][2]}"
+        for dimension in dimensions if dimension != 'month'
+    ]
+    grouping = [f"c.{key}" for key in keys] + [DIMENSIONS[d][1] for d in dimensions if d != 'month']
+    result = execute(connection, f"""
+        SELECT {''.join(f'c.{key}, ' for key in keys)}{''.join(f'{name}, ' for name in names)}
+               SUM(c.hours_worked) AS hours_worked, SUM(c.amount) AS amount,
+               SUM(c.record_count) AS record_count
+        FROM ({combined}) c
+        {' '.join(joins)}
+        {f"GROUP BY {', '.join(grouping)}" if grouping else ""}
+        {f"ORDER BY {', '.join(f'c.{key}' for key in keys)}" if keys else ""}
+    """, params)
+
+    columns = list(result.keys()) if hasattr(result, 'keys') else [column[0] for column in result.description]
+    rows = []
+    for values in result.fetchall():
+        row = dict(zip(columns, values))
+        for column in ('employee_id', 'object_id', 'estimate_id'):
+            # 0 marks register rows without that dimension
+            if column in row and not row[column]:
+                row[column] = None
+        rows.append(row)
+    return rows
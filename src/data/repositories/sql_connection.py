@@ -0,0 +1,53 @@
+"""
+Raw SQL helpers shared by repositories that accept any connection
+
+Repositories written as plain functions (closure table, change counters,
+register turnovers, payroll snapshots, estimate rollups) are called both from
+legacy sqlite3 code and from SQLAlchemy sessions. These helpers run a
+statement with named parameters and report the backend for either kind of
+connection.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+
+def is_sqlalchemy(connection) -> bool:
+    """True for a SQLAlchemy Connection or Session, False for sqlite3"""
+    return isinstance(connection, (Session, Connection))
+
+
+def execute(connection, sql: str, params=None):
+    """
+    Execute SQL with :name parameters
+
+    Args:
+        connection: sqlite3 connection/cursor or SQLAlchemy Connection/Session
+        sql: Statement text
+        params: Parameter dict
+
+    Returns:
+        The sqlite3 cursor or SQLAlchemy result
+    """
+    if is_sqlalchemy(connection):
+        return connection.execute(text(sql), params or {})
+    return connection.execute(sql, params or {})
+
+
+def dialect_name(connection) -> str:
+    """SQLAlchemy dialect name of the connection ('sqlite' for sqlite3)"""
+    if isinstance(connection, Session):
+        return connection.get_bind().dialect.name
+    if isinstance(connection, Connection):
+        return connection.dialect.name
+    return 'sqlite'
+
+
+def database_key(connection) -> str:
+    """Identifies the database behind a connection, for per-database caches"""
+    if isinstance(connection, Session):
+        return str(connection.get_bind().url)
+    if isinstance(connection, Connection):
+        return str(connection.engine.url)
+    row = connection.execute("PRAGMA database_list").fetchone()
+    return f"sqlite:///{row[2]}" if row and row[2] else f"sqlite-memory:{id(connection)}"
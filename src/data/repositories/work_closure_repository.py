@@ -0,0 +1,285 @@
+"""
+Repository for the work catalog closure table
+
+work_closure stores one row per (ancestor, descendant) pair of the works tree,
+including a depth 0 row for every work, so subtree filters, breadcrumbs and
+depth statistics are single indexed queries instead of walks over parent_id.
+
+All functions accept either a sqlite3 connection/cursor (legacy raw SQL code)
+or a SQLAlchemy Connection/Session. ORM changes to Work.parent_id are mirrored
+automatically through mapper events; raw SQL writers call insert_work,
+move_work and delete_works themselves. Bulk writers that bypass both (the DBF
+importer) rebuild the table after writing works, and ensure_consistent repairs
+any remaining drift at startup.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import event, inspect
+
+from src.data.models.sqlalchemy_models import Work
+from src.data.repositories.sql_connection import dialect_name, execute
+
+logger = logging.getLogger(__name__)
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+_CHUNK_SIZE = 900
+
+
+def _id_placeholders(ids: Sequence[int]):
+    params = {f'id_{i}': work_id for i, work_id in enumerate(ids)}
+    return ', '.join(f':{name}' for name in params), params
+
+
+def _chunks(ids: Iterable[int]):
+    ids = list(ids)
+    for start in range(0, len(ids), _CHUNK_SIZE):
+        yield ids[start:start + _CHUNK_SIZE]
+
+
+def create_table(connection) -> None:
+    """Create the closure table on SQLite databases that predate it"""
+    execute(connection, """
+        CREATE TABLE IF NOT EXISTS work_closure (
+            ancestor_id INTEGER NOT NULL REFERENCES works(id) ON DELETE CASCADE,
+            descendant_id INTEGER NOT NULL REFERENCES works(id) ON DELETE CASCADE,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        )
+    """)
+    execute(connection, """
+        CREATE INDEX IF NOT EXISTS idx_work_closure_descendant
+        ON work_closure(descendant_id, depth)
+    """)
+
+
+def rebuild(connection) -> int:
+    """Recompute the closure table from works.parent_id
+
+    Returns:
+        Number of closure rows written
+    """
+    # Stopping at the starting ancestor keeps corrupt parent cycles finite
+    closure_cte = """
+        closure(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM works
+            UNION ALL
+            SELECT c.ancestor_id, w.id, c.depth + 1
+            FROM closure c
+            JOIN works w ON w.parent_id = c.descendant_id
+            WHERE w.id <> c.ancestor_id
+        )
+    """
+    insert = "INSERT INTO work_closure (ancestor_id, descendant_id, depth)"
+    select = "SELECT ancestor_id, descendant_id, depth FROM closure"
+
+    execute(connection, "DELETE FROM work_closure")
+    if dialect_name(connection) == 'mssql':
+        execute(connection, f"WITH {closure_cte} {insert} {select}")
+    else:
+        execute(connection, f"{insert} WITH RECURSIVE {closure_cte} {select}")
+
+    row_count = execute(connection, "SELECT COUNT(*) FROM work_closure").fetchone()[0]
+    logger.info(f"Rebuilt work closure table: {row_count} rows")
+    return row_count
+
+
+def count_parent_mismatches(connection) -> int:
+    """Count works whose parent_id disagrees with their depth 1 closure row
+
+    A parent_id pointing to a missing work or to the work itself has no
+    closure link, matching what rebuild produces.
+    """
+    return execute(connection, """
+        SELECT COUNT(*)
+        FROM works w
+        LEFT JOIN works p ON p.id = w.parent_id AND p.id <> w.id
+        LEFT JOIN work_closure c ON c.descendant_id = w.id AND c.depth = 1
+        WHERE (p.id IS NULL AND c.ancestor_id IS NOT NULL)
+        OR (p.id IS NOT NULL AND (c.ancestor_id IS NULL OR c.ancestor_id <> p.id))
+    """).fetchone()[0]
+
+
+def ensure_consistent(connection, create_missing_table: bool = True) -> bool:
+    """Create and backfill the closure table when it is out of sync with works
+
+    The table is rebuilt when it does not cover all works or when a parent_id
+    was changed without updating the closure (raw SQL writers).
+
+    Returns:
+        True if the table was rebuilt
+    """
+    if create_missing_table:
+        create_table(connection)
+
+    works_count = execute(connection, "SELECT COUNT(*) FROM works").fetchone()[0]
+    closure_count = execute(
+        connection, "SELECT COUNT(*) FROM work_closure WHERE depth = 0"
+    ).fetchone()[0]
+
+    if works_count == closure_count and count_parent_mismatches(connection) == 0:
+        return False
+
+    rebuild(connection)
+    return True
+
+
+def insert_work(connection, work_id: int, parent_id: Optional[int]) -> None:
+    """Add closure rows for a newly created (leaf) work"""
+    execute(
+        connection,
+        "INSERT INTO work_closure (ancestor_id, descendant_id, depth) VALUES (:work_id, :work_id, 0)",
+        {'work_id': work_id}
+    )
+    if parent_id is not None:
+        execute(connection, """
+            INSERT INTO work_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, :work_id, depth + 1
+            FROM work_closure
+            WHERE descendant_id = :parent_id
+        """, {'work_id': work_id, 'parent_id': parent_id})
+
+
+def move_work(connection, work_id: int, new_parent_id: Optional[int]) -> None:
+    """Re-link the subtree of work_id under new_parent_id
+
+    Raises:
+        ValueError: If new_parent_id is the work itself or one of its descendants
+    """
+    params = {'work_id': work_id, 'new_parent_id': new_parent_id}
+
+    if new_parent_id is not None:
+        in_subtree = execute(connection, """
+            SELECT 1 FROM work_closure
+            WHERE ancestor_id = :work_id AND descendant_id = :new_parent_id
+        """, params).fetchone()
+        if in_subtree:
+            raise ValueError(f"Cannot move work {work_id} under its own descendant {new_parent_id}")
+
+    # Drop links from the old ancestors to every node of the subtree
+    execute(connection, """
+        DELETE FROM work_closure
+        WHERE descendant_id IN (
+            SELECT descendant_id FROM work_closure WHERE ancestor_id = :work_id
+        )
+        AND ancestor_id IN (
+            SELECT ancestor_id FROM work_closure
+            WHERE descendant_id = :work_id AND ancestor_id <> :work_id
+        )
+    """, params)
+
+    if new_parent_id is not None:
+        execute(connection, """
+            INSERT INTO work_closure (ancestor_id, descendant_id, depth)
+            SELECT p.ancestor_id, s.descendant_id, p.depth + s.depth + 1
+            FROM work_closure p
+            CROSS JOIN work_closure s
+            WHERE p.descendant_id = :new_parent_id AND s.ancestor_id = :work_id
+        """, params)
+
+
+def delete_works(connection, work_ids: Iterable[int]) -> None:
+    """Remove closure rows of permanently deleted works
+
+    Links that passed through a deleted work are dropped as well, so its
+    remaining children become roots, matching their dangling parent_id.
+    """
+    for work_id in work_ids:
+        execute(connection, """
+            DELETE FROM work_closure
+            WHERE descendant_id IN (
+                SELECT descendant_id FROM work_closure WHERE ancestor_id = :work_id
+            )
+            AND ancestor_id IN (
+                SELECT ancestor_id FROM work_closure WHERE descendant_id = :work_id
+            )
+        """, {'work_id': work_id})
+
+
+def get_ancestor_ids(connection, work_id: int, include_self: bool = True) -> List[int]:
+    """Return ancestor IDs ordered from root to work (or its parent)"""
+    min_depth = 0 if include_self else 1
+    rows = execute(connection, """
+        SELECT ancestor_id FROM work_closure
+        WHERE descendant_id = :work_id AND depth >= :min_depth
+        ORDER BY depth DESC
+    """, {'work_id': work_id, 'min_depth': min_depth}).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_paths(connection, work_ids: Sequence[int]) -> Dict[int, List[str]]:
+    """Return breadcrumb names (root first) for several works at once"""
+    paths: Dict[int, List[str]] = {work_id: [] for work_id in work_ids}
+
+    for chunk in _chunks(work_ids):
+        placeholders, params = _id_placeholders(chunk)
+        rows = execute(connection, f"""
+            SELECT c.descendant_id, w.name
+            FROM work_closure c
+            JOIN works w ON w.id = c.ancestor_id
+            WHERE c.descendant_id IN ({placeholders})
+            ORDER BY c.descendant_id, c.depth DESC
+        """, params).fetchall()
+        for row in rows:
+            paths[row[0]].append(row[1])
+
+    return paths
+
+
+def get_descendant_rows(
+    connection,
+    work_id: int,
+    max_depth: int = 10,
+    include_deleted: bool = False
+) -> List[tuple]:
+    """Return (work_id, depth) pairs of the subtree ordered by depth
+
+    Unless include_deleted is set, works marked for deletion are skipped
+    together with everything below them.
+    """
+    deleted_condition = "" if include_deleted else """
+        AND NOT EXISTS (
+            SELECT 1
+            FROM work_closure a
+            JOIN works d ON d.id = a.ancestor_id
+            WHERE a.descendant_id = c.descendant_id
+            AND a.depth < c.depth
+            AND d.marked_for_deletion = :deleted
+        )
+    """
+    rows = execute(connection, f"""
+        SELECT c.descendant_id, c.depth
+        FROM work_closure c
+        WHERE c.ancestor_id = :work_id
+        AND c.depth BETWEEN 1 AND :max_depth
+        {deleted_condition}
+        ORDER BY c.depth, c.descendant_id
+    """, {'work_id': work_id, 'max_depth': max_depth, 'deleted': True}).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+def subtree_condition(column: str = "w.id", param_name: str = "group_id") -> str:
+    """SQL condition matching works strictly below the group bound to :param_name"""
+    return (
+        f"{column} IN (SELECT descendant_id FROM work_closure "
+        f"WHERE ancestor_id = :{param_name} AND depth > 0)"
+    )
+
+
+def _on_work_inserted(mapper, connection, target):
+    insert_work(connection, target.id, target.parent_id)
+
+
+def _on_work_updated(mapper, connection, target):
+    history = inspect(target).attrs.parent_id.history
+    if history.has_changes():
+        move_work(connection, target.id, target.parent_id)
+
+
+def _on_work_deleted(mapper, connection, target):
+    delete_works(connection, [target.id])
+
+
+event.listen(Work, 'after_insert', _on_work_inserted)
+event.listen(Work, 'after_update', _on_work_updated)
+event.listen(Work, 'before_delete', _on_work_deleted)
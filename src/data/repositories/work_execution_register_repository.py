@@ -3,6 +3,7 @@ from typing import List, Dict, Optional
 import logging
 from sqlalchemy import func
 from ..database_manager import DatabaseManager
+from . import work_execution_turnover_repository
 from ..models.sqlalchemy_models import (
     WorkExecutionRegister as WorkExecutionRegisterModel,
     Object as ObjectModel,
@@ -39,6 +40,8 @@ class WorkExecutionRegisterRepository:
         """Delete all movements for a document using SQLAlchemy"""
         try:
             with self.db_manager.session_scope() as session:
+                # Bulk deletes bypass mapper events; SQLite triggers need no help
+                work_execution_turnover_repository.remove_recorder(session, recorder_type, recorder_id)
                 session.query(WorkExecutionRegisterModel)\
                     .filter(WorkExecutionRegisterModel.recorder_type == recorder_type)\
                     .filter(WorkExecutionRegisterModel.recorder_id == recorder_id)\
@@ -321,6 +324,28 @@ class WorkExecutionRegisterRepository:
             logger.error(f"Failed to get turnovers: {e}")
             return []
 
+    def get_variance(self, dimensions: List[str], filters: Optional[Dict] = None,
+                     sort_by: Optional[str] = None, sort_order: str = 'asc',
+                     limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """
+        Get plan, fact, remainder and percent complete from the monthly turnovers
+        
+        Args:
+            dimensions: Grouping: 'object', 'estimate', 'work', 'month'
+            filters: Dict with keys: object_id, estimate_id, work_id, month_from, month_to
+            sort_by: Dimension or variance column to sort by
+            sort_order: 'asc' or 'desc'
+            limit: Page size (None: all groups)
+            offset: Groups to skip
+            
+        Returns:
+            {'rows': [...], 'total': number of groups, 'totals': {...}}
+        """
+        with self.db_manager.session_scope() as session:
+            return work_execution_turnover_repository.load_variance(
+                session, dimensions, filters, sort_by, sort_order, limit, offset
+            )
+    
     def _model_to_dict(self, model: WorkExecutionRegisterModel) -> Dict:
         """Convert SQLAlchemy model to dict"""
         return {
@@ -0,0 +1,368 @@
+"""
+Repository for monthly turnovers of the work execution register
+
+work_execution_turnovers holds one row per month, object, estimate and work
+with the summed income (plan) and expense (fact) of all register movements
+in it, so plan-vs-fact reports aggregate a few thousand monthly rows instead
+of every movement. Missing dimensions are stored as 0 to keep the key usable
+for upserts.
+
+On SQLite the table is maintained by triggers on work_execution_register, so
+raw SQL writers are covered without any changes. Other backends apply ORM
+inserts through a mapper event and deletions explicitly with
+remove_recorder() (see WorkExecutionRegisterRepository.delete_movements).
+
+Variance rows are derived from the turnovers:
+
+    remaining = plan - fact
+    percent_complete = fact / plan * 100 (None without a plan)
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from src.data.models.sqlalchemy_models import WorkExecutionRegister
+from src.data.repositories.sql_connection import dialect_name, execute
+
+logger = logging.getLogger(__name__)
+
+MEASURES = ('quantity_income', 'quantity_expense', 'sum_income', 'sum_expense')
+
+# Dimension -> (key column, name expression, name key) of variance rows
+DIMENSIONS: Dict[str, Tuple[str, str, str]] = {
+    'object': ('object_id', 'o.name', 'object_name'),
+    'estimate': ('estimate_id', 'e.number', 'estimate_number'),
+    'work': ('work_id', 'w.name', 'work_name'),
+    'month': ('month', 'v.month', 'month'),
+}
+
+VARIANCE_COLUMNS = (
+    'plan_quantity', 'fact_quantity', 'remaining_quantity',
+    'plan_sum', 'fact_sum', 'remaining_sum',
+    'percent_complete', 'percent_complete_sum',
+)
+
+_VARIANCE_SQL = {
+    'plan_quantity': 'SUM(t.quantity_income)',
+    'fact_quantity': 'SUM(t.quantity_expense)',
+    'remaining_quantity': 'SUM(t.quantity_income) - SUM(t.quantity_expense)',
+    'plan_sum': 'SUM(t.sum_income)',
+    'fact_sum': 'SUM(t.sum_expense)',
+    'remaining_sum': 'SUM(t.sum_income) - SUM(t.sum_expense)',
+    'percent_complete': (
+        'CASE WHEN SUM(t.quantity_income) > 0 '
+        'THEN SUM(t.quantity_expense) * 100.0 / SUM(t.quantity_income) END'
+    ),
+    'percent_complete_sum': (
+        'CASE WHEN SUM(t.sum_income) > 0 '
+        'THEN SUM(t.sum_expense) * 100.0 / SUM(t.sum_income) END'
+    ),
+}
+
+
+def _month_sql(connection, column: str) -> str:
+    dialect = dialect_name(connection)
+    if dialect == 'sqlite':
+        return f"substr({column}, 1, 7)"
+    if dialect == 'postgresql':
+        return f"to_char({column}, 'YYYY-MM')"
+    return f"SUBSTRING(CAST({column} AS VARCHAR(10)), 1, 7)"
+
+
+def month_of(period) -> str:
+    """'YYYY-MM' of a date or ISO date string"""
+    if isinstance(period, date):
+        return period.strftime('%Y-%m')
+    return str(period)[:7]
+
+
+def create_table(connection) -> None:
+    """Create the turnovers table on SQLite databases that predate it"""
+    execute(connection, """
+        CREATE TABLE IF NOT EXISTS work_execution_turnovers (
+            month VARCHAR(7) NOT NULL,
+            object_id INTEGER NOT NULL DEFAULT 0,
+            estimate_id INTEGER NOT NULL DEFAULT 0,
+            work_id INTEGER NOT NULL DEFAULT 0,
+            quantity_income FLOAT NOT NULL DEFAULT 0,
+            quantity_expense FLOAT NOT NULL DEFAULT 0,
+            sum_income FLOAT NOT NULL DEFAULT 0,
+            sum_expense FLOAT NOT NULL DEFAULT 0,
+            movement_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, object_id, estimate_id, work_id)
+        )
+    """)
+    execute(connection, """
+        CREATE INDEX IF NOT EXISTS idx_work_turnovers_dimensions
+        ON work_execution_turnovers(object_id, estimate_id, work_id)
+    """)
+
+
+def rebuild(connection) -> int:
+    """Recompute all turnovers from the register
+
+    Returns:
+        Number of turnover rows written
+    """
+    execute(connection, "DELETE FROM work_execution_turnovers")
+    month = _month_sql(connection, 'period')
+    execute(connection, f"""
+        INSERT INTO work_execution_turnovers (
+            month, object_id, estimate_id, work_id,
+            quantity_income, quantity_expense, sum_income, sum_expense, movement_count
+        )
+        SELECT
+            {month}, COALESCE(object_id, 0), COALESCE(estimate_id, 0), COALESCE(work_id, 0),
+            SUM(COALESCE(quantity_income, 0)), SUM(COALESCE(quantity_expense, 0)),
+            SUM(COALESCE(sum_income, 0)), SUM(COALESCE(sum_expense, 0)), COUNT(*)
+        FROM work_execution_register
+        GROUP BY {month}, COALESCE(object_id, 0), COALESCE(estimate_id, 0), COALESCE(work_id, 0)
+    """)
+    return execute(connection, "SELECT COUNT(*) FROM work_execution_turnovers").fetchone()[0]
+
+
+def install_sqlite_triggers(connection) -> None:
+    """Create the triggers that keep the turnovers in step with the register"""
+    def apply(row: str, sign: str) -> str:
+        key = (
+            f"substr({row}.period, 1, 7), COALESCE({row}.object_id, 0), "
+            f"COALESCE({row}.estimate_id, 0), COALESCE({row}.work_id, 0)"
+        )
+        values = ', '.join(f"{sign}COALESCE({row}.{measure}, 0)" for measure in MEASURES)
+        return f"""
+            INSERT INTO work_execution_turnovers (
+                month, object_id, estimate_id, work_id,
+                {', '.join(MEASURES)}, movement_count
+            )
+            VALUES ({key}, {values}, {sign}1)
+            ON CONFLICT (month, object_id, estimate_id, work_id) DO UPDATE SET
+                {', '.join(f"{measure} = {measure} + excluded.{measure}" for measure in MEASURES)},
+                movement_count = movement_count + excluded.movement_count;
+        """
+
+    # Drops the OLD row's turnover once its last movement is gone
+    cleanup = """
+        DELETE FROM work_execution_turnovers
+        WHERE month = substr(OLD.period, 1, 7) AND object_id = COALESCE(OLD.object_id, 0)
+          AND estimate_id = COALESCE(OLD.estimate_id, 0) AND work_id = COALESCE(OLD.work_id, 0)
+          AND movement_count <= 0;
+    """
+    for suffix, event_sql, body in (
+        ('insert', "AFTER INSERT", apply('NEW', '')),
+        ('update', "AFTER UPDATE", apply('OLD', '-') + apply('NEW', '') + cleanup),
+        ('delete', "AFTER DELETE", apply('OLD', '-') + cleanup),
+    ):
+        execute(connection, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_work_turnover_{suffix}
+            {event_sql} ON work_execution_register
+            BEGIN {body} END
+        """)
+
+
+def ensure_consistent(connection, create_missing_table: bool = True) -> bool:
+    """Create the table (and on SQLite the triggers), rebuild when it lags the register
+
+    Returns:
+        True if the turnovers were rebuilt
+    """
+    if create_missing_table:
+        create_table(connection)
+    if dialect_name(connection) == 'sqlite':
+        install_sqlite_triggers(connection)
+
+    movements = execute(connection, "SELECT COUNT(*) FROM work_execution_register").fetchone()[0]
+    counted = execute(
+        connection, "SELECT COALESCE(SUM(movement_count), 0) FROM work_execution_turnovers"
+    ).fetchone()[0]
+    if movements == counted:
+        return False
+
+    rebuild(connection)
+    return True
+
+
+def _add(connection, key: Dict, values: Dict, count: int) -> None:
+    params = dict(key, count=count, **values)
+    assignments = ', '.join(f"{measure} = {measure} + :{measure}" for measure in MEASURES)
+    where = "month = :month AND object_id = :object_id AND estimate_id = :estimate_id AND work_id = :work_id"
+    result = execute(connection, f"""
+        UPDATE work_execution_turnovers
+        SET {assignments}, movement_count = movement_count + :count
+        WHERE {where}
+    """, params)
+    if result.rowcount == 0:
+        execute(connection, f"""
+            INSERT INTO work_execution_turnovers (
+                month, object_id, estimate_id, work_id, {', '.join(MEASURES)}, movement_count
+            )
+            VALUES (:month, :object_id, :estimate_id, :work_id,
+                    {', '.join(f':{measure}' for measure in MEASURES)}, :count)
+        """, params)
+    elif count < 0:
+        execute(connection, f"DELETE FROM work_execution_turnovers WHERE {where} AND movement_count <= 0", params)
+
+
+def remove_recorder(connection, recorder_type: str, recorder_id: int) -> None:
+    """Subtract a document's movements before they are deleted (non-SQLite)
+
+    Does nothing on SQLite, where the delete trigger subtracts them.
+    """
+    if dialect_name(connection) == 'sqlite':
+        return
+
+    month = _month_sql(connection, 'period')
+    rows = execute(connection, f"""
+        SELECT {month}, COALESCE(object_id, 0), COALESCE(estimate_id, 0), COALESCE(work_id, 0),
+               SUM(COALESCE(quantity_income, 0)), SUM(COALESCE(quantity_expense, 0)),
+               SUM(COALESCE(sum_income, 0)), SUM(COALESCE(sum_expense, 0)), COUNT(*)
+        FROM work_execution_register
+        WHERE recorder_type = :recorder_type AND recorder_id = :recorder_id
+        GROUP BY {month}, COALESCE(object_id, 0), COALESCE(estimate_id, 0), COALESCE(work_id, 0)
+    """, {'recorder_type': recorder_type, 'recorder_id': recorder_id}).fetchall()
+    for row in rows:
+        key = dict(zip(('month', 'object_id', 'estimate_id', 'work_id'), row[:4]))
+        _add(connection, key, {measure: -(value or 0) for measure, value in zip(MEASURES, row[4:8])}, -row[8])
+
+
+def _on_movement_inserted(mapper, connection, target):
+    """Add ORM-inserted movements to the turnovers (non-SQLite)"""
+    if dialect_name(connection) == 'sqlite':
+        return
+    key = {
+        'month': month_of(target.period),
+        'object_id': target.object_id or 0,
+        'estimate_id': target.estimate_id or 0,
+        'work_id': target.work_id or 0,
+    }
+    _add(connection, key, {measure: getattr(target, measure) or 0 for measure in MEASURES}, 1)
+
+
+event.listen(WorkExecutionRegister, 'after_insert', _on_movement_inserted)
+
+
+def load_variance(
+    connection,
+    dimensions: Sequence[str],
+    filters: Optional[Dict] = None,
+    sort_by: Optional[str] = None,
+    sort_order: str = 'asc',
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> Dict:
+    """
+    Plan, fact, remainder and percent complete grouped by dimensions
+
+    Args:
+        connection: sqlite3 connection, SQLAlchemy connection or session
+        dimensions: Subset of DIMENSIONS in grouping order, e.g. ['object', 'work']
+        filters: Optional object_id, estimate_id, work_id and month_from/month_to
+            ('YYYY-MM'); drill down by filtering on the parent row's keys
+        sort_by: A dimension, its name key or one of VARIANCE_COLUMNS
+            (default: the dimensions in order)
+        sort_order: 'asc' or 'desc'
+        limit: Page size (None: all rows)
+        offset: Rows to skip
+
+    Returns:
+        {'rows': [...], 'total': number of groups, 'totals': variance over all groups}
+    """
+    unknown = [dimension for dimension in dimensions if dimension not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown variance dimensions: {', '.join(unknown)}")
+    dimensions = list(dict.fromkeys(dimensions))
+    filters = filters or {}
+
+    where, params = [], {}
+    for column in ('object_id', 'estimate_id', 'work_id'):
+        if filters.get(column) is not None:
+            where.append(f"t.{column} = :{column}")
+            params[column] = filters[column]
+    if filters.get('month_from'):
+        where.append("t.month >= :month_from")
+        params['month_from'] = month_of(filters['month_from'])
+    if filters.get('month_to'):
+        where.append("t.month <= :month_to")
+        params['month_to'] = month_of(filters['month_to'])
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    keys = [DIMENSIONS[dimension][0] for dimension in dimensions]
+    measures = ', '.join(f"{_VARIANCE_SQL[column]} AS {column}" for column in VARIANCE_COLUMNS)
+    grouped = f"""
+        SELECT {''.join(f't.{key}, ' for key in keys)}{measures}
+        FROM work_execution_turnovers t
+        {where_sql}
+        {f"GROUP BY {', '.join(f't.{key}' for key in keys)}" if keys else ""}
+    """
+
+    sortable = {column: f"v.{column}" for column in VARIANCE_COLUMNS}
+    for dimension in dimensions:
+        key, name_sql, name_key = DIMENSIONS[dimension]
+        sortable[dimension] = sortable[key] = f"v.{key}"
+        sortable[name_key] = name_sql
+    if sort_by is not None and sort_by not in sortable:
+        raise ValueError(f"Cannot sort variance by {sort_by}")
+    direction = 'DESC' if sort_order == 'desc' else 'ASC'
+    order = [f"{sortable[sort_by]} {direction}"] if sort_by else []
+    order += [f"v.{key} {direction if not sort_by else 'ASC'}" for key in keys]
+
+    joins = []
+    if 'object' in dimensions:
+        joins.append("LEFT JOIN objects o ON o.id = v.object_id")
+    if 'estimate' in dimensions:
+        joins.append("LEFT JOIN estimates e ON e.id = v.estimate_id")
+    if 'work' in dimensions:
+        joins.append("LEFT JOIN works w ON w.id = v.work_id")
+    names = ''.join(
+        f"{DIMENSIONS[dimension][1]} AS {DIMENSIONS[dimension][2]}, "
+        for dimension in dimensions if dimension != 'month'
+    )
+
+    # Group count and totals come from window aggregates over all groups,
+    # so the turnovers are grouped once per page
+    summed = VARIANCE_COLUMNS[:6]
+    windows = ', '.join(
+        ['COUNT(*) OVER () AS variance_groups']
+        + [f"SUM(v.{column}) OVER () AS variance_total_{column}" for column in summed]
+    )
+    page = ""
+    page_params = dict(params)
+    if limit is not None:
+        page = "LIMIT :limit OFFSET :offset"
+        page_params.update(limit=limit, offset=offset)
+    result = execute(connection, f"""
+        SELECT {names}v.*, {windows}
+        FROM ({grouped}) v
+        {' '.join(joins)}
+        {f"ORDER BY {', '.join(order)}" if order else ""}
+        {page}
+    """, page_params)
+
+    columns = list(result.keys()) if hasattr(result, 'keys') else [column[0] for column in result.description]
+    rows: List[Dict] = []
+    summary = None
+    for values in result.fetchall():
+        row = dict(zip(columns, values))
+        summary = [row.pop('variance_groups')] + [row.pop(f'variance_total_{column}') for column in summed]
+        for column in ('object_id', 'estimate_id', 'work_id'):
+            # 0 marks movements without that dimension
+            if column in row and not row[column]:
+                row[column] = None
+        rows.append(row)
+
+    if summary is None:
+        # Paged past the last group
+        summary = execute(connection, f"""
+            SELECT COUNT(*), {', '.join(f'SUM(g.{column})' for column in summed)}
+            FROM ({grouped}) g
+        """, params).fetchone()
+
+    totals = dict(zip(summed, (value or 0 for value in summary[1:])))
+    totals['percent_complete'] = (
+        totals['fact_quantity'] * 100.0 / totals['plan_quantity'] if totals['plan_quantity'] > 0 else None
+    )
+    totals['percent_complete_sum'] = (
+        totals['fact_sum'] * 100.0 / totals['plan_sum'] if totals['plan_sum'] > 0 else None
+    )
+    return {'rows': rows, 'total': summary[0], 'totals': totals}
@@ -1,19 +1,248 @@
+import atexit
+import configparser
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
 from typing import Optional, List, Tuple
 from ..data.models.audit import AuditLog
 from ..data.repositories.audit_repository import AuditRepository
 
-class AuditService:
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL_MS = 500
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_ENQUEUE_TIMEOUT_MS = 1000
+
+
+class _FlushMarker:
+    """Queue item released once every entry queued before it is written"""
+
     def __init__(self):
-        self.repository = AuditRepository()
-
-    def log(self, 
-            user_id: int, 
-            username: str, 
-            action: str, 
-            resource_type: str, 
-            resource_id: int, 
+        self.done = threading.Event()
+
+
+class AuditLogWriter:
+    """Background writer that batches audit entries
+
+    Entries are queued by log() and written by a daemon thread with one
+    multi-row INSERT per batch, once batch_size entries are pending or
+    flush_interval_ms after the first one was queued. The queue is bounded:
+    when max_pending entries are waiting, log() blocks for up to
+    enqueue_timeout_ms and then writes the entry itself, so a slow database
+    slows callers down instead of growing memory or losing entries.
+    """
+
+    def __init__(self,
+                 repository: Optional[AuditRepository] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 enqueue_timeout_ms: int = DEFAULT_ENQUEUE_TIMEOUT_MS):
+        self._repository = repository
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        # Counters for monitoring
+        self.batches_written = 0
+        self.entries_written = 0
+        self.entries_written_directly = 0
+        self.entries_failed = 0
+
+    @property
+    def repository(self) -> AuditRepository:
+        if self._repository is None:
+            self._repository = AuditRepository()
+        return self._repository
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def log(self, entry: AuditLog) -> None:
+        """Queue an entry for writing"""
+        if self._closed.is_set():
+            self._write([entry], direct=True)
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning(f"Audit queue is full ({self._queue.maxsize} entries), writing entry directly")
+            self._write([entry], direct=True)
+
+    def flush(self) -> None:
+        """Write the entries queued before the call
+        
+        A marker is queued behind them and the call returns once the worker
+        reaches it, so entries logged meanwhile do not keep it waiting.
+        """
+        if self._closed.is_set():
+            self._drain()
+            return
+
+        self._ensure_thread()
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        while not marker.done.wait(self.flush_interval):
+            # The worker stops on close(), then the rest is drained here
+            if self._closed.is_set():
+                self._drain()
+
+    def close(self) -> None:
+        """Stop the worker and write the remaining entries"""
+        self._closed.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.flush_interval + 5)
+        self._drain()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            batch, marker = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+            if marker is not None:
+                self._release(marker)
+
+    def _take_batch(self) -> Tuple[List[AuditLog], Optional[_FlushMarker]]:
+        """Next batch, cut short by a flush marker (returned with it)"""
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], None
+        if isinstance(item, _FlushMarker):
+            return [], item
+
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._closed.is_set():
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if isinstance(item, _FlushMarker):
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    def _drain(self) -> None:
+        while True:
+            batch, marker = [], None
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, _FlushMarker):
+                    marker = item
+                    break
+                batch.append(item)
+            if batch:
+                self._write_batch(batch)
+            if marker is not None:
+                self._release(marker)
+            elif not batch:
+                return
+
+    def _release(self, marker: _FlushMarker) -> None:
+        self._queue.task_done()
+        marker.done.set()
+
+    def _write_batch(self, batch: List[AuditLog]) -> None:
+        try:
+            self._write(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, entries: List[AuditLog], direct: bool = False) -> None:
+        try:
+            self.repository.create_many(entries)
+        except Exception as e:
+            # Audit logging should not break the application flow, but should be logged to system logs
+            self.entries_failed += len(entries)
+            logger.error(f"Failed to write {len(entries)} audit log entries: {e}")
+            return
+
+        if direct:
+            self.entries_written_directly += len(entries)
+        else:
+            self.batches_written += 1
+        self.entries_written += len(entries)
+
+
+_writer: Optional[AuditLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_log_writer(config_path: str = 'env.ini') -> AuditLogWriter:
+    """Return the process-wide audit writer configured from [Audit]"""
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            config = configparser.ConfigParser()
+            if os.path.exists(config_path):
+                config.read(config_path, encoding='utf-8')
+            section = config['Audit'] if config.has_section('Audit') else {}
+
+            _writer = AuditLogWriter(
+                batch_size=int(section.get('batch_size', DEFAULT_BATCH_SIZE)),
+                flush_interval_ms=int(section.get('flush_interval_ms', DEFAULT_FLUSH_INTERVAL_MS)),
+                max_pending=int(section.get('max_pending', DEFAULT_MAX_PENDING)),
+                enqueue_timeout_ms=int(section.get('enqueue_timeout_ms', DEFAULT_ENQUEUE_TIMEOUT_MS))
+            )
+            # The worker is a daemon thread, so flush explicitly on exit
+            atexit.register(shutdown_audit_log_writer)
+        return _writer
+
+
+def shutdown_audit_log_writer() -> None:
+    """Write pending entries and stop the process-wide writer, if it was started"""
+    global _writer
+
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+class AuditService:
+    def __init__(self, writer: Optional[AuditLogWriter] = None):
+        self.writer = writer or get_audit_log_writer()
+        self.repository = self.writer.repository
+
+    def log(self,
+            user_id: int,
+            username: str,
+            action: str,
+            resource_type: str,
+            resource_id: int,
             details: str = ""):
-        """Create an audit log entry"""
+        """Queue an audit log entry"""
         try:
             log = AuditLog(
                 user_id=user_id,
@@ -21,13 +250,20 @@ class AuditService:
                 action=action,
                 resource_type=resource_type,
                 resource_id=resource_id,
-                details=details
+                details=details,
+                created_at=datetime.now()
             )
-            self.repository.create(log)
+            self.writer.log(log)
         except Exception as e:
             # Audit logging should not break the application flow, but should be logged to system logs
-            import logging
-            logging.error(f"Failed to create audit log: {e}")
+            logger.error(f"Failed to create audit log: {e}")
 
     def get_logs(self, limit: int = 100, offset: int = 0, resource_type: str = None, resource_id: int = None) -> Tuple[List[AuditLog], int]:
+        self.writer.flush()
         return self.repository.get_logs(limit, offset, resource_type, resource_id)
+
+    def get_logs_before(self, limit: int = 100, resource_type: str = None, resource_id: int = None,
+                        before: Optional[Tuple[datetime, int]] = None) -> List[AuditLog]:
+        """Keyset page of entries older than before=(created_at, id)"""
+        self.writer.flush()
+        return self.repository.get_logs_before(limit, resource_type, resource_id, before)
@@ -14,6 +14,7 @@ from datetime import datetime
 
 from ..data.models.sqlalchemy_models import Work, Unit, WorkUnitMigration
 from ..data.database_manager import DatabaseManager
+from ..data.repositories import work_closure_repository
 
 logger = logging.getLogger(__name__)
 
@@ -271,23 +272,14 @@ class BulkWorkOperationsService:
     
     def _has_circular_reference(self, session: Session, work_id: int, parent_id: int) -> bool:
         """Check if setting parent_id would create a circular reference"""
-        visited = set()
-        current_id = parent_id
-        
-        while current_id is not None and current_id not in visited:
-            if current_id == work_id:
-                return True
-            
-            visited.add(current_id)
-            
-            # Get parent of current work
-            parent_work = session.query(Work).filter(Work.id == current_id).first()
-            if parent_work:
-                current_id = parent_work.parent_id
-            else:
-                break
-        
-        return False
+        if parent_id == work_id:
+            return True
+        # Queried in the caller's transaction so concurrent moves are seen
+        in_subtree = session.execute(text("""
+            SELECT 1 FROM work_closure
+            WHERE ancestor_id = :work_id AND descendant_id = :parent_id
+        """), {'work_id': work_id, 'parent_id': parent_id}).fetchone()
+        return in_subtree is not None
     
     def bulk_migrate_legacy_units(
         self, 
@@ -0,0 +1,99 @@
+"""
+Cross-process Cache Invalidation
+
+In-process caches are private to one process, while the API may run
+several workers next to the desktop client, all writing to the same
+database. The channel compares the shared
+change_counters with the versions it saw last time, at most once per poll
+interval, and calls the listeners of every counter that moved.
+
+Writers don't have to do anything: SQLite triggers (or record_change() on
+other backends) bump the counters in the writing transaction.
+"""
+
+from typing import Callable, Dict, List, Optional
+import threading
+import time
+import logging
+
+from sqlalchemy.engine import Engine
+
+from ..data.repositories import change_counter_repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_SECONDS = 1.0
+
+
+class CacheInvalidationChannel:
+    """Polls the shared change counters and notifies in-process caches"""
+
+    def __init__(self, poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+        self._versions: Optional[Dict[str, int]] = None
+        self._last_poll: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, name: str, callback: Callable[[], None]) -> None:
+        """Call callback whenever the counter of table name changes"""
+        self._listeners.setdefault(name, []).append(callback)
+
+    def versions(self) -> Dict[str, int]:
+        """Counter values seen by the last poll"""
+        return dict(self._versions or {})
+
+    def is_due(self) -> bool:
+        return self._last_poll is None or time.monotonic() - self._last_poll >= self.poll_interval
+
+    def poll(self, bind, force: bool = False) -> List[str]:
+        """
+        Read the counters and notify listeners of the changed ones
+
+        Args:
+            bind: Engine or connection of the shared database
+            force: Poll even if the interval has not elapsed
+
+        Returns:
+            Names of the counters that changed since the previous poll
+            (none on the first poll, which only records the baseline)
+        """
+        with self._lock:
+            if not force and not self.is_due():
+                return []
+            self._last_poll = time.monotonic()
+
+            try:
+                if isinstance(bind, Engine):
+                    with bind.connect() as conn:
+                        versions = change_counter_repository.get_versions(conn)
+                else:
+                    versions = change_counter_repository.get_versions(bind)
+            except Exception as e:
+                logger.warning(f"Failed to read change counters: {e}")
+                return []
+
+            previous, self._versions = self._versions, versions
+
+        if previous is None:
+            return []
+
+        changed = [name for name, version in versions.items() if previous.get(name) != version]
+        for name in changed:
+            for callback in self._listeners.get(name, ()):
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Cache invalidation listener for {name} failed: {e}")
+
+        if changed:
+            logger.debug(f"Invalidated caches of changed tables: {', '.join(changed)}")
+        return changed
+
+
+_channel = CacheInvalidationChannel()
+
+
+def get_cache_invalidation_channel() -> CacheInvalidationChannel:
+    """Return the process-wide invalidation channel"""
+    return _channel
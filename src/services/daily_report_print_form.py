@@ -9,20 +9,22 @@ from ..data.database_manager import DatabaseManager
 class DailyReportPrintForm(PrintFormGenerator):
     """Generator for daily report print forms"""
     
+    BATCH_FILE_PREFIX = 'daily_report'
+    
     def __init__(self):
         """Initialize daily report print form generator"""
         super().__init__(orientation='landscape')
         self.db = DatabaseManager().get_connection()
     
-    def generate(self, report_id: int) -> Optional[bytes]:
+    def build_elements(self, report_id: int) -> Optional[list]:
         """
-        Generate daily report print form
+        Build daily report print form
         
         Args:
             report_id: ID of the daily report
             
         Returns:
-            PDF content as bytes or None if report not found
+            List of flowables or None if report not found
         """
         # Load report data
         report_data = self._load_report_data(report_id)
@@ -62,8 +64,7 @@ class DailyReportPrintForm(PrintFormGenerator):
         # Signatures
         elements.append(self._create_signatures_section(report_data))
         
-        # Generate PDF
-        return self.create_pdf(elements)
+        return elements
     
     def _load_report_data(self, report_id: int) -> Optional[dict]:
         """Load daily report data from database"""
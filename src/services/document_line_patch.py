@@ -0,0 +1,295 @@
+"""
+Document Line Patches
+
+Saving a document used to delete all of its lines and insert them again, so
+changing one quantity in a 5,000-line estimate rewrote 5,000 rows, their
+indexes and their sync timestamps. A line patch carries only the lines that
+changed, keyed by line uuid:
+
+    insert  a new line with the given uuid and values
+    update  the given columns of an existing line
+    delete  an existing line
+    move    set the line_number of an existing line
+
+Operations of one kind are applied with executemany (updates grouped by the
+set of columns they change), and derived columns such as timesheet totals
+and daily report deviations are recalculated only for the lines touched.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('insert', 'update', 'delete', 'move')
+
+DAY_COLUMNS = tuple(f'day_{day:02d}' for day in range(1, 32))
+
+_TOTAL_HOURS_SQL = ' + '.join(f'COALESCE({column}, 0)' for column in DAY_COLUMNS)
+_DEVIATION_SQL = (
+    "CASE WHEN planned_labor > 0 "
+    "THEN (COALESCE(actual_labor, 0) - planned_labor) * 100.0 / planned_labor ELSE 0 END"
+)
+
+# Upper bound of parameters per IN list
+_CHUNK_SIZE = 900
+
+
+class LinePatchError(ValueError):
+    """The patch is malformed (unknown operation or column, missing line number)"""
+
+
+class LinePatchConflict(LinePatchError):
+    """The patch does not match the stored lines (unknown or duplicate uuid, no uuid column)"""
+
+
+@dataclass(frozen=True)
+class LineTable:
+    """Table part of a document type"""
+    table: str
+    document_column: str
+    columns: Tuple[str, ...]
+    # (column, SQL expression) recalculated for inserted and updated lines
+    derived: Tuple[Tuple[str, str], ...] = ()
+    # Lines carry executor_ids stored in daily_report_executors
+    has_executors: bool = False
+
+
+LINE_TABLES: Dict[str, LineTable] = {
+    'estimate': LineTable(
+        'estimate_lines', 'estimate_id',
+        ('line_number', 'work_id', 'quantity', 'unit', 'price', 'labor_rate', 'sum',
+         'planned_labor', 'is_group', 'group_name', 'parent_group_id', 'is_collapsed',
+         'material_id', 'material_quantity', 'material_price', 'material_sum'),
+    ),
+    'daily_report': LineTable(
+        'daily_report_lines', 'daily_report_id',
+        ('line_number', 'work_id', 'planned_labor', 'actual_labor', 'is_group', 'group_name',
+         'parent_group_id', 'is_collapsed', 'material_id', 'planned_material_quantity',
+         'actual_material_quantity'),
+        derived=(('labor_deviation_percent', _DEVIATION_SQL), ('deviation_percent', _DEVIATION_SQL)),
+        has_executors=True,
+    ),
+    'timesheet': LineTable(
+        'timesheet_lines', 'timesheet_id',
+        ('line_number', 'employee_id', 'hourly_rate') + DAY_COLUMNS,
+        derived=(
+            ('total_hours', _TOTAL_HOURS_SQL),
+            ('total_amount', f'({_TOTAL_HOURS_SQL}) * COALESCE(hourly_rate, 0)'),
+        ),
+    ),
+}
+
+
+@dataclass
+class LinePatchResult:
+    """Number of lines affected by each kind of operation"""
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    moved: int = 0
+
+
+@dataclass(frozen=True)
+class LineSyncColumns:
+    """
+    Sync columns a full document save fills in for every inserted line
+
+    names and placeholders are appended to the column and VALUES lists of the
+    INSERT; both are empty on schemas without the columns.
+    """
+    names: str = ''
+    placeholders: str = ''
+    has_uuid: bool = False
+
+    def values(self) -> tuple:
+        """Parameters for the placeholders of one line: a fresh uuid"""
+        return (str(uuid4()),) if self.has_uuid else ()
+
+
+def _table_columns(db, table: str) -> set:
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def line_sync_columns(db, table: str) -> LineSyncColumns:
+    """Sync columns of a line table, so lines saved in full can be patched later"""
+    present = _table_columns(db, table)
+    columns = [(name, value) for name, value in
+               (('uuid', '?'), ('updated_at', 'CURRENT_TIMESTAMP'), ('is_deleted', '0'))
+               if name in present]
+    return LineSyncColumns(
+        names=''.join(f", {name}" for name, _ in columns),
+        placeholders=''.join(f", {value}" for _, value in columns),
+        has_uuid='uuid' in present,
+    )
+
+
+def _chunks(items: List[str]):
+    for start in range(0, len(items), _CHUNK_SIZE):
+        yield items[start:start + _CHUNK_SIZE]
+
+
+def _normalize_values(spec: LineTable, operation: dict, present: set) -> Tuple[Dict, Optional[List[int]]]:
+    """Validated column values of an insert/update plus the line's executor IDs"""
+    values = dict(operation.get('values') or {})
+    executor_ids = values.pop('executor_ids', None) if spec.has_executors else None
+
+    # Timesheet lines are edited as a {day: hours} dict
+    if 'days' in values and 'day_01' in spec.columns:
+        days = {int(day): hours for day, hours in (values.pop('days') or {}).items()}
+        for day, column in enumerate(DAY_COLUMNS, start=1):
+            values[column] = days.get(day, 0)
+
+    if operation.get('line_number') is not None:
+        values['line_number'] = operation['line_number']
+
+    unknown = sorted(set(values) - set(spec.columns))
+    if unknown:
+        raise LinePatchError(f"Unknown {spec.table} columns: {', '.join(unknown)}")
+
+    # Columns missing from an older schema are skipped
+    return {column: value for column, value in values.items() if column in present}, executor_ids
+
+
+def _stored_documents(db, spec: LineTable, uuids: List[str]) -> Dict[str, int]:
+    """Document ID of each stored line among the given uuids"""
+    stored = {}
+    for chunk in _chunks(uuids):
+        rows = db.execute(
+            f"SELECT uuid, {spec.document_column} FROM {spec.table} "
+            f"WHERE uuid IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        stored.update((row[0], row[1]) for row in rows)
+    return stored
+
+
+def apply_line_patch(db, document_type: str, document_id: int, operations: Iterable[dict]) -> LinePatchResult:
+    """
+    Apply line operations to one document without committing
+
+    Args:
+        db: DB-API connection (sqlite3)
+        document_type: Key of LINE_TABLES ('estimate', 'daily_report', 'timesheet')
+        document_id: Document the lines belong to
+        operations: Dicts with 'op', 'uuid', optional 'values' and 'line_number';
+            each uuid may appear once
+
+    Returns:
+        Counts of inserted, updated, deleted and moved lines
+
+    Raises:
+        LinePatchError: Unknown operation or column, missing line number
+        LinePatchConflict: A uuid is unknown, belongs to another document or already exists,
+            or the table has no uuid column (legacy schema; the document can only be saved in full)
+    """
+    spec = LINE_TABLES[document_type]
+    present = _table_columns(db, spec.table)
+    if 'uuid' not in present:
+        raise LinePatchConflict(f"{spec.table} has no uuid column, save the document in full")
+    operations = list(operations)
+
+    inserts: Dict[Tuple[str, ...], List[tuple]] = {}
+    updates: Dict[Tuple[str, ...], List[tuple]] = {}
+    deletes: List[tuple] = []
+    moves: List[tuple] = []
+    executors: Dict[str, List[int]] = {}
+    seen = set()
+    result = LinePatchResult()
+
+    for operation in operations:
+        op, uuid = operation.get('op'), operation.get('uuid')
+        if op not in OPERATIONS:
+            raise LinePatchError(f"Unknown line operation: {op}")
+        if not uuid:
+            raise LinePatchError(f"Line operation '{op}' without uuid")
+        if uuid in seen:
+            raise LinePatchError(f"Line {uuid} appears more than once in the patch")
+        seen.add(uuid)
+
+        if op == 'delete':
+            deletes.append((uuid, document_id))
+        elif op == 'move':
+            if operation.get('line_number') is None:
+                raise LinePatchError(f"Move of line {uuid} without line_number")
+            moves.append((operation['line_number'], uuid, document_id))
+        else:
+            values, executor_ids = _normalize_values(spec, operation, present)
+            if executor_ids is not None:
+                executors[uuid] = list(dict.fromkeys(executor_ids))
+            columns = tuple(sorted(values))
+            if op == 'insert':
+                if 'line_number' not in values:
+                    raise LinePatchError(f"Insert of line {uuid} without line_number")
+                inserts.setdefault(columns, []).append((document_id, uuid) + tuple(values[c] for c in columns))
+            else:
+                if columns:
+                    updates.setdefault(columns, []).append(tuple(values[c] for c in columns) + (uuid, document_id))
+                result.updated += 1
+
+    stored = _stored_documents(db, spec, sorted(seen))
+    for operation in operations:
+        uuid = operation['uuid']
+        if operation['op'] == 'insert':
+            if uuid in stored:
+                raise LinePatchConflict(f"Line {uuid} already exists")
+        elif stored.get(uuid) != document_id:
+            raise LinePatchConflict(f"Line {uuid} not found in {spec.table} of document {document_id}")
+
+    touched = "updated_at = CURRENT_TIMESTAMP, " if 'updated_at' in present else ""
+    where = f"uuid = ? AND {spec.document_column} = ?"
+    cursor = db.cursor()
+
+    if deletes:
+        if spec.has_executors:
+            cursor.executemany(f"""
+                DELETE FROM daily_report_executors
+                WHERE report_line_id IN (SELECT id FROM {spec.table} WHERE {where})
+            """, deletes)
+        cursor.executemany(f"DELETE FROM {spec.table} WHERE {where}", deletes)
+        result.deleted = len(deletes)
+
+    for columns, rows in updates.items():
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        cursor.executemany(f"UPDATE {spec.table} SET {touched}{assignments} WHERE {where}", rows)
+
+    if moves:
+        cursor.executemany(f"UPDATE {spec.table} SET {touched}line_number = ? WHERE {where}", moves)
+        result.moved = len(moves)
+
+    for columns, rows in inserts.items():
+        names = [spec.document_column, 'uuid', *columns]
+        placeholders = ['?'] * len(names)
+        if 'updated_at' in present:
+            names.append('updated_at')
+            placeholders.append('CURRENT_TIMESTAMP')
+        if 'is_deleted' in present:
+            names.append('is_deleted')
+            placeholders.append('0')
+        cursor.executemany(
+            f"INSERT INTO {spec.table} ({', '.join(names)}) VALUES ({', '.join(placeholders)})",
+            rows
+        )
+        result.inserted += len(rows)
+
+    derived = [(column, expression) for column, expression in spec.derived if column in present]
+    changed = [(row[1],) for rows in inserts.values() for row in rows]
+    changed += [(row[-2],) for rows in updates.values() for row in rows]
+    if derived and changed:
+        assignments = ', '.join(f"{column} = {expression}" for column, expression in derived)
+        cursor.executemany(f"UPDATE {spec.table} SET {assignments} WHERE uuid = ?", changed)
+
+    if executors:
+        cursor.executemany(f"""
+            DELETE FROM daily_report_executors
+            WHERE report_line_id IN (SELECT id FROM {spec.table} WHERE uuid = ?)
+        """, [(uuid,) for uuid in executors])
+        cursor.executemany(f"""
+            INSERT INTO daily_report_executors (report_line_id, executor_id)
+            SELECT id, ? FROM {spec.table} WHERE uuid = ?
+        """, [(executor_id, uuid) for uuid, ids in executors.items() for executor_id in ids])
+
+    logger.debug(f"Patched {spec.table} of document {document_id}: {result}")
+    return result
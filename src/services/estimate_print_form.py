@@ -10,20 +10,22 @@ from ..data.database_manager import DatabaseManager
 class EstimatePrintForm(PrintFormGenerator):
     """Generator for estimate print forms"""
     
+    BATCH_FILE_PREFIX = 'estimate'
+    
     def __init__(self):
         """Initialize estimate print form generator"""
         super().__init__(orientation='landscape')
         self.db = DatabaseManager().get_connection()
     
-    def generate(self, estimate_id: int) -> Optional[bytes]:
+    def build_elements(self, estimate_id: int) -> Optional[list]:
         """
-        Generate estimate print form based on АРСД format
+        Build estimate print form based on АРСД format
         
         Args:
             estimate_id: ID of the estimate
             
         Returns:
-            PDF content as bytes or None if estimate not found
+            List of flowables or None if estimate not found
         """
         # Load estimate data
         estimate_data = self._load_estimate_data(estimate_id)
@@ -58,8 +60,7 @@ class EstimatePrintForm(PrintFormGenerator):
         # Totals
         elements.append(self._create_totals_section(estimate_data))
         
-        # Generate PDF
-        return self.create_pdf(elements)
+        return elements
     
     def _load_estimate_data(self, estimate_id: int) -> Optional[dict]:
         """Load estimate data from database"""
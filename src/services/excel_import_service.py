@@ -4,6 +4,7 @@ from datetime import date
 from typing import Optional, Tuple
 from ..data.models.estimate import Estimate, EstimateLine
 from ..data.database_manager import DatabaseManager
+from ..data.repositories import work_closure_repository
 
 
 class ExcelImportService:
@@ -240,5 +241,7 @@ class ExcelImportService:
             INSERT INTO works (name, code, unit, price, labor_rate, marked_for_deletion)
             VALUES (?, ?, ?, ?, ?, 0)
         """, (name, code, unit, price, labor_rate))
+        work_id = cursor.lastrowid
+        work_closure_repository.insert_work(cursor, work_id, None)
         self.db.commit()
-        return cursor.lastrowid
+        return work_id
@@ -17,7 +17,8 @@ class ExcelPrintFormGenerator:
         self.templates_path = self._get_templates_path()
         self._ensure_templates_directory()
     
-    def _get_templates_path(self) -> str:
+    @staticmethod
+    def _get_templates_path() -> str:
         """Get templates path from config"""
         config = configparser.ConfigParser()
         if os.path.exists('env.ini'):
@@ -7,15 +7,19 @@ Implements requirement 2.5 for hierarchical query optimization.
 """
 
 from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import text, and_, or_, func, case
 import logging
 
 from ..data.models.sqlalchemy_models import Work, Unit
 from ..data.database_manager import DatabaseManager
+from ..data.repositories import work_closure_repository
 
 logger = logging.getLogger(__name__)
 
+# Keeps IN (...) lists below SQLite's bound parameter limit
+FETCH_CHUNK_SIZE = 900
+
 
 class HierarchicalQueryService:
     """Service for optimized hierarchical work queries"""
@@ -51,18 +55,18 @@ class HierarchicalQueryService:
         try:
             with self.db_manager.get_session() as session:
                 # Use database-specific recursive CTE for optimal performance
-                if self.db_manager.get_database_type() == 'postgresql':
+                db_type = self._get_database_type(session)
+                if db_type == 'postgresql':
                     return self._get_hierarchy_postgresql(
                         session, root_id, max_depth, include_unit_info, 
                         include_deleted, page, page_size
                     )
-                elif self.db_manager.get_database_type() == 'mssql':
+                elif db_type == 'mssql':
                     return self._get_hierarchy_mssql(
                         session, root_id, max_depth, include_unit_info, 
                         include_deleted, page, page_size
                     )
                 else:
-                    # SQLite fallback - use iterative approach
                     return self._get_hierarchy_sqlite(
                         session, root_id, max_depth, include_unit_info, 
                         include_deleted, page, page_size
@@ -82,6 +86,13 @@ class HierarchicalQueryService:
                 }
             }
     
+    def _get_database_type(self, session: Session) -> str:
+        """Get database type from the session's dialect"""
+        dialect_name = session.get_bind().dialect.name
+        if dialect_name in ('postgresql', 'mssql'):
+            return dialect_name
+        return 'sqlite'
+    
     def _get_hierarchy_postgresql(
         self, 
         session: Session, 
@@ -96,7 +107,7 @@ class HierarchicalQueryService:
         
         # Build the recursive CTE query
         deleted_condition = "" if include_deleted else "AND w.marked_for_deletion = false"
-        unit_join = "LEFT JOIN units u ON w.unit_id = u.id" if include_unit_info else ""
+        unit_join = "LEFT JOIN units u ON w.unit_id = u.id"
         unit_fields = ", u.name as unit_name, u.description as unit_description" if include_unit_info else ""
         
         root_condition = f"w.parent_id = {root_id}" if root_id else "w.parent_id IS NULL"
@@ -107,7 +118,7 @@ class HierarchicalQueryService:
             SELECT 
                 w.id, w.name, w.code, w.unit_id, w.price, w.labor_rate,
                 w.is_group, w.parent_id, w.marked_for_deletion, w.uuid,
-                COALESCE(u.name, w.unit) as unit_display
+                u.name as unit_display
                 {unit_fields},
                 0 as level,
                 ARRAY[w.id] as path,
@@ -122,7 +133,7 @@ class HierarchicalQueryService:
             SELECT 
                 w.id, w.name, w.code, w.unit_id, w.price, w.labor_rate,
                 w.is_group, w.parent_id, w.marked_for_deletion, w.uuid,
-                COALESCE(u.name, w.unit) as unit_display
+                u.name as unit_display
                 {unit_fields},
                 wh.level + 1,
                 wh.path || w.id,
@@ -185,7 +196,7 @@ class HierarchicalQueryService:
         """SQL Server-optimized recursive CTE query"""
         
         deleted_condition = "" if include_deleted else "AND w.marked_for_deletion = 0"
-        unit_join = "LEFT JOIN units u ON w.unit_id = u.id" if include_unit_info else ""
+        unit_join = "LEFT JOIN units u ON w.unit_id = u.id"
         unit_fields = ", u.name as unit_name, u.description as unit_description" if include_unit_info else ""
         
         root_condition = f"w.parent_id = {root_id}" if root_id else "w.parent_id IS NULL"
@@ -196,7 +207,7 @@ class HierarchicalQueryService:
             SELECT 
                 w.id, w.name, w.code, w.unit_id, w.price, w.labor_rate,
                 w.is_group, w.parent_id, w.marked_for_deletion, w.uuid,
-                COALESCE(u.name, w.unit) as unit_display
+                u.name as unit_display
                 {unit_fields},
                 0 as level,
                 CAST(w.id AS VARCHAR(MAX)) as path,
@@ -211,7 +222,7 @@ class HierarchicalQueryService:
             SELECT 
                 w.id, w.name, w.code, w.unit_id, w.price, w.labor_rate,
                 w.is_group, w.parent_id, w.marked_for_deletion, w.uuid,
-                COALESCE(u.name, w.unit) as unit_display
+                u.name as unit_display
                 {unit_fields},
                 wh.level + 1,
                 wh.path + ',' + CAST(w.id AS VARCHAR(MAX)),
@@ -272,61 +283,69 @@ class HierarchicalQueryService:
         page: int, 
         page_size: int
     ) -> Dict[str, Any]:
-        """SQLite fallback using iterative approach"""
+        """SQLite recursive CTE query"""
         
-        works = []
-        processed_ids = set()
-        
-        # Start with root works
-        if root_id:
-            root_works = session.query(Work).filter(
-                and_(
-                    Work.parent_id == root_id,
-                    Work.marked_for_deletion == (False if not include_deleted else or_(True, False))
-                )
-            ).all()
-        else:
-            root_works = session.query(Work).filter(
-                and_(
-                    Work.parent_id.is_(None),
-                    Work.marked_for_deletion == (False if not include_deleted else or_(True, False))
-                )
-            ).all()
-        
-        # Process hierarchy level by level
-        current_level = root_works
-        level = 0
-        
-        while current_level and level < max_depth:
-            for work in current_level:
-                if work.id not in processed_ids:
-                    work_data = self._work_to_dict(work, level, include_unit_info)
-                    works.append(work_data)
-                    processed_ids.add(work.id)
+        deleted_condition = "" if include_deleted else "AND w.marked_for_deletion = 0"
+        unit_fields = ", u.name as unit_name, u.description as unit_description" if include_unit_info else ""
+        
+        root_condition = "w.parent_id = :root_id" if root_id else "w.parent_id IS NULL"
+        
+        # Zero-padded ids keep the text path sortable in tree order
+        hierarchy_cte = f"""
+        WITH RECURSIVE work_hierarchy(id, level, path, hierarchy_path) AS (
+            -- Base case: root works
+            SELECT w.id, 0, printf('%010d', w.id), w.name
+            FROM works w
+            WHERE {root_condition} {deleted_condition}
             
-            # Get next level
-            if level < max_depth - 1:
-                parent_ids = [work.id for work in current_level]
-                current_level = session.query(Work).filter(
-                    and_(
-                        Work.parent_id.in_(parent_ids),
-                        Work.marked_for_deletion == (False if not include_deleted else or_(True, False))
-                    )
-                ).all()
-            else:
-                current_level = []
+            UNION ALL
             
-            level += 1
+            -- Recursive case: children
+            SELECT 
+                w.id, wh.level + 1,
+                wh.path || '/' || printf('%010d', w.id),
+                wh.hierarchy_path || ' > ' || w.name
+            FROM works w
+            JOIN work_hierarchy wh ON w.parent_id = wh.id
+            WHERE wh.level < :max_depth - 1 {deleted_condition}
+        )
+        """
+        params = {'root_id': root_id, 'max_depth': max_depth}
+        
+        query = hierarchy_cte + f"""
+        SELECT 
+            w.id, w.name, w.code, w.unit_id, w.price, w.labor_rate,
+            w.is_group, w.parent_id, w.marked_for_deletion, w.uuid,
+            u.name as unit_display
+            {unit_fields},
+            wh.level, wh.path, wh.hierarchy_path
+        FROM work_hierarchy wh
+        JOIN works w ON w.id = wh.id
+        LEFT JOIN units u ON w.unit_id = u.id
+        ORDER BY wh.path
+        LIMIT :limit OFFSET :offset
+        """
         
-        # Apply pagination
-        total_items = len(works)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_works = works[start_idx:end_idx]
+        result = session.execute(
+            text(query),
+            {**params, 'limit': page_size, 'offset': (page - 1) * page_size}
+        )
+        works = []
+        for row in result:
+            work_data = dict(row._mapping)
+            work_data['is_group'] = bool(work_data['is_group'])
+            work_data['marked_for_deletion'] = bool(work_data['marked_for_deletion'])
+            works.append(work_data)
+        
+        total_result = session.execute(
+            text(hierarchy_cte + "SELECT COUNT(*) as total FROM work_hierarchy"),
+            params
+        )
+        total_items = total_result.fetchone()[0]
         
         return {
             'success': True,
-            'data': paginated_works,
+            'data': works,
             'pagination': {
                 'page': page,
                 'page_size': page_size,
@@ -375,24 +394,16 @@ class HierarchicalQueryService:
         
         try:
             with self.db_manager.get_session() as session:
-                current_id = work_id
-                visited = set()
+                ancestor_ids = work_closure_repository.get_ancestor_ids(
+                    session, work_id, include_self
+                )
+                works_by_id = self._fetch_works_by_id(session, ancestor_ids)
                 
-                while current_id and current_id not in visited:
-                    visited.add(current_id)
-                    
-                    work = session.query(Work).filter(Work.id == current_id).first()
-                    if not work:
-                        break
-                    
-                    if current_id == work_id and not include_self:
-                        current_id = work.parent_id
-                        continue
-                    
-                    work_data = self._work_to_dict(work, 0, True)
-                    ancestors.insert(0, work_data)  # Insert at beginning for correct order
-                    
-                    current_id = work.parent_id
+                ancestors = [
+                    self._work_to_dict(works_by_id[ancestor_id], 0, True)
+                    for ancestor_id in ancestor_ids
+                    if ancestor_id in works_by_id
+                ]
                 
         except Exception as e:
             logger.error(f"Failed to get work ancestors for {work_id}: {str(e)}")
@@ -420,37 +431,37 @@ class HierarchicalQueryService:
         
         try:
             with self.db_manager.get_session() as session:
-                # Use recursive approach for all database types
-                to_process = [(work_id, 0)]
-                processed = set()
+                descendant_levels = work_closure_repository.get_descendant_rows(
+                    session, work_id, max_depth, include_deleted
+                )
+                works_by_id = self._fetch_works_by_id(
+                    session, [descendant_id for descendant_id, _ in descendant_levels]
+                )
                 
-                while to_process:
-                    current_id, level = to_process.pop(0)
-                    
-                    if current_id in processed or level >= max_depth:
-                        continue
-                    
-                    processed.add(current_id)
-                    
-                    # Get children
-                    children_query = session.query(Work).filter(Work.parent_id == current_id)
-                    if not include_deleted:
-                        children_query = children_query.filter(Work.marked_for_deletion == False)
-                    
-                    children = children_query.all()
-                    
-                    for child in children:
-                        child_data = self._work_to_dict(child, level + 1, True)
-                        descendants.append(child_data)
-                        
-                        # Add to processing queue for next level
-                        to_process.append((child.id, level + 1))
+                descendants = [
+                    self._work_to_dict(works_by_id[descendant_id], level, True)
+                    for descendant_id, level in descendant_levels
+                    if descendant_id in works_by_id
+                ]
                 
         except Exception as e:
             logger.error(f"Failed to get work descendants for {work_id}: {str(e)}")
         
         return descendants
     
+    def _fetch_works_by_id(self, session: Session, work_ids: List[int]) -> Dict[int, Work]:
+        """Load works with their units in a few IN (...) queries"""
+        works_by_id = {}
+        
+        for start in range(0, len(work_ids), FETCH_CHUNK_SIZE):
+            chunk = work_ids[start:start + FETCH_CHUNK_SIZE]
+            for work in session.query(Work).options(
+                joinedload(Work.unit_ref)
+            ).filter(Work.id.in_(chunk)):
+                works_by_id[work.id] = work
+        
+        return works_by_id
+    
     def get_hierarchy_statistics(self) -> Dict[str, Any]:
         """
         Get statistics about the work hierarchy
@@ -503,22 +514,21 @@ class HierarchicalQueryService:
                 result = children_query.fetchone()
                 stats['avg_children_per_parent'] = float(result[0]) if result[0] else 0.0
                 
-                # Calculate max depth and works by level (simplified for performance)
-                # This is an approximation - for exact calculation, we'd need recursive queries
-                max_depth_query = session.execute(text("""
-                    SELECT MAX(level_count) as max_depth
+                # Depth of every active work from the closure table
+                levels_query = session.execute(text("""
+                    SELECT level, COUNT(*) as works_count
                     FROM (
-                        SELECT COUNT(*) as level_count
-                        FROM works w1
-                        JOIN works w2 ON w1.parent_id = w2.id
-                        JOIN works w3 ON w2.parent_id = w3.id
-                        WHERE w1.marked_for_deletion = 0
-                        GROUP BY w1.id
-                        LIMIT 1000
-                    ) subq
-                """))
-                result = max_depth_query.fetchone()
-                stats['max_depth'] = result[0] if result and result[0] else 0
+                        SELECT c.descendant_id, MAX(c.depth) as level
+                        FROM work_closure c
+                        JOIN works w ON w.id = c.descendant_id
+                        WHERE w.marked_for_deletion = :deleted
+                        GROUP BY c.descendant_id
+                    ) levels
+                    GROUP BY level
+                    ORDER BY level
+                """), {'deleted': False})
+                stats['works_by_level'] = {row[0]: row[1] for row in levels_query}
+                stats['max_depth'] = max(stats['works_by_level'], default=0)
                 
         except Exception as e:
             logger.error(f"Failed to get hierarchy statistics: {str(e)}")
@@ -543,7 +553,7 @@ class HierarchicalQueryService:
         try:
             with self.db_manager.get_session() as session:
                 # Check for missing indexes
-                db_type = self.db_manager.get_database_type()
+                db_type = self._get_database_type(session)
                 
                 if db_type in ['postgresql', 'mssql']:
                     # Check if indexes exist
@@ -97,19 +97,28 @@ class HierarchyService:
         
         return self.estimate_repo.save(plan_estimate)
 
-    def get_hierarchy_summary(self, base_id: int) -> Dict[str, Any]:
+    def get_hierarchy_summary(self, base_id: int, include_works: bool = False) -> Dict[str, Any]:
         """Get summary of plan estimates for a general estimate"""
-        plan_estimates = self.hierarchy_repo.get_plan_estimates_by_base(base_id)
+        rollups = self.hierarchy_repo.get_hierarchy_rollups([base_id], include_works=include_works)
+        rollup = rollups[0] if rollups else {}
         
-        total_plan_sum = sum(e.total_sum for e in plan_estimates)
-        count = len(plan_estimates)
-        
-        return {
+        summary = {
             "base_id": base_id,
-            "plan_count": count,
-            "total_plan_sum": total_plan_sum,
-            "plan_estimates": plan_estimates
+            "plan_count": rollup.get('plan_count', 0),
+            "total_plan_sum": rollup.get('plan_sum', 0.0),
+            "total_plan_labor": rollup.get('plan_labor', 0.0),
+            "executed_quantity": rollup.get('executed_quantity', 0.0),
+            "executed_sum": rollup.get('executed_sum', 0.0),
+            "plan_estimates": self.hierarchy_repo.get_plan_estimates_by_base(base_id)
         }
+        if include_works:
+            summary["works"] = rollup.get('works', [])
+        return summary
+
+    def get_hierarchy_rollups(self, base_ids: Optional[List[int]] = None,
+                              include_works: bool = False) -> List[Dict[str, Any]]:
+        """Get plan and execution totals for many general estimates at once"""
+        return self.hierarchy_repo.get_hierarchy_rollups(base_ids, include_works=include_works)
 
     def get_hierarchy_tree(self, root_id: int) -> Optional[HierarchyTree]:
         """Get full hierarchy tree"""
@@ -0,0 +1,435 @@
+"""
+Background job queue for long-running operations
+
+DBF imports, unit and UUID migrations, Excel imports and bulk posting run
+as jobs on a worker thread pool instead of inside a request or the Qt
+thread. A job type is a function registered with register_job_type():
+
+    def run_import(job: JobContext, file_path: str) -> dict:
+        ...
+        job.progress(done, total, "Importing lines")
+        return {'estimate_id': ...}
+
+job.progress() is what the existing progress_callback hooks are wired to:
+it publishes a progress event and raises JobCancelled once the job was
+cancelled, so long loops stop at their next progress update.
+
+Job state lives in background_jobs, so the job list and results survive
+restarts and are visible to every process. Progress is written there at
+most every PROGRESS_PERSIST_INTERVAL seconds, which is also when a
+cancellation requested through another process is noticed. Events are
+delivered in-process to subscribe()rs such as the SSE endpoint
+(api/endpoints/jobs.py).
+"""
+import asyncio
+import atexit
+import configparser
+import inspect
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ..data.repositories.background_job_repository import BackgroundJobRepository, FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+PROGRESS_PERSIST_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.progress() once the job was cancelled"""
+
+
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    title: str
+    func: Callable[..., Any]
+    admin_only: bool = True
+    # Accepted parameter names and their types (a tuple for alternatives)
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    # False: only started by the server itself, never through POST /jobs
+    submittable: bool = True
+
+    def validate(self, parameters: Dict[str, Any]) -> None:
+        """Check parameters against the declared ones
+
+        Raises:
+            ValueError: Unknown, missing or mistyped parameter
+        """
+        unknown = sorted(set(parameters) - set(self.parameters))
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(unknown)}")
+
+        signature = list(inspect.signature(self.func).parameters.values())[1:]
+        missing = [p.name for p in signature if p.default is inspect.Parameter.empty and p.name not in parameters]
+        if missing:
+            raise ValueError(f"Missing parameters for {self.name}: {', '.join(missing)}")
+
+        for name, value in parameters.items():
+            types = self.parameters[name]
+            types = types if isinstance(types, tuple) else (types,)
+            # bool is an int subclass: only accept it where bool is declared
+            if isinstance(value, bool) and bool not in types or not isinstance(value, types):
+                raise ValueError(f"Invalid value for {self.name} parameter {name}: {value!r}")
+
+
+_job_types: Dict[str, JobType] = {}
+
+
+def register_job_type(name: str, title: str, func: Callable[..., Any], admin_only: bool = True,
+                      parameters: Optional[Dict[str, Any]] = None, submittable: bool = True) -> None:
+    """Register the function run for jobs of a type (called as func(job, **parameters))"""
+    _job_types[name] = JobType(name, title, func, admin_only, parameters or {}, submittable)
+
+
+def get_job_type(name: str) -> Optional[JobType]:
+    _load_default_job_types()
+    return _job_types.get(name)
+
+
+def get_job_types() -> List[JobType]:
+    _load_default_job_types()
+    return list(_job_types.values())
+
+
+def _load_default_job_types() -> None:
+    # Registers the built-in job types on first use
+    from . import job_types  # noqa: F401
+
+
+def current_owner() -> str:
+    """Owner recorded on jobs run by this process (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_is_gone(owner: Optional[str]) -> bool:
+    """Whether the process that ran a job has ended
+
+    Jobs of other hosts are never considered gone: their process may
+    still be running against the shared database.
+    """
+    if not owner:
+        return True
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    return int(pid) != os.getpid() and not _process_alive(int(pid))
+
+
+class JobContext:
+    """Handle given to a running job function"""
+
+    def __init__(self, job_queue: 'JobQueue', job_id: str):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.current = 0
+        self.total: Optional[int] = None
+        self.message: Optional[str] = None
+        self._persisted_at = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job_queue.is_cancelled(self.job_id)
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, current: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Report progress; raises JobCancelled if the job was cancelled"""
+        self.current = current
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+        now = time.monotonic()
+        if now - self._persisted_at >= PROGRESS_PERSIST_INTERVAL or (self.total and current >= self.total):
+            self._persisted_at = now
+            if self.job_queue.repository.update_progress(self.job_id, self.current, self.total, self.message):
+                self.job_queue.mark_cancelled(self.job_id)
+
+        self.job_queue.publish({
+            'job_id': self.job_id,
+            'status': 'running',
+            'current': self.current,
+            'total': self.total,
+            'percent': _percent(self.current, self.total),
+            'message': self.message,
+        })
+        self.check_cancelled()
+
+    def percent_callback(self) -> Callable[[str, int], None]:
+        """Adapter for progress_callback(message, percent) hooks (DBFImporter)"""
+        return lambda message, percent: self.progress(int(percent), 100, message)
+
+    def count_callback(self, message: Optional[str] = None) -> Callable[[int, int], None]:
+        """Adapter for progress_callback(current, total) hooks"""
+        return lambda current, total: self.progress(current, total, message)
+
+
+def _percent(current: int, total: Optional[int]) -> Optional[float]:
+    if not total:
+        return None
+    return round(min(current, total) * 100.0 / total, 1)
+
+
+def job_event(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress event for a stored job"""
+    event = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'current': job['current'],
+        'total': job['total'],
+        'percent': _percent(job['current'], job['total']),
+        'message': job['message'],
+    }
+    if job['status'] in FINISHED_STATUSES:
+        event.update(result=job['result'], error=job['error'])
+    return event
+
+
+class JobSubscription:
+    """Events of one job (or of every job when job_id is None)
+
+    Subscriptions made with an event loop deliver to an asyncio queue read
+    with get_async(), so async consumers hold no thread while waiting.
+    """
+
+    def __init__(self, job_queue: 'JobQueue', job_id: Optional[str],
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.loop = loop
+        self.events = asyncio.Queue() if loop is not None else queue.Queue()
+
+    def put(self, event: Dict[str, Any]) -> None:
+        if self.loop is None:
+            self.events.put(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+        except RuntimeError:
+            # The consumer's event loop is closed
+            self.close()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, None when none arrived within timeout"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def get_async(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event of a subscription made with a loop, None on timeout"""
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.job_queue.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JobQueue:
+    """Runs registered job types on a thread pool and tracks them in background_jobs"""
+
+    def __init__(self, repository: Optional[BackgroundJobRepository] = None, max_workers: int = DEFAULT_WORKERS):
+        self.repository = repository or BackgroundJobRepository()
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._cancelled: set = set()
+        self._subscriptions: List[JobSubscription] = []
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job-worker')
+            return self._executor
+
+    def submit(self, job_type: str, parameters: Optional[Dict[str, Any]] = None,
+               created_by: Optional[int] = None) -> Dict[str, Any]:
+        """Queue a job and return its stored state
+
+        Raises:
+            ValueError: Unknown job type
+        """
+        registered = get_job_type(job_type)
+        if registered is None:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job_id = str(uuid.uuid4())
+        parameters = parameters or {}
+        registered.validate(parameters)
+        job = self.repository.create(job_id, job_type, parameters, created_by, owner=current_owner())
+        self._get_executor().submit(self._run, job_id, registered, parameters)
+        self.publish(job_event(job))
+        logger.info(f"Queued {job_type} job {job_id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.repository.get(job_id)
+
+    def list(self, limit: int = 50, created_by: Optional[int] = None,
+             status: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.repository.list(limit, created_by, status)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; False if the job is unknown or already finished"""
+        if not self.repository.request_cancel(job_id):
+            return False
+        self.mark_cancelled(job_id)
+        return True
+
+    def mark_cancelled(self, job_id: str) -> None:
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    def subscribe(self, job_id: Optional[str] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> JobSubscription:
+        subscription = JobSubscription(self, job_id, loop)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.job_id is None or subscription.job_id == event['job_id']:
+                subscription.put(event)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job finished (or timeout) and return its stored state"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.subscribe(job_id) as subscription:
+            while True:
+                job = self.repository.get(job_id)
+                if job is None or job['status'] in FINISHED_STATUSES:
+                    return job
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return job
+                subscription.get(timeout=min(remaining, 1.0) if remaining is not None else 1.0)
+
+    def recover_interrupted(self) -> int:
+        """Fail jobs a previous process on this host left queued or running"""
+        count = self.repository.fail_interrupted(owner_is_gone)
+        if count:
+            logger.warning(f"Marked {count} interrupted background jobs as failed")
+        return count
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel running jobs and stop the workers"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        for job in self.repository.list(limit=1000, status='running'):
+            self.cancel(job['id'])
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id: str, job_type: JobType, parameters: Dict[str, Any]) -> None:
+        if not self.repository.mark_running(job_id):
+            self._finish(job_id, 'cancelled', message="Cancelled before start")
+            return
+
+        self.publish({'job_id': job_id, 'status': 'running', 'current': 0, 'total': None,
+                      'percent': None, 'message': job_type.title})
+        context = JobContext(self, job_id)
+        try:
+            result = job_type.func(context, **parameters)
+        except JobCancelled:
+            self._finish(job_id, 'cancelled', message=context.message)
+        except Exception as e:
+            logger.error(f"{job_type.name} job {job_id} failed: {e}", exc_info=True)
+            self._finish(job_id, 'failed', error=str(e), message=context.message)
+        else:
+            self._finish(job_id, 'succeeded', result=result, message=context.message)
+
+    def _finish(self, job_id: str, status: str, result: Any = None,
+                error: Optional[str] = None, message: Optional[str] = None) -> None:
+        try:
+            self.repository.finish(job_id, status, result, error, message)
+        except Exception as e:
+            logger.error(f"Failed to store the outcome of job {job_id}: {e}")
+        with self._lock:
+            self._cancelled.discard(job_id)
+        job = self.repository.get(job_id)
+        if job is not None:
+            self.publish(job_event(job))
+        logger.info(f"Job {job_id} {status}")
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(config_path: str = 'env.ini') -> JobQueue:
+    """Return the process-wide job queue configured from [Jobs]"""
+    global _job_queue
+
+    with _job_queue_lock:
+        if _job_queue is None:
+            config = configparser.ConfigParser()
+            if os.path.exists(config_path):
+                config.read(config_path, encoding='utf-8')
+            section = config['Jobs'] if config.has_section('Jobs') else {}
+
+            _job_queue = JobQueue(max_workers=int(section.get('workers', DEFAULT_WORKERS)))
+            atexit.register(shutdown_job_queue)
+        return _job_queue
+
+
+def shutdown_job_queue() -> None:
+    """Cancel running jobs and stop the process-wide queue, if it was started"""
+    global _job_queue
+
+    with _job_queue_lock:
+        job_queue, _job_queue = _job_queue, None
+    if job_queue is not None:
+        job_queue.shutdown(wait=False)
@@ -0,0 +1,159 @@
+"""
+Built-in background job types
+
+Each function runs on a job worker thread as func(job, **parameters) and
+returns a JSON-serialisable result. Services are imported lazily so the
+queue can be started without pulling in every importer.
+"""
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from .job_queue import JobContext, register_job_type
+
+DBF_IMPORTER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'dbf_importer')
+
+# Files uploaded for jobs; the only files a job may delete
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'construction_job_uploads')
+
+
+def upload_directory() -> str:
+    """Directory the server saves uploaded job files to"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    return UPLOAD_DIR
+
+
+def _is_upload(file_path: str) -> bool:
+    upload_dir = os.path.realpath(UPLOAD_DIR)
+    return os.path.dirname(os.path.realpath(file_path)) == upload_dir
+
+
+def run_dbf_import(job: JobContext, dbf_directory: str, clear_existing: bool = False,
+                   limit: Optional[int] = None, delta: bool = False) -> Dict[str, Any]:
+    # The importer resolves its own config package relative to dbf_importer/
+    if DBF_IMPORTER_DIR not in sys.path:
+        sys.path.insert(0, DBF_IMPORTER_DIR)
+    from core.importer import DBFImporter
+
+    importer = DBFImporter(progress_callback=job.percent_callback())
+    # Read in this process: a spawn process pool has no place inside the API server,
+    # the pool is for the standalone importer
+    results = importer.import_all_entities(dbf_directory, clear_existing=clear_existing, limit=limit,
+                                           max_workers=0, delta=delta)
+    job.check_cancelled()
+    # Rows written, deleted and skipped as unchanged per entity
+    return {'results': results, 'rows': importer.import_stats}
+
+
+def run_unit_migration(job: JobContext, batch_size: int = 100) -> Dict[str, Any]:
+    from ..data.database_manager import DatabaseManager
+    from .migration_workflow_service import MigrationWorkflowService
+
+    service = MigrationWorkflowService(DatabaseManager())
+    result = service.execute_full_migration(batch_size, progress_callback=job.count_callback("Migrating work units"))
+    return {
+        'batches_executed': result['batches_executed'],
+        'total_works_processed': result['total_works_processed'],
+        'final_statistics': result['final_statistics'],
+        'total_processing_time_seconds': result['total_processing_time_seconds'],
+    }
+
+
+def run_uuid_migration(job: JobContext) -> Dict[str, Any]:
+    from ..data.database_manager import DatabaseManager
+    from .uuid_migration_service import UUIDMigrationService
+
+    result = UUIDMigrationService(DatabaseManager()).perform_full_uuid_migration(progress_callback=job.progress)
+    # The migration reports a cancellation raised from its callback as an error and stops
+    job.check_cancelled()
+    job.progress(4, 4, "UUID migration finished")
+    return {
+        'overall_success': result['overall_success'],
+        'phases_completed': result['phases_completed'],
+        'errors': result['errors'],
+    }
+
+
+def run_estimate_excel_import(job: JobContext, file_path: str) -> Dict[str, Any]:
+    from ..data.repositories.estimate_repository import EstimateRepository
+    from .excel_import_service import ExcelImportService
+
+    try:
+        job.progress(0, 2, "Reading Excel file")
+        estimate, message = ExcelImportService().import_estimate(file_path)
+        if not estimate:
+            raise ValueError(message or "Не удалось импортировать смету")
+
+        job.progress(1, 2, "Saving estimate")
+        if not EstimateRepository().save(estimate):
+            raise RuntimeError("Не удалось сохранить смету")
+        job.progress(2, 2, "Смета успешно импортирована")
+        return {'estimate_id': estimate.id, 'number': estimate.number, 'lines': len(estimate.lines)}
+    finally:
+        # Only uploads saved by POST /documents/estimates/import-excel are removed
+        if _is_upload(file_path) and os.path.exists(file_path):
+            os.unlink(file_path)
+
+
+DOCUMENT_LABELS = {
+    'estimates': "Смета",
+    'daily-reports': "Ежедневный отчет",
+    'timesheets': "Табель",
+}
+
+
+def _posting_action(document_type: str, unpost: bool):
+    if document_type == 'timesheets':
+        from .timesheet_posting_service import TimesheetPostingService
+        service = TimesheetPostingService()
+        return service.unpost_timesheet if unpost else service.post_timesheet
+
+    from .document_posting_service import DocumentPostingService
+    service = DocumentPostingService()
+    if document_type == 'estimates':
+        return service.unpost_estimate if unpost else service.post_estimate
+    return service.unpost_daily_report if unpost else service.post_daily_report
+
+
+def _run_bulk_posting(job: JobContext, document_type: str, ids: List[int], unpost: bool) -> Dict[str, Any]:
+    if document_type not in DOCUMENT_LABELS:
+        raise ValueError(f"Unknown document type: {document_type}")
+
+    action = _posting_action(document_type, unpost)
+    label = DOCUMENT_LABELS[document_type]
+    processed = 0
+    errors = []
+    for index, document_id in enumerate(ids):
+        success, error = action(document_id)
+        if success:
+            processed += 1
+        else:
+            errors.append(f"{label} ID {document_id}: {error}")
+        job.progress(index + 1, len(ids))
+
+    verb = "Отменено проведение документов" if unpost else "Проведено документов"
+    return {'processed_count': processed, 'errors': errors, 'message': f"{verb}: {processed}"}
+
+
+def run_bulk_post(job: JobContext, document_type: str, ids: List[int]) -> Dict[str, Any]:
+    return _run_bulk_posting(job, document_type, ids, unpost=False)
+
+
+def run_bulk_unpost(job: JobContext, document_type: str, ids: List[int]) -> Dict[str, Any]:
+    return _run_bulk_posting(job, document_type, ids, unpost=True)
+
+
+BULK_POSTING_PARAMETERS = {'document_type': str, 'ids': list}
+
+register_job_type('dbf_import', "DBF import", run_dbf_import, parameters={
+    'dbf_directory': str, 'clear_existing': bool, 'limit': (int, type(None)), 'delta': bool,
+})
+register_job_type('unit_migration', "Unit migration", run_unit_migration, parameters={'batch_size': int})
+register_job_type('uuid_migration', "UUID migration", run_uuid_migration)
+# Started only by the upload endpoint, which saves the file itself
+register_job_type('estimate_excel_import', "Estimate Excel import", run_estimate_excel_import,
+                  admin_only=False, parameters={'file_path': str}, submittable=False)
+register_job_type('bulk_post', "Bulk posting", run_bulk_post, parameters=BULK_POSTING_PARAMETERS)
+register_job_type('bulk_unpost', "Bulk unposting", run_bulk_unpost, parameters=BULK_POSTING_PARAMETERS)
@@ -0,0 +1,347 @@
+"""
+Material Requirements
+
+Explodes estimate lines (or the work reported in daily reports) into the
+materials, cost items, labor and other components needed to perform them.
+Building this per work through the composition endpoint costs one request
+and several joins per line; here the line quantities of the whole selection
+are summed per work and multiplied by the consumption rates of every
+component in a single aggregating SELECT:
+
+    requirement = SUM(line quantity) per work * rate per unit of work
+
+Rates come from work_specifications. Works without an active specification
+fall back to their cost_item_materials composition (materials by
+quantity_per_unit, cost items once per unit of work with their labor
+coefficient), so a work migrated to specifications is never counted twice.
+Daily reports contribute actual_labor, the executed quantity that posting
+writes to the work execution register.
+
+Results are cached per selection and labelled with the change counters of
+the tables they were built from; a cached explosion is served until one of
+those tables is written.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import csv
+import io
+import logging
+import tempfile
+import threading
+
+from ..data.repositories import change_counter_repository
+from ..data.repositories.sql_connection import database_key, execute
+
+logger = logging.getLogger(__name__)
+
+# Result groups by component type; unknown specification types go to 'other'
+COMPONENT_GROUPS: Dict[str, str] = {
+    'Material': 'materials',
+    'CostItem': 'cost_items',
+    'Labor': 'labor',
+    'Equipment': 'other',
+    'Other': 'other',
+}
+GROUPS = ('materials', 'cost_items', 'labor', 'other')
+
+# Tables an explosion reads besides the document lines
+RATE_COUNTERS = ('work_specifications', 'cost_item_materials', 'materials', 'cost_items', 'units')
+SOURCE_COUNTERS: Dict[str, Tuple[str, ...]] = {
+    'estimates': ('estimate_lines',) + RATE_COUNTERS,
+    'daily_reports': ('daily_reports', 'daily_report_lines') + RATE_COUNTERS,
+}
+
+# (key, header) of exported columns
+EXPORT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('component_type', 'Тип'),
+    ('code', 'Код'),
+    ('name', 'Наименование'),
+    ('unit', 'Ед. изм.'),
+    ('quantity', 'Количество'),
+    ('unit_price', 'Цена'),
+    ('amount', 'Сумма'),
+    ('labor', 'Трудозатраты'),
+)
+
+DEFAULT_CACHE_ENTRIES = 64
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+_EXPLOSION_SQL = """
+    WITH line_quantities AS (
+        {line_quantities}
+    ),
+    specified_works AS (
+        SELECT DISTINCT work_id FROM work_specifications
+        WHERE COALESCE(marked_for_deletion, :no) = :no
+    ),
+    components AS (
+        SELECT
+            s.component_type AS component_type,
+            s.material_id AS material_id,
+            NULL AS cost_item_id,
+            m.code AS code,
+            COALESCE(m.description, s.component_name) AS name,
+            u.name AS unit,
+            s.consumption_rate * q.quantity AS quantity,
+            s.consumption_rate * q.quantity * s.unit_price AS amount,
+            0 AS labor
+        FROM line_quantities q
+        JOIN work_specifications s ON s.work_id = q.work_id
+        LEFT JOIN materials m ON m.id = s.material_id
+        LEFT JOIN units u ON u.id = s.unit_id
+        WHERE COALESCE(s.marked_for_deletion, :no) = :no
+
+        UNION ALL
+
+        SELECT
+            CASE WHEN cim.material_id IS NULL THEN 'CostItem' ELSE 'Material' END,
+            cim.material_id,
+            CASE WHEN cim.material_id IS NULL THEN cim.cost_item_id END,
+            COALESCE(m.code, ci.code),
+            COALESCE(m.description, ci.description),
+            CASE WHEN cim.material_id IS NULL
+                 THEN COALESCE(ciu.name, ci.unit) ELSE COALESCE(mu.name, m.unit) END,
+            CASE WHEN cim.material_id IS NULL
+                 THEN q.quantity ELSE COALESCE(cim.quantity_per_unit, 0) * q.quantity END,
+            CASE WHEN cim.material_id IS NULL
+                 THEN COALESCE(ci.price, 0) * q.quantity
+                 ELSE COALESCE(cim.quantity_per_unit, 0) * q.quantity * COALESCE(m.price, 0) END,
+            CASE WHEN cim.material_id IS NULL
+                 THEN COALESCE(ci.labor_coefficient, 0) * q.quantity ELSE 0 END
+        FROM line_quantities q
+        JOIN cost_item_materials cim ON cim.work_id = q.work_id
+        LEFT JOIN cost_items ci ON ci.id = cim.cost_item_id
+        LEFT JOIN units ciu ON ciu.id = ci.unit_id
+        LEFT JOIN materials m ON m.id = cim.material_id
+        LEFT JOIN units mu ON mu.id = m.unit_id
+        WHERE q.work_id NOT IN (SELECT work_id FROM specified_works)
+    )
+    SELECT
+        component_type,
+        material_id,
+        cost_item_id,
+        MAX(code) AS code,
+        MAX(name) AS name,
+        unit,
+        SUM(quantity) AS quantity,
+        SUM(amount) AS amount,
+        SUM(labor) AS labor
+    FROM components
+    GROUP BY
+        component_type, material_id, cost_item_id,
+        CASE WHEN material_id IS NULL AND cost_item_id IS NULL THEN name END,
+        unit
+    ORDER BY component_type, name
+"""
+
+_ESTIMATE_QUANTITIES_SQL = """
+        SELECT el.work_id AS work_id, SUM(COALESCE(el.quantity, 0)) AS quantity
+        FROM estimate_lines el
+        WHERE el.estimate_id IN ({ids})
+          AND el.work_id IS NOT NULL
+          AND COALESCE(el.is_group, :no) = :no
+        GROUP BY el.work_id
+"""
+
+_DAILY_REPORT_QUANTITIES_SQL = """
+        SELECT drl.work_id AS work_id, SUM(COALESCE(drl.actual_labor, 0)) AS quantity
+        FROM daily_report_lines drl
+        JOIN daily_reports dr ON dr.id = drl.daily_report_id
+        WHERE dr.date >= :date_from AND dr.date <= :date_to
+          AND COALESCE(dr.marked_for_deletion, :no) = :no
+          {estimate_filter}
+          AND drl.work_id IS NOT NULL
+          AND COALESCE(drl.is_group, :no) = :no
+        GROUP BY drl.work_id
+"""
+
+
+@dataclass(frozen=True)
+class RequirementSource:
+    """Documents whose lines are exploded"""
+    kind: str
+    estimate_ids: Tuple[int, ...] = ()
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    estimate_id: Optional[int] = None
+
+    @classmethod
+    def estimates(cls, estimate_ids: Iterable[int]) -> 'RequirementSource':
+        return cls('estimates', estimate_ids=tuple(sorted(set(estimate_ids))))
+
+    @classmethod
+    def daily_reports(cls, date_from: date, date_to: date,
+                      estimate_id: Optional[int] = None) -> 'RequirementSource':
+        return cls('daily_reports', date_from=date_from, date_to=date_to, estimate_id=estimate_id)
+
+
+def _explosion_query(source: RequirementSource) -> Tuple[str, dict]:
+    params = {'no': False}
+    if source.kind == 'estimates':
+        names = [f'e{i}' for i in range(len(source.estimate_ids))]
+        params.update(zip(names, source.estimate_ids))
+        line_quantities = _ESTIMATE_QUANTITIES_SQL.format(ids=', '.join(f':{name}' for name in names))
+    elif source.kind == 'daily_reports':
+        params['date_from'] = source.date_from.isoformat()
+        params['date_to'] = source.date_to.isoformat()
+        estimate_filter = ''
+        if source.estimate_id is not None:
+            estimate_filter = 'AND dr.estimate_id = :estimate_id'
+            params['estimate_id'] = source.estimate_id
+        line_quantities = _DAILY_REPORT_QUANTITIES_SQL.format(estimate_filter=estimate_filter)
+    else:
+        raise ValueError(f"Unknown requirement source: {source.kind}")
+    return _EXPLOSION_SQL.format(line_quantities=line_quantities), params
+
+
+def explode(connection, source: RequirementSource) -> Dict[str, object]:
+    """
+    Compute the requirements of a selection without caching
+
+    Args:
+        connection: sqlite3 connection, SQLAlchemy connection or session
+        source: Estimates or daily report period to explode
+
+    Returns:
+        {'materials', 'cost_items', 'labor', 'other': [requirement dicts],
+         'totals': {'<group>_amount', 'amount', 'labor'}}
+    """
+    result: Dict[str, object] = {group: [] for group in GROUPS}
+    totals = {f'{group}_amount': 0.0 for group in GROUPS}
+    totals['labor'] = 0.0
+
+    if source.kind != 'estimates' or source.estimate_ids:
+        sql, params = _explosion_query(source)
+        rows = execute(connection, sql, params).fetchall()
+        for row in rows:
+            (component_type, material_id, cost_item_id, code, name, unit,
+             quantity, amount, labor) = tuple(row)
+            quantity, amount, labor = float(quantity or 0), float(amount or 0), float(labor or 0)
+            group = COMPONENT_GROUPS.get(component_type, 'other')
+            result[group].append({
+                'component_type': component_type,
+                'material_id': material_id,
+                'cost_item_id': cost_item_id,
+                'code': code,
+                'name': name,
+                'unit': unit,
+                'quantity': quantity,
+                'unit_price': amount / quantity if quantity else 0.0,
+                'amount': amount,
+                'labor': labor,
+            })
+            totals[f'{group}_amount'] += amount
+            totals['labor'] += labor
+
+    totals['amount'] = sum(totals[f'{group}_amount'] for group in GROUPS)
+    result['totals'] = totals
+    return result
+
+
+class MaterialRequirementsCache:
+    """Explosions per database and selection, recomputed when a source table changes"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, RequirementSource], Tuple[Dict[str, int], dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, connection, source: RequirementSource) -> Dict[str, object]:
+        """
+        Return the requirements of a selection, from cache when still current
+
+        The returned dict is shared with the cache and must not be modified.
+        """
+        try:
+            versions = change_counter_repository.get_versions(connection)
+        except Exception as e:
+            logger.debug(f"Change counters unavailable, material requirements are not cached: {e}")
+            versions = {}
+        counters = SOURCE_COUNTERS[source.kind]
+        current = {counter: versions[counter] for counter in counters if counter in versions}
+        cacheable = len(current) == len(counters)
+
+        key = (database_key(connection), source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and cacheable and entry[0] == current:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # Labelled with the versions read before computing, see ReferenceSnapshotCache
+        requirements = explode(connection, source)
+        self.loads += 1
+        if cacheable:
+            with self._lock:
+                self._entries[key] = (current, requirements)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return requirements
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = MaterialRequirementsCache()
+
+
+def get_material_requirements_cache() -> MaterialRequirementsCache:
+    """Return the process-wide requirements cache"""
+    return _cache
+
+
+def get_material_requirements(connection, source: RequirementSource) -> Dict[str, object]:
+    """Return the (cached) requirements of estimates or a daily report period"""
+    return _cache.get(connection, source)
+
+
+def _export_rows(requirements: Dict[str, object]) -> Iterator[list]:
+    for group in GROUPS:
+        for requirement in requirements[group]:
+            yield [requirement[key] for key, _ in EXPORT_COLUMNS]
+
+
+def iter_csv(requirements: Dict[str, object]) -> Iterator[bytes]:
+    """Stream the requirements as semicolon-separated CSV readable by Excel"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    # UTF-8 BOM so that Excel detects the encoding
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in _export_rows(requirements):
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_xlsx(requirements: Dict[str, object]) -> Iterator[bytes]:
+    """Stream the requirements as an XLSX workbook written in write-only mode"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Потребность')
+    sheet.append([header for _, header in EXPORT_COLUMNS])
+    for row in _export_rows(requirements):
+        sheet.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
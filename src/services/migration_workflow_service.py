@@ -5,7 +5,7 @@ including batch processing, progress tracking, and status reporting.
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
@@ -166,8 +166,12 @@ class MigrationWorkflowService:
                 'batch_completed_at': batch_end_time.isoformat()
             }
     
-    def execute_full_migration(self, batch_size: int = 100) -> Dict[str, Any]:
-        """Execute complete migration process in batches"""
+    def execute_full_migration(self, batch_size: int = 100,
+                               progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Execute complete migration process in batches
+
+        progress_callback(processed, total) is called after every batch.
+        """
         migration_start_time = datetime.now()
         
         # Create migration plan
@@ -193,6 +197,8 @@ class MigrationWorkflowService:
             batch_number += 1
             
             self.logger.info(f"Completed batch {batch_number}, processed {total_processed} works")
+            if progress_callback:
+                progress_callback(total_processed, plan['analysis']['total_works_needing_migration'])
         
         migration_end_time = datetime.now()
         total_time = (migration_end_time - migration_start_time).total_seconds()
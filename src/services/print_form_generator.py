@@ -3,27 +3,28 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from io import BytesIO
-from typing import List, Tuple, Any
+from typing import List, Optional, Tuple, Any
+import threading
+import zipfile
 
 
-class PrintFormGenerator:
-    """Base class for generating print forms using ReportLab"""
+class FontStyleRegistry:
+    """Process-wide fonts, paragraph styles and table styles for print forms
     
-    def __init__(self, orientation='portrait'):
-        """Initialize print form generator
-        
-        Args:
-            orientation: 'portrait' or 'landscape'
-        """
-        self.orientation = orientation
-        self.page_size = landscape(A4) if orientation == 'landscape' else A4
-        self.page_width, self.page_height = self.page_size
-        # Reduced margins for landscape to maximize table width
-        self.margin = 10 * mm if orientation == 'landscape' else 20 * mm
+    TTF files are parsed and styles are built once per process, on first use
+    or through warm_up_print_forms() at application startup, and then shared
+    by every PrintFormGenerator. The shared stylesheet must not be modified.
+    """
+    
+    _instance: Optional['FontStyleRegistry'] = None
+    _lock = threading.Lock()
+    
+    def __init__(self):
+        """Register fonts and build the shared styles"""
         self.styles = getSampleStyleSheet()
         
         # Register fonts with Cyrillic support
@@ -31,6 +32,45 @@ class PrintFormGenerator:
         
         # Create custom styles
         self._create_custom_styles()
+        
+        # Table styles reused by every table without custom commands
+        self.default_table_commands = (
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), self.font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('FONTNAME', (0, 1), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        )
+        self.default_table_style = TableStyle(list(self.default_table_commands))
+        self.info_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), self.font_name_bold),
+            ('FONTNAME', (1, 0), (1, -1), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ])
+    
+    @classmethod
+    def get(cls) -> 'FontStyleRegistry':
+        """Get the registry, initializing it on first use"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
     
     def _register_fonts(self):
         """Register fonts with Cyrillic support"""
@@ -129,6 +169,104 @@ class PrintFormGenerator:
             fontName=self.font_name,
             fontSize=8
         ))
+
+
+def warm_up_print_forms() -> 'FontStyleRegistry':
+    """Register fonts and styles ahead of the first print request"""
+    return FontStyleRegistry.get()
+
+
+class PrintFormGenerator:
+    """Base class for generating print forms using ReportLab"""
+    
+    # File name prefix of documents in a batch zip archive
+    BATCH_FILE_PREFIX = 'document'
+    
+    def __init__(self, orientation='portrait'):
+        """Initialize print form generator
+        
+        Args:
+            orientation: 'portrait' or 'landscape'
+        """
+        self.orientation = orientation
+        self.page_size = landscape(A4) if orientation == 'landscape' else A4
+        self.page_width, self.page_height = self.page_size
+        # Reduced margins for landscape to maximize table width
+        self.margin = 10 * mm if orientation == 'landscape' else 20 * mm
+        
+        # Fonts and styles are shared by all generators of the process
+        self._registry = FontStyleRegistry.get()
+        self.font_name = self._registry.font_name
+        self.font_name_bold = self._registry.font_name_bold
+        self.styles = self._registry.styles
+    
+    def build_elements(self, document_id: int) -> Optional[List[Any]]:
+        """
+        Build the flowables of one document
+        
+        Args:
+            document_id: ID of the document
+            
+        Returns:
+            List of ReportLab flowables or None if the document was not found
+        """
+        raise NotImplementedError
+    
+    def generate(self, document_id: int) -> Optional[bytes]:
+        """
+        Generate the print form of one document
+        
+        Args:
+            document_id: ID of the document
+            
+        Returns:
+            PDF content as bytes or None if the document was not found
+        """
+        elements = self.build_elements(document_id)
+        if elements is None:
+            return None
+        return self.create_pdf(elements)
+    
+    def generate_batch(self, document_ids: List[int], output_format: str = 'pdf') -> Optional[bytes]:
+        """
+        Generate print forms of several documents at once
+        
+        Args:
+            document_ids: IDs of the documents, in output order
+            output_format: 'pdf' for one PDF with a page break between documents,
+                           'zip' for an archive with one PDF per document
+            
+        Returns:
+            PDF or zip content as bytes, None if none of the documents was found
+        """
+        if output_format not in ('pdf', 'zip'):
+            raise ValueError(f"Unsupported batch format: {output_format}")
+        
+        if output_format == 'zip':
+            buffer = BytesIO()
+            documents_count = 0
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for document_id in document_ids:
+                    elements = self.build_elements(document_id)
+                    if elements is None:
+                        continue
+                    archive.writestr(
+                        f"{self.BATCH_FILE_PREFIX}_{document_id}.pdf",
+                        self.create_pdf(elements)
+                    )
+                    documents_count += 1
+            return buffer.getvalue() if documents_count else None
+        
+        elements = []
+        for document_id in document_ids:
+            document_elements = self.build_elements(document_id)
+            if document_elements is None:
+                continue
+            if elements:
+                elements.append(PageBreak())
+            elements.extend(document_elements)
+        
+        return self.create_pdf(elements) if elements else None
     
     def create_pdf(self, elements: List[Any]) -> bytes:
         """
@@ -220,27 +358,13 @@ class PrintFormGenerator:
         Returns:
             Formatted Table object
         """
-        # Default table style
-        default_style = [
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), self.font_name_bold),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 1), (-1, -1), self.font_name),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]
+        table = Table(data, colWidths=col_widths)
         
-        # Add custom style if provided
+        # Default table style, extended with the custom style if provided
         if style:
-            default_style.extend(style)
-        
-        table = Table(data, colWidths=col_widths)
-        table.setStyle(TableStyle(default_style))
+            table.setStyle(TableStyle(list(self._registry.default_table_commands) + list(style)))
+        else:
+            table.setStyle(self._registry.default_table_style)
         
         return table
     
@@ -278,23 +402,8 @@ class PrintFormGenerator:
         """
         table_data = [[label, value] for label, value in data]
         
-        style = [
-            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), self.font_name_bold),
-            ('FONTNAME', (1, 0), (1, -1), self.font_name),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]
-        
         col_widths = [80 * mm, 100 * mm]
         table = Table(table_data, colWidths=col_widths)
-        table.setStyle(TableStyle(style))
+        table.setStyle(self._registry.info_table_style)
         
         return table
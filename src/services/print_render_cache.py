@@ -0,0 +1,439 @@
+"""
+Print Render Cache
+
+Content-addressed disk cache of rendered print forms (PDF/Excel).
+
+The cache key combines the document type and ID, a hash of the exact rows the
+print form reads (document header, lines and the joined reference names), the
+output format and the modification time of the generator modules and Excel
+template. Any edit of the document, its lines or the template therefore
+produces a new key, so entries never need explicit invalidation; old versions
+simply age out through size-bounded LRU eviction.
+
+Rendering runs in a process pool so that large PDFs don't block the API event
+loop. Identical concurrent requests share one render. The worker reads the
+document itself, so the document is hashed again after rendering and the file
+is only cached when the hash did not change in between.
+"""
+
+import asyncio
+import configparser
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = 'print_cache'
+DEFAULT_CACHE_MAX_SIZE_MB = 256
+DEFAULT_RENDER_WORKERS = 2
+
+# Eviction frees space down to this fraction of the size limit
+EVICTION_TARGET_RATIO = 0.9
+
+CACHE_FILE_SUFFIX = '.bin'
+
+# (document type, format) -> "module:Class" of the print form generator;
+# strings keep the spec picklable for the render worker processes
+PRINT_FORM_RENDERERS: Dict[Tuple[str, str], str] = {
+    ('estimate', 'pdf'): 'src.services.estimate_print_form:EstimatePrintForm',
+    ('estimate', 'excel'): 'src.services.excel_estimate_print_form:ExcelEstimatePrintForm',
+    ('daily_report', 'pdf'): 'src.services.daily_report_print_form:DailyReportPrintForm',
+    ('daily_report', 'excel'): 'src.services.excel_daily_report_print_form:ExcelDailyReportPrintForm',
+}
+
+# Queries returning everything a print form reads for one document
+DOCUMENT_VERSION_QUERIES: Dict[str, List[str]] = {
+    'estimate': [
+        """
+        SELECT e.*, c.name, o.name, org.name, p.full_name
+        FROM estimates e
+        LEFT JOIN counterparties c ON e.customer_id = c.id
+        LEFT JOIN objects o ON e.object_id = o.id
+        LEFT JOIN organizations org ON e.contractor_id = org.id
+        LEFT JOIN persons p ON e.responsible_id = p.id
+        WHERE e.id = ?
+        """,
+        """
+        SELECT el.*, w.name, w.code
+        FROM estimate_lines el
+        LEFT JOIN works w ON el.work_id = w.id
+        WHERE el.estimate_id = ?
+        ORDER BY el.line_number, el.id
+        """,
+    ],
+    'daily_report': [
+        """
+        SELECT dr.*, e.number, e.date, o.name, p.full_name
+        FROM daily_reports dr
+        LEFT JOIN estimates e ON dr.estimate_id = e.id
+        LEFT JOIN objects o ON e.object_id = o.id
+        LEFT JOIN persons p ON dr.foreman_id = p.id
+        WHERE dr.id = ?
+        """,
+        """
+        SELECT drl.*, w.name
+        FROM daily_report_lines drl
+        LEFT JOIN works w ON drl.work_id = w.id
+        WHERE drl.daily_report_id = ?
+        ORDER BY drl.line_number, drl.id
+        """,
+        """
+        SELECT dre.report_line_id, p.full_name
+        FROM daily_report_executors dre
+        JOIN daily_report_lines drl ON dre.report_line_id = drl.id
+        JOIN persons p ON dre.executor_id = p.id
+        WHERE drl.daily_report_id = ?
+        ORDER BY dre.report_line_id, p.full_name
+        """,
+    ],
+}
+
+
+def _load_renderer_class(renderer_spec: str):
+    module_name, class_name = renderer_spec.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def compute_document_hash(connection, document_type: str, document_id: int) -> str:
+    """Hash the rows a print form of the document is built from"""
+    digest = hashlib.sha256()
+    cursor = connection.cursor()
+    for query in DOCUMENT_VERSION_QUERIES[document_type]:
+        cursor.execute(query, (document_id,))
+        for row in cursor.fetchall():
+            digest.update(repr(tuple(row)).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def compute_template_fingerprint(renderer_spec: str) -> List[float]:
+    """Modification times of the generator modules and the Excel template"""
+    renderer_class = _load_renderer_class(renderer_spec)
+    package = renderer_spec.split('.')[0]
+    mtimes = []
+
+    for cls in renderer_class.__mro__:
+        module = sys.modules.get(cls.__module__)
+        module_file = getattr(module, '__file__', None)
+        if module_file and cls.__module__.split('.')[0] == package:
+            mtimes.append(os.path.getmtime(module_file))
+
+    template_name = getattr(renderer_class, 'TEMPLATE_NAME', None)
+    if template_name:
+        template_path = os.path.join(renderer_class._get_templates_path(), template_name)
+        mtimes.append(os.path.getmtime(template_path) if os.path.exists(template_path) else 0.0)
+
+    return mtimes
+
+
+def build_cache_key(document_type: str, document_id: int, document_hash: str,
+                    output_format: str, template_fingerprint: List[float]) -> str:
+    """Build the content-addressed key of a rendered print form"""
+    key_data = [document_type, document_id, document_hash, output_format, template_fingerprint]
+    return hashlib.sha256(json.dumps(key_data).encode('utf-8')).hexdigest()
+
+
+class PrintRenderCache:
+    """Size-bounded LRU cache of rendered files on local disk
+
+    Recency is tracked through file modification times (touched on every hit),
+    so several API processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_size = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached content or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        """Store content, evicting least recently used files over the size limit"""
+        if len(content) > self.max_size_bytes:
+            return
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._total_size += len(content)
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._scan())
+        total_size = sum(size for _, size, _ in entries)
+        target_size = self.max_size_bytes * EVICTION_TARGET_RATIO
+
+        for _, size, path in entries:
+            if total_size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+        self._total_size = total_size
+        logger.debug(f"Print render cache evicted down to {total_size} bytes")
+
+    def clear(self) -> None:
+        """Remove all cached files"""
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._total_size = 0
+
+
+def _init_render_worker(db_source: Optional[str]) -> None:
+    """Register print fonts and open the database once per render worker process"""
+    from src.services.print_form_generator import warm_up_print_forms
+    warm_up_print_forms()
+
+    if db_source is None:
+        return
+    from src.data.database_manager import DatabaseManager
+    DatabaseManager().initialize(db_source)
+
+
+def render_print_form(renderer_spec: str, document_id: int) -> Optional[bytes]:
+    """Render a print form (runs inside a worker process)"""
+    renderer = _load_renderer_class(renderer_spec)()
+    return renderer.generate(document_id)
+
+
+def render_print_form_batch(renderer_spec: str, document_ids: List[int],
+                            output_format: str) -> Optional[bytes]:
+    """Render several documents into one PDF or zip (runs inside a worker process)"""
+    renderer = _load_renderer_class(renderer_spec)()
+    return renderer.generate_batch(document_ids, output_format)
+
+
+class PrintRenderService:
+    """Renders print forms through the disk cache and a process pool"""
+
+    def __init__(
+        self,
+        cache: PrintRenderCache,
+        db_source: Optional[str] = None,
+        max_workers: int = DEFAULT_RENDER_WORKERS,
+        renderers: Optional[Dict[Tuple[str, str], str]] = None
+    ):
+        """
+        Args:
+            cache: Disk cache of rendered files
+            db_source: env.ini or database path the worker processes initialize from
+            max_workers: Render processes; 0 renders in a thread of this process
+            renderers: Override of PRINT_FORM_RENDERERS
+        """
+        self.cache = cache
+        self.db_source = db_source
+        self.max_workers = max_workers
+        self.renderers = renderers or PRINT_FORM_RENDERERS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the API's open database connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_render_worker,
+                    initargs=(self.db_source,)
+                )
+            return self._executor
+
+    def get_cache_key(self, connection, document_type: str, document_id: int,
+                      output_format: str) -> str:
+        """Compute the cache key of the current version of a document"""
+        renderer_spec = self.renderers[(document_type, output_format)]
+        return build_cache_key(
+            document_type,
+            document_id,
+            compute_document_hash(connection, document_type, document_id),
+            output_format,
+            compute_template_fingerprint(renderer_spec)
+        )
+
+    async def render(self, connection, document_type: str, document_id: int,
+                     output_format: str) -> Optional[bytes]:
+        """
+        Return the rendered print form, from cache when the document is unchanged
+
+        Args:
+            connection: sqlite3 connection used to fingerprint the document
+            document_type: 'estimate' or 'daily_report'
+            document_id: Document ID
+            output_format: 'pdf' or 'excel'
+
+        Returns:
+            File content or None if the generator produced nothing
+        """
+        key = await asyncio.to_thread(
+            self.get_cache_key, connection, document_type, document_id, output_format
+        )
+
+        content = self.cache.get(key)
+        if content is not None:
+            logger.debug(f"Print render cache hit: {document_type} {document_id} {output_format}")
+            return content
+
+        task = self._in_flight.get(key)
+        if task is None:
+            renderer_spec = self.renderers[(document_type, output_format)]
+            task = asyncio.ensure_future(self._render_and_store(
+                key, renderer_spec, connection, document_type, document_id, output_format
+            ))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def render_batch(self, document_type: str, document_ids: List[int],
+                           output_format: str = 'pdf') -> Optional[bytes]:
+        """
+        Render several documents into one PDF or a zip of PDFs
+
+        Batches are not cached; the documents share one generator, so fonts,
+        styles and table styles are set up once.
+
+        Args:
+            document_type: 'estimate' or 'daily_report'
+            document_ids: Document IDs in output order
+            output_format: 'pdf' or 'zip'
+
+        Returns:
+            File content or None if none of the documents was found
+        """
+        renderer_spec = self.renderers[(document_type, 'pdf')]
+        return await self._run_in_worker(
+            render_print_form_batch, renderer_spec, list(document_ids), output_format
+        )
+
+    async def _render_and_store(self, key: str, renderer_spec: str, connection,
+                                document_type: str, document_id: int,
+                                output_format: str) -> Optional[bytes]:
+        content = await self._run_in_worker(render_print_form, renderer_spec, document_id)
+        if not content:
+            return content
+
+        # The document may have been edited while the worker was reading it;
+        # the content then matches neither version and must not be cached
+        rendered_key = await asyncio.to_thread(
+            self.get_cache_key, connection, document_type, document_id, output_format
+        )
+        if rendered_key == key:
+            await asyncio.to_thread(self.cache.put, key, content)
+        else:
+            logger.debug(f"Document changed while rendering, not caching: {document_type} {document_id}")
+        return content
+
+    async def _run_in_worker(self, func, *args):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+
+        if executor is not None:
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                logger.warning("Print render pool is broken, rendering in-process")
+                self._reset_executor(executor)
+
+        return await asyncio.to_thread(func, *args)
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """Stop the render worker processes"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_service: Optional[PrintRenderService] = None
+_service_lock = threading.Lock()
+
+
+def get_print_render_service(db_source: Optional[str] = None,
+                             config_path: str = 'env.ini') -> PrintRenderService:
+    """Return the process-wide render service configured from [PrintForms]"""
+    global _service
+
+    with _service_lock:
+        if _service is None:
+            config = configparser.ConfigParser()
+            if os.path.exists(config_path):
+                config.read(config_path, encoding='utf-8')
+            section = config['PrintForms'] if config.has_section('PrintForms') else {}
+
+            cache = PrintRenderCache(
+                section.get('cache_path', DEFAULT_CACHE_PATH),
+                int(section.get('cache_max_size_mb', DEFAULT_CACHE_MAX_SIZE_MB)) * 1024 * 1024
+            )
+            _service = PrintRenderService(
+                cache,
+                db_source=db_source,
+                max_workers=int(section.get('render_workers', DEFAULT_RENDER_WORKERS))
+            )
+        return _service
+
+
+def shutdown_print_render_service() -> None:
+    """Stop the process-wide render service, if it was started"""
+    global _service
+
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.shutdown()
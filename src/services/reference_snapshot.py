@@ -0,0 +1,172 @@
+"""
+Reference Data Snapshots
+
+Small reference tables (units, persons, objects, organizations and
+counterparties) are read far more often than they change: every document
+view needs their display names and every picker lists them. A snapshot holds
+all rows of one table in memory together with the version of the table's
+change counter it was loaded at.
+
+Before a snapshot is served the counters are read again (one SELECT of the
+small change_counters table); the table is only reloaded when its counter
+has moved. Counters are bumped by SQLite triggers in the writing transaction,
+or by ORM flushes on other backends, so snapshots stay current across API
+workers and the desktop client without explicit invalidation.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import threading
+import logging
+
+from ..data.repositories import change_counter_repository
+from ..data.repositories.sql_connection import database_key, execute, is_sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+# Snapshot table -> display name column
+SNAPSHOT_TABLES: Dict[str, str] = {
+    'units': 'name',
+    'persons': 'full_name',
+    'objects': 'name',
+    'organizations': 'name',
+    'counterparties': 'name',
+}
+
+
+class ReferenceSnapshot:
+    """All rows of one reference table as of a change counter version"""
+
+    def __init__(self, table: str, version: Optional[int], rows: Iterable[dict]):
+        self.table = table
+        self.version = version
+        self.name_column = SNAPSHOT_TABLES[table]
+        self.rows: Dict[int, dict] = {row['id']: row for row in rows}
+        self._parent_ids: Optional[Set[int]] = None
+
+    def get(self, item_id: Optional[int]) -> Optional[dict]:
+        return self.rows.get(item_id) if item_id is not None else None
+
+    def name(self, item_id: Optional[int]) -> Optional[str]:
+        """Display name of a row (deleted rows included), None if unknown"""
+        row = self.get(item_id)
+        return row[self.name_column] if row else None
+
+    def active_rows(self) -> List[dict]:
+        """Rows not marked for deletion, ordered by display name"""
+        return sorted(
+            (row for row in self.rows.values() if not row.get('marked_for_deletion')),
+            key=lambda row: row[self.name_column] or ''
+        )
+
+    def parent_ids(self) -> Set[int]:
+        """Ids of rows that have at least one active child"""
+        if self._parent_ids is None:
+            self._parent_ids = {
+                row['parent_id'] for row in self.rows.values()
+                if row.get('parent_id') and not row.get('marked_for_deletion')
+            }
+        return self._parent_ids
+
+
+def _fetch_dicts(connection, sql: str) -> List[dict]:
+    if is_sqlalchemy(connection):
+        return [dict(row) for row in execute(connection, sql).mappings()]
+    cursor = connection.execute(sql)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _read_versions(connection) -> Dict[str, int]:
+    try:
+        return change_counter_repository.get_versions(connection)
+    except Exception as e:
+        # Databases without change_counters simply aren't cached
+        logger.debug(f"Change counters unavailable, reference snapshots are not cached: {e}")
+        return {}
+
+
+class ReferenceSnapshotCache:
+    """Snapshots per database and table, reloaded when the counter moves"""
+
+    def __init__(self):
+        self._snapshots: Dict[Tuple[str, str], ReferenceSnapshot] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get_many(self, connection, tables: Iterable[str]) -> Dict[str, ReferenceSnapshot]:
+        """
+        Return current snapshots of the given tables
+
+        Args:
+            connection: sqlite3 connection, SQLAlchemy connection or session
+            tables: Names from SNAPSHOT_TABLES
+
+        Returns:
+            {table: ReferenceSnapshot}
+        """
+        tables = list(dict.fromkeys(tables))
+        unknown = [table for table in tables if table not in SNAPSHOT_TABLES]
+        if unknown:
+            raise ValueError(f"Not a snapshot table: {', '.join(unknown)}")
+
+        database = database_key(connection)
+        versions = _read_versions(connection)
+        result = {}
+        for table in tables:
+            version = versions.get(table)
+            key = (database, table)
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+            if snapshot is None or version is None or snapshot.version != version:
+                # Labelled with the version read before loading: a concurrent
+                # write makes the next call reload rather than miss the change
+                snapshot = ReferenceSnapshot(table, version, _fetch_dicts(connection, f"SELECT * FROM {table}"))
+                self.loads += 1
+                if version is not None:
+                    with self._lock:
+                        self._snapshots[key] = snapshot
+            result[table] = snapshot
+        return result
+
+    def get(self, connection, table: str) -> ReferenceSnapshot:
+        return self.get_many(connection, [table])[table]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+
+_cache = ReferenceSnapshotCache()
+
+
+def get_reference_snapshot_cache() -> ReferenceSnapshotCache:
+    """Return the process-wide snapshot cache"""
+    return _cache
+
+
+def get_reference_snapshot(connection, table: str) -> ReferenceSnapshot:
+    """Return the current snapshot of one reference table"""
+    return _cache.get(connection, table)
+
+
+def attach_reference_names(connection, rows: List[dict], fields: Dict[str, Tuple[str, str]]) -> List[dict]:
+    """
+    Add display names of referenced rows in place
+
+    Args:
+        connection: Database connection the rows were read from
+        rows: Row dicts, e.g. documents
+        fields: {id column: (snapshot table, name key to add)}, for example
+            {'foreman_id': ('persons', 'foreman_name')}
+
+    Returns:
+        The same rows
+    """
+    if not rows:
+        return rows
+    snapshots = _cache.get_many(connection, {table for table, _ in fields.values()})
+    for row in rows:
+        for id_column, (table, name_key) in fields.items():
+            row[name_key] = snapshots[table].name(row.get(id_column))
+    return rows
+
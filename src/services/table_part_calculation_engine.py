@@ -4,11 +4,16 @@ Automatic calculation engine for document table parts.
 This module provides real-time calculation capabilities for table parts,
 including automatic sum calculations (Quantity × Price) and document totals
 with performance monitoring and error handling.
+
+Row rules are compiled into a column dependency graph so an edit only
+re-evaluates the columns downstream of the changed one, and document totals
+are kept as running aggregates updated from (old value, new value) deltas.
 """
 
 import time
 import logging
-from typing import Dict, List, Optional, Any, Callable, Union
+from collections import Counter, deque
+from typing import Dict, List, Optional, Any, Callable, Union, Iterable
 from dataclasses import dataclass, field
 from enum import Enum
 from PyQt6.QtCore import QObject, pyqtSignal, QTimer
@@ -52,6 +57,7 @@ class CalculationResult:
     error: Optional[str] = None
     execution_time_ms: float = 0.0
     rule_id: Optional[str] = None
+    updated_values: Dict[str, Any] = field(default_factory=dict)  # target column -> value
 
 
 @dataclass
@@ -76,13 +82,62 @@ class PerformanceMetrics:
     last_calculation_timestamp: Optional[float] = None
 
 
+class _ColumnAggregate:
+    """Running aggregate of the numeric values of one column"""
+    
+    __slots__ = ('total', 'count', 'values', '_min', '_max')
+    
+    def __init__(self):
+        self.total = Decimal('0')
+        self.count = 0
+        self.values: Counter = Counter()
+        self._min: Optional[Decimal] = None
+        self._max: Optional[Decimal] = None
+    
+    def add(self, value: Decimal):
+        self.total += value
+        self.count += 1
+        self.values[value] += 1
+        if self._min is not None and value < self._min:
+            self._min = value
+        if self._max is not None and value > self._max:
+            self._max = value
+    
+    def remove(self, value: Decimal):
+        remaining = self.values.get(value, 0)
+        if not remaining:
+            return
+        self.total -= value
+        self.count -= 1
+        if remaining == 1:
+            del self.values[value]
+            # Extremes are recomputed lazily only when the extreme itself leaves
+            if value == self._min:
+                self._min = None
+            if value == self._max:
+                self._max = None
+        else:
+            self.values[value] = remaining - 1
+    
+    def minimum(self) -> Optional[Decimal]:
+        if self._min is None and self.values:
+            self._min = min(self.values)
+        return self._min
+    
+    def maximum(self) -> Optional[Decimal]:
+        if self._max is None and self.values:
+            self._max = max(self.values)
+        return self._max
+
+
 class TablePartCalculationEngine(QObject):
     """
     Automatic calculation engine for table parts.
     
     Provides real-time calculations with performance monitoring:
-    - Individual field calculations (< 100ms target)
-    - Document total calculations (< 200ms target)
+    - Individual field calculations (< 100ms target), limited to the columns
+      downstream of the edited one through a compiled dependency graph
+    - Document total calculations (< 200ms target), maintained incrementally
     - Error handling and recovery
     - Performance metrics tracking
     """
@@ -105,6 +160,14 @@ class TablePartCalculationEngine(QObject):
         self.calculation_rules: Dict[str, CalculationRule] = {}
         self.total_rules: Dict[str, TotalCalculationRule] = {}
         
+        # Compiled dependency graph (built lazily, reset when rules change)
+        self._trigger_index: Optional[Dict[str, List[CalculationRule]]] = None
+        self._rule_order: Dict[str, int] = {}
+        self._cascade_cache: Dict[str, List[CalculationRule]] = {}
+        
+        # Running aggregates of the columns referenced by total rules
+        self._aggregates: Dict[str, _ColumnAggregate] = {}
+        
         # Performance tracking
         self.metrics = PerformanceMetrics()
         self.calculation_history: List[float] = []
@@ -149,17 +212,20 @@ class TablePartCalculationEngine(QObject):
     def add_calculation_rule(self, rule: CalculationRule):
         """Add a calculation rule to the engine"""
         self.calculation_rules[rule.id] = rule
+        self._invalidate_dependency_graph()
         logger.debug(f"Added calculation rule: {rule.id}")
     
     def remove_calculation_rule(self, rule_id: str):
         """Remove a calculation rule from the engine"""
         if rule_id in self.calculation_rules:
             del self.calculation_rules[rule_id]
+            self._invalidate_dependency_graph()
             logger.debug(f"Removed calculation rule: {rule_id}")
     
     def add_total_rule(self, rule_id: str, rule: TotalCalculationRule):
         """Add a total calculation rule"""
         self.total_rules[rule_id] = rule
+        self._aggregates.setdefault(rule.column, _ColumnAggregate())
         logger.debug(f"Added total rule: {rule_id}")
     
     def remove_total_rule(self, rule_id: str):
@@ -173,6 +239,11 @@ class TablePartCalculationEngine(QObject):
         """
         Calculate a single field value based on calculation rules.
         
+        Every rule downstream of the changed column is evaluated once, in
+        dependency order, so chained rules (e.g. sum -> sum with VAT) update
+        in a single call. All written values are reported in updated_values
+        of the returned result.
+        
         Args:
             row_data: Data for the current row
             column: Column that was changed (trigger column)
@@ -184,8 +255,8 @@ class TablePartCalculationEngine(QObject):
         start_time = time.perf_counter()
         
         try:
-            # Find applicable calculation rules
-            applicable_rules = self._find_applicable_rules(column)
+            # Find the rules downstream of the changed column
+            applicable_rules = self._get_downstream_rules(column)
             
             if not applicable_rules:
                 return CalculationResult(
@@ -196,6 +267,7 @@ class TablePartCalculationEngine(QObject):
             # Execute calculations for each applicable rule
             results = []
             failed_results = []
+            updated_values = {}
             
             for rule in applicable_rules:
                 if not rule.enabled:
@@ -205,6 +277,7 @@ class TablePartCalculationEngine(QObject):
                 if result.success and result.value is not None:
                     # Update row data with calculated value
                     row_data[rule.target_column] = result.value
+                    updated_values[rule.target_column] = result.value
                     results.append(result)
                 elif not result.success:
                     logger.warning(f"Calculation failed for rule {rule.id}: {result.error}")
@@ -226,11 +299,13 @@ class TablePartCalculationEngine(QObject):
                 # Return first successful calculation
                 primary_result = results[0]
                 primary_result.execution_time_ms = execution_time
+                primary_result.updated_values = updated_values
                 return primary_result
             elif failed_results:
                 # Return first failed calculation
                 primary_result = failed_results[0]
                 primary_result.execution_time_ms = execution_time
+                primary_result.updated_values = updated_values
                 return primary_result
             else:
                 # No applicable rules, return success
@@ -250,10 +325,25 @@ class TablePartCalculationEngine(QObject):
                 execution_time_ms=execution_time
             )
     
+    def needs_table_data(self, column: str) -> bool:
+        """
+        Check whether recalculating after a change of column needs all rows.
+        
+        Only custom and aggregate rules look beyond the current row, so for
+        plain row rules callers can skip collecting the table data.
+        """
+        return any(
+            rule.enabled and rule.calculation_type != CalculationType.MULTIPLY
+            for rule in self._get_downstream_rules(column)
+        )
+    
     def calculate_totals(self, all_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Calculate document totals based on all table data.
         
+        Rebuilds the running aggregates in a single pass over the rows; later
+        edits can then be applied with apply_row_delta/apply_total_delta.
+        
         Args:
             all_data: All rows of table data
             
@@ -261,32 +351,113 @@ class TablePartCalculationEngine(QObject):
             Dictionary with calculated totals
         """
         start_time = time.perf_counter()
-        totals = {}
         
         try:
-            for rule_id, rule in self.total_rules.items():
-                if not rule.enabled:
-                    continue
-                
-                try:
-                    total_value = self._calculate_total_for_rule(rule, all_data)
-                    if total_value is not None:
-                        # Apply formatting if specified
-                        if rule.format_function:
-                            formatted_value = rule.format_function(total_value)
-                        else:
-                            formatted_value = self._format_decimal(total_value, rule.precision)
-                        
-                        totals[rule.column] = {
-                            'value': total_value,
-                            'formatted': formatted_value,
-                            'rule_id': rule_id
-                        }
-                        
-                except Exception as e:
-                    error_msg = f"Total calculation failed for {rule_id}: {str(e)}"
-                    logger.error(error_msg)
-                    self.calculationError.emit("total_calculation_error", error_msg)
+            self._rebuild_aggregates(all_data)
+            return self._finish_totals(start_time)
+            
+        except Exception as e:
+            execution_time = (time.perf_counter() - start_time) * 1000
+            error_msg = f"Total calculation engine error: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            self.calculationError.emit("total_calculation_error", error_msg)
+            return {}
+    
+    def recalculate_all(self, all_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Recalculate every row and the document totals in bulk.
+        
+        Intended for paste and import: all enabled rules are applied to each
+        row in dependency order (rows are updated in place), then totals are
+        rebuilt in the same pass instead of once per edited cell.
+        
+        Args:
+            all_data: All rows of table data
+            
+        Returns:
+            Dictionary with calculated totals
+        """
+        start_time = time.perf_counter()
+        
+        rules = [rule for rule in self._get_all_rules_in_order() if rule.enabled]
+        error_count = 0
+        first_error = None
+        
+        self._rebuild_aggregates([])
+        
+        for row_data in all_data:
+            for rule in rules:
+                result = self._execute_calculation_rule(rule, row_data, all_data)
+                if result.success and result.value is not None:
+                    row_data[rule.target_column] = result.value
+                elif not result.success:
+                    error_count += 1
+                    first_error = first_error or result.error
+            self._add_row_to_aggregates(row_data)
+        
+        if error_count:
+            logger.warning(f"Bulk recalculation: {error_count} calculation errors, first: {first_error}")
+            self.calculationError.emit(
+                "calculation_error",
+                f"{error_count} calculation errors, first: {first_error}"
+            )
+        
+        return self._finish_totals(start_time)
+    
+    def apply_total_delta(self, column: str, old_value: Any, new_value: Any) -> bool:
+        """
+        Update the running totals of a column after a single value change.
+        
+        Args:
+            column: Column whose value changed
+            old_value: Value before the change (None for a new row)
+            new_value: Value after the change (None for a deleted row)
+            
+        Returns:
+            True if the column takes part in totals
+        """
+        aggregate = self._aggregates.get(column)
+        if aggregate is None:
+            return False
+        
+        old_decimal = self._to_decimal(old_value)
+        new_decimal = self._to_decimal(new_value)
+        if old_decimal == new_decimal:
+            return True
+        
+        if old_decimal is not None:
+            aggregate.remove(old_decimal)
+        if new_decimal is not None:
+            aggregate.add(new_decimal)
+        return True
+    
+    def apply_row_delta(self, old_row: Optional[Dict[str, Any]],
+                        new_row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Update running totals for an edited, inserted (old_row=None) or
+        deleted (new_row=None) row and return the new totals.
+        """
+        start_time = time.perf_counter()
+        
+        for column in self._aggregates:
+            old_value = old_row.get(column) if old_row else None
+            new_value = new_row.get(column) if new_row else None
+            self.apply_total_delta(column, old_value, new_value)
+        
+        return self._finish_totals(start_time)
+    
+    def snapshot_row(self, row_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy the values of a row that contribute to totals"""
+        return {column: row_data.get(column) for column in self._aggregates}
+    
+    def get_running_totals(self) -> Dict[str, Any]:
+        """Get totals from the running aggregates without touching row data"""
+        return self._build_totals()
+    
+    def _finish_totals(self, start_time: float) -> Dict[str, Any]:
+        """Build totals, record metrics and notify listeners"""
+        try:
+            totals = self._build_totals()
             
             execution_time = (time.perf_counter() - start_time) * 1000
             
@@ -312,21 +483,106 @@ class TablePartCalculationEngine(QObject):
     
     def _find_applicable_rules(self, changed_column: str) -> List[CalculationRule]:
         """Find calculation rules that should be triggered by a column change"""
-        applicable_rules = []
+        if self._trigger_index is None:
+            self._compile_dependency_graph()
+        return self._trigger_index.get(changed_column, [])
+    
+    def _invalidate_dependency_graph(self):
+        """Drop the compiled graph; it is rebuilt on next use"""
+        self._trigger_index = None
+        self._cascade_cache.clear()
+    
+    def _compile_dependency_graph(self):
+        """Index rules by the columns that trigger them"""
+        trigger_index: Dict[str, List[CalculationRule]] = {}
         
         for rule in self.calculation_rules.values():
             if not rule.trigger_on_change:
                 continue
-                
-            # Check if the changed column is a source column for this rule
-            if changed_column in rule.source_columns:
-                applicable_rules.append(rule)
-            
-            # Check dependencies
-            if changed_column in rule.dependencies:
-                applicable_rules.append(rule)
+            for column in dict.fromkeys(rule.source_columns + rule.dependencies):
+                trigger_index.setdefault(column, []).append(rule)
         
-        return applicable_rules
+        self._trigger_index = trigger_index
+        self._rule_order = {rule_id: i for i, rule_id in enumerate(self.calculation_rules)}
+        self._cascade_cache.clear()
+    
+    def _get_downstream_rules(self, changed_column: str) -> List[CalculationRule]:
+        """
+        Rules affected by a column change, transitively, in dependency order.
+        
+        A rule runs after every other affected rule that writes one of its
+        inputs; rules caught in a cycle run once, in registration order.
+        """
+        cached = self._cascade_cache.get(changed_column)
+        if cached is not None:
+            return cached
+        
+        if self._trigger_index is None:
+            self._compile_dependency_graph()
+        
+        # Collect every rule reachable from the changed column
+        affected: Dict[str, CalculationRule] = {}
+        queue = deque([changed_column])
+        seen_columns = {changed_column}
+        while queue:
+            column = queue.popleft()
+            for rule in self._trigger_index.get(column, []):
+                if rule.id in affected:
+                    continue
+                affected[rule.id] = rule
+                if rule.target_column not in seen_columns:
+                    seen_columns.add(rule.target_column)
+                    queue.append(rule.target_column)
+        
+        ordered = self._order_rules(list(affected.values()))
+        self._cascade_cache[changed_column] = ordered
+        return ordered
+    
+    def _get_all_rules_in_order(self) -> List[CalculationRule]:
+        """All rules in dependency order (used for bulk recalculation)"""
+        if self._trigger_index is None:
+            self._compile_dependency_graph()
+        return self._order_rules(list(self.calculation_rules.values()))
+    
+    def _order_rules(self, rules: List[CalculationRule]) -> List[CalculationRule]:
+        """Topologically sort rules so producers run before consumers"""
+        writers: Dict[str, List[str]] = {}
+        for rule in rules:
+            writers.setdefault(rule.target_column, []).append(rule.id)
+        
+        by_id = {rule.id: rule for rule in rules}
+        pending_inputs = {rule.id: 0 for rule in rules}
+        consumers: Dict[str, List[str]] = {rule.id: [] for rule in rules}
+        for rule in rules:
+            for column in dict.fromkeys(rule.source_columns + rule.dependencies):
+                for writer_id in writers.get(column, []):
+                    if writer_id != rule.id:
+                        consumers[writer_id].append(rule.id)
+                        pending_inputs[rule.id] += 1
+        
+        def registration_key(rule_id: str) -> int:
+            return self._rule_order.get(rule_id, len(self._rule_order))
+        
+        ready = sorted((rule_id for rule_id, count in pending_inputs.items() if count == 0),
+                       key=registration_key)
+        ordered: List[CalculationRule] = []
+        while ready:
+            rule_id = ready.pop(0)
+            ordered.append(by_id[rule_id])
+            for consumer_id in consumers[rule_id]:
+                pending_inputs[consumer_id] -= 1
+                if pending_inputs[consumer_id] == 0:
+                    ready.append(consumer_id)
+            ready.sort(key=registration_key)
+        
+        if len(ordered) < len(rules):
+            ordered_ids = {rule.id for rule in ordered}
+            cyclic = sorted((rule_id for rule_id in by_id if rule_id not in ordered_ids),
+                            key=registration_key)
+            logger.warning(f"Circular dependency between calculation rules: {', '.join(cyclic)}")
+            ordered.extend(by_id[rule_id] for rule_id in cyclic)
+        
+        return ordered
     
     def _execute_calculation_rule(self, rule: CalculationRule, row_data: Dict[str, Any], 
                                  all_data: Optional[List[Dict[str, Any]]]) -> CalculationResult:
@@ -434,38 +690,82 @@ class TablePartCalculationEngine(QObject):
                 rule_id=rule.id
             )
     
-    def _calculate_total_for_rule(self, rule: TotalCalculationRule, 
-                                 all_data: List[Dict[str, Any]]) -> Optional[Decimal]:
-        """Calculate total for a specific rule"""
-        if not all_data:
-            return Decimal('0')
+    def _to_decimal(self, value: Any) -> Optional[Decimal]:
+        """Convert a cell value to Decimal; None for empty or invalid values"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value))
+        except (InvalidOperation, ValueError):
+            return None
+    
+    def _rebuild_aggregates(self, all_data: Iterable[Dict[str, Any]]):
+        """Recompute running aggregates from scratch in one pass"""
+        self._aggregates = {rule.column: _ColumnAggregate() for rule in self.total_rules.values()}
+        for row_data in all_data:
+            self._add_row_to_aggregates(row_data)
+    
+    def _add_row_to_aggregates(self, row_data: Dict[str, Any]):
+        """Add the values of one row to the running aggregates"""
+        for column, aggregate in self._aggregates.items():
+            value = self._to_decimal(row_data.get(column))
+            if value is not None:
+                aggregate.add(value)
+    
+    def _build_totals(self) -> Dict[str, Any]:
+        """Build the totals dictionary from the running aggregates"""
+        totals = {}
         
-        values = []
-        for row in all_data:
-            value = row.get(rule.column)
-            if value is not None and value != '':
-                try:
-                    decimal_value = Decimal(str(value))
-                    values.append(decimal_value)
-                except (InvalidOperation, ValueError):
-                    # Skip invalid values
-                    continue
+        for rule_id, rule in self.total_rules.items():
+            if not rule.enabled:
+                continue
+            
+            try:
+                aggregate = self._aggregates.get(rule.column)
+                if aggregate is None:
+                    aggregate = self._aggregates[rule.column] = _ColumnAggregate()
+                total_value = self._total_from_aggregate(rule, aggregate)
+                if total_value is not None:
+                    # Apply formatting if specified
+                    if rule.format_function:
+                        formatted_value = rule.format_function(total_value)
+                    else:
+                        formatted_value = self._format_decimal(total_value, rule.precision)
+                    
+                    totals[rule.column] = {
+                        'value': total_value,
+                        'formatted': formatted_value,
+                        'rule_id': rule_id
+                    }
+                    
+            except Exception as e:
+                error_msg = f"Total calculation failed for {rule_id}: {str(e)}"
+                logger.error(error_msg)
+                self.calculationError.emit("total_calculation_error", error_msg)
         
-        if not values:
+        return totals
+    
+    def _total_from_aggregate(self, rule: TotalCalculationRule,
+                              aggregate: _ColumnAggregate) -> Optional[Decimal]:
+        """Derive a rule's total from a column aggregate"""
+        if not aggregate.count:
             return Decimal('0')
         
         if rule.calculation_type == CalculationType.SUM:
-            result = sum(values)
+            result = aggregate.total
         elif rule.calculation_type == CalculationType.AVERAGE:
-            result = sum(values) / len(values)
+            result = aggregate.total / aggregate.count
         elif rule.calculation_type == CalculationType.COUNT:
-            result = Decimal(len(values))
+            result = Decimal(aggregate.count)
         elif rule.calculation_type == CalculationType.MIN:
-            result = min(values)
+            result = aggregate.minimum()
         elif rule.calculation_type == CalculationType.MAX:
-            result = max(values)
+            result = aggregate.maximum()
         elif rule.calculation_type == CalculationType.CUSTOM and rule.custom_function:
-            result = rule.custom_function(values)
+            # Custom functions receive the values as a multiset (row order is not kept)
+            result = rule.custom_function(list(aggregate.values.elements()))
             if isinstance(result, (int, float)):
                 result = Decimal(str(result))
         else:
@@ -3,12 +3,22 @@ Table Part Memory Optimizer
 
 Manages memory usage for large table datasets in PyQt6 applications.
 Provides caching, compression, and cleanup strategies to handle large datasets efficiently.
+
+Entries are kept in an OrderedDict (plus frequency buckets for LFU) so that
+lookups and evictions are O(1), and the cache byte size is tracked
+incrementally instead of being re-summed on every change. Expiry times are
+kept in a min-heap, so purging expired entries only looks at entries that
+actually expired.
 """
 
 import json
 import gzip
+import heapq
+import itertools
 import time
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
@@ -34,6 +44,8 @@ class MemoryOptimizationOptions:
     cache_strategy: CacheStrategy = CacheStrategy.LRU
     monitoring_interval_ms: int = 5000
     compression_threshold_bytes: int = 10240  # 10KB
+    background_compression: bool = False  # Compress large entries off-thread
+    default_ttl_seconds: Optional[float] = None  # None means entries never expire
 
 
 @dataclass
@@ -45,6 +57,11 @@ class MemoryStats:
     compression_ratio: float = 0.0
     cleanup_count: int = 0
     last_cleanup: Optional[float] = None
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    hit_rate: float = 0.0
 
 
 @dataclass
@@ -58,6 +75,7 @@ class CacheEntry:
     last_accessed: float = field(default_factory=time.time)
     created: float = field(default_factory=time.time)
     is_compressed: bool = False
+    expires_at: Optional[float] = None
 
 
 class TablePartMemoryOptimizer(QObject):
@@ -65,8 +83,9 @@ class TablePartMemoryOptimizer(QObject):
     Memory optimizer for table part data.
     
     Features:
-    - Intelligent caching with configurable eviction strategies
-    - Data compression for large entries
+    - Intelligent caching with configurable eviction strategies (O(1) eviction)
+    - Per-key time-to-live
+    - Data compression for large entries, optionally on a background thread
     - Automatic cleanup when memory thresholds are exceeded
     - Performance monitoring and statistics
     """
@@ -81,9 +100,22 @@ class TablePartMemoryOptimizer(QObject):
         super().__init__()
         
         self.options = options or MemoryOptimizationOptions()
-        self.cache: Dict[str, CacheEntry] = {}
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
         self.stats = MemoryStats(max_memory_mb=self.options.max_memory_mb)
         
+        # Running totals so statistics never need a full scan
+        self._total_bytes = 0
+        self._compressed_bytes = 0
+        
+        # LFU bookkeeping: access_count -> keys in insertion order
+        self._frequency_buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_frequency = 0
+        
+        # TTL bookkeeping: (expires_at, sequence, entry); items of removed or
+        # replaced entries stay in the heap until popped or compacted
+        self._expiry_heap: List[Tuple[float, int, CacheEntry]] = []
+        self._expiry_sequence = itertools.count()
+        
         # Monitoring timer
         self.monitoring_timer = QTimer()
         self.monitoring_timer.timeout.connect(self._update_stats)
@@ -92,54 +124,62 @@ class TablePartMemoryOptimizer(QObject):
         # Compression lock for thread safety
         self._compression_lock = threading.Lock()
         
+        # Guards the cache against the background compression worker
+        self._cache_lock = threading.RLock()
+        self._compression_executor: Optional[ThreadPoolExecutor] = None
+        
         logger.info(f"Memory optimizer initialized with {self.options.max_memory_mb}MB limit")
     
-    def store(self, key: str, data: Any) -> bool:
+    def store(self, key: str, data: Any, ttl_seconds: Optional[float] = None) -> bool:
         """
         Store data in optimized cache.
         
         Args:
             key: Unique identifier for the data
             data: Data to store
+            ttl_seconds: Lifetime of the entry; defaults to options.default_ttl_seconds
             
         Returns:
             True if stored successfully, False otherwise
         """
         try:
-            # Estimate size
-            size_bytes = self._estimate_size(data)
+            # Serialize once; the payload doubles as size estimate and compression input
+            payload = self._serialize(data)
+            size_bytes = len(payload)
             
-            # Check if cleanup is needed
-            if self._should_cleanup(size_bytes):
-                self.cleanup()
+            if ttl_seconds is None:
+                ttl_seconds = self.options.default_ttl_seconds
             
             # Create cache entry
             entry = CacheEntry(
                 key=key,
                 data=data,
                 size_bytes=size_bytes,
-                access_count=1
+                access_count=1,
+                expires_at=time.time() + ttl_seconds if ttl_seconds is not None else None
             )
             
+            compress = (self.options.compression_enabled and
+                        size_bytes > self.options.compression_threshold_bytes)
+            
             # Compress if enabled and data is large enough
-            if (self.options.compression_enabled and 
-                size_bytes > self.options.compression_threshold_bytes):
+            if compress and not self.options.background_compression:
+                self._apply_compression(entry, gzip.compress(payload))
+            
+            with self._cache_lock:
+                if key in self.cache:
+                    self._remove_entry(key)
+                
+                # Check if cleanup is needed
+                if self._should_cleanup(entry.size_bytes):
+                    self.cleanup(entry.size_bytes)
                 
-                compressed_data = self._compress_data(data)
-                if compressed_data and len(compressed_data) < size_bytes:
-                    entry.compressed_data = compressed_data
-                    entry.size_bytes = len(compressed_data)
-                    entry.is_compressed = True
-                    entry.data = None  # Clear original data to save memory
-                    
-                    compression_ratio = len(compressed_data) / size_bytes
-                    self.compressionCompleted.emit(key, compression_ratio)
-                    
-                    logger.debug(f"Compressed {key}: {size_bytes} -> {len(compressed_data)} bytes "
-                               f"({compression_ratio:.2%})")
+                # Store in cache
+                self._insert_entry(entry)
+            
+            if compress and self.options.background_compression:
+                self._get_compression_executor().submit(self._compress_in_background, entry, payload)
             
-            # Store in cache
-            self.cache[key] = entry
             self._update_stats()
             
             logger.debug(f"Stored {key} ({entry.size_bytes} bytes, compressed: {entry.is_compressed})")
@@ -159,22 +199,39 @@ class TablePartMemoryOptimizer(QObject):
         Returns:
             Cached data or None if not found
         """
-        entry = self.cache.get(key)
-        if not entry:
-            return None
-        
-        try:
+        with self._cache_lock:
+            entry = self.cache.get(key)
+            expired = entry is not None and self._is_expired(entry)
+            if expired:
+                self._expire(key)
+                entry = None
+            
+            if not entry:
+                self.stats.misses += 1
+                self._update_hit_rate()
+                if expired:
+                    self._update_stats()
+                return None
+            
+            self.stats.hits += 1
+            self._update_hit_rate()
+            
             # Update access statistics
-            entry.access_count += 1
+            self._touch(entry)
             entry.last_accessed = time.time()
             
+            compressed_data = entry.compressed_data if entry.is_compressed else None
+            data = entry.data
+        
+        try:
             # Decompress if needed
-            if entry.is_compressed and entry.compressed_data:
-                if entry.data is None:
-                    entry.data = self._decompress_data(entry.compressed_data)
-                return entry.data
+            if compressed_data and data is None:
+                data = self._decompress_data(compressed_data)
+                with self._cache_lock:
+                    if self.cache.get(key) is entry:
+                        entry.data = data
             
-            return entry.data
+            return data
             
         except Exception as e:
             logger.error(f"Failed to retrieve {key}: {e}")
@@ -184,51 +241,68 @@ class TablePartMemoryOptimizer(QObject):
     
     def has(self, key: str) -> bool:
         """Check if key exists in cache"""
-        return key in self.cache
+        with self._cache_lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return False
+            if self._is_expired(entry):
+                self._expire(key)
+                self._update_stats()
+                return False
+            return True
     
     def delete(self, key: str) -> bool:
         """Remove entry from cache"""
-        if key in self.cache:
-            del self.cache[key]
-            self._update_stats()
-            logger.debug(f"Deleted {key} from cache")
-            return True
-        return False
+        with self._cache_lock:
+            if key not in self.cache:
+                return False
+            self._remove_entry(key)
+        
+        self._update_stats()
+        logger.debug(f"Deleted {key} from cache")
+        return True
     
     def clear(self):
         """Clear all cache entries"""
-        self.cache.clear()
+        with self._cache_lock:
+            self.cache.clear()
+            self._frequency_buckets.clear()
+            self._min_frequency = 0
+            self._expiry_heap.clear()
+            self._total_bytes = 0
+            self._compressed_bytes = 0
         self._update_stats()
         logger.info("Cache cleared")
     
-    def cleanup(self) -> Tuple[int, float]:
+    def cleanup(self, reserve_bytes: int = 0) -> Tuple[int, float]:
         """
         Perform cache cleanup to free memory.
         
+        Expired entries go first, then entries are evicted one at a time in
+        strategy order until usage drops below the cleanup threshold.
+        
+        Args:
+            reserve_bytes: Extra room to free for an entry about to be stored
+        
         Returns:
             Tuple of (removed_count, freed_mb)
         """
-        target_size_mb = self.options.max_memory_mb * self.options.cleanup_threshold
-        current_size_mb = self.stats.used_memory_mb
+        target_bytes = (self.options.max_memory_mb * self.options.cleanup_threshold * 1024 * 1024
+                        - reserve_bytes)
         
-        if current_size_mb <= target_size_mb:
-            return 0, 0.0
-        
-        # Get entries sorted by eviction strategy
-        entries = list(self.cache.items())
-        sorted_entries = self._sort_entries_for_cleanup(entries)
-        
-        removed_count = 0
-        freed_bytes = 0
-        
-        # Remove entries until we're under the target size
-        for key, entry in sorted_entries:
-            if current_size_mb - (freed_bytes / (1024 * 1024)) <= target_size_mb:
-                break
+        with self._cache_lock:
+            start_bytes = self._total_bytes
+            if start_bytes <= target_bytes:
+                return 0, 0.0
+            
+            removed_count = self.purge_expired()
             
-            freed_bytes += entry.size_bytes
-            removed_count += 1
-            del self.cache[key]
+            # Remove entries until we're under the target size
+            while self.cache and self._total_bytes > target_bytes:
+                self._evict_one()
+                removed_count += 1
+            
+            freed_bytes = start_bytes - self._total_bytes
         
         freed_mb = freed_bytes / (1024 * 1024)
         
@@ -243,6 +317,26 @@ class TablePartMemoryOptimizer(QObject):
         logger.info(f"Cleanup completed: removed {removed_count} entries, freed {freed_mb:.2f}MB")
         return removed_count, freed_mb
     
+    def purge_expired(self) -> int:
+        """
+        Remove all entries whose TTL has elapsed.
+        
+        Returns:
+            Number of removed entries
+        """
+        now = time.time()
+        removed_count = 0
+        with self._cache_lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                _, _, entry = heapq.heappop(heap)
+                if self.cache.get(entry.key) is entry:
+                    self._expire(entry.key)
+                    removed_count += 1
+        if removed_count:
+            self._update_stats()
+        return removed_count
+    
     def optimize_memory(self) -> Tuple[int, float]:
         """
         Optimize memory usage by compressing uncompressed entries.
@@ -256,7 +350,10 @@ class TablePartMemoryOptimizer(QObject):
         optimized_count = 0
         saved_bytes = 0
         
-        for entry in list(self.cache.values()):
+        with self._cache_lock:
+            entries = list(self.cache.values())
+        
+        for entry in entries:
             if (not entry.is_compressed and 
                 entry.data is not None and 
                 entry.size_bytes > self.options.compression_threshold_bytes):
@@ -266,17 +363,12 @@ class TablePartMemoryOptimizer(QObject):
                     if compressed_data and len(compressed_data) < entry.size_bytes:
                         original_size = entry.size_bytes
                         
-                        entry.compressed_data = compressed_data
-                        entry.size_bytes = len(compressed_data)
-                        entry.is_compressed = True
-                        entry.data = None  # Clear original data
+                        with self._cache_lock:
+                            self._apply_compression(entry, compressed_data)
                         
                         saved_bytes += (original_size - entry.size_bytes)
                         optimized_count += 1
                         
-                        compression_ratio = len(compressed_data) / original_size
-                        self.compressionCompleted.emit(entry.key, compression_ratio)
-                        
                 except Exception as e:
                     logger.warning(f"Failed to compress {entry.key}: {e}")
         
@@ -328,35 +420,55 @@ class TablePartMemoryOptimizer(QObject):
     
     def get_cache_info(self) -> Dict[str, Any]:
         """Get detailed cache information"""
-        total_size = sum(entry.size_bytes for entry in self.cache.values())
-        compressed_count = sum(1 for entry in self.cache.values() if entry.is_compressed)
+        with self._cache_lock:
+            compressed_count = sum(1 for entry in self.cache.values() if entry.is_compressed)
+            total_entries = len(self.cache)
+            total_size = self._total_bytes
         
         return {
-            'total_entries': len(self.cache),
+            'total_entries': total_entries,
             'compressed_entries': compressed_count,
             'total_size_mb': total_size / (1024 * 1024),
-            'compression_ratio': compressed_count / len(self.cache) if self.cache else 0,
+            'compression_ratio': compressed_count / total_entries if total_entries else 0,
             'cache_strategy': self.options.cache_strategy.value,
-            'max_memory_mb': self.options.max_memory_mb
+            'max_memory_mb': self.options.max_memory_mb,
+            'hits': self.stats.hits,
+            'misses': self.stats.misses,
+            'evictions': self.stats.evictions,
+            'expirations': self.stats.expirations,
+            'hit_rate': self.stats.hit_rate
         }
     
+    def wait_for_compression(self):
+        """Block until queued background compressions have finished"""
+        executor = self._compression_executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+    
     def cleanup_resources(self):
         """Cleanup resources and stop monitoring"""
         self.monitoring_timer.stop()
+        if self._compression_executor is not None:
+            self._compression_executor.shutdown(wait=True)
+            self._compression_executor = None
         self.clear()
         logger.info("Memory optimizer resources cleaned up")
     
     # Private methods
     
-    def _estimate_size(self, data: Any) -> int:
-        """Estimate size of data in bytes"""
+    def _serialize(self, data: Any) -> bytes:
+        """Serialize data to the JSON bytes used for sizing and compression"""
+        if isinstance(data, bytes):
+            return data
         try:
-            # Convert to JSON string and estimate size
-            json_str = json.dumps(data, default=str)
-            return len(json_str.encode('utf-8'))
+            return json.dumps(data, default=str).encode('utf-8')
         except Exception:
-            # Fallback estimation
-            return len(str(data).encode('utf-8'))
+            # Fallback for structures json cannot walk (e.g. circular references)
+            return str(data).encode('utf-8')
+    
+    def _estimate_size(self, data: Any) -> int:
+        """Estimate size of data in bytes"""
+        return len(self._serialize(data))
     
     def _compress_data(self, data: Any) -> Optional[bytes]:
         """Compress data using gzip"""
@@ -374,36 +486,147 @@ class TablePartMemoryOptimizer(QObject):
             json_str = gzip.decompress(compressed_data).decode('utf-8')
             return json.loads(json_str)
     
-    def _should_cleanup(self, additional_size_bytes: int = 0) -> bool:
-        """Check if cleanup is needed"""
-        projected_size_mb = (
-            self.stats.used_memory_mb + 
-            (additional_size_bytes / (1024 * 1024))
-        )
-        threshold_mb = self.options.max_memory_mb * self.options.cleanup_threshold
-        return projected_size_mb > threshold_mb
+    def _apply_compression(self, entry: CacheEntry, compressed_data: Optional[bytes]) -> bool:
+        """Replace entry data with its compressed form if that saves space"""
+        if not compressed_data or len(compressed_data) >= entry.size_bytes:
+            return False
+        
+        original_size = entry.size_bytes
+        in_cache = self.cache.get(entry.key) is entry
+        
+        entry.compressed_data = compressed_data
+        entry.size_bytes = len(compressed_data)
+        entry.is_compressed = True
+        entry.data = None  # Clear original data to save memory
+        
+        if in_cache:
+            self._total_bytes += entry.size_bytes - original_size
+            self._compressed_bytes += entry.size_bytes
+        
+        compression_ratio = len(compressed_data) / original_size
+        self.compressionCompleted.emit(entry.key, compression_ratio)
+        
+        logger.debug(f"Compressed {entry.key}: {original_size} -> {len(compressed_data)} bytes "
+                     f"({compression_ratio:.2%})")
+        return True
     
-    def _sort_entries_for_cleanup(
-        self, 
-        entries: List[Tuple[str, CacheEntry]]
-    ) -> List[Tuple[str, CacheEntry]]:
-        """Sort entries based on cache strategy"""
+    def _compress_in_background(self, entry: CacheEntry, payload: bytes):
+        """Compression job run by the background executor"""
+        try:
+            compressed_data = gzip.compress(payload)
+        except Exception as e:
+            logger.warning(f"Background compression of {entry.key} failed: {e}")
+            return
+        
+        with self._cache_lock:
+            # The entry may have been replaced or evicted in the meantime
+            if self.cache.get(entry.key) is not entry or entry.is_compressed:
+                return
+            self._apply_compression(entry, compressed_data)
+    
+    def _get_compression_executor(self) -> ThreadPoolExecutor:
+        """Create the background compression executor on first use"""
+        if self._compression_executor is None:
+            self._compression_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="table-part-compress"
+            )
+        return self._compression_executor
+    
+    def _insert_entry(self, entry: CacheEntry):
+        """Add a new entry at the most-recently-used position"""
+        self.cache[entry.key] = entry
+        self._total_bytes += entry.size_bytes
+        if entry.is_compressed:
+            self._compressed_bytes += entry.size_bytes
+        
+        if self.options.cache_strategy == CacheStrategy.LFU:
+            self._frequency_buckets.setdefault(entry.access_count, OrderedDict())[entry.key] = None
+            self._min_frequency = entry.access_count
+        
+        if entry.expires_at is not None:
+            heapq.heappush(self._expiry_heap, (entry.expires_at, next(self._expiry_sequence), entry))
+            # Drop items of entries that were deleted or evicted before expiring
+            if len(self._expiry_heap) > 2 * len(self.cache) + 64:
+                self._compact_expiry_heap()
+    
+    def _compact_expiry_heap(self):
+        """Rebuild the expiry heap from the live entries"""
+        self._expiry_heap = [
+            item for item in self._expiry_heap if self.cache.get(item[2].key) is item[2]
+        ]
+        heapq.heapify(self._expiry_heap)
+    
+    def _remove_entry(self, key: str) -> CacheEntry:
+        """Remove an entry and keep the running totals in sync"""
+        entry = self.cache.pop(key)
+        self._total_bytes -= entry.size_bytes
+        if entry.is_compressed:
+            self._compressed_bytes -= entry.size_bytes
+        
+        if self.options.cache_strategy == CacheStrategy.LFU:
+            bucket = self._frequency_buckets.get(entry.access_count)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._frequency_buckets[entry.access_count]
+        return entry
+    
+    def _touch(self, entry: CacheEntry):
+        """Record an access in the structure used by the eviction strategy"""
         if self.options.cache_strategy == CacheStrategy.LRU:
-            return sorted(entries, key=lambda x: x[1].last_accessed)
+            self.cache.move_to_end(entry.key)
+            entry.access_count += 1
         elif self.options.cache_strategy == CacheStrategy.LFU:
-            return sorted(entries, key=lambda x: x[1].access_count)
-        elif self.options.cache_strategy == CacheStrategy.FIFO:
-            return sorted(entries, key=lambda x: x[1].created)
+            bucket = self._frequency_buckets[entry.access_count]
+            del bucket[entry.key]
+            if not bucket:
+                del self._frequency_buckets[entry.access_count]
+                if self._min_frequency == entry.access_count:
+                    self._min_frequency += 1
+            entry.access_count += 1
+            self._frequency_buckets.setdefault(entry.access_count, OrderedDict())[entry.key] = None
         else:
-            return entries
+            entry.access_count += 1
+    
+    def _evict_one(self):
+        """Evict the next victim chosen by the cache strategy"""
+        if self.options.cache_strategy == CacheStrategy.LFU:
+            if self._min_frequency not in self._frequency_buckets:
+                self._min_frequency = min(self._frequency_buckets)
+            key = next(iter(self._frequency_buckets[self._min_frequency]))
+        else:
+            # LRU keeps recently used keys at the end, FIFO keeps insertion order
+            key = next(iter(self.cache))
+        
+        self._remove_entry(key)
+        self.stats.evictions += 1
+        logger.debug(f"Evicted {key} from cache")
+    
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        """Check whether an entry's TTL has elapsed"""
+        return entry.expires_at is not None and entry.expires_at <= time.time()
+    
+    def _expire(self, key: str):
+        """Remove an expired entry"""
+        self._remove_entry(key)
+        self.stats.expirations += 1
+        logger.debug(f"Expired {key} from cache")
+    
+    def _update_hit_rate(self):
+        """Recalculate the hit rate from hit and miss counters"""
+        lookups = self.stats.hits + self.stats.misses
+        self.stats.hit_rate = self.stats.hits / lookups if lookups else 0.0
+    
+    def _should_cleanup(self, additional_size_bytes: int = 0) -> bool:
+        """Check if cleanup is needed"""
+        projected_size_mb = (self._total_bytes + additional_size_bytes) / (1024 * 1024)
+        threshold_mb = self.options.max_memory_mb * self.options.cleanup_threshold
+        return projected_size_mb > threshold_mb
     
     def _update_stats(self):
         """Update memory statistics"""
-        total_size_bytes = sum(entry.size_bytes for entry in self.cache.values())
-        compressed_size_bytes = sum(
-            entry.size_bytes for entry in self.cache.values() 
-            if entry.is_compressed
-        )
+        total_size_bytes = self._total_bytes
+        compressed_size_bytes = self._compressed_bytes
         
         self.stats.used_memory_mb = total_size_bytes / (1024 * 1024)
         self.stats.cache_size = len(self.cache)
@@ -3,11 +3,14 @@ Table Part Virtualization Service
 
 Provides virtual scrolling and lazy loading for large datasets in table parts.
 Optimizes memory usage and rendering performance for tables with 1000+ rows.
+
+Pages requested while scrolling are fetched on a QThreadPool so the GUI thread
+never blocks on load_data_fn; results are delivered back through signals.
 """
 
 from typing import List, Dict, Any, Optional, Tuple, Callable
 from dataclasses import dataclass
-from PyQt6.QtCore import QObject, pyqtSignal, QTimer
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer, QRunnable, QThreadPool
 from PyQt6.QtWidgets import QTableWidget, QAbstractItemView
 import logging
 import time
@@ -25,6 +28,8 @@ class VirtualizationOptions:
     cache_size: int = 10
     enable_prefetch: bool = True
     enable_column_virtualization: bool = False
+    background_loading: bool = True
+    max_loader_threads: int = 2
 
 
 @dataclass
@@ -36,6 +41,16 @@ class PerformanceMetrics:
     total_rows: int = 0
     cache_hit_rate: float = 0.0
     average_load_time_ms: float = 0.0
+    scroll_events: int = 0
+    last_scroll_latency_ms: float = 0.0
+    average_scroll_latency_ms: float = 0.0
+    max_scroll_latency_ms: float = 0.0
+    pending_page_loads: int = 0
+    cancelled_page_loads: int = 0
+
+
+# Marker stored in placeholder rows while their page is being fetched
+PLACEHOLDER_KEY = '_placeholder'
 
 
 @dataclass
@@ -49,6 +64,46 @@ class DataPage:
     timestamp: float = 0.0
 
 
+class PageLoadSignals(QObject):
+    """Signals of a PageLoadWorker; lives on the thread that created it"""
+    finished = pyqtSignal(int, int, object, object, float, str)  # page, request_id, data, total, load_ms, error
+
+
+class PageLoadWorker(QRunnable):
+    """
+    Worker that fetches one page of data in a background thread.
+    """
+    def __init__(self,
+                 page_number: int,
+                 page_size: int,
+                 request_id: int,
+                 load_data_fn: Callable[[int, int], Tuple[List[Dict[str, Any]], int]]):
+        super().__init__()
+        self.page_number = page_number
+        self.page_size = page_size
+        self.request_id = request_id
+        self.load_data_fn = load_data_fn
+        self.signals = PageLoadSignals()
+        self.is_cancelled = False
+        # The service keeps its own reference and removes it on completion
+        self.setAutoDelete(False)
+
+    def run(self):
+        if self.is_cancelled:
+            return
+
+        start_time = time.time()
+        try:
+            data, total_count = self.load_data_fn(self.page_number, self.page_size)
+            error = ''
+        except Exception as e:
+            data, total_count = [], None
+            error = str(e) or e.__class__.__name__
+
+        load_time = (time.time() - start_time) * 1000
+        self.signals.finished.emit(self.page_number, self.request_id, data, total_count, load_time, error)
+
+
 class TablePartVirtualizationService(QObject):
     """
     Service for virtualizing table part data to handle large datasets efficiently.
@@ -58,6 +113,8 @@ class TablePartVirtualizationService(QObject):
     - Lazy loading: Loads data in pages as needed
     - Memory management: Caches limited number of pages
     - Prefetching: Preloads adjacent pages for smooth scrolling
+    - Background loading: Pages are fetched on a thread pool, duplicate
+      requests are coalesced and pages that scrolled out of view are cancelled
     """
     
     # Signals
@@ -65,6 +122,7 @@ class TablePartVirtualizationService(QObject):
     loadingStateChanged = pyqtSignal(bool)  # is_loading
     errorOccurred = pyqtSignal(str)  # error_message
     metricsUpdated = pyqtSignal(object)  # PerformanceMetrics
+    placeholdersReady = pyqtSignal(int, int, int)  # page_number, start_row, row_count
     
     def __init__(
         self,
@@ -93,7 +151,19 @@ class TablePartVirtualizationService(QObject):
         self.prefetch_timer = QTimer()
         self.prefetch_timer.setSingleShot(True)
         self.prefetch_timer.timeout.connect(self._do_prefetch)
-        self.pending_prefetch_page: Optional[int] = None
+        self.pending_prefetch_pages: List[int] = []
+        
+        # Background loading
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(max(1, self.options.max_loader_threads))
+        self._inflight: Dict[int, PageLoadWorker] = {}
+        self._next_request_id = 0
+        
+        # Scroll latency tracking
+        self._scroll_started_at: Optional[float] = None
+        self._scroll_target: Optional[Tuple[int, int]] = None
+        self.total_scroll_latency = 0.0
+        self.cancelled_loads = 0
         
         # Setup table
         self._setup_table()
@@ -115,7 +185,11 @@ class TablePartVirtualizationService(QObject):
     def _on_scroll(self, value: int):
         """Handle scroll events to load visible data"""
         visible_range = self._get_visible_range()
+        self._scroll_started_at = time.time()
+        self._scroll_target = visible_range
+        self.metrics.scroll_events += 1
         self._load_visible_range(visible_range[0], visible_range[1])
+        self._check_scroll_complete()
     
     def _get_visible_range(self) -> Tuple[int, int]:
         """Calculate the range of visible rows"""
@@ -136,16 +210,22 @@ class TablePartVirtualizationService(QObject):
         start_page = start_row // self.options.page_size
         end_page = end_row // self.options.page_size
         
+        preload_start = start_page
+        preload_end = end_page
+        if self.options.enable_prefetch:
+            preload_start = max(0, start_page - self.options.preload_pages)
+            preload_end = end_page + self.options.preload_pages
+        
+        # Drop queued loads for pages that are no longer near the viewport
+        self._cancel_stale_loads(preload_start, preload_end)
+        
         # Load current visible pages
         for page_num in range(start_page, end_page + 1):
             if not self._is_page_loaded(page_num):
-                self._load_page(page_num)
+                self._request_page(page_num)
         
         # Prefetch adjacent pages if enabled
         if self.options.enable_prefetch:
-            preload_start = max(0, start_page - self.options.preload_pages)
-            preload_end = end_page + self.options.preload_pages
-            
             for page_num in range(preload_start, preload_end + 1):
                 if page_num < start_page or page_num > end_page:
                     self._schedule_prefetch(page_num)
@@ -156,7 +236,7 @@ class TablePartVirtualizationService(QObject):
         return page is not None and page.is_loaded
     
     def _load_page(self, page_number: int):
-        """Load a specific page of data"""
+        """Load a specific page of data synchronously on the calling thread"""
         # Check if already loading or loaded
         existing_page = self.pages.get(page_number)
         if existing_page:
@@ -186,65 +266,198 @@ class TablePartVirtualizationService(QObject):
             data, total_count = self.load_data_fn(page_number, self.options.page_size)
             
             load_time = (time.time() - start_time) * 1000  # Convert to ms
-            self.total_load_time += load_time
-            
-            # Update page with loaded data
-            loaded_page = DataPage(
-                page_number=page_number,
-                data=data,
-                is_loading=False,
-                is_loaded=True,
-                timestamp=time.time()
-            )
-            self.pages[page_number] = loaded_page
-            
-            # Update total count
-            if total_count is not None:
-                self.total_count = total_count
-            
-            # Emit signals
-            self.dataLoaded.emit(page_number, data)
-            
-            # Update table display
-            self._update_table_display()
-            
-            # Cleanup old pages if cache is full
-            self._cleanup_cache()
-            
-            # Update metrics
-            self._update_metrics()
-            
-            logger.debug(f"Loaded page {page_number} with {len(data)} rows in {load_time:.2f}ms")
+            self._apply_loaded_page(page_number, data, total_count, load_time)
             
         except Exception as e:
-            logger.error(f"Failed to load page {page_number}: {e}")
-            
-            error_page = DataPage(
-                page_number=page_number,
-                data=[],
-                is_loading=False,
-                is_loaded=False,
-                error=str(e),
-                timestamp=time.time()
-            )
-            self.pages[page_number] = error_page
-            
-            self.errorOccurred.emit(str(e))
+            self._apply_failed_page(page_number, str(e))
         
         finally:
             self.loadingStateChanged.emit(False)
     
+    def _request_page(self, page_number: int):
+        """
+        Request a page without blocking the GUI thread.
+        
+        A placeholder entry is created immediately so the view can render
+        empty rows; repeated requests for a page already in flight are
+        coalesced into the existing load.
+        """
+        if not self.options.background_loading:
+            self._load_page(page_number)
+            return
+        
+        existing_page = self.pages.get(page_number)
+        if existing_page:
+            if existing_page.is_loaded:
+                self.cache_hits += 1
+                self._update_metrics()
+                return
+            if existing_page.is_loading:
+                return
+        
+        self.pages[page_number] = DataPage(
+            page_number=page_number,
+            data=[],
+            is_loading=True,
+            timestamp=time.time()
+        )
+        self.total_requests += 1
+        
+        if not self._inflight:
+            self.loadingStateChanged.emit(True)
+        
+        self._next_request_id += 1
+        worker = PageLoadWorker(
+            page_number,
+            self.options.page_size,
+            self._next_request_id,
+            self.load_data_fn
+        )
+        worker.signals.finished.connect(self._on_page_fetched)
+        self._inflight[page_number] = worker
+        self.thread_pool.start(worker)
+        
+        self.placeholdersReady.emit(
+            page_number,
+            page_number * self.options.page_size,
+            self._page_row_count(page_number)
+        )
+        self._update_table_display()
+    
+    def _on_page_fetched(self, page_number: int, request_id: int, data: Any,
+                         total_count: Any, load_time: float, error: str):
+        """Apply a page fetched by a worker (runs on the GUI thread)"""
+        worker = self._inflight.get(page_number)
+        is_current = worker is not None and worker.request_id == request_id
+        
+        if is_current:
+            del self._inflight[page_number]
+
+            if error:
+                self._apply_failed_page(page_number, error)
+            else:
+                self._apply_loaded_page(page_number, data, total_count, load_time)
+            self._check_scroll_complete()
+        else:
+            logger.debug(f"Discarded stale result for page {page_number}")
+        
+        if not self._inflight:
+            self.loadingStateChanged.emit(False)
+    
+    def _apply_loaded_page(self, page_number: int, data: List[Dict[str, Any]],
+                           total_count: Optional[int], load_time: float):
+        """Store a successfully loaded page and refresh the view"""
+        self.total_load_time += load_time
+        
+        # Update page with loaded data
+        loaded_page = DataPage(
+            page_number=page_number,
+            data=data,
+            is_loading=False,
+            is_loaded=True,
+            timestamp=time.time()
+        )
+        self.pages[page_number] = loaded_page
+        
+        # Update total count
+        if total_count is not None:
+            self.total_count = total_count
+        
+        # Emit signals
+        self.dataLoaded.emit(page_number, data)
+        
+        # Update table display
+        self._update_table_display()
+        
+        # Cleanup old pages if cache is full
+        self._cleanup_cache()
+        
+        # Update metrics
+        self._update_metrics()
+        
+        logger.debug(f"Loaded page {page_number} with {len(data)} rows in {load_time:.2f}ms")
+    
+    def _apply_failed_page(self, page_number: int, error: str):
+        """Record a failed page load"""
+        logger.error(f"Failed to load page {page_number}: {error}")
+        
+        error_page = DataPage(
+            page_number=page_number,
+            data=[],
+            is_loading=False,
+            is_loaded=False,
+            error=error,
+            timestamp=time.time()
+        )
+        self.pages[page_number] = error_page
+        
+        self.errorOccurred.emit(error)
+    
+    def _cancel_stale_loads(self, keep_start_page: int, keep_end_page: int):
+        """Cancel in-flight loads for pages outside the given window"""
+        for page_num in list(self._inflight.keys()):
+            if keep_start_page <= page_num <= keep_end_page:
+                continue
+            
+            worker = self._inflight.pop(page_num)
+            worker.is_cancelled = True
+            # Not-yet-started workers are removed from the queue outright;
+            # running ones finish and their result is discarded.
+            self.thread_pool.tryTake(worker)
+            
+            page = self.pages.get(page_num)
+            if page is not None and page.is_loading:
+                del self.pages[page_num]
+            
+            self.cancelled_loads += 1
+            logger.debug(f"Cancelled stale load of page {page_num}")
+        
+        self.pending_prefetch_pages = [
+            page_num for page_num in self.pending_prefetch_pages
+            if keep_start_page <= page_num <= keep_end_page
+        ]
+    
+    def _page_row_count(self, page_number: int) -> int:
+        """Number of rows a page is expected to hold"""
+        if self.total_count is None:
+            return self.options.page_size
+        remaining = self.total_count - page_number * self.options.page_size
+        return max(0, min(self.options.page_size, remaining))
+    
+    def _check_scroll_complete(self):
+        """Record scroll latency once the scrolled-to range is fully loaded"""
+        if self._scroll_started_at is None or self._scroll_target is None:
+            return
+        
+        start_row, end_row = self._scroll_target
+        if not self.is_range_loaded(start_row, max(start_row, end_row - 1)):
+            return
+        
+        latency = (time.time() - self._scroll_started_at) * 1000
+        self._scroll_started_at = None
+        self._scroll_target = None
+        
+        self.total_scroll_latency += latency
+        self.metrics.last_scroll_latency_ms = latency
+        self.metrics.max_scroll_latency_ms = max(self.metrics.max_scroll_latency_ms, latency)
+        if self.metrics.scroll_events > 0:
+            self.metrics.average_scroll_latency_ms = self.total_scroll_latency / self.metrics.scroll_events
+        
+        self._update_metrics()
+    
     def _schedule_prefetch(self, page_number: int):
         """Schedule a page prefetch with debouncing"""
         if not self._is_page_loaded(page_number):
-            self.pending_prefetch_page = page_number
+            if page_number not in self.pending_prefetch_pages:
+                self.pending_prefetch_pages.append(page_number)
             self.prefetch_timer.start(100)  # 100ms delay
     
     def _do_prefetch(self):
-        """Execute pending prefetch"""
-        if self.pending_prefetch_page is not None:
-            self._load_page(self.pending_prefetch_page)
-            self.pending_prefetch_page = None
+        """Execute pending prefetches"""
+        pending_pages = self.pending_prefetch_pages
+        self.pending_prefetch_pages = []
+        for page_num in pending_pages:
+            self._request_page(page_num)
     
     def _update_table_display(self):
         """Update table widget with loaded data"""
@@ -254,7 +467,7 @@ class TablePartVirtualizationService(QObject):
         start_row, end_row = self._get_visible_range()
         
         # Get data for visible range
-        visible_data = self._get_data_range(start_row, end_row)
+        visible_data = self._get_data_range(start_row, end_row, include_placeholders=True)
         
         # Update table rows
         # This should be implemented by subclasses based on their specific table structure
@@ -267,15 +480,26 @@ class TablePartVirtualizationService(QObject):
         if render_time > 16:  # More than one frame at 60fps
             logger.warning(f"Slow render detected: {render_time:.2f}ms")
     
-    def _get_data_range(self, start_row: int, end_row: int) -> List[Dict[str, Any]]:
-        """Get data for a specific range of rows"""
+    def _get_data_range(self, start_row: int, end_row: int,
+                        include_placeholders: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get data for a specific range of rows.
+        
+        With include_placeholders, rows of pages still being fetched are
+        returned as {PLACEHOLDER_KEY: True, 'row': index} entries.
+        """
         result = []
         start_page = start_row // self.options.page_size
         end_page = end_row // self.options.page_size
         
         for page_num in range(start_page, end_page + 1):
             page = self.pages.get(page_num)
-            if page and page.is_loaded:
+            if include_placeholders and page and page.is_loading:
+                page_start_row = page_num * self.options.page_size
+                page_end_row = page_start_row + self._page_row_count(page_num)
+                for row in range(max(start_row, page_start_row), min(end_row, page_end_row)):
+                    result.append({PLACEHOLDER_KEY: True, 'row': row})
+            elif page and page.is_loaded:
                 page_start_row = page_num * self.options.page_size
                 page_end_row = page_start_row + len(page.data)
                 
@@ -295,11 +519,14 @@ class TablePartVirtualizationService(QObject):
         if len(self.pages) <= self.options.cache_size:
             return
         
-        # Sort pages by timestamp (oldest first)
-        sorted_pages = sorted(self.pages.items(), key=lambda x: x[1].timestamp)
+        # Sort pages by timestamp (oldest first); pages being fetched are kept
+        sorted_pages = sorted(
+            (item for item in self.pages.items() if not item[1].is_loading),
+            key=lambda x: x[1].timestamp
+        )
         
         # Remove oldest pages
-        pages_to_remove = len(self.pages) - self.options.cache_size
+        pages_to_remove = min(len(self.pages) - self.options.cache_size, len(sorted_pages))
         for i in range(pages_to_remove):
             page_num, _ = sorted_pages[i]
             del self.pages[page_num]
@@ -317,6 +544,9 @@ class TablePartVirtualizationService(QObject):
         total_items = sum(len(page.data) for page in self.pages.values() if page.is_loaded)
         self.metrics.memory_usage_mb = (total_items * 1) / 1024  # Rough estimate: 1KB per item
         
+        self.metrics.pending_page_loads = len(self._inflight)
+        self.metrics.cancelled_page_loads = self.cancelled_loads
+        
         self.metricsUpdated.emit(self.metrics)
     
     def get_all_data(self) -> List[Dict[str, Any]]:
@@ -341,8 +571,32 @@ class TablePartVirtualizationService(QObject):
         
         return True
     
+    def _cancel_all_loads(self):
+        """Cancel every in-flight load; late results are discarded"""
+        for worker in self._inflight.values():
+            worker.is_cancelled = True
+            self.thread_pool.tryTake(worker)
+        self._inflight.clear()
+        self.pending_prefetch_pages = []
+        self._scroll_started_at = None
+        self._scroll_target = None
+    
+    def wait_for_pending_loads(self, timeout_ms: int = -1) -> bool:
+        """
+        Block until background loads finish and apply their results.
+        
+        Intended for tests and for callers that need the data synchronously
+        (e.g. printing or exporting the whole table).
+        """
+        from PyQt6.QtCore import QCoreApplication
+        
+        finished = self.thread_pool.waitForDone(timeout_ms)
+        QCoreApplication.processEvents()
+        return finished
+    
     def reset(self):
         """Reset all data and state"""
+        self._cancel_all_loads()
         self.pages.clear()
         self.total_count = None
         self.current_page = 0
@@ -352,22 +606,29 @@ class TablePartVirtualizationService(QObject):
         self.total_load_time = 0.0
         self.total_requests = 0
         self.cache_hits = 0
+        self.total_scroll_latency = 0.0
+        self.cancelled_loads = 0
         
         logger.info("Virtualization service reset")
     
     def refresh_page(self, page_number: int):
         """Refresh a specific page"""
+        worker = self._inflight.pop(page_number, None)
+        if worker is not None:
+            worker.is_cancelled = True
+            self.thread_pool.tryTake(worker)
         if page_number in self.pages:
             del self.pages[page_number]
-        self._load_page(page_number)
+        self._request_page(page_number)
     
     def refresh_all(self):
         """Refresh all loaded pages"""
         loaded_pages = [num for num, page in self.pages.items() if page.is_loaded]
+        self._cancel_all_loads()
         self.pages.clear()
         
         for page_num in loaded_pages:
-            self._load_page(page_num)
+            self._request_page(page_num)
     
     def get_metrics(self) -> PerformanceMetrics:
         """Get current performance metrics"""
@@ -384,6 +645,8 @@ class TablePartVirtualizationService(QObject):
     def cleanup(self):
         """Cleanup resources"""
         self.prefetch_timer.stop()
+        self._cancel_all_loads()
+        self.thread_pool.waitForDone()
         self.pages.clear()
         logger.info("Virtualization service cleaned up")
 
@@ -8,7 +8,7 @@ key relationships.
 
 import uuid
 import logging
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from datetime import datetime
 from sqlalchemy import text, inspect, MetaData, Table
 from sqlalchemy.orm import Session
@@ -360,8 +360,11 @@ class UUIDMigrationService:
         
         return validation_results
     
-    def perform_full_uuid_migration(self) -> Dict[str, Any]:
-        """Perform complete UUID migration process"""
+    def perform_full_uuid_migration(self, progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, Any]:
+        """Perform complete UUID migration process
+
+        progress_callback(phase, 4, message) is called before every phase.
+        """
         migration_results = {
             'start_time': datetime.now(),
             'end_time': None,
@@ -379,6 +382,8 @@ class UUIDMigrationService:
             
             # Phase 1: Assign UUIDs to works
             self.logger.info("Phase 1: Assigning UUIDs to works")
+            if progress_callback:
+                progress_callback(0, 4, "Assigning UUIDs to works")
             uuid_results = self.assign_uuids_to_existing_works()
             migration_results['uuid_assignment'] = uuid_results
             migration_results['phases_completed'].append('uuid_assignment')
@@ -388,6 +393,8 @@ class UUIDMigrationService:
             
             # Phase 2: Add UUID columns to FK tables
             self.logger.info("Phase 2: Adding UUID columns to foreign key tables")
+            if progress_callback:
+                progress_callback(1, 4, "Adding UUID columns to foreign key tables")
             column_results = self.add_uuid_columns_to_fk_tables()
             migration_results['column_addition'] = column_results
             migration_results['phases_completed'].append('column_addition')
@@ -397,6 +404,8 @@ class UUIDMigrationService:
             
             # Phase 3: Update foreign key UUIDs
             self.logger.info("Phase 3: Updating foreign key UUID values")
+            if progress_callback:
+                progress_callback(2, 4, "Updating foreign key UUID values")
             fk_results = self.update_foreign_key_uuids()
             migration_results['fk_update'] = fk_results
             migration_results['phases_completed'].append('fk_update')
@@ -406,6 +415,8 @@ class UUIDMigrationService:
             
             # Phase 4: Validate migration
             self.logger.info("Phase 4: Validating UUID migration")
+            if progress_callback:
+                progress_callback(3, 4, "Validating UUID migration")
             validation_results = self.validate_uuid_migration()
             migration_results['validation'] = validation_results
             migration_results['phases_completed'].append('validation')
@@ -3,7 +3,8 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
                               QTableWidgetItem, QHeaderView, QPushButton, QCheckBox, QMessageBox)
 from PyQt6.QtCore import Qt
 from ..data.database_manager import DatabaseManager
-from ..data.models.sqlalchemy_models import Person, UserSetting
+from ..data.models.sqlalchemy_models import UserSetting
+from ..services.reference_snapshot import get_reference_snapshot
 
 
 class EmployeePickerDialog(QDialog):
@@ -93,30 +94,28 @@ class EmployeePickerDialog(QDialog):
     def load_data(self):
         """Load employees based on filter setting"""
         try:
-            query = self.session.query(Person).filter(Person.marked_for_deletion == False)
+            # Persons come from the shared snapshot, reloaded only after changes
+            persons = get_reference_snapshot(self.session, 'persons').active_rows()
             
             if not self.show_all and self.foreman_id:
                 # Show only brigade members (parent_id = foreman_id) OR those with no parent (parent_id IS NULL)
-                from sqlalchemy import or_
-                query = query.filter(or_(Person.parent_id == self.foreman_id, Person.parent_id == None))
-            
-            persons = query.order_by(Person.full_name).all()
+                persons = [p for p in persons if p['parent_id'] in (self.foreman_id, None)]
             
             self.table.setRowCount(len(persons))
             
             for row_idx, person in enumerate(persons):
                 # Column 0: Name
-                self.table.setItem(row_idx, 0, QTableWidgetItem(person.full_name or ""))
+                self.table.setItem(row_idx, 0, QTableWidgetItem(person['full_name'] or ""))
                 
                 # Column 1: Position
-                self.table.setItem(row_idx, 1, QTableWidgetItem(person.position or ""))
+                self.table.setItem(row_idx, 1, QTableWidgetItem(person['position'] or ""))
                 
                 # Column 2: Rate
-                rate = person.hourly_rate if person.hourly_rate else 0.0
+                rate = person['hourly_rate'] if person['hourly_rate'] else 0.0
                 self.table.setItem(row_idx, 2, QTableWidgetItem(f"{rate:.2f}"))
                 
                 # Column 3: ID (hidden)
-                self.table.setItem(row_idx, 3, QTableWidgetItem(str(person.id)))
+                self.table.setItem(row_idx, 3, QTableWidgetItem(str(person['id'])))
             
             # Select first row if available
             if self.table.rowCount() > 0:
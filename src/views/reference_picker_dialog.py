@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
 from PyQt6.QtGui import QAction
 from PyQt6.QtCore import Qt
 from ..data.database_manager import DatabaseManager
+from ..services.reference_snapshot import SNAPSHOT_TABLES, get_reference_snapshot
 
 
 class ReferencePickerDialog(QDialog):
@@ -41,6 +42,56 @@ class ReferencePickerDialog(QDialog):
         else:
             return "name"
     
+    def _get_snapshot(self):
+        """Cached snapshot of the table, None if it must be queried
+
+        Raw SQL extra filters can only be applied by the database.
+        """
+        if self.table_name in SNAPSHOT_TABLES and not self.extra_filter:
+            return get_reference_snapshot(self.db, self.table_name)
+        return None
+
+    def _load_snapshot_rows(self, snapshot, search_text):
+        """Filter the snapshot the way load_data filters in SQL"""
+        rows = snapshot.active_rows()
+
+        if self.owner_id and self.table_name == "objects":
+            # Filter by owner only if the owner has objects at all
+            owned = [row for row in rows if row['owner_id'] == self.owner_id]
+            if owned:
+                rows = owned
+
+        if self.current_id and not search_text and self.is_hierarchical and self.current_parent_id is None:
+            current = snapshot.get(self.current_id)
+            if current:
+                self.current_parent_id = current['parent_id'] or None
+
+        if search_text:
+            needle = search_text.lower()
+            rows = [row for row in rows if needle in (row[self.display_column] or '').lower()]
+        elif self.is_hierarchical:
+            parent_id = self.current_parent_id
+            rows = [row for row in rows if (row['parent_id'] or None) == parent_id]
+
+        if not self.is_hierarchical:
+            # Same shape as the "NULL as parent_id" of the SQL query
+            rows = [dict(row, parent_id=None) for row in rows]
+
+        return rows
+
+    def _has_children(self, item_id):
+        """Check whether an item has active children"""
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return item_id in snapshot.parent_ids()
+
+        cursor = self.db.cursor()
+        cursor.execute(f"""
+            SELECT COUNT(*) as cnt FROM {self.table_name}
+            WHERE parent_id = ? AND marked_for_deletion = 0
+        """, (item_id,))
+        return cursor.fetchone()['cnt'] > 0
+
     def on_context_menu(self, position):
         """Handle context menu"""
         menu = QMenu()
@@ -143,6 +194,11 @@ class ReferencePickerDialog(QDialog):
     
     def load_data(self, search_text=""):
         """Load data from database"""
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            self._fill_table(self._load_snapshot_rows(snapshot, search_text), snapshot.parent_ids())
+            return
+
         cursor = self.db.cursor()
         
         # Build WHERE clause
@@ -217,21 +273,23 @@ class ReferencePickerDialog(QDialog):
             ORDER BY {order_by_clause}
         """, params)
         
-        rows = cursor.fetchall()
+        self._fill_table(cursor.fetchall())
+
+    def _fill_table(self, rows, parent_ids=None):
+        """Show loaded rows and restore the selection
+
+        parent_ids (ids of groups with children) saves a query per row.
+        """
         self.table_view.setRowCount(len(rows))
         
         row_to_select = None
         for row_idx, row in enumerate(rows):
             self.table_view.setItem(row_idx, 0, QTableWidgetItem(str(row['id'])))
             
-            has_children = False
-            if self.is_hierarchical:
-                # Check if this row has children (is a group)
-                cursor.execute(f"""
-                    SELECT COUNT(*) as cnt FROM {self.table_name}
-                    WHERE parent_id = ? AND marked_for_deletion = 0
-                """, (row['id'],))
-                has_children = cursor.fetchone()['cnt'] > 0
+            # Check if this row has children (is a group)
+            has_children = self.is_hierarchical and (
+                row['id'] in parent_ids if parent_ids is not None else self._has_children(row['id'])
+            )
             
             name_text = row[self.display_column]
             if has_children:
@@ -302,15 +360,7 @@ class ReferencePickerDialog(QDialog):
             if id_item:
                 selected_id = int(id_item.text())
                 
-                # Check if this item has children
-                cursor = self.db.cursor()
-                cursor.execute(f"""
-                    SELECT COUNT(*) as cnt FROM {self.table_name}
-                    WHERE parent_id = ? AND marked_for_deletion = 0
-                """, (selected_id,))
-                has_children = cursor.fetchone()['cnt'] > 0
-                
-                if has_children:
+                if self._has_children(selected_id):
                     self.current_parent_id = selected_id
                     self.load_data()
     
@@ -322,17 +372,7 @@ class ReferencePickerDialog(QDialog):
             if id_item:
                 selected_id = int(id_item.text())
                 
-                has_children = False
-                if self.is_hierarchical:
-                    # Check if this item has children
-                    cursor = self.db.cursor()
-                    cursor.execute(f"""
-                        SELECT COUNT(*) as cnt FROM {self.table_name}
-                        WHERE parent_id = ? AND marked_for_deletion = 0
-                    """, (selected_id,))
-                    has_children = cursor.fetchone()['cnt'] > 0
-                
-                if has_children:
+                if self.is_hierarchical and self._has_children(selected_id):
                     # Drill down
                     self.current_parent_id = selected_id
                     self.load_data()
@@ -491,15 +531,7 @@ class ReferencePickerDialog(QDialog):
                     if id_item:
                         selected_id = int(id_item.text())
                         
-                        # Check if this item has children
-                        cursor = self.db.cursor()
-                        cursor.execute(f"""
-                            SELECT COUNT(*) as cnt FROM {self.table_name}
-                            WHERE parent_id = ? AND marked_for_deletion = 0
-                        """, (selected_id,))
-                        has_children = cursor.fetchone()['cnt'] > 0
-                        
-                        if has_children:
+                        if self._has_children(selected_id):
                             self.on_drill_down()
                         else:
                             self.on_select()
@@ -118,6 +118,9 @@ class BaseTablePart(QWidget):
         
         # Initialize calculation engine
         self.calculation_engine = create_calculation_engine()
+        # Per-row values the running totals were built from; None until the
+        # first full total calculation or after structural changes
+        self._total_snapshots: Optional[List[Dict[str, Any]]] = None
         self.calculation_engine.set_performance_thresholds(
             config.calculation_timeout_ms,
             config.total_calculation_timeout_ms
@@ -323,6 +326,7 @@ class BaseTablePart(QWidget):
         
         # Trigger recalculation if enabled
         if self.config.auto_calculation_enabled:
+            self._total_snapshots = None
             self.total_calculation_timer.stop()
             self.total_calculation_timer.start(self.config.total_calculation_timeout_ms)
     
@@ -359,29 +363,74 @@ class BaseTablePart(QWidget):
             # Get current row data
             row_data = self._get_row_data(row)
             if row_data:
+                # Collect the whole table only for rules that look beyond the edited row
+                all_data = self._get_table_data() if self.calculation_engine.needs_table_data(column) else None
+                
                 # Perform calculation using the engine
-                result = self.calculation_engine.calculate_field(row_data, column, self._get_table_data())
+                result = self.calculation_engine.calculate_field(row_data, column, all_data)
                 
-                if result.success and result.value is not None:
-                    # Update the table with calculated value
-                    self._update_calculated_field(row, result.rule_id or column, result.value)
+                # Update the table with every value written by downstream rules
+                for target_column, value in result.updated_values.items():
+                    self._update_calculated_field(row, target_column, value)
                 
                 self.calculationRequested.emit(row, column)
+                
+                if self._apply_row_to_totals(row, row_data):
+                    return
             
             # Schedule total calculation
             self.total_calculation_timer.stop()
             self.total_calculation_timer.start(self.config.total_calculation_timeout_ms)
     
+    def _apply_row_to_totals(self, row: int, row_data: Dict[str, Any]) -> bool:
+        """
+        Update document totals from the delta of one edited row.
+        
+        Returns False when the running totals cannot be trusted (no full
+        calculation yet, or rows were added, removed or moved since) and a
+        full recalculation is needed instead.
+        """
+        snapshots = self._total_snapshots
+        if snapshots is None or len(snapshots) != self.table.rowCount() or not 0 <= row < len(snapshots):
+            return False
+        
+        new_snapshot = self.calculation_engine.snapshot_row(row_data)
+        totals = self.calculation_engine.apply_row_delta(snapshots[row], new_snapshot)
+        snapshots[row] = new_snapshot
+        
+        self._update_document_totals(totals)
+        self.totalCalculationRequested.emit()
+        return True
+    
     def _perform_total_calculations(self):
         """Perform total calculations"""
         all_data = self._get_table_data()
         totals = self.calculation_engine.calculate_totals(all_data)
+        self._total_snapshots = [self.calculation_engine.snapshot_row(row_data) for row_data in all_data]
         
         # Update UI with totals
         self._update_document_totals(totals)
         
         self.totalCalculationRequested.emit()
     
+    def recalculate_all(self):
+        """
+        Recalculate all rows and totals in one pass (after paste or import).
+        """
+        all_data = self._get_table_data()
+        totals = self.calculation_engine.recalculate_all(all_data)
+        self._total_snapshots = [self.calculation_engine.snapshot_row(row_data) for row_data in all_data]
+        
+        target_columns = {rule.target_column for rule in self.calculation_engine.calculation_rules.values()
+                          if rule.enabled}
+        for row, row_data in enumerate(all_data):
+            for target_column in target_columns:
+                if target_column in row_data:
+                    self._update_calculated_field(row, target_column, row_data[target_column])
+        
+        self._update_document_totals(totals)
+        self.totalCalculationRequested.emit()
+    
     def _update_keyboard_context(self, selected_rows: List[int]):
         """Update keyboard handler context"""
         current_item = self.table.currentItem()
@@ -539,6 +588,7 @@ class BaseTablePart(QWidget):
         
         # Trigger recalculation if enabled
         if self.config.auto_calculation_enabled:
+            self._total_snapshots = None
             self.total_calculation_timer.stop()
             self.total_calculation_timer.start(self.config.total_calculation_timeout_ms)
     
@@ -566,6 +616,7 @@ class BaseTablePart(QWidget):
         
         # Trigger recalculation if enabled
         if self.config.auto_calculation_enabled:
+            self._total_snapshots = None
             self.total_calculation_timer.stop()
             self.total_calculation_timer.start(self.config.total_calculation_timeout_ms)
     
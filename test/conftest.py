@@ -0,0 +1,84 @@
+"""
+Shared pytest fixtures for tests that run API endpoints in-process
+
+make_database creates a temporary SQLite database with the full schema;
+api_client mounts routers on a FastAPI app with the current user and the
+database connection overridden and sends requests to it through httpx.
+"""
+import asyncio
+import os
+import sys
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.sqlalchemy_base import Base
+from src.data.models import sqlalchemy_models  # noqa: F401 - registers the tables
+from src.data.repositories import change_counter_repository
+from api.dependencies.auth import get_current_user
+from api.dependencies.database import get_db_connection
+from api.models.auth import UserInfo
+
+class ApiClient:
+    """Sends requests to an in-process FastAPI app"""
+
+    def __init__(self, app: FastAPI, user):
+        self.app = app
+        # Returned by the get_current_user override, may be replaced between requests
+        self.user = user
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+                return await client.request(method, url, **kwargs)
+        return asyncio.run(send())
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('POST', url, **kwargs)
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """Factory creating a SQLite database with all tables, returns its path"""
+    def make(name: str = 'test.db', change_counters: bool = False) -> str:
+        path = str(tmp_path / name)
+        engine = create_engine(f'sqlite:///{path}')
+        Base.metadata.create_all(engine)
+        if change_counters:
+            with engine.begin() as conn:
+                change_counter_repository.ensure_installed(conn)
+        engine.dispose()
+        return path
+
+    return make
+
+
+@pytest.fixture
+def api_client():
+    """
+    Factory mounting routers under /api, returns an ApiClient
+
+    The current user defaults to an admin; connection, when given, is served
+    by get_db_connection and overrides adds further dependency overrides.
+    """
+    def make(*routers, connection=None, user: Optional[UserInfo] = None, overrides=None) -> ApiClient:
+        app = FastAPI()
+        for router in routers:
+            app.include_router(router, prefix="/api")
+        client = ApiClient(app, user or UserInfo(id=1, username='admin', role='admin', is_active=True))
+        app.dependency_overrides[get_current_user] = lambda: client.user
+        if connection is not None:
+            app.dependency_overrides[get_db_connection] = lambda: connection
+        app.dependency_overrides.update(overrides or {})
+        return client
+
+    return make
@@ -0,0 +1,94 @@
+"""Import time profile of the API server
+
+The cold start budget depends on the machine and its load, so it is only
+checked on request, on the target server:
+
+    API_IMPORT_TIME_CHECK=1 python -m pytest test/test_api_import_time.py -s
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold start budget for `import api.main`, see deploy-to-prod/DEPLOYMENT_GUIDE.md
+IMPORT_TIME_BUDGET_SECONDS = 3.0
+
+# Libraries that must only be imported when a print/import endpoint is used
+DEFERRED_PACKAGES = ('reportlab', 'openpyxl', 'PyQt6', 'pandas', 'PIL')
+
+
+def _profile_import(module: str):
+    """Run `python -X importtime -c "import <module>"` and parse its report
+
+    Returns:
+        Dict of module name to cumulative import time in microseconds, and
+        the number of sys.path entries pointing to the project root
+    """
+    code = (
+        f"import os, sys; import {module}; "
+        f"print(sum(os.path.abspath(p) == {PROJECT_ROOT!r} for p in sys.path))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+
+    return cumulative, int(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope='module')
+def api_import_profile():
+    return _profile_import('api.main')
+
+
+def test_api_import_time_profile(api_import_profile):
+    cumulative, _ = api_import_profile
+
+    top_level = sorted(
+        ((us, name) for name, us in cumulative.items() if '.' not in name or name.startswith(('api.', 'src.'))),
+        reverse=True
+    )[:15]
+    print("\nSlowest imports (cumulative):")
+    for us, name in top_level:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    print(f"import api.main: {cumulative['api.main'] / 1e6:.2f} s "
+          f"(budget {IMPORT_TIME_BUDGET_SECONDS:.1f} s)")
+
+
+@pytest.mark.skipif(
+    os.environ.get('API_IMPORT_TIME_CHECK') != '1', reason="set API_IMPORT_TIME_CHECK=1 to check the budget"
+)
+def test_api_import_time_budget(api_import_profile):
+    cumulative, _ = api_import_profile
+    assert cumulative['api.main'] / 1e6 < IMPORT_TIME_BUDGET_SECONDS
+
+
+def test_heavy_packages_are_deferred(api_import_profile):
+    cumulative, _ = api_import_profile
+    imported = sorted(name for name in cumulative if name.split('.')[0] in DEFERRED_PACKAGES)
+    assert imported == []
+
+
+def test_project_root_added_to_path_once(api_import_profile):
+    _, root_entries = api_import_profile
+    # The cwd entry of `python -c` plus the one added by api.main
+    assert root_entries <= 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
@@ -0,0 +1,210 @@
+"""Tests and benchmarks for fast JSON serialization and response compression"""
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.middleware import compression
+from api.middleware.compression import CompressionMiddleware, choose_encoding
+from api.models.references import PaginationInfo
+from api.responses import FastJSONResponse
+
+
+def works_page(count=10000) -> dict:
+    """Payload shaped like GET /references/works?page_size=10000"""
+    return {
+        "success": True,
+        "data": [
+            {
+                "id": i, "name": f"Кладка кирпичных стен {i}", "code": f"01-{i:05d}",
+                "price": 1250.5 + i, "labor_rate": 1.75, "is_group": 0, "parent_id": i // 50 or None,
+                "marked_for_deletion": 0, "uuid": f"00000000-0000-4000-8000-{i:012d}", "unit_id": 3,
+                "unit_display": "м3", "unit_name": "м3", "unit_description": "кубический метр",
+            }
+            for i in range(count)
+        ],
+        "pagination": PaginationInfo(page=1, page_size=count, total_items=count, total_pages=1),
+        "hierarchy_mode": "flat",
+        "parent_id": None,
+    }
+
+
+def estimate_document(line_count=5000) -> dict:
+    """Payload shaped like GET /documents/estimates/{id} with many lines"""
+    return {
+        "success": True,
+        "data": {
+            "id": 1, "number": "СМ-000123", "date": "2025-03-01", "customer_name": "ООО Заказчик",
+            "object_name": "Жилой дом", "total_sum": 1.0e7, "total_labor": 12500.0,
+            "lines": [
+                {
+                    "id": i, "estimate_id": 1, "line_number": i, "work_id": i % 700,
+                    "work_name": f"Монтаж конструкций, позиция {i}", "quantity": 12.5, "unit": "м2",
+                    "price": 830.0, "labor_rate": 0.8, "sum": 10375.0, "planned_labor": 10.0,
+                    "is_group": 0, "group_name": None, "parent_group_id": None,
+                }
+                for i in range(1, line_count + 1)
+            ],
+        },
+    }
+
+
+def default_render(payload) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def fast_render(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+
+def request(app, url, accept_encoding='gzip'):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get(url, headers={'Accept-Encoding': accept_encoding})
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def app():
+    application = FastAPI()
+    application.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @application.get('/large')
+    async def large():
+        return FastJSONResponse(works_page(500), headers={'ETag': 'W/"v1"'})
+
+    @application.get('/small')
+    async def small():
+        return {"success": True}
+
+    @application.get('/stream')
+    async def stream():
+        async def chunks():
+            for i in range(50):
+                yield (f'{{"chunk": {i}, "padding": "{"x" * 100}"}}\n').encode()
+        return StreamingResponse(chunks(), media_type='application/x-ndjson')
+
+    @application.get('/events')
+    async def events():
+        async def chunks():
+            yield b'data: ' + b'x' * 2000 + b'\n\n'
+        return StreamingResponse(chunks(), media_type='text/event-stream')
+
+    @application.get('/not-modified')
+    async def not_modified():
+        return Response(status_code=304, headers={'ETag': 'W/"v1"'})
+
+    return application
+
+
+class TestFastJSONResponse:
+    """Tests for orjson rendering"""
+
+    def test_matches_default_encoding(self):
+        payload = {
+            "pagination": PaginationInfo(page=1, page_size=50, total_items=3, total_pages=1),
+            "created_at": datetime.datetime(2025, 1, 2, 3, 4, 5),
+            "date": datetime.date(2025, 1, 2),
+            "amount": Decimal('12.50'),
+            "name": "Смета",
+            "ids": [1, None, 2.5],
+        }
+        assert json.loads(fast_render(payload)) == json.loads(default_render(payload))
+
+    def test_unknown_type_rejected(self):
+        with pytest.raises(TypeError):
+            fast_render({"value": object()})
+
+
+class TestCompressionMiddleware:
+    """Tests for gzip/brotli response compression"""
+
+    def test_choose_encoding(self):
+        assert choose_encoding('gzip, deflate, br', brotli_available=True) == 'br'
+        assert choose_encoding('gzip, deflate, br', brotli_available=False) == 'gzip'
+        assert choose_encoding('br;q=0, gzip;q=0.5', brotli_available=True) == 'gzip'
+        assert choose_encoding('*', brotli_available=False) == 'gzip'
+        assert choose_encoding('identity', brotli_available=True) is None
+        assert choose_encoding('', brotli_available=True) is None
+
+    def test_large_response_gzipped(self, app, monkeypatch):
+        monkeypatch.setattr(compression, 'brotli', None)
+        response = request(app, '/large', accept_encoding='gzip, br')
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['vary']
+        assert response.headers['etag'] == 'W/"v1"'
+        assert int(response.headers['content-length']) < len(response.content) / 5
+        assert len(response.json()['data']) == 500
+
+    def test_brotli_preferred(self, app):
+        pytest.importorskip('brotli')
+        response = request(app, '/large', accept_encoding='gzip, br')
+
+        assert response.headers['content-encoding'] == 'br'
+        assert len(response.json()['data']) == 500
+
+    def test_uncompressed_responses(self, app):
+        assert 'content-encoding' not in request(app, '/small').headers
+        assert 'content-encoding' not in request(app, '/large', accept_encoding='identity').headers
+        assert 'content-encoding' not in request(app, '/events').headers
+
+        response = request(app, '/not-modified')
+        assert response.status_code == 304
+        assert 'content-encoding' not in response.headers
+
+    def test_streaming_response_compressed(self, app):
+        response = request(app, '/stream')
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert 'content-length' not in response.headers
+        lines = response.text.splitlines()
+        assert [json.loads(line)['chunk'] for line in lines] == list(range(50))
+
+
+class TestResponseBenchmarks:
+    """Serialization time and bytes on the wire for the largest payloads"""
+
+    @pytest.mark.parametrize('name, build', [
+        ('10k-work page', works_page),
+        ('5k-line estimate', estimate_document),
+    ])
+    def test_serialization_and_wire_size(self, name, build):
+        payload = build()
+
+        start = time.perf_counter()
+        default_body = default_render(payload)
+        default_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fast_body = fast_render(payload)
+        fast_ms = (time.perf_counter() - start) * 1000
+
+        gzip_size = len(gzip.compress(fast_body, compresslevel=6))
+        sizes = f"raw {len(fast_body) / 1024:.0f} KiB, gzip {gzip_size / 1024:.0f} KiB"
+        if compression.brotli is not None:
+            brotli_size = len(compression.brotli.compress(fast_body, quality=4))
+            sizes += f", br {brotli_size / 1024:.0f} KiB"
+
+        print(f"\n{name}: jsonable_encoder+json {default_ms:.0f}ms, orjson {fast_ms:.0f}ms; {sizes}")
+
+        assert json.loads(fast_body) == json.loads(default_body)
+        assert fast_ms < default_ms
+        assert gzip_size < len(fast_body) / 5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
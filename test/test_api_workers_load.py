@@ -0,0 +1,151 @@
+"""Load test comparing the API server with 1 and N workers
+
+Starts deploy-to-prod/api_server.py against a scratch database and hammers
+the persons listing from concurrent clients. Slow, so it only runs with
+API_LOAD_TEST=1 (API_LOAD_TEST_WORKERS sets N, default: CPU count, min 2):
+
+    API_LOAD_TEST=1 python -m pytest test/test_api_workers_load.py -s
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+CLIENTS = 16
+DURATION_SECONDS = 5.0
+PERSONS_COUNT = 2000
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get('API_LOAD_TEST') != '1', reason="set API_LOAD_TEST=1 to run the load test"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _prepare_database(directory: str):
+    """Create a scratch database with a user and a persons catalog; return (config, token)"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from api.services.auth_service import AuthService, simple_hash
+    from src.data.schema_manager import SchemaManager
+    from src.data.models.sqlalchemy_models import Person, User
+
+    db_path = os.path.join(directory, 'load.db')
+    config_path = os.path.join(directory, 'env.ini')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        f.write(f"[Database]\ntype = sqlite\nsqlite_path = {db_path}\n")
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    SchemaManager(engine).initialize_schema()
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username='load', password_hash=simple_hash('load'), role='admin'))
+    session.add_all([
+        Person(full_name=f'Employee {index:05d}', position='Mason', hourly_rate=500)
+        for index in range(PERSONS_COUNT)
+    ])
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    return config_path, AuthService().create_access_token(1, 'load', 'admin')
+
+
+def _start_server(config_path: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_CONFIG_PATH=config_path, PYTHONPATH=PROJECT_ROOT)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, 'deploy-to-prod', 'api_server.py'),
+         '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"API server with {workers} worker(s) did not start")
+
+
+def _measure(port: int, token: str) -> dict:
+    url = f'http://127.0.0.1:{port}/api/references/persons?page_size=500'
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + DURATION_SECONDS
+
+    def client():
+        while time.monotonic() < deadline:
+            request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    json.loads(response.read())
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / DURATION_SECONDS,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+    }
+
+
+def test_single_vs_multi_worker_throughput():
+    workers = max(2, int(os.environ.get('API_LOAD_TEST_WORKERS', os.cpu_count() or 2)))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path, token = _prepare_database(directory)
+
+        for worker_count in (1, workers):
+            port = _free_port()
+            process = _start_server(config_path, worker_count, port)
+            try:
+                _measure(port, token)  # warm-up
+                results[worker_count] = _measure(port, token)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    print(f"\n{CLIENTS} clients, {DURATION_SECONDS:.0f}s, GET /api/references/persons?page_size=500")
+    for worker_count, result in results.items():
+        print(f"  {worker_count:2d} worker(s): {result['rps']:7.1f} req/s, "
+              f"p50 {result['p50_ms']:6.1f}ms, p95 {result['p95_ms']:6.1f}ms, "
+              f"{result['errors']} errors")
+
+    for result in results.values():
+        assert result['errors'] == 0
+        assert result['requests'] > 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
@@ -0,0 +1,188 @@
+"""Tests for the batched audit log writer and keyset pagination"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models.audit import AuditLog
+from src.data.models.sqlalchemy_models import AuditLogEntry
+from src.data.repositories.audit_repository import AuditRepository
+from src.services.audit_service import AuditLogWriter, AuditService
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        'sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool
+    )
+    AuditLogEntry.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def _count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM audit_logs")).scalar()
+
+
+class GatedRepository(AuditRepository):
+    """Repository whose background writes wait until the gate is opened"""
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self.gate = threading.Event()
+        self.statements = 0
+
+    def create_many(self, logs):
+        if threading.current_thread().name == 'audit-log-writer':
+            self.gate.wait(timeout=5)
+        self.statements += 1
+        return super().create_many(logs)
+
+
+class TestAuditLogWriter:
+    """Tests for batching, backpressure and shutdown"""
+
+    def test_entries_are_written_in_batches(self, engine):
+        writer = AuditLogWriter(AuditRepository(engine), batch_size=200, flush_interval_ms=50)
+        service = AuditService(writer)
+        try:
+            for resource_id in range(450):
+                service.log(1, 'admin', 'update', 'estimate', resource_id, 'bulk')
+            writer.flush()
+
+            assert _count(engine) == 450
+            assert writer.entries_written == 450
+            assert writer.batches_written < 10
+        finally:
+            writer.close()
+
+    def test_flush_does_not_wait_for_later_entries(self, engine):
+        writer = AuditLogWriter(AuditRepository(engine), batch_size=50, flush_interval_ms=20)
+        for resource_id in range(100):
+            writer.log(AuditLog(action='create', resource_type='estimate', resource_id=resource_id))
+
+        stop = threading.Event()
+
+        def keep_logging():
+            while not stop.is_set():
+                writer.log(AuditLog(action='update', resource_type='estimate', resource_id=0))
+
+        logger_thread = threading.Thread(target=keep_logging)
+        logger_thread.start()
+        try:
+            # Returns once the first 100 are written, however many follow them
+            writer.flush()
+            assert _count(engine) >= 100
+        finally:
+            stop.set()
+            logger_thread.join()
+            writer.close()
+
+    def test_full_queue_applies_backpressure(self, engine):
+        repository = GatedRepository(engine)
+        writer = AuditLogWriter(repository, batch_size=1, flush_interval_ms=10,
+                                max_pending=2, enqueue_timeout_ms=10)
+        for resource_id in range(10):
+            writer.log(AuditLog(action='create', resource_type='estimate', resource_id=resource_id))
+
+        # The worker is stuck, so callers had to write the overflow themselves
+        assert writer.entries_written_directly > 0
+        assert writer.pending <= 2
+
+        repository.gate.set()
+        writer.close()
+        assert _count(engine) == 10
+
+    def test_close_writes_pending_entries(self, engine):
+        writer = AuditLogWriter(AuditRepository(engine), batch_size=1000, flush_interval_ms=10000)
+        for resource_id in range(5):
+            writer.log(AuditLog(action='delete', resource_type='daily_report', resource_id=resource_id))
+        writer.close()
+
+        assert _count(engine) == 5
+
+        # Entries logged after shutdown are written directly
+        writer.log(AuditLog(action='delete', resource_type='daily_report', resource_id=6))
+        assert _count(engine) == 6
+
+    def test_entries_get_their_own_timestamps(self):
+        first = AuditLog()
+        time.sleep(0.01)
+        assert AuditLog().created_at > first.created_at
+
+
+class TestAuditKeysetPagination:
+    """Tests for get_logs_before"""
+
+    def _populate(self, engine):
+        base = datetime(2025, 1, 1, 12, 0, 0)
+        logs = [
+            AuditLog(user_id=1, username='admin', action='update', resource_type='estimate',
+                     resource_id=index % 3, created_at=base + timedelta(seconds=index // 2))
+            for index in range(25)
+        ]
+        AuditRepository(engine).create_many(logs)
+
+    def test_pages_cover_all_entries_once(self, engine):
+        self._populate(engine)
+        repository = AuditRepository(engine)
+
+        expected, _ = repository.get_logs(limit=100)
+        seen = []
+        before = None
+        while True:
+            page = repository.get_logs_before(limit=10, before=before)
+            seen.extend(log.id for log in page)
+            if len(page) < 10:
+                break
+            before = (page[-1].created_at, page[-1].id)
+
+        # Entries share timestamps in pairs, so the id tie-break matters
+        assert seen == [log.id for log in expected]
+        assert len(seen) == 25
+
+    def test_resource_page_uses_index(self, engine):
+        self._populate(engine)
+        repository = AuditRepository(engine)
+
+        first = repository.get_logs_before(limit=3, resource_type='estimate', resource_id=1)
+        second = repository.get_logs_before(
+            limit=10, resource_type='estimate', resource_id=1,
+            before=(first[-1].created_at, first[-1].id)
+        )
+        assert len(first) + len(second) == 8
+        assert all(log.resource_id == 1 for log in first + second)
+
+        with engine.connect() as conn:
+            plan = conn.execute(text("""
+                EXPLAIN QUERY PLAN
+                SELECT * FROM audit_logs
+                WHERE resource_type = 'estimate' AND resource_id = 1 AND created_at < '2025-01-02'
+                ORDER BY created_at DESC, id DESC LIMIT 10
+            """)).fetchall()
+        details = ' '.join(row[-1] for row in plan)
+        assert 'idx_audit_logs_resource_created' in details
+        assert 'TEMP B-TREE' not in details
+
+
+def test_api_cursor_round_trip():
+    from fastapi import HTTPException
+    from api.endpoints.audit import decode_cursor, encode_cursor
+
+    log = AuditLog(id=42, created_at=datetime(2025, 1, 1, 12, 30, 15, 250))
+    assert decode_cursor(encode_cursor(log)) == (log.created_at, 42)
+
+    with pytest.raises(HTTPException):
+        decode_cursor('not-a-cursor')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
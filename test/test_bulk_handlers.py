@@ -0,0 +1,177 @@
+"""Tests and benchmark for set-based bulk operation handlers"""
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models import sqlalchemy_models as models
+from api.services import bulk_handlers
+from api.services.bulk_handlers import (
+    BulkDeleteHandler, BulkDocumentDeleteHandler, BulkPermanentDeleteHandler, MAX_IDS_PER_STATEMENT
+)
+from api.endpoints import documents
+
+DOCUMENT_COUNT = 10000
+
+
+@pytest.fixture
+def connection(make_database):
+    path = make_database('bulk.db')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        # Every 10th estimate is posted, every 25th already marked for deletion
+        conn.execute(models.Estimate.__table__.insert(), [
+            {'id': i, 'number': f'E-{i}', 'date': date(2025, 1, 1),
+             'is_posted': i % 10 == 0, 'marked_for_deletion': i % 25 == 0}
+            for i in range(1, DOCUMENT_COUNT + 1)
+        ])
+        conn.execute(models.Object.__table__.insert(), [
+            {'id': i, 'name': f'Object {i}'} for i in range(1, 4)
+        ])
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def run(handler, ids, connection):
+    return asyncio.run(handler.execute(ids, {'db': connection}))
+
+
+def statements_of(connection, handler, ids):
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        return run(handler, ids, connection), statements
+    finally:
+        connection.set_trace_callback(None)
+
+
+class TestDocumentDelete:
+    """Tests for the set-based document delete"""
+
+    def test_per_id_errors_in_request_order(self, connection):
+        handler = BulkDocumentDeleteHandler('estimates')
+        result = run(handler, [10, 1, 99999, 25, 2, 1], connection)
+
+        assert result.success
+        assert result.processed == 2
+        assert result.errors == [
+            'Document E-10 is posted, cannot delete',
+            'ID 99999: Not found',
+            'ID 25: Not found',
+        ]
+        marked = {row[0] for row in connection.execute("SELECT id FROM estimates WHERE id IN (1, 2, 10) "
+                                                       "AND marked_for_deletion = 1")}
+        assert marked == {1, 2}
+
+    def test_statements_do_not_grow_per_id(self, connection):
+        ids = list(range(1, 2 * MAX_IDS_PER_STATEMENT + 1))
+        result, statements = statements_of(connection, BulkDocumentDeleteHandler('estimates'), ids)
+
+        updates = [sql for sql in statements if sql.startswith('UPDATE')]
+        assert len(updates) == 2
+        assert result.processed == len(ids) - len(ids) // 10 - len(ids) // 25 + len(ids) // 50
+        assert len(statements) < 12
+
+    def test_rejects_unknown_table(self, connection):
+        result = run(BulkDocumentDeleteHandler('objects'), [1], connection)
+        assert not result.success and result.processed == 0
+
+
+class TestReferenceHandlers:
+    """Tests for reference delete handlers"""
+
+    def test_mark_and_permanent_delete(self, connection):
+        result = run(BulkDeleteHandler('objects'), [1, 2, 7], connection)
+        assert (result.processed, result.errors) == (2, ['ID 7: Item not found or update failed'])
+
+        result = run(BulkPermanentDeleteHandler('objects'), [1, 7], connection)
+        assert (result.processed, result.errors) == (1, ['ID 7: Not found'])
+        assert [row[0] for row in connection.execute("SELECT id FROM objects ORDER BY id")] == [2, 3]
+
+    def test_failed_chunk_is_retried_per_id(self, connection):
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute("UPDATE estimates SET object_id = 2 WHERE id = 1")
+        connection.commit()
+
+        result = run(BulkPermanentDeleteHandler('objects'), [1, 2, 3], connection)
+
+        assert result.processed == 2
+        assert len(result.errors) == 1 and result.errors[0].startswith('ID 2: ')
+        assert [row[0] for row in connection.execute("SELECT id FROM objects")] == [2]
+
+    def test_default_handlers_registered_once(self):
+        bulk_handlers.register_default_handlers()
+        handler = bulk_handlers.bulk_operation_service.get_handler('estimates:delete')
+        bulk_handlers.register_default_handlers()
+        assert bulk_handlers.bulk_operation_service.get_handler('estimates:delete') is handler
+
+
+def test_bulk_delete_endpoint(connection, api_client):
+    api = api_client(documents.router, connection=connection)
+
+    response = api.post('/api/documents/estimates/bulk-delete', json={'ids': [3, 30, 50, 123456]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['deleted_count'] == 1
+    assert body['errors'] == [
+        'Смета E-30 проведена, удаление невозможно',
+        'Смета ID 50 не найдена',
+        'Смета ID 123456 не найдена',
+    ]
+
+
+def delete_per_id(connection, ids):
+    """The previous approach: one SELECT and one UPDATE per id"""
+    cursor = connection.cursor()
+    deleted, errors = 0, []
+    for estimate_id in ids:
+        cursor.execute("SELECT id, number, is_posted FROM estimates WHERE id = ? AND marked_for_deletion = 0",
+                       (estimate_id,))
+        row = cursor.fetchone()
+        if not row:
+            errors.append(f"ID {estimate_id}: Not found")
+            continue
+        if row['is_posted']:
+            errors.append(f"Document {row['number']} is posted, cannot delete")
+            continue
+        cursor.execute("UPDATE estimates SET marked_for_deletion = 1, modified_at = CURRENT_TIMESTAMP WHERE id = ?",
+                       (estimate_id,))
+        deleted += 1
+    connection.commit()
+    return deleted, errors
+
+
+def test_benchmark_10k_id_bulk_delete(connection):
+    ids = list(range(1, DOCUMENT_COUNT + 1))
+
+    start = time.perf_counter()
+    expected = delete_per_id(connection, ids)
+    per_id_ms = (time.perf_counter() - start) * 1000
+    connection.execute("UPDATE estimates SET marked_for_deletion = (id % 25 = 0)")
+    connection.commit()
+
+    start = time.perf_counter()
+    result, statements = statements_of(connection, BulkDocumentDeleteHandler('estimates'), ids)
+    set_based_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{DOCUMENT_COUNT}-id bulk delete: per id {per_id_ms:.0f}ms, "
+          f"set-based {set_based_ms:.0f}ms ({len(statements)} statements)")
+
+    assert (result.processed, result.errors) == expected
+    assert len(statements) < DOCUMENT_COUNT / 100
+    assert set_based_ms < per_id_ms
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
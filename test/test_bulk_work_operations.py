@@ -8,12 +8,16 @@ including unit assignments, validation, and hierarchical queries.
 import pytest
 import sys
 import os
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.services.bulk_work_operations_service import BulkWorkOperationsService
 from src.services.hierarchical_query_service import HierarchicalQueryService
 from src.data.database_manager import DatabaseManager
-from src.data.models.sqlalchemy_models import Work, Unit, WorkUnitMigration
+from src.data.models.sqlalchemy_models import Base, Work, WorkClosure, Unit, WorkUnitMigration
+from src.data.repositories import work_closure_repository
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
 
 
 class TestBulkWorkOperationsService:
@@ -239,5 +243,307 @@ class TestBulkOperationsIntegration:
         assert len(result['errors']) > 0
 
 
+class _SessionFactoryManager:
+    """Minimal database manager over a standalone engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self._session_factory = sessionmaker(bind=engine)
+    
+    def get_session(self):
+        return self._session_factory()
+
+
+class TestWorkHierarchyQueries:
+    """Test cases for the SQLite CTE queries and closure-backed hierarchy lookups"""
+    
+    @pytest.fixture
+    def engine(self, tmp_path):
+        """Create a file-backed SQLite database with a small works tree"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'hierarchy.db'}")
+        Unit.__table__.create(engine)
+        Work.__table__.create(engine)
+        WorkClosure.__table__.create(engine)
+        
+        #   1
+        #   +-- 2
+        #   |   +-- 4
+        #   |   +-- 5 (deleted)
+        #   |       +-- 6
+        #   +-- 3
+        #   7
+        rows = [
+            (1, 'Root', None, 0), (2, 'Group A', 1, 0), (3, 'Group B', 1, 0),
+            (4, 'Work A1', 2, 0), (5, 'Work A2', 2, 1), (6, 'Work A2.1', 5, 0),
+            (7, 'Other root', None, 0),
+        ]
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO units (id, name, uuid, updated_at, is_deleted) "
+                                    "VALUES (1, 'м2', 'unit-1', CURRENT_TIMESTAMP, 0)"))
+            for work_id, name, parent_id, deleted in rows:
+                connection.execute(text("""
+                    INSERT INTO works (id, name, unit_id, price, labor_rate, is_group, parent_id,
+                                       marked_for_deletion, uuid, updated_at, is_deleted)
+                    VALUES (:id, :name, 1, 0, 0, 0, :parent_id, :deleted, :uuid, CURRENT_TIMESTAMP, 0)
+                """), {'id': work_id, 'name': name, 'parent_id': parent_id,
+                       'deleted': deleted, 'uuid': f'work-{work_id}'})
+            work_closure_repository.rebuild(connection)
+        
+        yield engine
+        engine.dispose()
+    
+    @pytest.fixture
+    def hierarchy_service(self, engine):
+        return HierarchicalQueryService(_SessionFactoryManager(engine))
+    
+    def test_sqlite_recursive_hierarchy(self, hierarchy_service):
+        """Test SQLite recursive CTE ordering, depth and pagination"""
+        result = hierarchy_service.get_work_hierarchy_tree()
+        
+        assert result['success']
+        assert [work['id'] for work in result['data']] == [1, 2, 4, 3, 7]
+        assert [work['level'] for work in result['data']] == [0, 1, 2, 1, 0]
+        assert result['data'][2]['hierarchy_path'] == 'Root > Group A > Work A1'
+        assert result['data'][2]['unit_display'] == 'м2'
+        assert result['data'][0]['is_group'] is False
+        assert result['pagination']['total_items'] == 5
+        
+        subtree = hierarchy_service.get_work_hierarchy_tree(
+            root_id=2, include_deleted=True, page=2, page_size=2
+        )
+        assert [work['id'] for work in subtree['data']] == [6]
+        assert subtree['pagination']['total_items'] == 3
+        assert subtree['pagination']['total_pages'] == 2
+        
+        shallow = hierarchy_service.get_work_hierarchy_tree(max_depth=1)
+        assert [work['id'] for work in shallow['data']] == [1, 7]
+    
+    def test_service_ancestors_and_descendants(self, hierarchy_service):
+        """Test service methods backed by the closure table"""
+        ancestors = hierarchy_service.get_work_ancestors(4)
+        assert [work['id'] for work in ancestors] == [1, 2, 4]
+        assert ancestors[-1]['unit_display'] == 'м2'
+        
+        descendants = hierarchy_service.get_work_descendants(2, include_deleted=True)
+        assert [(work['id'], work['level']) for work in descendants] == [(4, 1), (5, 1), (6, 2)]
+        
+        stats = hierarchy_service.get_hierarchy_statistics()
+        assert stats['max_depth'] == 3
+    
+    def test_circular_reference_check(self, engine):
+        """Test BulkWorkOperationsService cycle check against the closure table"""
+        bulk_service = BulkWorkOperationsService(_SessionFactoryManager(engine))
+        with sessionmaker(bind=engine)() as session:
+            assert bulk_service._has_circular_reference(session, 2, 4)
+            assert bulk_service._has_circular_reference(session, 4, 4)
+            assert not bulk_service._has_circular_reference(session, 4, 3)
+            
+            # A move made earlier in the same transaction is seen
+            work_closure_repository.move_work(session, 3, 4)
+            assert bulk_service._has_circular_reference(session, 4, 3)
+    
+    def test_large_catalog_performance(self, tmp_path):
+        """Benchmark a SQLite CTE page on a 100k-node catalog"""
+        node_count = 100_000
+        engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+        Unit.__table__.create(engine)
+        Work.__table__.create(engine)
+        WorkClosure.__table__.create(engine)
+        
+        # A single root with four children per group, nine levels deep
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO works (id, name, price, labor_rate, is_group, parent_id, "
+                "marked_for_deletion, uuid, updated_at, is_deleted) "
+                "VALUES (?, ?, 0, 0, 0, ?, 0, ?, CURRENT_TIMESTAMP, 0)",
+                [(i, f'Work {i}', (i + 2) // 4 if i > 1 else None, f'work-{i}') for i in range(1, node_count + 1)]
+            )
+        
+        try:
+            with sessionmaker(bind=engine)() as session:
+                start_time = time.perf_counter()
+                service = HierarchicalQueryService(_SessionFactoryManager(engine))
+                result = service._get_hierarchy_sqlite(session, None, 100, False, False, 1, 1000)
+                cte_time_ms = (time.perf_counter() - start_time) * 1000
+            
+            print(f"sqlite CTE page: {cte_time_ms:.1f}ms")
+            
+            assert result['pagination']['total_items'] == node_count
+        finally:
+            engine.dispose()
+
+
+class TestWorkClosureRepository:
+    """Test cases for the work closure table maintenance"""
+    
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'closure.db'}")
+        Base.metadata.create_all(engine)
+        yield engine
+        engine.dispose()
+    
+    @pytest.fixture
+    def session(self, engine):
+        with sessionmaker(bind=engine)() as session:
+            yield session
+    
+    def _closure(self, session):
+        rows = session.execute(text(
+            "SELECT ancestor_id, descendant_id, depth FROM work_closure"
+        )).fetchall()
+        return {(row[0], row[1]): row[2] for row in rows}
+    
+    def _add_tree(self, session):
+        root = Work(name='Root', is_group=True)
+        group = Work(name='Group', is_group=True, parent=root)
+        leaf = Work(name='Leaf', parent=group)
+        other = Work(name='Other', is_group=True)
+        session.add_all([root, group, leaf, other])
+        session.commit()
+        return root, group, leaf, other
+    
+    def test_orm_insert_maintains_closure(self, session):
+        """Test that ORM inserts add closure rows for every ancestor"""
+        root, group, leaf, other = self._add_tree(session)
+        
+        closure = self._closure(session)
+        assert closure[(root.id, leaf.id)] == 2
+        assert closure[(group.id, leaf.id)] == 1
+        assert closure[(leaf.id, leaf.id)] == 0
+        assert (other.id, leaf.id) not in closure
+        assert len(closure) == 7
+    
+    def test_orm_move_and_delete(self, session):
+        """Test that parent changes re-link the whole subtree"""
+        root, group, leaf, other = self._add_tree(session)
+        
+        group.parent_id = other.id
+        session.commit()
+        
+        assert work_closure_repository.get_ancestor_ids(session, leaf.id) == [other.id, group.id, leaf.id]
+        assert (root.id, leaf.id) not in self._closure(session)
+        
+        session.delete(leaf)
+        session.commit()
+        assert all(leaf.id not in pair for pair in self._closure(session))
+        
+        group.parent_id = None
+        session.commit()
+        assert work_closure_repository.get_ancestor_ids(session, group.id) == [group.id]
+    
+    def test_move_under_own_descendant_is_rejected(self, session):
+        """Test that closure maintenance refuses to create cycles"""
+        root, group, leaf, other = self._add_tree(session)
+        
+        with pytest.raises(ValueError):
+            work_closure_repository.move_work(session, root.id, leaf.id)
+    
+    def test_raw_sqlite_connection(self, engine, tmp_path):
+        """Test maintenance through a legacy sqlite3 connection"""
+        import sqlite3
+        
+        connection = sqlite3.connect(tmp_path / 'closure.db')
+        connection.row_factory = sqlite3.Row
+        try:
+            cursor = connection.cursor()
+            for work_id, parent_id in [(1, None), (2, 1), (3, 2), (4, None)]:
+                cursor.execute(
+                    "INSERT INTO works (id, name, parent_id, marked_for_deletion, uuid, updated_at, is_deleted) "
+                    "VALUES (?, ?, ?, 0, ?, CURRENT_TIMESTAMP, 0)",
+                    (work_id, f'Work {work_id}', parent_id, f'work-{work_id}')
+                )
+                work_closure_repository.insert_work(cursor, work_id, parent_id)
+            
+            assert work_closure_repository.get_paths(cursor, [3, 4]) == {
+                3: ['Work 1', 'Work 2', 'Work 3'], 4: ['Work 4']
+            }
+            
+            work_closure_repository.move_work(cursor, 2, 4)
+            assert work_closure_repository.get_descendant_rows(cursor, 4) == [(2, 1), (3, 2)]
+            assert work_closure_repository.get_descendant_rows(cursor, 1) == []
+            
+            cursor.execute("UPDATE works SET marked_for_deletion = 1 WHERE id = 2")
+            assert work_closure_repository.get_descendant_rows(cursor, 4) == []
+            assert work_closure_repository.get_descendant_rows(cursor, 4, include_deleted=True) == [(2, 1), (3, 2)]
+            
+            work_closure_repository.delete_works(cursor, [2])
+            cursor.execute("DELETE FROM works WHERE id = 2")
+            assert work_closure_repository.get_ancestor_ids(cursor, 3) == [3]
+        finally:
+            connection.close()
+    
+    def test_ensure_consistent_backfills(self, engine):
+        """Test that a missing or incomplete closure table is rebuilt"""
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE work_closure"))
+            for work_id, parent_id in [(1, None), (2, 1), (3, 2)]:
+                connection.execute(text(
+                    "INSERT INTO works (id, name, parent_id, marked_for_deletion, uuid, updated_at, is_deleted) "
+                    "VALUES (:id, 'Work', :parent_id, 0, :uuid, CURRENT_TIMESTAMP, 0)"
+                ), {'id': work_id, 'parent_id': parent_id, 'uuid': f'work-{work_id}'})
+            
+            assert work_closure_repository.ensure_consistent(connection)
+            assert not work_closure_repository.ensure_consistent(connection)
+            assert work_closure_repository.get_ancestor_ids(connection, 3) == [1, 2, 3]
+    
+    def test_ensure_consistent_detects_raw_reparenting(self, engine):
+        """Test that parent_id changes written past the closure are repaired"""
+        with engine.begin() as connection:
+            for work_id, parent_id in [(1, None), (2, 1), (3, 2), (4, None)]:
+                connection.execute(text(
+                    "INSERT INTO works (id, name, parent_id, marked_for_deletion, uuid, updated_at, is_deleted) "
+                    "VALUES (:id, 'Work', :parent_id, 0, :uuid, CURRENT_TIMESTAMP, 0)"
+                ), {'id': work_id, 'parent_id': parent_id, 'uuid': f'work-{work_id}'})
+            work_closure_repository.rebuild(connection)
+            assert not work_closure_repository.ensure_consistent(connection)
+            
+            connection.execute(text("UPDATE works SET parent_id = 4 WHERE id = 2"))
+            assert work_closure_repository.count_parent_mismatches(connection) == 1
+            assert work_closure_repository.ensure_consistent(connection)
+            assert work_closure_repository.get_ancestor_ids(connection, 3) == [4, 2, 3]
+            
+            # A dangling or self-referencing parent_id has no closure link after a rebuild
+            connection.execute(text("UPDATE works SET parent_id = 99 WHERE id = 2"))
+            connection.execute(text("UPDATE works SET parent_id = 1 WHERE id = 1"))
+            assert work_closure_repository.ensure_consistent(connection)
+            assert not work_closure_repository.ensure_consistent(connection)
+    
+    def test_large_catalog_subtree_queries(self, engine):
+        """Benchmark closure rebuild and subtree queries on a 100k-node catalog"""
+        node_count = 100_000
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO works (id, name, price, labor_rate, is_group, parent_id, "
+                "marked_for_deletion, uuid, updated_at, is_deleted) "
+                "VALUES (?, ?, 0, 0, 0, ?, 0, ?, CURRENT_TIMESTAMP, 0)",
+                [(i, f'Work {i}', (i + 2) // 4 if i > 1 else None, f'work-{i}')
+                 for i in range(1, node_count + 1)]
+            )
+            
+            start_time = time.perf_counter()
+            work_closure_repository.rebuild(connection)
+            rebuild_time_ms = (time.perf_counter() - start_time) * 1000
+            
+            start_time = time.perf_counter()
+            paths = work_closure_repository.get_paths(connection, list(range(node_count - 100, node_count)))
+            breadcrumbs_time_ms = (time.perf_counter() - start_time) * 1000
+            
+            start_time = time.perf_counter()
+            subtree_count = connection.execute(text(
+                "SELECT COUNT(*) FROM works w WHERE "
+                + work_closure_repository.subtree_condition()
+            ), {'group_id': 2}).fetchone()[0]
+            subtree_time_ms = (time.perf_counter() - start_time) * 1000
+        
+        print(f"closure rebuild: {rebuild_time_ms:.1f}ms, 100 breadcrumbs: {breadcrumbs_time_ms:.1f}ms, "
+              f"subtree count: {subtree_time_ms:.1f}ms")
+        
+        assert len(paths[node_count - 1]) == 10
+        assert subtree_count > node_count // 5
+        assert breadcrumbs_time_ms < 500
+        assert subtree_time_ms < 1000
+
+
 if __name__ == '__main__':
-    pytest.main([__file__])
\ No newline at end of file
+    pytest.main([__file__])
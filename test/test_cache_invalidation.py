@@ -0,0 +1,145 @@
+"""Tests for change counters and cross-process cache invalidation"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.sqlalchemy_base import Base
+from src.data.models.sqlalchemy_models import Work
+from src.data.repositories import change_counter_repository
+from src.services.cache_invalidation import CacheInvalidationChannel
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'shared.db')
+        engine = create_engine(f'sqlite:///{path}')
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            change_counter_repository.ensure_installed(conn)
+        session = sessionmaker(bind=engine)()
+        session.add_all([Work(id=1, name='Group', is_group=True), Work(id=2, name='Masonry')])
+        session.commit()
+        session.close()
+        engine.dispose()
+        yield path
+
+
+class TestChangeCounters:
+    """Tests for the SQLite triggers"""
+
+    def test_tracked_writes_bump_counter(self, db_path):
+        engine = create_engine(f'sqlite:///{db_path}')
+        raw = sqlite3.connect(db_path)
+        try:
+            with engine.connect() as conn:
+                initial = change_counter_repository.get_versions(conn)['works']
+
+            # Raw SQL writers are counted without any code changes
+            raw.execute("UPDATE works SET parent_id = 1 WHERE id = 2")
+            raw.commit()
+            with engine.connect() as conn:
+                assert change_counter_repository.get_versions(conn)['works'] == initial + 1
+
+            # Columns the caches don't depend on are not tracked
+            raw.execute("UPDATE works SET name = 'Brickwork' WHERE id = 2")
+            raw.commit()
+            with engine.connect() as conn:
+                assert change_counter_repository.get_versions(conn)['works'] == initial + 1
+
+            session = sessionmaker(bind=engine)()
+            session.add(Work(id=3, name='Plaster', parent_id=1))
+            session.commit()
+            session.close()
+            with engine.connect() as conn:
+                assert change_counter_repository.get_versions(conn)['works'] == initial + 2
+        finally:
+            raw.close()
+            engine.dispose()
+
+    def test_ensure_installed_is_idempotent(self, db_path):
+        engine = create_engine(f'sqlite:///{db_path}')
+        try:
+            with engine.begin() as conn:
+                initial = change_counter_repository.get_versions(conn)['works']
+                change_counter_repository.ensure_installed(conn)
+                change_counter_repository.record_change(conn, 'works')
+            with engine.connect() as conn:
+                triggers = conn.execute(text(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_change_counter_%'"
+                )).scalar()
+                assert triggers == 3 * len(change_counter_repository.TRACKED_TABLES)
+                # record_change leaves SQLite counters to the triggers
+                assert change_counter_repository.get_versions(conn)['works'] == initial
+        finally:
+            engine.dispose()
+
+
+    def test_missing_tables_get_no_counters(self):
+        conn = sqlite3.connect(':memory:')
+        try:
+            conn.execute("CREATE TABLE works (id INTEGER PRIMARY KEY, parent_id INTEGER, marked_for_deletion INTEGER, name TEXT)")
+            change_counter_repository.ensure_installed(conn)
+
+            # Readers must not mistake counters without triggers for "never changed"
+            assert set(change_counter_repository.get_versions(conn)) == {'works', 'work_contents'}
+        finally:
+            conn.close()
+
+
+    def test_orm_flush_counters(self, db_path):
+        # Other backends bump counters from ORM flushes; check what a flush counts
+        engine = create_engine(f'sqlite:///{db_path}')
+        session = sessionmaker(bind=engine)()
+        try:
+            work = session.get(Work, 2)
+            work.name = 'Brickwork'
+            assert change_counter_repository._changed_counters(session) == {'work_contents'}
+
+            work.parent_id = 1
+            assert change_counter_repository._changed_counters(session) == {'works', 'work_contents'}
+            session.rollback()
+
+            session.add(Work(id=3, name='Plaster'))
+            assert change_counter_repository._changed_counters(session) == {'works', 'work_contents'}
+        finally:
+            session.close()
+            engine.dispose()
+
+
+class TestCacheInvalidationChannel:
+    """Tests for polling the counters from several 'workers'"""
+
+    def test_other_worker_sees_change(self, db_path):
+        worker_a = create_engine(f'sqlite:///{db_path}')
+        worker_b = create_engine(f'sqlite:///{db_path}')
+        channel = CacheInvalidationChannel(poll_interval=60)
+        notified = []
+        channel.subscribe('works', lambda: notified.append('works'))
+        try:
+            # The first poll only records the baseline
+            assert channel.poll(worker_b) == []
+
+            with worker_a.begin() as conn:
+                conn.execute(text("UPDATE works SET marked_for_deletion = 1 WHERE id = 2"))
+
+            # Throttled until the interval elapses
+            assert channel.poll(worker_b) == []
+            # The row change also moves the whole-row works counter
+            assert sorted(channel.poll(worker_b, force=True)) == ['work_contents', 'works']
+            assert notified == ['works']
+            assert channel.poll(worker_b, force=True) == []
+        finally:
+            worker_a.dispose()
+            worker_b.dispose()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -221,6 +221,131 @@ class TestCalculationEngine:
         assert len(issues) >= 2  # Should have issues for missing columns
 
 
+class TestIncrementalCalculation:
+    """Test dependency-graph recalculation and running totals"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.engine = create_calculation_engine()
+        self.engine.add_calculation_rule(CalculationRule(
+            id='vat',
+            name='VAT',
+            source_columns=['sum'],
+            target_column='vat',
+            calculation_type=CalculationType.CUSTOM,
+            custom_function=lambda row, all_data: float(row['sum']) * 0.2,
+            precision=2
+        ))
+        self.engine.add_calculation_rule(CalculationRule(
+            id='discount',
+            name='Discount',
+            source_columns=['discount_rate', 'price'],
+            target_column='discount',
+            calculation_type=CalculationType.MULTIPLY,
+            precision=2
+        ))
+    
+    def test_downstream_rules_cascade(self):
+        """Test that an edit recalculates the whole chain of dependent columns"""
+        row_data = {'quantity': 2, 'price': 10, 'sum': 0, 'vat': 0, 'discount_rate': 0.1}
+        
+        result = self.engine.calculate_field(row_data, 'quantity')
+        
+        assert result.success
+        assert row_data['sum'] == Decimal('20.00')
+        assert row_data['vat'] == Decimal('4.00')
+        assert result.updated_values == {'sum': Decimal('20.00'), 'vat': Decimal('4.00')}
+    
+    def test_only_downstream_rules_run(self):
+        """Test that unrelated rules are not evaluated"""
+        rules = [rule.id for rule in self.engine._get_downstream_rules('quantity')]
+        assert rules == ['quantity_price_sum', 'vat']
+        
+        rules = [rule.id for rule in self.engine._get_downstream_rules('price')]
+        assert rules[0] == 'quantity_price_sum'
+        assert set(rules) == {'quantity_price_sum', 'vat', 'discount'}
+        assert rules.index('vat') > rules.index('quantity_price_sum')
+    
+    def test_table_data_needed_only_for_custom_rules(self):
+        """Test that only edits reaching a custom rule need the whole table"""
+        assert self.engine.needs_table_data('quantity')
+        assert not self.engine.needs_table_data('discount_rate')
+        assert not self.engine.needs_table_data('comment')
+        
+        self.engine.calculation_rules['vat'].enabled = False
+        assert not self.engine.needs_table_data('quantity')
+    
+    def test_dependency_graph_rebuilt_on_rule_change(self):
+        """Test that adding or removing rules invalidates the compiled graph"""
+        assert len(self.engine._get_downstream_rules('quantity')) == 2
+        
+        self.engine.remove_calculation_rule('vat')
+        
+        assert [rule.id for rule in self.engine._get_downstream_rules('quantity')] == ['quantity_price_sum']
+    
+    def test_running_totals_match_full_recalculation(self):
+        """Test that delta updates give the same totals as a full pass"""
+        rows = [{'quantity': i, 'price': 2, 'sum': i * 2} for i in range(1, 11)]
+        self.engine.calculate_totals(rows)
+        
+        old_row = self.engine.snapshot_row(rows[3])
+        rows[3]['quantity'] = 100
+        self.engine.calculate_field(rows[3], 'quantity')
+        totals = self.engine.apply_row_delta(old_row, self.engine.snapshot_row(rows[3]))
+        
+        expected = TablePartCalculationEngine().calculate_totals(rows)
+        assert totals['sum']['value'] == expected['sum']['value'] == Decimal('302.00')
+        assert totals['quantity']['value'] == expected['quantity']['value']
+        
+        # Row deletion and insertion
+        totals = self.engine.apply_row_delta(self.engine.snapshot_row(rows[0]), None)
+        assert totals['quantity']['value'] == Decimal('150.000')
+        totals = self.engine.apply_row_delta(None, {'quantity': 5, 'sum': 10})
+        assert totals['quantity']['value'] == Decimal('155.000')
+    
+    def test_running_min_max(self):
+        """Test that removing the current extreme recomputes min/max"""
+        self.engine.add_total_rule('max_price', TotalCalculationRule(
+            column='price', calculation_type=CalculationType.MAX, precision=2
+        ))
+        self.engine.calculate_totals([{'price': 5}, {'price': 9}, {'price': 7}])
+        
+        totals = self.engine.apply_row_delta({'price': 9}, {'price': 1})
+        
+        assert totals['price']['value'] == Decimal('7.00')
+    
+    def test_recalculate_all(self):
+        """Test bulk recalculation of rows and totals after paste/import"""
+        rows = [{'quantity': i, 'price': 3} for i in range(100)]
+        
+        totals = self.engine.recalculate_all(rows)
+        
+        assert rows[10]['sum'] == Decimal('30.00')
+        assert rows[10]['vat'] == Decimal('6.00')
+        assert totals['sum']['value'] == Decimal(sum(i * 3 for i in range(100))).quantize(Decimal('0.01'))
+    
+    def test_incremental_edit_performance(self):
+        """Benchmark a single edit in a 50,000-row table"""
+        rows = [{'quantity': i % 17, 'price': 1.5, 'sum': 0} for i in range(50000)]
+        
+        start_time = time.perf_counter()
+        self.engine.recalculate_all(rows)
+        bulk_time_ms = (time.perf_counter() - start_time) * 1000
+        
+        start_time = time.perf_counter()
+        for i in range(100):
+            old_row = self.engine.snapshot_row(rows[i])
+            rows[i]['quantity'] = 42
+            self.engine.calculate_field(rows[i], 'quantity')
+            totals = self.engine.apply_row_delta(old_row, self.engine.snapshot_row(rows[i]))
+        edit_time_ms = (time.perf_counter() - start_time) * 1000 / 100
+        
+        print(f"bulk recalculation: {bulk_time_ms:.1f}ms, single edit: {edit_time_ms:.3f}ms")
+        
+        assert totals['sum']['value'] == TablePartCalculationEngine().calculate_totals(rows)['sum']['value']
+        assert edit_time_ms < 5
+
+
 class TestCalculationFactoryFunctions:
     """Test factory functions for creating calculation rules"""
     
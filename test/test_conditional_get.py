@@ -0,0 +1,175 @@
+"""Tests for ETags and 304 Not Modified on document and reference endpoints"""
+import datetime
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models import sqlalchemy_models as models
+from src.services.reference_snapshot import get_reference_snapshot_cache
+from api.dependencies.conditional import make_etag
+from api.endpoints import documents, references
+from api.models.auth import UserInfo
+
+
+@pytest.fixture
+def connection(make_database):
+    path = make_database('documents.db', change_counters=True)
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        models.Person(id=1, full_name='Foreman'),
+        models.Object(id=1, name='Tower'),
+        models.Unit(id=1, name='m3'),
+        models.Work(id=1, name='Masonry', unit_id=1),
+    ])
+    session.flush()
+    session.add_all([
+        models.Estimate(id=1, number='E-1', date=datetime.date(2025, 1, 1), object_id=1, responsible_id=1),
+        models.DailyReport(id=1, date=datetime.date(2025, 1, 2), estimate_id=1, foreman_id=1),
+    ])
+    session.flush()
+    session.add(models.EstimateLine(estimate_id=1, line_number=1, work_id=1, quantity=10))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    get_reference_snapshot_cache().clear()
+    yield conn
+    get_reference_snapshot_cache().clear()
+    conn.close()
+
+
+@pytest.fixture
+def api(connection, api_client):
+    """GET helper returning (response, SQL statements run by the endpoint)"""
+    client = api_client(documents.router, references.router, connection=connection)
+
+    def get(url, etag=None, as_user=None):
+        if as_user is not None:
+            client.user = as_user
+        statements = []
+        connection.set_trace_callback(statements.append)
+
+        try:
+            return client.get(url, headers={'If-None-Match': etag} if etag else None), statements
+        finally:
+            connection.set_trace_callback(None)
+
+    return get
+
+
+class TestDocumentETags:
+    """Tests for conditional GET of documents"""
+
+    def test_not_modified_skips_document_queries(self, api):
+        response, _ = api('/api/documents/estimates/1')
+        assert response.status_code == 200
+        etag = response.headers['etag']
+        assert etag.startswith('W/"')
+
+        response, statements = api('/api/documents/estimates/1', etag=etag)
+        assert response.status_code == 304
+        assert response.headers['etag'] == etag
+        assert response.content == b''
+        # Only the change counters were read
+        assert len(statements) == 1
+        assert 'change_counters' in statements[0]
+
+    def test_line_change_invalidates(self, api, connection):
+        etag = api('/api/documents/estimates/1')[0].headers['etag']
+
+        connection.execute("UPDATE estimate_lines SET quantity = 12 WHERE estimate_id = 1")
+        connection.commit()
+
+        response, _ = api('/api/documents/estimates/1', etag=etag)
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+        assert response.json()['data']['lines'][0]['quantity'] == 12
+
+    def test_reference_rename_invalidates(self, api, connection):
+        etag = api('/api/documents/daily-reports/1')[0].headers['etag']
+
+        connection.execute("UPDATE persons SET full_name = 'Site Manager' WHERE id = 1")
+        connection.commit()
+
+        response, _ = api('/api/documents/daily-reports/1', etag=etag)
+        assert response.status_code == 200
+        assert response.json()['data']['foreman_name'] == 'Site Manager'
+
+    def test_work_rename_invalidates_lines(self, api, connection):
+        etag = api('/api/documents/estimates/1')[0].headers['etag']
+
+        connection.execute("UPDATE works SET name = 'Brickwork' WHERE id = 1")
+        connection.commit()
+
+        response, _ = api('/api/documents/estimates/1', etag=etag)
+        assert response.status_code == 200
+        assert response.json()['data']['lines'][0]['work_name'] == 'Brickwork'
+
+    def test_list_etag_depends_on_query(self, api):
+        first = api('/api/documents/estimates?page=1')[0].headers['etag']
+        second = api('/api/documents/estimates?page=2')[0].headers['etag']
+        assert first != second
+
+        response, statements = api('/api/documents/estimates?page=1', etag=first)
+        assert response.status_code == 304
+        assert len(statements) == 1
+
+    def test_per_user_list(self, api):
+        admin_etag = api('/api/documents/timesheets')[0].headers['etag']
+        other = UserInfo(id=2, username='foreman', role='foreman', is_active=True)
+
+        response, _ = api('/api/documents/timesheets', etag=admin_etag, as_user=other)
+        assert response.status_code == 200
+        assert response.headers['etag'] != admin_etag
+
+    def test_weak_comparison_and_lists(self, api):
+        etag = api('/api/documents/daily-reports')[0].headers['etag']
+        strong = etag[2:]
+
+        assert api('/api/documents/daily-reports', etag=strong)[0].status_code == 304
+        assert api('/api/documents/daily-reports', etag=f'W/"other", {etag}')[0].status_code == 304
+        assert api('/api/documents/daily-reports', etag='*')[0].status_code == 304
+        assert api('/api/documents/daily-reports', etag='W/"other"')[0].status_code == 200
+
+
+class TestReferenceETags:
+    """Tests for conditional GET of reference data"""
+
+    def test_reference_list_not_modified(self, api, connection):
+        response, _ = api('/api/references/units')
+        etag = response.headers['etag']
+
+        response, statements = api('/api/references/units', etag=etag)
+        assert response.status_code == 304
+        assert len(statements) == 1
+
+        connection.execute("UPDATE units SET name = 'kg' WHERE id = 1")
+        connection.commit()
+        assert api('/api/references/units', etag=etag)[0].status_code == 200
+
+    def test_without_counters_no_etag(self, api, connection):
+        connection.execute("DELETE FROM change_counters WHERE name = 'units'")
+        connection.commit()
+
+        response, _ = api('/api/references/units')
+        assert response.status_code == 200
+        assert 'etag' not in response.headers
+
+
+def test_make_etag_is_weak_and_stable():
+    assert make_etag('/a', [('x', 1)]) == make_etag('/a', [('x', 1)])
+    assert make_etag('/a', [('x', 1)]) != make_etag('/a', [('x', 2)])
+    assert make_etag('/a').startswith('W/"')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -263,6 +263,54 @@ postgres_password = pass
         os.unlink(temp_file)
 
 
+def test_sqlite_profile_defaults():
+    """Test that SQLite defaults to the pooled production profile"""
+    config = DatabaseConfig("nonexistent_file.ini")
+    config_data = config.get_config_data()
+    
+    assert config_data['sqlite_profile'] == "production"
+    assert config_data['sqlite_pool_size'] == 5
+    assert config_data['sqlite_journal_mode'] == "WAL"
+    assert config_data['sqlite_synchronous'] == "NORMAL"
+    assert config_data['sqlite_temp_store'] == "MEMORY"
+    assert config_data['sqlite_busy_timeout_ms'] == 5000
+    
+    print("✓ SQLite profile defaults work")
+
+
+def test_sqlite_profile_from_file():
+    """Test SQLite engine profile settings and invalid values"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False) as f:
+        f.write("""[Database]
+type = sqlite
+sqlite_path = test.db
+sqlite_profile = Compatibility
+sqlite_pool_size = 3
+sqlite_journal_mode = truncate
+sqlite_synchronous = FULL; DROP TABLE works
+sqlite_cache_size_kb = 1024
+sqlite_optimize_interval = 0
+""")
+        temp_file = f.name
+    
+    try:
+        config = DatabaseConfig(temp_file)
+        config_data = config.get_config_data()
+        
+        assert config_data['sqlite_profile'] == "compatibility"
+        assert config_data['sqlite_pool_size'] == 3
+        assert config_data['sqlite_journal_mode'] == "TRUNCATE"
+        # Values outside the allowed PRAGMA options fall back to the default
+        assert config_data['sqlite_synchronous'] == "NORMAL"
+        assert config_data['sqlite_cache_size_kb'] == 1024
+        assert config_data['sqlite_mmap_size_mb'] == 256
+        assert config_data['sqlite_optimize_interval'] == 0
+        
+        print("✓ SQLite profile settings from file work")
+    finally:
+        os.unlink(temp_file)
+
+
 def test_missing_database_section():
     """Test handling of missing Database section"""
     # Create config without Database section
@@ -214,12 +214,12 @@ class TestDatabaseManagerIntegration:
                     pass
     
     def test_requirement_7_1_connection_pooling_sqlite(self):
-        """Test Requirement 7.1: Connection pooling (SQLite uses NullPool)
+        """Test Requirement 7.1: Connection pooling (SQLite production profile)
         
         WHEN using PostgreSQL or MSSQL 
         THEN the Database Manager SHALL maintain a connection pool
         
-        Note: SQLite uses NullPool (no pooling), which is correct behavior
+        Note: SQLite uses a bounded QueuePool with the default production profile
         """
         db_manager = DatabaseManager()
         db_manager.initialize('test_pool.db')
@@ -227,9 +227,10 @@ class TestDatabaseManagerIntegration:
         try:
             engine = db_manager.get_engine()
             
-            # For SQLite, pool should be NullPool
-            from sqlalchemy.pool import NullPool
-            assert isinstance(engine.pool, NullPool)
+            # For SQLite, pool should be a bounded QueuePool
+            from sqlalchemy.pool import QueuePool
+            assert isinstance(engine.pool, QueuePool)
+            assert engine.pool.size() == 5
             
             # Clean up
             if db_manager._connection:
@@ -296,7 +297,8 @@ class TestDatabaseManagerIntegration:
             for i in range(5):
                 with db_manager.session_scope() as session:
                     result = session.execute(text("SELECT 1"))
-                    assert result is not None
+                    # Consumed, so no open statement keeps the WAL files alive after cleanup
+                    assert result.scalar() == 1
             
             # All sessions should have been properly closed and reused
             # No errors should occur
@@ -384,5 +386,159 @@ class TestDatabaseManagerIntegration:
                     pass
 
 
+
+def _write_sqlite_config(directory, db_name, profile):
+    config_path = os.path.join(directory, 'env.ini')
+    db_path = os.path.join(directory, db_name)
+    with open(config_path, 'w') as f:
+        f.write(f"""[Database]
+type = sqlite
+sqlite_path = {db_path}
+sqlite_profile = {profile}
+sqlite_cache_size_kb = 32768
+sqlite_busy_timeout_ms = 2500
+""")
+    return config_path
+
+
+def _shutdown(db_manager):
+    if db_manager._connection:
+        db_manager._connection.close()
+    if db_manager._engine:
+        db_manager._engine.dispose()
+
+
+class TestSQLiteEngineProfile:
+    """Tests for the SQLite production / compatibility engine profiles"""
+    
+    def setup_method(self):
+        DatabaseManager._instance = None
+    
+    def test_production_profile_applies_pragmas(self):
+        """Pooled connections get WAL, synchronous=NORMAL and the tuning PRAGMAs"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(_write_sqlite_config(temp_dir, 'prod.db', 'production'))
+            
+            try:
+                from sqlalchemy.pool import QueuePool
+                assert isinstance(db_manager.get_engine().pool, QueuePool)
+                
+                with db_manager.session_scope() as session:
+                    pragma = lambda name: session.execute(text(f"PRAGMA {name}")).scalar()
+                    assert pragma('journal_mode').lower() == 'wal'
+                    assert pragma('synchronous') == 1  # NORMAL
+                    assert pragma('cache_size') == -32768
+                    assert pragma('temp_store') == 2  # MEMORY
+                    assert pragma('busy_timeout') == 2500
+                    assert pragma('foreign_keys') == 1
+                
+                # The legacy raw connection is tuned as well
+                cursor = db_manager.get_connection().cursor()
+                assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 1
+                
+                db_manager.optimize_sqlite()
+            finally:
+                _shutdown(db_manager)
+    
+    def test_compatibility_profile_keeps_null_pool(self):
+        """The compatibility profile keeps the previous NullPool behavior"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(_write_sqlite_config(temp_dir, 'compat.db', 'compatibility'))
+            
+            try:
+                from sqlalchemy.pool import NullPool
+                assert isinstance(db_manager.get_engine().pool, NullPool)
+                
+                with db_manager.session_scope() as session:
+                    assert session.execute(text("PRAGMA journal_mode")).scalar().lower() == 'delete'
+                    assert session.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            finally:
+                _shutdown(db_manager)
+    
+    def test_legacy_initialization_reads_profile(self, monkeypatch):
+        """A direct database path still uses the sqlite_profile from env.ini"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _write_sqlite_config(temp_dir, 'compat.db', 'compatibility')
+            monkeypatch.chdir(temp_dir)
+            db_manager = DatabaseManager()
+            db_manager.initialize('legacy.db')
+            
+            try:
+                from sqlalchemy.pool import NullPool
+                assert isinstance(db_manager.get_engine().pool, NullPool)
+                
+                with db_manager.session_scope() as session:
+                    assert session.execute(text("PRAGMA journal_mode")).scalar().lower() == 'delete'
+            finally:
+                _shutdown(db_manager)
+    
+    def test_periodic_optimize_runs_on_checkin(self):
+        """PRAGMA optimize runs once the optimize interval has elapsed"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(_write_sqlite_config(temp_dir, 'optimize.db', 'production'))
+            
+            try:
+                db_manager._last_sqlite_optimize -= 7200
+                with db_manager.session_scope() as session:
+                    session.execute(text("SELECT 1"))
+                
+                import time
+                assert time.monotonic() - db_manager._last_sqlite_optimize < 60
+            finally:
+                _shutdown(db_manager)
+    
+    def test_profile_benchmark(self):
+        """Benchmark session-open cost and mixed read/write throughput per profile"""
+        import time
+        
+        sessions_count = 300
+        operations_count = 2000
+        results = {}
+        
+        for profile in ('compatibility', 'production'):
+            DatabaseManager._instance = None
+            with tempfile.TemporaryDirectory() as temp_dir:
+                db_manager = DatabaseManager()
+                db_manager.initialize(_write_sqlite_config(temp_dir, f'{profile}.db', profile))
+                
+                try:
+                    engine = db_manager.get_engine()
+                    TestBase.metadata.create_all(engine)
+                    
+                    start = time.perf_counter()
+                    for _ in range(sessions_count):
+                        with db_manager.session_scope() as session:
+                            session.execute(text("SELECT 1")).scalar()
+                    session_open = (time.perf_counter() - start) / sessions_count
+                    
+                    # One write per four reads, each in its own session
+                    start = time.perf_counter()
+                    for i in range(operations_count):
+                        with db_manager.session_scope() as session:
+                            if i % 5 == 0:
+                                session.add(TestModel(name=f'row {i}', value=i))
+                            else:
+                                session.execute(
+                                    text("SELECT COUNT(*) FROM test_table WHERE value >= :value"),
+                                    {'value': i // 2}
+                                ).scalar()
+                    throughput = operations_count / (time.perf_counter() - start)
+                    
+                    with db_manager.session_scope() as session:
+                        assert session.query(TestModel).count() == operations_count // 5
+                    
+                    results[profile] = (session_open, throughput)
+                finally:
+                    _shutdown(db_manager)
+        
+        # Timings depend on the machine and its load, so they are reported, not asserted
+        for profile, (session_open, throughput) in results.items():
+            print(f"\n{profile}: session open {session_open * 1000:.3f} ms, "
+                  f"mixed read/write {throughput:.0f} ops/s")
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,127 @@
+"""Tests and benchmark for the DBF importer's native bulk upsert"""
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dbf_importer'))
+
+from src.data.sqlalchemy_base import Base
+from src.data.models import sqlalchemy_models as models
+from core.database import DatabaseManager
+
+COMPOSITION_ROWS = 10000
+
+
+@pytest.fixture
+def manager():
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'import.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine, tables=[models.CostItemMaterial.__table__])
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)"))
+        engine.dispose()
+
+        db_manager = DatabaseManager(url)
+        yield db_manager
+        db_manager.engine.dispose()
+
+
+def rows(db_manager, query):
+    with db_manager.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(query))]
+
+
+def count_statements(db_manager):
+    statements = []
+    event.listen(db_manager.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def composition(count, quantity=1.0):
+    """Composition rows of 100 cost items per work; every 10th without a material"""
+    return [
+        {'work_id': i // 100 + 1, 'material_id': None if i % 10 == 0 else i % 100 + 1,
+         'cost_item_id': i % 100 + 1, 'quantity_per_unit': quantity}
+        for i in range(count)
+    ]
+
+
+class TestUpsertRecords:
+    """Tests for DatabaseManager.upsert_records"""
+
+    def test_insert_update_and_last_duplicate_wins(self, manager):
+        assert manager.upsert_records('items', [{'id': 1, 'name': 'a', 'price': 1.0},
+                                                {'id': 2, 'name': 'b', 'price': 2.0}])
+        assert manager.upsert_records('items', [
+            {'id': 2, 'name': 'b2', 'price': 2.5},
+            {'id': 3, 'name': 'c', 'price': 3.0},
+            {'id': 3, 'name': 'c2', 'price': 3.5},
+            {'id': None, 'name': 'auto', 'price': 0.0},
+        ])
+        assert rows(manager, "SELECT id, name, price FROM items ORDER BY id") == [
+            (1, 'a', 1.0), (2, 'b2', 2.5), (3, 'c2', 3.5), (4, 'auto', 0.0)
+        ]
+
+    def test_composition_matches_rows_without_material(self, manager):
+        data = composition(300)
+        assert manager.upsert_records('cost_item_materials', data)
+        assert manager.upsert_records('cost_item_materials', composition(300, quantity=2.0))
+
+        stored = rows(manager, "SELECT COUNT(*), MIN(quantity_per_unit), "
+                               "SUM(material_id IS NULL) FROM cost_item_materials")
+        assert stored == [(300, 2.0, 30)]
+
+    def test_same_result_as_per_record_path(self, manager):
+        data = composition(500)
+        manager.update_or_insert_records('cost_item_materials', data)
+        query = ("SELECT work_id, cost_item_id, material_id, quantity_per_unit FROM cost_item_materials "
+                 "ORDER BY work_id, cost_item_id, material_id")
+        expected = rows(manager, query)
+        with manager.engine.begin() as conn:
+            conn.execute(text("DELETE FROM cost_item_materials"))
+
+        manager.upsert_records('cost_item_materials', data)
+        assert rows(manager, query) == expected
+
+    def test_statements_do_not_grow_per_record(self, manager):
+        statements = count_statements(manager)
+        assert manager.upsert_records('cost_item_materials', composition(2000))
+        assert len(statements) <= 4
+
+    def test_failure_reports_false(self, manager):
+        assert not manager.upsert_records('items', [{'id': 1, 'missing_column': 1}])
+        assert rows(manager, "SELECT COUNT(*) FROM items") == [(0,)]
+
+
+def test_benchmark_composition_import(manager):
+    data = composition(COMPOSITION_ROWS)
+
+    start = time.perf_counter()
+    for i in range(0, len(data), 100):
+        manager.update_or_insert_records('cost_item_materials', data[i:i + 100])
+    per_record_s = time.perf_counter() - start
+
+    data = composition(COMPOSITION_ROWS, quantity=3.0)
+    start = time.perf_counter()
+    for i in range(0, len(data), manager.batch_size):
+        assert manager.upsert_records('cost_item_materials', data[i:i + manager.batch_size])
+    upsert_s = time.perf_counter() - start
+
+    print(f"\n{COMPOSITION_ROWS}-row composition re-import: per record {per_record_s:.2f}s, "
+          f"bulk upsert {upsert_s:.2f}s")
+
+    assert rows(manager, "SELECT COUNT(*), MIN(quantity_per_unit) FROM cost_item_materials") == [
+        (COMPOSITION_ROWS, 3.0)
+    ]
+    assert upsert_s * 5 < per_record_s
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
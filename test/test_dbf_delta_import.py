@@ -0,0 +1,328 @@
+"""Tests for the DBF importer's delta re-import based on record fingerprints"""
+import os
+import sys
+import tempfile
+import time
+import types
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dbf_importer'))
+
+from src.data.sqlalchemy_base import Base
+from src.data.models import sqlalchemy_models as models
+from core.database import DatabaseManager
+from core.fingerprints import compute_delta, fingerprint, parse_record_key, record_key
+from core.scheduler import IMPORT_ORDER
+
+# Tables the importer writes to, with only the columns it fills
+SCHEMA = [
+    "CREATE TABLE units (id INTEGER PRIMARY KEY, name TEXT UNIQUE, description TEXT, marked_for_deletion BOOLEAN)",
+    "CREATE TABLE materials (id INTEGER PRIMARY KEY, description TEXT, code TEXT, price REAL, unit_id INTEGER, "
+    "marked_for_deletion BOOLEAN)",
+    "CREATE TABLE works (id INTEGER PRIMARY KEY, name TEXT, parent_id INTEGER, code TEXT, unit_id INTEGER, "
+    "price REAL, labor_rate REAL, marked_for_deletion BOOLEAN)",
+    "CREATE TABLE cost_items (id INTEGER PRIMARY KEY AUTOINCREMENT, description TEXT, code TEXT, is_folder BOOLEAN, "
+    "marked_for_deletion BOOLEAN, price REAL, labor_coefficient REAL, unit_id INTEGER)",
+    "CREATE TABLE work_specifications (id INTEGER PRIMARY KEY AUTOINCREMENT, work_id INTEGER, component_type TEXT, "
+    "component_name TEXT, unit_id INTEGER, material_id INTEGER, consumption_rate REAL, unit_price REAL)",
+]
+
+WORKS = 2000
+MATERIALS_PER_WORK = 50
+
+
+@pytest.fixture
+def manager():
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'import.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine, tables=[models.CostItemMaterial.__table__])
+        with engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+        engine.dispose()
+
+        db_manager = DatabaseManager(url)
+        yield db_manager
+        db_manager.engine.dispose()
+
+
+@pytest.fixture
+def importer(manager, monkeypatch):
+    # Records are passed already transformed, so the DBF reader is never used
+    try:
+        import dbfread  # noqa: F401
+    except ImportError:
+        stub = types.ModuleType('dbfread')
+        stub.DBF = None
+        monkeypatch.setitem(sys.modules, 'dbfread', stub)
+    from core.importer import DBFImporter
+
+    dbf_importer = DBFImporter()
+    dbf_importer.db_manager = manager
+    return dbf_importer
+
+
+def rows(db_manager, query):
+    with db_manager.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(query))]
+
+
+def export(works=20, materials_per_work=5):
+    """Transformed 1C export: every work uses the first materials_per_work materials"""
+    return {
+        'units': [{'id': 1, 'name': 'шт', 'description': '796', 'marked_for_deletion': False}],
+        'materials': [
+            {'id': m, 'description': f'Материал {m}', 'code': str(m), 'price': 10.0, 'unit_id': 1,
+             'marked_for_deletion': False}
+            for m in range(1, materials_per_work + 1)
+        ],
+        'nomenclature': [
+            {'id': w, 'name': f'Работа {w}', 'parent_id': None, 'code': str(w), 'unit_name_ref': 'шт',
+             'price': 100.0, 'labor_rate': 1.0, 'marked_for_deletion': False}
+            for w in range(1, works + 1)
+        ],
+        'composition': [
+            {'work_id': w, 'material_id': m, 'cost_item_name': f'Затрата {m}', 'quantity_per_unit': 1.0,
+             'marked_for_deletion': False}
+            for w in range(1, works + 1) for m in range(1, materials_per_work + 1)
+        ],
+    }
+
+
+def run_import(dbf_importer, data, **options):
+    dbf_importer._build_unit_mapping(data['units'])
+    return {entity_type: dbf_importer.write_entity(entity_type, data[entity_type], **options)
+            for entity_type in IMPORT_ORDER}
+
+
+def specifications(db_manager):
+    """work_id -> spec row ids, to tell rebuilt specifications from untouched ones"""
+    result = {}
+    for spec_id, work_id in rows(db_manager, "SELECT id, work_id FROM work_specifications ORDER BY id"):
+        result.setdefault(work_id, []).append(spec_id)
+    return result
+
+
+def composition_row(data, work_id, material_id):
+    return next(record for record in data['composition']
+                if record['work_id'] == work_id and record['material_id'] == material_id)
+
+
+class TestComputeDelta:
+    """Tests for comparing an export with stored fingerprints"""
+
+    def test_new_changed_unchanged_and_deleted(self):
+        records = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 3, 'name': 'c'}, {'id': None, 'name': 'x'}]
+        stored = {'1': fingerprint({'id': 1, 'name': 'a'}), '2': fingerprint({'id': 2, 'name': 'old'}),
+                  '4': fingerprint({'id': 4, 'name': 'd'})}
+
+        delta = compute_delta('materials', records, stored)
+        assert [record['name'] for record in delta.changed] == ['b', 'c', 'x']
+        assert set(delta.fingerprints) == {'2', '3'}
+        assert delta.deleted == ['4']
+        assert delta.skipped == 1
+
+        assert compute_delta('materials', records, stored, with_deletes=False).deleted == []
+
+    def test_composition_key_round_trip(self):
+        record = {'work_id': 7, 'cost_item_name': 'Монтаж | демонтаж', 'material_id': None, 'quantity_per_unit': 2.0}
+        key = record_key('composition', record)
+        assert parse_record_key('composition', key) == {
+            'work_id': 7, 'cost_item_name': 'Монтаж | демонтаж', 'material_id': None
+        }
+        assert parse_record_key('units', record_key('units', {'id': 42})) == {'id': 42}
+
+    def test_fingerprint_ignores_key_order(self):
+        assert fingerprint({'id': 1, 'price': 2.5}) == fingerprint({'price': 2.5, 'id': 1})
+        assert fingerprint({'id': 1, 'price': 2.5}) != fingerprint({'id': 1, 'price': 2.6})
+
+
+class TestFingerprintStore:
+    """Tests for DatabaseManager fingerprint and key-based delete helpers"""
+
+    def test_save_update_delete_and_replace(self, manager):
+        assert manager.load_fingerprints('materials') == {}
+        assert manager.save_fingerprints('materials', {'1': 'a', '2': 'b'})
+        assert manager.save_fingerprints('units', {'1': 'u'})
+        assert manager.save_fingerprints('materials', {'2': 'b2', '3': 'c'}, deleted_keys=['1'])
+        assert manager.load_fingerprints('materials') == {'2': 'b2', '3': 'c'}
+
+        assert manager.save_fingerprints('materials', {'9': 'z'}, replace=True)
+        assert manager.load_fingerprints('materials') == {'9': 'z'}
+        assert manager.load_fingerprints('units') == {'1': 'u'}
+
+    def test_delete_by_keys_matches_null_material(self, manager):
+        manager.upsert_records('cost_item_materials', [
+            {'work_id': 1, 'cost_item_id': 1, 'material_id': None, 'quantity_per_unit': 1.0},
+            {'work_id': 1, 'cost_item_id': 1, 'material_id': 5, 'quantity_per_unit': 1.0},
+            {'work_id': 2, 'cost_item_id': 1, 'material_id': None, 'quantity_per_unit': 1.0},
+        ])
+        assert manager.delete_records_by_keys('cost_item_materials', [
+            {'work_id': 1, 'cost_item_id': 1, 'material_id': None},
+        ])
+        assert rows(manager, "SELECT work_id, material_id FROM cost_item_materials ORDER BY work_id") == [
+            (1, 5), (2, None)
+        ]
+
+    def test_delete_by_ids_above_parameter_limit(self, manager):
+        manager.upsert_records('materials', [{'id': i, 'description': str(i)} for i in range(1, 1501)])
+        assert manager.delete_records_by_ids('materials', list(range(1, 1401)))
+        assert rows(manager, "SELECT COUNT(*) FROM materials") == [(100,)]
+
+    def test_rebuild_work_closure(self, manager):
+        assert manager.rebuild_work_closure()
+
+        with manager.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE work_closure (ancestor_id INTEGER, descendant_id INTEGER, depth INTEGER)"))
+            conn.execute(text("INSERT INTO work_closure VALUES (1, 1, 0)"))
+        manager.upsert_records('works', [
+            {'id': 1, 'name': 'Группа', 'parent_id': None},
+            {'id': 2, 'name': 'Работа', 'parent_id': 1},
+            {'id': 3, 'name': 'Подгруппа', 'parent_id': 2},
+        ])
+
+        assert manager.rebuild_work_closure()
+        assert rows(manager, "SELECT ancestor_id, descendant_id, depth FROM work_closure "
+                             "ORDER BY descendant_id, depth") == [
+            (1, 1, 0), (2, 2, 0), (1, 2, 1), (3, 3, 0), (2, 3, 1), (1, 3, 2)
+        ]
+
+
+class TestDeltaImport:
+    """Tests for DBFImporter.write_entity with delta"""
+
+    def test_unchanged_export_writes_nothing(self, importer, manager):
+        assert all(run_import(importer, export(), delta=True).values())
+        before = specifications(manager)
+        assert importer.import_stats['composition']['written'] == 100
+
+        statements = []
+        event.listen(manager.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        assert all(run_import(importer, export(), delta=True).values())
+
+        writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'dbf_import_fingerprints' not in s]
+        assert writes == []
+        assert importer.import_stats['composition'] == {'written': 0, 'deleted': 0, 'skipped': 100, 'failed': 0}
+        assert importer.import_stats['nomenclature']['skipped'] == 20
+        assert specifications(manager) == before
+
+    def test_only_changes_are_applied(self, importer, manager):
+        run_import(importer, export(), delta=True)
+        before = specifications(manager)
+
+        data = export()
+        composition_row(data, 3, 2)['quantity_per_unit'] = 4.0
+        data['composition'].remove(composition_row(data, 5, 4))
+        data['composition'].append({'work_id': 7, 'material_id': None, 'cost_item_name': 'Затрата 9',
+                                    'quantity_per_unit': 0.5, 'marked_for_deletion': False})
+        assert all(run_import(importer, data, delta=True).values())
+
+        assert importer.import_stats['composition'] == {'written': 2, 'deleted': 1, 'skipped': 98, 'failed': 0}
+        assert rows(manager, "SELECT quantity_per_unit FROM cost_item_materials "
+                             "WHERE work_id = 3 AND material_id = 2") == [(4.0,)]
+        assert rows(manager, "SELECT COUNT(*) FROM cost_item_materials WHERE work_id = 5") == [(4,)]
+        assert rows(manager, "SELECT COUNT(*) FROM cost_item_materials") == [(100,)]
+
+        after = specifications(manager)
+        for work_id in set(before) - {3, 5, 7}:
+            assert after[work_id] == before[work_id]
+        assert {work_id for work_id in (3, 5, 7) if after[work_id] != before[work_id]} == {3, 5, 7}
+        assert rows(manager, "SELECT consumption_rate FROM work_specifications "
+                             "WHERE work_id = 3 AND material_id = 2") == [(4.0,)]
+        assert [len(after[work_id]) for work_id in (3, 5, 7)] == [5, 4, 6]
+
+    def test_changed_material_rebuilds_specifications_that_use_it(self, importer, manager):
+        data = export()
+        data['materials'].append({'id': 99, 'description': 'Кабель', 'code': '99', 'price': 10.0, 'unit_id': 1,
+                                  'marked_for_deletion': False})
+        data['composition'].append({'work_id': 2, 'material_id': 99, 'cost_item_name': 'Затрата 1',
+                                    'quantity_per_unit': 1.0, 'marked_for_deletion': False})
+        run_import(importer, data, delta=True)
+        before = specifications(manager)
+
+        data = export()
+        data['materials'].append({'id': 99, 'description': 'Кабель', 'code': '99', 'price': 12.5, 'unit_id': 1,
+                                  'marked_for_deletion': False})
+        data['composition'].append({'work_id': 2, 'material_id': 99, 'cost_item_name': 'Затрата 1',
+                                    'quantity_per_unit': 1.0, 'marked_for_deletion': False})
+        run_import(importer, data, delta=True)
+
+        after = specifications(manager)
+        assert [work_id for work_id in before if after[work_id] != before[work_id]] == [2]
+        assert rows(manager, "SELECT unit_price FROM work_specifications WHERE material_id = 99") == [(12.5,)]
+
+    def test_records_missing_from_export_are_marked_for_deletion(self, importer, manager):
+        run_import(importer, export(), delta=True)
+
+        data = export(works=19)
+        data['materials'].pop()
+        assert all(run_import(importer, data, delta=True).values())
+        assert importer.import_stats['nomenclature']['deleted'] == 1
+        assert importer.import_stats['materials']['deleted'] == 1
+        assert importer.import_stats['composition']['deleted'] == 5
+        assert rows(manager, "SELECT id FROM works WHERE marked_for_deletion = 1") == [(20,)]
+        assert rows(manager, "SELECT id FROM materials WHERE marked_for_deletion = 1") == [(5,)]
+        assert rows(manager, "SELECT COUNT(*) FROM works") == [(20,)]
+        assert rows(manager, "SELECT COUNT(*) FROM cost_item_materials WHERE work_id = 20") == [(0,)]
+        assert rows(manager, "SELECT COUNT(*) FROM work_specifications WHERE work_id = 20") == [(0,)]
+        assert '20' not in manager.load_fingerprints('nomenclature')
+
+        # A record that comes back is written again with its own mark
+        assert all(run_import(importer, export(), delta=True).values())
+        assert rows(manager, "SELECT COUNT(*) FROM works WHERE marked_for_deletion = 1") == [(0,)]
+        assert rows(manager, "SELECT COUNT(*) FROM materials WHERE marked_for_deletion = 1") == [(0,)]
+
+    def test_limited_import_does_not_delete(self, importer, manager):
+        run_import(importer, export(), delta=True)
+
+        data = export(works=5)
+        assert all(run_import(importer, data, delta=True, complete=False).values())
+        assert importer.import_stats['nomenclature']['deleted'] == 0
+        assert rows(manager, "SELECT COUNT(*) FROM works") == [(20,)]
+
+    def test_clear_existing_replaces_fingerprints(self, importer, manager):
+        run_import(importer, export(), delta=True)
+        run_import(importer, export(works=10), clear_existing=True)
+        assert len(manager.load_fingerprints('nomenclature')) == 10
+
+        # The cleared table holds only what the full import wrote: nothing to skip wrongly
+        assert all(run_import(importer, export(), delta=True).values())
+        assert importer.import_stats['nomenclature'] == {'written': 10, 'deleted': 0, 'skipped': 10, 'failed': 0}
+        assert rows(manager, "SELECT COUNT(*) FROM works") == [(20,)]
+
+
+def test_benchmark_weekly_refresh(importer, manager):
+    """A re-import where the composition of 2% of the works changed, against the full clear-and-reload"""
+    run_import(importer, export(WORKS, MATERIALS_PER_WORK), delta=True)
+
+    start = time.perf_counter()
+    assert all(run_import(importer, export(WORKS, MATERIALS_PER_WORK), clear_existing=True).values())
+    full_s = time.perf_counter() - start
+
+    data = export(WORKS, MATERIALS_PER_WORK)
+    for record in data['composition']:
+        if record['work_id'] % 50 == 0:
+            record['quantity_per_unit'] = 2.0
+    start = time.perf_counter()
+    assert all(run_import(importer, data, delta=True).values())
+    delta_s = time.perf_counter() - start
+
+    rows_total = WORKS * MATERIALS_PER_WORK
+    stats = importer.import_stats['composition']
+    print(f"\n{rows_total}-row composition refresh: full reload {full_s:.2f}s, "
+          f"delta {delta_s:.2f}s ({stats['written']} written, {stats['skipped']} skipped)")
+
+    assert stats['written'] == rows_total // 50
+    assert stats['skipped'] == rows_total - rows_total // 50
+    assert rows(manager, "SELECT COUNT(*) FROM work_specifications") == [(rows_total,)]
+    assert delta_s * 2 < full_s
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
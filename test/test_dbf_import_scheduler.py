@@ -0,0 +1,123 @@
+"""Tests for the dependency-aware parallel DBF import scheduler"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dbf_importer'))
+
+from core.scheduler import IMPORT_ORDER, ImportScheduler, dependency_levels
+
+# Simulated read+transform time per entity: composition is read first but must be written last
+READ_SECONDS = {'units': 0.3, 'materials': 0.1, 'nomenclature': 0.2, 'composition': 0.0}
+
+
+def fake_read(dbf_directory, entity_type, limit=None):
+    """Module-level so it can be sent to the process pool"""
+    time.sleep(READ_SECONDS[entity_type])
+    records = [{'id': i, 'name': f'{entity_type} {i}'} for i in range(10)]
+    if limit:
+        records = records[:limit]
+    return records, READ_SECONDS[entity_type]
+
+
+def failing_read(dbf_directory, entity_type, limit=None):
+    if entity_type == 'materials':
+        raise FileNotFoundError('SC25.DBF')
+    return fake_read(dbf_directory, entity_type, limit)
+
+
+class RecordingWriter:
+    """Writer side of DBFImporter: records the order entities land in"""
+
+    def __init__(self):
+        self.progress_callback = None
+        self.written = []
+        self.unit_mapping_size = None
+        self.complete = None
+
+    def _build_unit_mapping(self, data):
+        self.unit_mapping_size = len(data)
+
+    def _create_unit_mapping(self, dbf_directory):
+        self.unit_mapping_size = 0
+
+    def write_entity(self, entity_type, data, clear_existing=False, delta=False, complete=True):
+        self.written.append((entity_type, len(data)))
+        self.complete = complete
+        return True
+
+
+class ThreadedScheduler(ImportScheduler):
+    """Reads on threads: no process start-up in the timings"""
+
+    def _create_executor(self, entity_count):
+        return ThreadPoolExecutor(max_workers=entity_count)
+
+
+class TestDependencyLevels:
+    """Tests for grouping entity types by dependency level"""
+
+    def test_import_order(self):
+        assert dependency_levels(IMPORT_ORDER) == [
+            ['units'], ['materials', 'nomenclature'], ['composition']
+        ]
+
+    def test_missing_dependencies_are_already_imported(self):
+        assert dependency_levels(['composition', 'materials']) == [['materials'], ['composition']]
+
+    def test_cycle(self):
+        with pytest.raises(ValueError):
+            dependency_levels(['a', 'b'], {'a': ('b',), 'b': ('a',)})
+
+
+class TestImportScheduler:
+    """Tests for the scheduler writing through a single writer"""
+
+    def test_writes_follow_dependencies(self):
+        writer = RecordingWriter()
+        scheduler = ThreadedScheduler(writer, read_function=fake_read)
+        results = scheduler.run('dbf', IMPORT_ORDER, limit=5)
+
+        assert results == dict.fromkeys(IMPORT_ORDER, True)
+        order = [entity_type for entity_type, _ in writer.written]
+        assert order[0] == 'units' and order[-1] == 'composition'
+        # Units are read in full for the mapping but written up to the limit
+        assert writer.unit_mapping_size == 10
+        assert dict(writer.written) == dict.fromkeys(IMPORT_ORDER, 5)
+        # A limited import is not the whole export: delta must not delete the rest
+        assert writer.complete is False
+
+        # Reads overlap: the whole run takes about the slowest read, not their sum
+        assert scheduler.total_seconds < sum(READ_SECONDS.values())
+        assert scheduler.timings['units']['wait'] > 0
+        assert scheduler.timings['composition']['wait'] == 0
+        assert 'composition' in scheduler.format_timings()
+
+    def test_process_pool(self):
+        writer = RecordingWriter()
+        scheduler = ImportScheduler(writer, max_workers=2, read_function=fake_read)
+        assert all(scheduler.run('dbf', IMPORT_ORDER).values())
+        assert [entity_type for entity_type, _ in writer.written][-1] == 'composition'
+        assert scheduler.timings['units']['read'] == READ_SECONDS['units']
+
+    def test_in_process_reads(self):
+        writer = RecordingWriter()
+        scheduler = ImportScheduler(writer, max_workers=0, read_function=fake_read)
+        assert all(scheduler.run('dbf', ['nomenclature', 'composition']).values())
+        assert [entity_type for entity_type, _ in writer.written] == ['nomenclature', 'composition']
+        assert writer.unit_mapping_size == 0
+
+    def test_failed_prerequisite_skips_dependents(self):
+        writer = RecordingWriter()
+        scheduler = ImportScheduler(writer, max_workers=0, read_function=failing_read)
+        results = scheduler.run('dbf', IMPORT_ORDER)
+
+        assert results == {'units': True, 'materials': False, 'nomenclature': True, 'composition': False}
+        assert [entity_type for entity_type, _ in writer.written] == ['units', 'nomenclature']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
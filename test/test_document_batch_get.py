@@ -0,0 +1,166 @@
+"""Tests for fetching several documents with lines in one request"""
+import datetime
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models import sqlalchemy_models as models
+from src.services.reference_snapshot import get_reference_snapshot_cache
+from api.endpoints import documents
+from api.models.documents import MAX_BATCH_GET_DOCUMENTS
+
+DOCUMENT_COUNT = 20
+
+
+@pytest.fixture
+def connection(make_database):
+    path = make_database('documents.db', change_counters=True)
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        models.Person(id=1, full_name='Foreman'),
+        models.Person(id=2, full_name='Mason'),
+        models.Object(id=1, name='Tower'),
+        models.Unit(id=1, name='m3'),
+        models.Work(id=1, name='Masonry', unit_id=1),
+    ])
+    session.flush()
+    for i in range(1, DOCUMENT_COUNT + 1):
+        session.add(models.Estimate(
+            id=i, number=f'E-{i}', date=datetime.date(2025, 1, 1), object_id=1, responsible_id=1,
+            marked_for_deletion=(i == DOCUMENT_COUNT)
+        ))
+        session.add(models.DailyReport(id=i, date=datetime.date(2025, 1, i), estimate_id=i, foreman_id=1))
+        session.add(models.Timesheet(
+            id=i, number=f'T-{i}', date=datetime.date(2025, 1, 31), object_id=1, estimate_id=i,
+            foreman_id=1, month_year='2025-01'
+        ))
+    session.flush()
+    for i in range(1, DOCUMENT_COUNT + 1):
+        for line_number in (1, 2):
+            session.add(models.EstimateLine(
+                estimate_id=i, line_number=line_number, work_id=1, quantity=10 * line_number
+            ))
+            line = models.DailyReportLine(
+                daily_report_id=i, line_number=line_number, work_id=1, actual_labor=line_number
+            )
+            session.add(line)
+            session.flush()
+            session.add(models.DailyReportExecutor(report_line_id=line.id, executor_id=line_number))
+        session.add(models.TimesheetLine(
+            timesheet_id=i, line_number=1, employee_id=2, day_01=8.0, day_02=4.0
+        ))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    get_reference_snapshot_cache().clear()
+    yield conn
+    get_reference_snapshot_cache().clear()
+    conn.close()
+
+
+@pytest.fixture
+def client(connection, api_client):
+    return api_client(documents.router, connection=connection)
+
+
+@pytest.fixture
+def api(client, connection):
+    """POST helper returning (response, SQL statements run by the endpoint)"""
+    def post(url, body):
+        statements = []
+        connection.set_trace_callback(statements.append)
+
+        try:
+            return client.post(url, json=body), statements
+        finally:
+            connection.set_trace_callback(None)
+
+    return post
+
+
+def document_queries(statements, *tables):
+    """Statements reading the given document tables"""
+    return [
+        statement for statement in statements
+        if any(f'FROM {table} ' in statement for table in tables)
+    ]
+
+
+class TestEstimateBatchGet:
+    """Tests for POST /documents/estimates/batch-get"""
+
+    def test_two_queries_for_all_documents(self, api):
+        ids = list(range(1, DOCUMENT_COUNT))
+        response, statements = api('/api/documents/estimates/batch-get', {'ids': ids})
+
+        assert response.status_code == 200
+        data = response.json()['data']
+        assert sorted(int(key) for key in data) == ids
+        assert [line['quantity'] for line in data['3']['lines']] == [10, 20]
+        assert data['3']['lines'][0]['work_name'] == 'Masonry'
+        assert data['3']['object_name'] == 'Tower'
+        assert len(document_queries(statements, 'estimates', 'estimate_lines')) == 2
+
+    def test_missing_and_deleted_ids(self, api):
+        response, _ = api('/api/documents/estimates/batch-get', {'ids': [1, DOCUMENT_COUNT, 999, 1]})
+
+        body = response.json()
+        assert list(body['data']) == ['1']
+        assert body['missing'] == [DOCUMENT_COUNT, 999]
+
+    def test_matches_single_get(self, api, client):
+        single = client.get('/api/documents/estimates/2').json()['data']
+        batch = api('/api/documents/estimates/batch-get', {'ids': [2]})[0].json()['data']['2']
+        assert batch == single
+
+    def test_projection_skips_lines(self, api):
+        response, statements = api('/api/documents/estimates/batch-get', {
+            'ids': [1, 2], 'include_lines': False, 'fields': ['number', 'object_name']
+        })
+
+        data = response.json()['data']
+        assert data['1'] == {'id': 1, 'number': 'E-1', 'object_name': 'Tower'}
+        assert document_queries(statements, 'estimate_lines') == []
+
+    def test_limits(self, api):
+        assert api('/api/documents/estimates/batch-get', {'ids': []})[0].status_code == 422
+        too_many = list(range(MAX_BATCH_GET_DOCUMENTS + 1))
+        assert api('/api/documents/estimates/batch-get', {'ids': too_many})[0].status_code == 422
+
+
+class TestDailyReportAndTimesheetBatchGet:
+    """Tests for daily report and timesheet batch fetch"""
+
+    def test_daily_reports_with_executors(self, api):
+        ids = list(range(1, DOCUMENT_COUNT + 1))
+        response, statements = api('/api/documents/daily-reports/batch-get', {'ids': ids})
+
+        data = response.json()['data']
+        assert len(data) == DOCUMENT_COUNT
+        lines = data['5']['lines']
+        assert [line['executor_names'] for line in lines] == [['Foreman'], ['Mason']]
+        assert data['5']['foreman_name'] == 'Foreman'
+        # Headers, lines and executors regardless of the number of reports
+        assert len(document_queries(statements, 'daily_reports', 'daily_report_lines', 'daily_report_executors')) == 3
+
+    def test_timesheets(self, api):
+        response, statements = api('/api/documents/timesheets/batch-get', {'ids': [1, 2, 3]})
+
+        data = response.json()['data']
+        assert data['2']['lines'][0]['employee_name'] == 'Mason'
+        assert data['2']['lines'][0]['days'] == {'1': 8.0, '2': 4.0}
+        assert len(document_queries(statements, 'timesheets', 'timesheet_lines')) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,249 @@
+"""Tests and benchmark for patching individual document lines"""
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.document_line_patch import (
+    LinePatchConflict, LinePatchError, apply_line_patch, line_sync_columns
+)
+from api.endpoints import documents
+
+LINE_COUNT = 5000
+
+
+@pytest.fixture
+def connection(make_database):
+    conn = sqlite3.connect(make_database('documents.db'))
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        INSERT INTO persons (id, full_name, uuid, updated_at, is_deleted, marked_for_deletion, is_group)
+        VALUES (1, 'Foreman', 'p-1', CURRENT_TIMESTAMP, 0, 0, 0),
+               (2, 'Mason', 'p-2', CURRENT_TIMESTAMP, 0, 0, 0);
+        INSERT INTO estimates (id, number, date, estimate_type, marked_for_deletion, uuid, updated_at, is_deleted)
+        VALUES (1, 'E-1', '2025-01-01', 'General', 0, 'e-1', CURRENT_TIMESTAMP, 0);
+        INSERT INTO daily_reports (id, date, estimate_id, foreman_id, marked_for_deletion, uuid, updated_at, is_deleted)
+        VALUES (1, '2025-01-02', 1, 1, 0, 'd-1', CURRENT_TIMESTAMP, 0);
+        INSERT INTO timesheets (id, number, date, month_year, is_posted, marked_for_deletion, uuid, updated_at, is_deleted)
+        VALUES (1, 'T-1', '2025-01-31', '2025-01', 0, 0, 't-1', CURRENT_TIMESTAMP, 0);
+    """)
+    conn.executemany("""
+        INSERT INTO estimate_lines (
+            estimate_id, line_number, quantity, price, sum, planned_labor, is_group,
+            uuid, updated_at, is_deleted
+        ) VALUES (1, ?, 10, 5, 50, 2, 0, ?, '2025-01-01 00:00:00', 0)
+    """, [(i, f'el-{i}') for i in range(1, LINE_COUNT + 1)])
+    conn.execute("UPDATE estimates SET total_sum = ?, total_labor = ? WHERE id = 1", (50 * LINE_COUNT, 2 * LINE_COUNT))
+    conn.executemany("""
+        INSERT INTO daily_report_lines (
+            daily_report_id, line_number, planned_labor, actual_labor, uuid, updated_at, is_deleted
+        ) VALUES (1, ?, 10, 10, ?, CURRENT_TIMESTAMP, 0)
+    """, [(1, 'dl-1'), (2, 'dl-2')])
+    conn.execute("INSERT INTO daily_report_executors (report_line_id, executor_id) VALUES (1, 1)")
+    conn.execute("""
+        INSERT INTO timesheet_lines (timesheet_id, line_number, employee_id, hourly_rate, day_01,
+                                     total_hours, total_amount, uuid, updated_at, is_deleted)
+        VALUES (1, 1, 2, 100, 8, 8, 800, 'tl-1', CURRENT_TIMESTAMP, 0)
+    """)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def send(connection, api_client):
+    client = api_client(documents.router, connection=connection)
+    return lambda method, url, payload: client.request(method, url, json=payload)
+
+
+@pytest.fixture
+def api(send):
+    return lambda url, operations: send('PATCH', url, {'operations': operations})
+
+
+def line(connection, table, line_uuid):
+    row = connection.execute(f"SELECT * FROM {table} WHERE uuid = ?", (line_uuid,)).fetchone()
+    return dict(row) if row else None
+
+
+class TestApplyLinePatch:
+    """Tests for the line patch service"""
+
+    def test_update_touches_only_changed_line(self, connection):
+        before = connection.total_changes
+        result = apply_line_patch(connection, 'estimate', 1, [
+            {'op': 'update', 'uuid': 'el-7', 'values': {'quantity': 12, 'sum': 60}},
+        ])
+
+        assert (result.updated, result.inserted, result.deleted) == (1, 0, 0)
+        assert connection.total_changes - before == 1
+        assert line(connection, 'estimate_lines', 'el-7')['quantity'] == 12
+        assert line(connection, 'estimate_lines', 'el-7')['updated_at'] != '2025-01-01 00:00:00'
+        assert line(connection, 'estimate_lines', 'el-8')['updated_at'] == '2025-01-01 00:00:00'
+
+    def test_insert_delete_move(self, connection):
+        result = apply_line_patch(connection, 'estimate', 1, [
+            {'op': 'insert', 'uuid': 'el-new', 'line_number': 2, 'values': {'quantity': 3, 'sum': 15}},
+            {'op': 'delete', 'uuid': 'el-1'},
+            {'op': 'move', 'uuid': 'el-3', 'line_number': 1},
+        ])
+
+        assert (result.inserted, result.deleted, result.moved) == (1, 1, 1)
+        assert line(connection, 'estimate_lines', 'el-1') is None
+        assert line(connection, 'estimate_lines', 'el-3')['line_number'] == 1
+        inserted = line(connection, 'estimate_lines', 'el-new')
+        assert (inserted['estimate_id'], inserted['line_number'], inserted['is_deleted']) == (1, 2, 0)
+
+    def test_stale_and_malformed_patches(self, connection):
+        with pytest.raises(LinePatchConflict):
+            apply_line_patch(connection, 'estimate', 1, [{'op': 'update', 'uuid': 'missing', 'values': {'sum': 1}}])
+        with pytest.raises(LinePatchConflict):
+            apply_line_patch(connection, 'estimate', 2, [{'op': 'delete', 'uuid': 'el-1'}])
+        with pytest.raises(LinePatchConflict):
+            apply_line_patch(connection, 'estimate', 1, [{'op': 'insert', 'uuid': 'el-1', 'line_number': 1}])
+        with pytest.raises(LinePatchError):
+            apply_line_patch(connection, 'estimate', 1, [{'op': 'update', 'uuid': 'el-1', 'values': {'id': 5}}])
+        with pytest.raises(LinePatchError):
+            apply_line_patch(connection, 'estimate', 1, [{'op': 'insert', 'uuid': 'el-x'}])
+        with pytest.raises(LinePatchError):
+            apply_line_patch(connection, 'estimate', 1, [
+                {'op': 'delete', 'uuid': 'el-1'}, {'op': 'move', 'uuid': 'el-1', 'line_number': 3},
+            ])
+        assert line(connection, 'estimate_lines', 'el-1') is not None
+
+    def test_legacy_schema_without_uuid(self):
+        legacy = sqlite3.connect(':memory:')
+        legacy.execute("CREATE TABLE estimate_lines (id INTEGER PRIMARY KEY, estimate_id INTEGER, "
+                       "line_number INTEGER, quantity REAL)")
+        try:
+            with pytest.raises(LinePatchConflict):
+                apply_line_patch(legacy, 'estimate', 1, [{'op': 'delete', 'uuid': 'el-1'}])
+            assert line_sync_columns(legacy, 'estimate_lines').values() == ()
+        finally:
+            legacy.close()
+
+    def test_daily_report_deviation_and_executors(self, connection):
+        apply_line_patch(connection, 'daily_report', 1, [
+            {'op': 'update', 'uuid': 'dl-1', 'values': {'actual_labor': 12, 'executor_ids': [2, 2]}},
+            {'op': 'insert', 'uuid': 'dl-3', 'line_number': 3,
+             'values': {'planned_labor': 4, 'actual_labor': 2, 'executor_ids': [1]}},
+            {'op': 'delete', 'uuid': 'dl-2'},
+        ])
+
+        assert line(connection, 'daily_report_lines', 'dl-1')['deviation_percent'] == pytest.approx(20.0)
+        assert line(connection, 'daily_report_lines', 'dl-3')['deviation_percent'] == pytest.approx(-50.0)
+        executors = connection.execute("""
+            SELECT drl.uuid, dre.executor_id FROM daily_report_executors dre
+            JOIN daily_report_lines drl ON drl.id = dre.report_line_id
+            ORDER BY drl.uuid
+        """).fetchall()
+        assert [tuple(row) for row in executors] == [('dl-1', 2), ('dl-3', 1)]
+
+    def test_timesheet_days_and_totals(self, connection):
+        apply_line_patch(connection, 'timesheet', 1, [
+            {'op': 'update', 'uuid': 'tl-1', 'values': {'days': {'2': 4, '3': 6}}},
+        ])
+
+        patched = line(connection, 'timesheet_lines', 'tl-1')
+        assert (patched['day_01'], patched['day_02'], patched['day_03']) == (0, 4, 6)
+        assert (patched['total_hours'], patched['total_amount']) == (10, 1000)
+
+
+class TestLinePatchEndpoints:
+    """Tests for PATCH /documents/.../lines"""
+
+    def test_estimate_totals(self, api, connection):
+        response = api('/api/documents/estimates/1/lines', [
+            {'op': 'update', 'uuid': 'el-1', 'values': {'sum': 150, 'planned_labor': 5}},
+            {'op': 'delete', 'uuid': 'el-2'},
+        ])
+
+        assert response.status_code == 200
+        data = response.json()['data']
+        assert (data['updated'], data['deleted']) == (1, 1)
+        assert data['total_sum'] == 50 * LINE_COUNT + 100 - 50
+        assert data['total_labor'] == 2 * LINE_COUNT + 3 - 2
+
+    def test_errors(self, api, connection):
+        stale = api('/api/documents/estimates/1/lines', [{'op': 'delete', 'uuid': 'missing'}])
+        assert stale.status_code == 409
+        malformed = api('/api/documents/daily-reports/1/lines', [
+            {'op': 'update', 'uuid': 'dl-1', 'values': {'labor_deviation_percent': 1}},
+        ])
+        assert malformed.status_code == 400
+        assert api('/api/documents/estimates/99/lines', [{'op': 'delete', 'uuid': 'el-1'}]).status_code == 404
+
+        connection.execute("UPDATE timesheets SET is_posted = 1")
+        connection.commit()
+        posted = api('/api/documents/timesheets/1/lines', [{'op': 'delete', 'uuid': 'tl-1'}])
+        assert posted.status_code == 400
+
+    def test_lines_saved_in_full_can_be_patched(self, send, api, connection):
+        response = send('PUT', '/api/documents/estimates/1', {
+            'number': 'E-1', 'date': '2025-01-01',
+            'lines': [{'line_number': 1, 'quantity': 1, 'sum': 10}, {'line_number': 2, 'quantity': 2, 'sum': 20}],
+        })
+        assert response.status_code == 200
+
+        uuids = [row[0] for row in connection.execute(
+            "SELECT uuid FROM estimate_lines WHERE estimate_id = 1 ORDER BY line_number"
+        )]
+        assert len(set(uuids)) == 2 and all(uuids)
+
+        patched = api('/api/documents/estimates/1/lines', [{'op': 'update', 'uuid': uuids[1], 'values': {'sum': 25}}])
+        assert patched.status_code == 200
+        assert patched.json()['data']['total_sum'] == 35
+
+
+def rewrite_all_lines(connection, lines):
+    """The full-save path: delete every line and insert each one again"""
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM estimate_lines WHERE estimate_id = ?", (1,))
+    for values in lines:
+        cursor.execute("""
+            INSERT INTO estimate_lines (
+                estimate_id, line_number, quantity, price, sum, planned_labor, is_group,
+                uuid, updated_at, is_deleted
+            ) VALUES (1, ?, ?, ?, ?, ?, 0, ?, CURRENT_TIMESTAMP, 0)
+        """, (values['line_number'], values['quantity'], values['price'], values['sum'],
+              values['planned_labor'], values['uuid']))
+    connection.commit()
+
+
+def test_benchmark_single_edit_in_large_estimate(connection):
+    lines = [
+        dict(row) for row in connection.execute(
+            "SELECT line_number, quantity, price, sum, planned_labor, uuid FROM estimate_lines ORDER BY line_number"
+        )
+    ]
+    lines[2500]['quantity'] = 11
+
+    before = connection.total_changes
+    start = time.perf_counter()
+    rewrite_all_lines(connection, lines)
+    rewrite_ms = (time.perf_counter() - start) * 1000
+    rewrite_rows = connection.total_changes - before
+
+    before = connection.total_changes
+    start = time.perf_counter()
+    apply_line_patch(connection, 'estimate', 1, [
+        {'op': 'update', 'uuid': lines[2500]['uuid'], 'values': {'quantity': 12}},
+    ])
+    connection.commit()
+    patch_ms = (time.perf_counter() - start) * 1000
+    patch_rows = connection.total_changes - before
+
+    print(f"\nOne edit in a {LINE_COUNT}-line estimate: full rewrite {rewrite_ms:.1f}ms / {rewrite_rows} rows, "
+          f"patch {patch_ms:.1f}ms / {patch_rows} rows")
+
+    assert rewrite_rows == 2 * LINE_COUNT
+    assert patch_rows == 1
+    assert patch_ms < rewrite_ms
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
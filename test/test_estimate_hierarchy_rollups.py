@@ -0,0 +1,156 @@
+"""Tests for SQL-side rollups of general/plan estimate hierarchies"""
+import datetime
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models import sqlalchemy_models as models
+from src.data.repositories.estimate_hierarchy_repository import load_hierarchy_rollups
+from api.endpoints import documents
+
+PLANS_PER_GENERAL = 150
+
+
+@pytest.fixture
+def database(make_database):
+    """Two general estimates with plans, plan lines and posted daily report movements"""
+    path = make_database('hierarchy.db')
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        models.Unit(id=1, name='m3'),
+        models.Work(id=1, name='Masonry', unit_id=1),
+        models.Work(id=2, name='Plaster', unit_id=1),
+        models.Estimate(id=1, number='G-1', date=datetime.date(2025, 1, 1), estimate_type='General',
+                        total_sum=1000000, total_labor=5000),
+        models.Estimate(id=2, number='G-2', date=datetime.date(2025, 2, 1), estimate_type='General',
+                        total_sum=10, total_labor=1),
+    ])
+    session.flush()
+
+    plan_id = 100
+    for general_id in (1, 2):
+        for i in range(PLANS_PER_GENERAL):
+            plan_id += 1
+            session.add(models.Estimate(
+                id=plan_id, number=f'P-{plan_id}', date=datetime.date(2025, 1, 2), estimate_type='Plan',
+                base_document_id=general_id, total_sum=100, total_labor=2,
+                marked_for_deletion=(i == 0)
+            ))
+            session.flush()
+            session.add_all([
+                models.EstimateLine(estimate_id=plan_id, line_number=1, is_group=True, group_name='Walls'),
+                models.EstimateLine(estimate_id=plan_id, line_number=2, work_id=1, quantity=3, sum=60,
+                                    planned_labor=1.5),
+                models.EstimateLine(estimate_id=plan_id, line_number=3, work_id=2, quantity=1, sum=40,
+                                    planned_labor=0.5),
+            ])
+            session.add(models.WorkExecutionRegister(
+                recorder_type='daily_report', recorder_id=plan_id, line_number=1,
+                period=datetime.date(2025, 1, 3), estimate_id=plan_id, work_id=1,
+                quantity_expense=1.0, sum_expense=20.0
+            ))
+    # Movement posted directly against a general estimate
+    session.add(models.WorkExecutionRegister(
+        recorder_type='daily_report', recorder_id=1, line_number=1, period=datetime.date(2025, 1, 3),
+        estimate_id=1, work_id=2, quantity_expense=2.0, sum_expense=30.0
+    ))
+    session.commit()
+    session.close()
+    yield engine, path
+    engine.dispose()
+
+
+@pytest.fixture
+def connection(database):
+    conn = sqlite3.connect(database[1])
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def traced(connection, *args, **kwargs):
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        return load_hierarchy_rollups(connection, *args, **kwargs), statements
+    finally:
+        connection.set_trace_callback(None)
+
+
+class TestHierarchyRollups:
+    """Tests for load_hierarchy_rollups"""
+
+    def test_totals_per_general_estimate(self, connection):
+        rollups, statements = traced(connection)
+
+        assert [rollup['number'] for rollup in rollups] == ['G-2', 'G-1']
+        first = next(rollup for rollup in rollups if rollup['id'] == 1)
+        # Plans marked for deletion are counted, as in the plan listings
+        assert first['plan_count'] == PLANS_PER_GENERAL
+        assert first['plan_sum'] == pytest.approx(100 * PLANS_PER_GENERAL)
+        assert first['plan_labor'] == pytest.approx(2 * PLANS_PER_GENERAL)
+        # Movements of every plan plus the general's own
+        assert first['executed_sum'] == pytest.approx(20 * PLANS_PER_GENERAL + 30)
+        assert first['executed_quantity'] == pytest.approx(PLANS_PER_GENERAL + 2)
+        assert 'works' not in first
+        assert len(statements) == 2
+
+    def test_work_breakdown(self, connection):
+        rollups, statements = traced(connection, [1], include_works=True)
+
+        assert len(rollups) == 1
+        works = {work['work_name']: work for work in rollups[0]['works']}
+        assert set(works) == {'Masonry', 'Plaster'}
+        assert works['Masonry']['planned_quantity'] == pytest.approx(3 * PLANS_PER_GENERAL)
+        assert works['Masonry']['planned_sum'] == pytest.approx(60 * PLANS_PER_GENERAL)
+        assert works['Masonry']['executed_sum'] == pytest.approx(20 * PLANS_PER_GENERAL)
+        assert works['Plaster']['planned_labor'] == pytest.approx(0.5 * PLANS_PER_GENERAL)
+        assert works['Plaster']['executed_quantity'] == pytest.approx(2.0)
+        assert len(statements) == 3
+
+    def test_query_count_does_not_grow_with_plans(self, connection):
+        _, few = traced(connection, [2], include_works=True)
+        _, all_generals = traced(connection, include_works=True)
+        assert len(few) == len(all_generals) == 3
+
+    def test_sqlalchemy_session(self, database):
+        session = sessionmaker(bind=database[0])()
+        try:
+            rollups = load_hierarchy_rollups(session, [1, 2, 999])
+        finally:
+            session.close()
+        assert sorted(rollup['id'] for rollup in rollups) == [1, 2]
+
+    def test_deleted_general_estimate(self, connection):
+        connection.execute("UPDATE estimates SET marked_for_deletion = 1 WHERE id = 2")
+
+        assert [rollup['id'] for rollup in load_hierarchy_rollups(connection)] == [1]
+        # Still reported when asked for explicitly, e.g. for its hierarchy summary
+        rollups = load_hierarchy_rollups(connection, [2])
+        assert [rollup['plan_count'] for rollup in rollups] == [PLANS_PER_GENERAL]
+
+    def test_empty_selection(self, connection):
+        assert load_hierarchy_rollups(connection, []) == []
+
+
+def test_rollups_endpoint(connection, api_client):
+    api = api_client(documents.router, connection=connection)
+
+    response = api.get('/api/documents/estimates/hierarchy-rollups?ids=2&include_works=true')
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert [rollup['id'] for rollup in data] == [2]
+    assert len(data[0]['works']) == 2
+
+    assert api.get('/api/documents/estimates/hierarchy-rollups?ids=x').status_code == 400
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
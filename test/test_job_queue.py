@@ -0,0 +1,253 @@
+"""Tests for the background job queue and its progress stream"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.sqlalchemy_base import Base
+from src.data.models import sqlalchemy_models  # noqa: F401 - registers the tables
+from src.data.repositories.background_job_repository import BackgroundJobRepository
+from src.services import job_queue as job_queue_module
+from src.services import job_types
+from src.services.job_queue import JobQueue, current_owner, register_job_type
+from api.endpoints import documents, jobs
+from api.models.auth import UserInfo
+
+# Lets the blocking test job run until a test releases it
+release = threading.Event()
+
+
+def count_job(job, steps, fail_at=None):
+    for step in range(1, steps + 1):
+        if step == fail_at:
+            raise RuntimeError(f"step {step} failed")
+        job.progress(step, steps, f"step {step}")
+    return {'steps': steps}
+
+
+def blocking_job(job):
+    job.progress(0, 1, "waiting")
+    while not release.wait(0.01):
+        job.check_cancelled()
+    job.progress(1, 1)
+    return {}
+
+
+def polling_job(job):
+    step = 0
+    while not release.wait(0.01):
+        step += 1
+        job.progress(step)
+    return {}
+
+
+register_job_type('test_count', "Count", count_job, admin_only=False, parameters={'steps': int, 'fail_at': int})
+register_job_type('test_blocking', "Blocking", blocking_job)
+register_job_type('test_polling', "Polling", polling_job)
+
+
+@pytest.fixture
+def queue():
+    release.clear()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'jobs.db')}")
+        Base.metadata.create_all(engine, tables=[sqlalchemy_models.BackgroundJob.__table__])
+        job_queue = JobQueue(BackgroundJobRepository(engine), max_workers=2)
+        yield job_queue
+        release.set()
+        job_queue.shutdown()
+        engine.dispose()
+
+
+def drain(subscription, until_status, timeout=5.0):
+    events = []
+    while True:
+        event = subscription.get(timeout=timeout)
+        assert event is not None, f"no {until_status} event, got {events}"
+        events.append(event)
+        if event['status'] == until_status:
+            return events
+
+
+class TestJobQueue:
+    """Tests for running, failing and cancelling jobs"""
+
+    def test_progress_and_result(self, queue):
+        with queue.subscribe() as subscription:
+            job = queue.submit('test_count', {'steps': 3}, created_by=7)
+            events = drain(subscription, 'succeeded')
+
+        assert events[0]['status'] == 'queued'
+        assert [e['current'] for e in events if e['status'] == 'running' and e['total']] == [1, 2, 3]
+        assert events[-1]['result'] == {'steps': 3}
+
+        stored = queue.get(job['id'])
+        assert (stored['status'], stored['current'], stored['total']) == ('succeeded', 3, 3)
+        assert stored['parameters'] == {'steps': 3}
+        assert stored['finished_at'] is not None
+        assert [j['id'] for j in queue.list(created_by=7)] == [job['id']]
+
+    def test_failure_is_stored(self, queue):
+        job = queue.submit('test_count', {'steps': 3, 'fail_at': 2})
+        stored = queue.wait(job['id'], timeout=5)
+        assert stored['status'] == 'failed'
+        assert stored['error'] == 'step 2 failed'
+        assert stored['current'] == 1
+
+    def test_cancel_running_job(self, queue):
+        with queue.subscribe() as subscription:
+            job = queue.submit('test_blocking')
+            drain(subscription, 'running')
+            assert queue.cancel(job['id'])
+            events = drain(subscription, 'cancelled')
+
+        assert events[-1]['job_id'] == job['id']
+        assert not queue.cancel(job['id'])
+        assert queue.get(job['id'])['status'] == 'cancelled'
+
+    def test_cancel_through_table(self, queue):
+        """A cancellation written by another process is noticed at the next persisted update"""
+        with queue.subscribe() as subscription:
+            job = queue.submit('test_polling')
+            drain(subscription, 'running')
+        assert queue.repository.request_cancel(job['id'])
+        assert not queue.is_cancelled(job['id'])
+
+        stored = queue.wait(job['id'], timeout=5)
+        assert stored['status'] == 'cancelled'
+        assert stored['current'] > 0
+
+    def test_unknown_type(self, queue):
+        with pytest.raises(ValueError):
+            queue.submit('no_such_job')
+
+    def test_recover_interrupted(self, queue):
+        queue.repository.create('left-over', 'test_count', {'steps': 1})
+        assert queue.recover_interrupted() == 1
+        stored = queue.get('left-over')
+        assert (stored['status'], stored['error']) == ('failed', 'Interrupted by a restart')
+
+    def test_recover_keeps_jobs_of_running_processes(self, queue):
+        """Jobs of a live process (e.g. the desktop app) or of another host are not failed"""
+        host = socket.gethostname()
+        queue.repository.create('own', 'test_count', {'steps': 1}, owner=current_owner())
+        queue.repository.create('parent', 'test_count', {'steps': 1}, owner=f"{host}:{os.getppid()}")
+        queue.repository.create('remote', 'test_count', {'steps': 1}, owner="other-host:1")
+        queue.repository.create('dead', 'test_count', {'steps': 1}, owner=f"{host}:{2 ** 22 + 1}")
+
+        assert queue.recover_interrupted() == 1
+        assert [queue.get(job_id)['status'] for job_id in ('own', 'parent', 'remote', 'dead')] == [
+            'queued', 'queued', 'queued', 'failed'
+        ]
+
+    def test_parameters_are_validated(self, queue):
+        for parameters in ({'steps': 2, 'path': '/etc'}, {'steps': '2'}, {'steps': True}, {}):
+            with pytest.raises(ValueError):
+                queue.submit('test_count', parameters)
+        assert queue.list() == []
+
+    def test_excel_import_only_deletes_uploads(self, queue):
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt') as outside:
+            outside.write(b'not an excel file')
+        try:
+            job = queue.submit('estimate_excel_import', {'file_path': outside.name})
+            assert queue.wait(job['id'], timeout=10)['status'] == 'failed'
+            assert os.path.exists(outside.name)
+        finally:
+            os.unlink(outside.name)
+
+        with tempfile.NamedTemporaryFile(delete=False, dir=job_types.upload_directory(), suffix='.xlsx') as upload:
+            upload.write(b'not an excel file')
+        job = queue.submit('estimate_excel_import', {'file_path': upload.name})
+        assert queue.wait(job['id'], timeout=10)['status'] == 'failed'
+        assert not os.path.exists(upload.name)
+
+    def test_async_subscription(self, queue):
+        async def scenario():
+            subscription = queue.subscribe(loop=asyncio.get_running_loop())
+            try:
+                assert await subscription.get_async(0.01) is None
+                job = await asyncio.to_thread(queue.submit, 'test_count', {'steps': 1})
+                events = []
+                while not events or events[-1]['status'] != 'succeeded':
+                    event = await subscription.get_async(5)
+                    assert event is not None
+                    events.append(event)
+                return job, events
+            finally:
+                subscription.close()
+
+        job, events = asyncio.run(scenario())
+        assert {event['job_id'] for event in events} == {job['id']}
+
+    def test_builtin_job_types_registered(self):
+        names = {job_type.name for job_type in job_queue_module.get_job_types()}
+        assert {'dbf_import', 'unit_migration', 'uuid_migration', 'estimate_excel_import',
+                'bulk_post', 'bulk_unpost'} <= names
+
+
+def test_job_endpoints(queue, api_client):
+    api = api_client(jobs.router, overrides={jobs.get_queue: lambda: queue})
+
+    submitted = api.post('/api/jobs', json={'job_type': 'test_count', 'parameters': {'steps': 4}})
+    assert submitted.status_code == 202
+    job_id = submitted.json()['data']['id']
+
+    # The event stream ends with the job, so the whole response can be read at once
+    response = api.get(f'/api/jobs/{job_id}/events')
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = [json.loads(line[len('data: '):]) for line in response.text.splitlines()
+              if line.startswith('data: ')]
+    assert events[-1]['status'] == 'succeeded'
+    assert events[-1]['result'] == {'steps': 4}
+
+    assert api.post('/api/jobs', json={'job_type': 'no_such_job'}).status_code == 400
+    internal = api.post('/api/jobs', json={
+        'job_type': 'estimate_excel_import', 'parameters': {'file_path': '/tmp/construction.db'}
+    })
+    assert internal.status_code == 400
+    bad_parameters = api.post('/api/jobs', json={
+        'job_type': 'test_count', 'parameters': {'steps': 1, 'file_path': '/tmp/x'}
+    })
+    assert bad_parameters.status_code == 400
+    types = api.get('/api/jobs/types')
+    assert 'estimate_excel_import' not in {job_type['name'] for job_type in types.json()['data']}
+    assert api.get('/api/jobs/00000000-0000-0000-0000-000000000000').status_code == 404
+    assert api.post(f'/api/jobs/{job_id}/cancel').status_code == 409
+
+    # Same user without the admin role: listings show their own jobs only
+    api.user = UserInfo(id=1, username='admin', role='user', is_active=True)
+    assert api.post('/api/jobs', json={'job_type': 'test_blocking'}).status_code == 403
+    assert len(api.get('/api/jobs').json()['data']) == 1
+
+
+def test_excel_import_endpoint_queues_job(queue, api_client):
+    api = api_client(documents.router, user=UserInfo(id=3, username='user', role='user', is_active=True),
+                     overrides={jobs.get_queue: lambda: queue})
+
+    def upload(filename):
+        return api.post('/api/documents/estimates/import-excel', files={'file': (filename, b'not an excel file')})
+
+    response = upload('estimate.xlsx')
+    assert response.status_code == 202
+    job = response.json()['data']
+    assert (job['job_type'], job['created_by']) == ('estimate_excel_import', 3)
+    assert os.path.dirname(job['parameters']['file_path']) == job_types.upload_directory()
+
+    # The request returned before the import ran; the job removes the upload either way
+    assert queue.wait(job['id'], timeout=10)['status'] == 'failed'
+    assert not os.path.exists(job['parameters']['file_path'])
+
+    assert upload('estimate.csv').status_code == 400
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
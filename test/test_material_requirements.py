@@ -0,0 +1,255 @@
+"""Tests and benchmark for exploding estimates into material requirements"""
+import csv
+import datetime
+import io
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models import sqlalchemy_models as models
+from src.services.material_requirements import (
+    RequirementSource, explode, get_material_requirements_cache, iter_csv, iter_xlsx
+)
+from api.endpoints import documents
+
+WORK_COUNT = 500
+SPECIFIED_WORKS = 100
+LINE_COUNT = 3000
+
+
+@pytest.fixture
+def database(make_database):
+    """Works 1-400 with a cost item/material composition, 401-500 with specifications"""
+    path = make_database('requirements.db', change_counters=True)
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        models.Unit(id=1, name='m3'),
+        models.Unit(id=2, name='kg'),
+        models.Unit(id=3, name='h'),
+        models.Material(id=1, code='M-1', description='Brick', price=10, unit_id=1),
+        models.Material(id=2, code='M-2', description='Mortar', price=2, unit_id=2),
+        models.CostItem(id=1, code='C-1', description='Masonry labor', price=5, labor_coefficient=0.5, unit_id=3),
+    ])
+    session.flush()
+    for work_id in range(1, WORK_COUNT + 1):
+        session.add(models.Work(id=work_id, name=f'Work {work_id}', unit_id=1))
+    session.flush()
+    for work_id in range(1, WORK_COUNT + 1):
+        session.add_all([
+            models.CostItemMaterial(work_id=work_id, cost_item_id=1, material_id=1, quantity_per_unit=2),
+            models.CostItemMaterial(work_id=work_id, cost_item_id=1, material_id=2, quantity_per_unit=3),
+            models.CostItemMaterial(work_id=work_id, cost_item_id=1, material_id=None),
+        ])
+        if work_id > WORK_COUNT - SPECIFIED_WORKS:
+            session.add_all([
+                models.WorkSpecification(work_id=work_id, component_type='Material', component_name='Brick',
+                                         material_id=1, unit_id=1, consumption_rate=4, unit_price=10),
+                models.WorkSpecification(work_id=work_id, component_type='Labor', component_name='Mason',
+                                         unit_id=3, consumption_rate=1.5, unit_price=20),
+                models.WorkSpecification(work_id=work_id, component_type='Equipment', component_name='Crane',
+                                         unit_id=3, consumption_rate=1, unit_price=7, marked_for_deletion=True),
+            ])
+    session.add(models.Estimate(id=1, number='E-1', date=datetime.date(2025, 1, 1)))
+    session.add(models.Estimate(id=2, number='E-2', date=datetime.date(2025, 1, 1)))
+    session.flush()
+    session.add(models.EstimateLine(estimate_id=1, line_number=0, is_group=True, group_name='Walls', quantity=99))
+    for i in range(1, LINE_COUNT + 1):
+        session.add(models.EstimateLine(estimate_id=1, line_number=i, work_id=(i - 1) % WORK_COUNT + 1, quantity=1))
+    session.add(models.EstimateLine(estimate_id=2, line_number=1, work_id=1, quantity=10))
+
+    session.add(models.DailyReport(id=1, date=datetime.date(2025, 1, 10), estimate_id=1))
+    session.add(models.DailyReport(id=2, date=datetime.date(2025, 2, 10), estimate_id=1))
+    session.flush()
+    session.add(models.DailyReportLine(daily_report_id=1, line_number=1, work_id=1, actual_labor=4))
+    session.add(models.DailyReportLine(daily_report_id=2, line_number=1, work_id=1, actual_labor=100))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    get_material_requirements_cache().clear()
+    yield conn, path
+    get_material_requirements_cache().clear()
+    conn.close()
+
+
+@pytest.fixture
+def connection(database):
+    return database[0]
+
+
+def by_name(rows):
+    return {row['name']: row for row in rows}
+
+
+class TestExplode:
+    """Tests for the explosion query"""
+
+    def test_estimate_requirements(self, connection):
+        requirements = explode(connection, RequirementSource.estimates([1]))
+
+        # Every work appears LINE_COUNT / WORK_COUNT times with quantity 1
+        per_work = LINE_COUNT // WORK_COUNT
+        composed = (WORK_COUNT - SPECIFIED_WORKS) * per_work
+        specified = SPECIFIED_WORKS * per_work
+        materials = by_name(requirements['materials'])
+        assert set(materials) == {'Brick', 'Mortar'}
+        assert materials['Brick']['quantity'] == pytest.approx(2 * composed + 4 * specified)
+        assert materials['Brick']['amount'] == pytest.approx(10 * (2 * composed + 4 * specified))
+        assert materials['Brick']['unit'] == 'm3'
+        assert materials['Mortar']['quantity'] == pytest.approx(3 * composed)
+
+        cost_item = requirements['cost_items'][0]
+        assert (cost_item['name'], cost_item['unit']) == ('Masonry labor', 'h')
+        assert cost_item['amount'] == pytest.approx(5 * composed)
+        assert cost_item['labor'] == pytest.approx(0.5 * composed)
+
+        assert by_name(requirements['labor'])['Mason']['quantity'] == pytest.approx(1.5 * specified)
+        assert requirements['other'] == []
+        assert requirements['totals']['amount'] == pytest.approx(
+            sum(row['amount'] for group in ('materials', 'cost_items', 'labor') for row in requirements[group])
+        )
+
+    def test_daily_report_period(self, connection):
+        source = RequirementSource.daily_reports(datetime.date(2025, 1, 1), datetime.date(2025, 1, 31))
+        requirements = explode(connection, source)
+
+        assert by_name(requirements['materials'])['Brick']['quantity'] == pytest.approx(8)
+        assert requirements['totals']['labor'] == pytest.approx(2)
+
+    def test_sqlalchemy_session_and_empty_selection(self, database):
+        engine = create_engine(f'sqlite:///{database[1]}')
+        session = sessionmaker(bind=engine)()
+        try:
+            requirements = explode(session, RequirementSource.estimates([2]))
+        finally:
+            session.close()
+            engine.dispose()
+        assert by_name(requirements['materials'])['Mortar']['quantity'] == pytest.approx(30)
+
+        empty = explode(database[0], RequirementSource.estimates([]))
+        assert empty['materials'] == [] and empty['totals']['amount'] == 0
+
+
+class TestRequirementsCache:
+    """Tests for caching per change counter versions"""
+
+    def test_reused_until_rates_change(self, connection):
+        cache = get_material_requirements_cache()
+        source = RequirementSource.estimates([2])
+
+        first = cache.get(connection, source)
+        assert cache.get(connection, source) is first
+        assert cache.loads == 1
+
+        connection.execute("UPDATE cost_item_materials SET quantity_per_unit = 5 WHERE work_id = 1 AND material_id = 2")
+        connection.commit()
+        changed = cache.get(connection, source)
+        assert cache.loads == 2
+        assert by_name(changed['materials'])['Mortar']['quantity'] == pytest.approx(50)
+
+
+class TestExport:
+    """Tests for CSV and XLSX export"""
+
+    def test_csv(self, connection):
+        requirements = explode(connection, RequirementSource.estimates([2]))
+        content = b''.join(iter_csv(requirements)).decode('utf-8-sig')
+
+        rows = list(csv.reader(io.StringIO(content), delimiter=';'))
+        assert rows[0][2] == 'Наименование'
+        assert [row[2] for row in rows[1:]] == ['Brick', 'Mortar', 'Masonry labor']
+
+    def test_xlsx(self, connection):
+        requirements = explode(connection, RequirementSource.estimates([1]))
+        workbook = load_workbook(io.BytesIO(b''.join(iter_xlsx(requirements))), read_only=True)
+
+        rows = list(workbook.active.iter_rows(values_only=True))
+        assert len(rows) == 1 + 4
+        assert rows[1][2] == 'Brick'
+
+
+def test_endpoints(connection, api_client):
+    api = api_client(documents.router, connection=connection)
+
+    response = api.get('/api/documents/estimates/material-requirements?ids=2')
+    assert response.status_code == 200
+    assert by_name(response.json()['data']['materials'])['Mortar']['quantity'] == pytest.approx(30)
+
+    export = api.get('/api/documents/estimates/material-requirements?ids=1,2&format=xlsx')
+    assert export.status_code == 200
+    assert 'material_requirements.xlsx' in export.headers['content-disposition']
+
+    period = api.get(
+        '/api/documents/daily-reports/material-requirements?date_from=2025-02-01&date_to=2025-02-28&format=csv'
+    )
+    assert period.status_code == 200
+    assert period.headers['content-type'].startswith('text/csv')
+
+    assert api.get('/api/documents/estimates/material-requirements?ids=x').status_code == 400
+
+
+def composition_per_line(session, estimate_id):
+    """The previous approach: load the composition of each line's work separately"""
+    lines = session.query(models.EstimateLine).filter(
+        models.EstimateLine.estimate_id == estimate_id, models.EstimateLine.work_id.isnot(None)
+    ).all()
+    materials = {}
+    for line in lines:
+        associations = session.query(models.CostItemMaterial).options(
+            joinedload(models.CostItemMaterial.cost_item).joinedload(models.CostItem.unit_ref),
+            joinedload(models.CostItemMaterial.material).joinedload(models.Material.unit_ref)
+        ).filter(models.CostItemMaterial.work_id == line.work_id).all()
+        for association in associations:
+            if association.material_id:
+                materials[association.material_id] = (
+                    materials.get(association.material_id, 0) + association.quantity_per_unit * line.quantity
+                )
+    return materials
+
+
+def test_benchmark_estimate_explosion(database):
+    connection, path = database
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    try:
+        start = time.perf_counter()
+        composition_per_line(session, 1)
+        per_line_ms = (time.perf_counter() - start) * 1000
+    finally:
+        session.close()
+        engine.dispose()
+
+    statements = []
+    connection.set_trace_callback(statements.append)
+    start = time.perf_counter()
+    explode(connection, RequirementSource.estimates([1]))
+    explode_ms = (time.perf_counter() - start) * 1000
+    connection.set_trace_callback(None)
+
+    cache = get_material_requirements_cache()
+    cache.get(connection, RequirementSource.estimates([1]))
+    start = time.perf_counter()
+    cache.get(connection, RequirementSource.estimates([1]))
+    cached_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{LINE_COUNT}-line estimate: composition per line {per_line_ms:.0f}ms, "
+          f"explosion {explode_ms:.1f}ms, cached {cached_ms:.2f}ms")
+
+    assert len(statements) == 1
+    assert explode_ms < per_line_ms
+    assert cached_ms < explode_ms
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
@@ -0,0 +1,239 @@
+"""Tests and benchmark for month-close snapshots of the payroll register"""
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.repositories import payroll_snapshot_repository as snapshots
+from src.data.repositories.payroll_register_repository import PayrollRegisterRepository
+from api.endpoints import registers
+from api.models.auth import UserInfo
+
+EMPLOYEES = 150
+YEARS = (2023, 2024, 2025)
+
+INSERT_RECORD = """
+    INSERT INTO payroll_register (
+        recorder_type, recorder_id, line_number, period, object_id, estimate_id,
+        employee_id, work_date, hours_worked, amount
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def timesheet_rows(employees, years):
+    """One timesheet per object and month, a record per employee and working day"""
+    rows = []
+    recorder_id = 0
+    for year in years:
+        for month in range(1, 13):
+            for object_id in (1, 2):
+                recorder_id += 1
+                for employee_id in range(object_id, employees + 1, 2):
+                    for day in range(1, 22):
+                        work_date = f'{year}-{month:02d}-{day:02d}'
+                        rows.append(('timesheet', recorder_id, employee_id, work_date, object_id, object_id * 10,
+                                     employee_id, work_date, 8, 8 * (100 + employee_id)))
+    return rows
+
+
+@pytest.fixture
+def database(make_database):
+    path = make_database('payroll.db')
+    engine = create_engine(f'sqlite:///{path}')
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        INSERT INTO persons (id, full_name, uuid, updated_at, is_deleted, marked_for_deletion, is_group)
+        VALUES (1, 'Ivanov', 'p-1', CURRENT_TIMESTAMP, 0, 0, 0), (2, 'Petrov', 'p-2', CURRENT_TIMESTAMP, 0, 0, 0);
+    """)
+    conn.executemany(INSERT_RECORD, [
+        ('timesheet', 1, 1, '2025-01-10', 1, None, 1, '2025-01-10', 8, 800),
+        ('timesheet', 1, 2, '2025-01-11', 1, None, 1, '2025-01-11', 4, 400),
+        ('timesheet', 1, 3, '2025-01-10', 1, None, 2, '2025-01-10', 8, 640),
+        ('timesheet', 2, 1, '2025-02-03', 1, None, 1, '2025-02-03', 8, 800),
+        ('timesheet', 3, 1, '2025-03-03', 1, None, 2, '2025-03-03', 6, 480),
+    ])
+    conn.commit()
+    yield engine, conn
+    conn.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def connection(database):
+    return database[1]
+
+
+def direct_totals(connection, where="1 = 1"):
+    """Totals per employee summed straight from the register"""
+    return {
+        row[0]: (row[1], row[2], row[3]) for row in connection.execute(f"""
+            SELECT employee_id, SUM(hours_worked), SUM(amount), COUNT(*)
+            FROM payroll_register WHERE {where} GROUP BY employee_id
+        """)
+    }
+
+
+def snapshot_totals(connection, filters=None):
+    return {
+        row['employee_id']: (row['hours_worked'], row['amount'], row['record_count'])
+        for row in snapshots.load_totals(connection, ['employee'], filters)
+    }
+
+
+class TestClosePeriod:
+    """Tests for closing and reopening months"""
+
+    def test_close_through_month(self, connection):
+        assert snapshots.close_period(connection, '2025-02') == 2
+        assert snapshots.close_period(connection, date(2025, 1, 31)) == 0
+        connection.commit()
+
+        assert snapshots.closed_through(connection) == '2025-02'
+        stored = connection.execute(
+            "SELECT hours_worked, amount, record_count FROM payroll_period_snapshots "
+            "WHERE month = '2025-01' AND employee_id = 1"
+        ).fetchone()
+        assert tuple(stored) == (12, 1200, 2)
+        assert connection.execute(
+            "SELECT COUNT(*) FROM payroll_period_snapshots WHERE month = '2025-03'"
+        ).fetchone()[0] == 0
+
+    def test_totals_combine_snapshots_and_open_months(self, connection):
+        snapshots.close_period(connection, '2025-02')
+        # Written behind the snapshots' back: closed months must not read the register
+        connection.execute("UPDATE payroll_register SET amount = 0 WHERE work_date < '2025-03-01'")
+
+        totals = snapshot_totals(connection)
+        assert totals[1] == (20, 2000, 3)
+        assert totals[2] == (14, 1120, 2)
+
+        by_month = snapshots.load_totals(connection, ['employee', 'month'], {'month_from': '2025-02'})
+        assert [(row['employee_name'], row['month'], row['amount']) for row in by_month] == [
+            ('Ivanov', '2025-02', 800), ('Petrov', '2025-03', 480)
+        ]
+        assert 'estimate_id' not in by_month[0]
+
+        with pytest.raises(ValueError):
+            snapshots.load_totals(connection, ['brigade'])
+
+    def test_reopen(self, connection):
+        snapshots.close_period(connection, '2025-02')
+        assert snapshots.reopen_period(connection, '2025-02') == 1
+        assert snapshots.closed_through(connection) == '2025-01'
+        assert snapshot_totals(connection) == direct_totals(connection)
+
+
+class TestRepostIntoClosedPeriod:
+    """Tests for the incremental snapshot recompute"""
+
+    def test_refresh_touched_keys(self, connection):
+        snapshots.close_period(connection, '2025-01')
+
+        keys = snapshots.keys_of_recorder(connection, 'timesheet', 1)
+        connection.execute("DELETE FROM payroll_register WHERE recorder_id = 1")
+        assert snapshots.refresh(connection, keys) == 2
+        assert snapshot_totals(connection) == direct_totals(connection)
+
+        records = [{'period': date(2025, 1, 15), 'employee_id': 2, 'object_id': 1, 'estimate_id': None}]
+        connection.execute(INSERT_RECORD, ('timesheet', 9, 1, '2025-01-15', 1, None, 2, '2025-01-15', 10, 900))
+        # Only the closed month's key is recomputed
+        assert snapshots.refresh(connection, snapshots.keys_of_records(records) | {('2025-03', 2, 1, 0)}) == 1
+        assert snapshot_totals(connection) == direct_totals(connection)
+
+    def test_repository_repost(self, database):
+        engine, connection = database
+        snapshots.close_period(connection, '2025-03')
+        connection.commit()
+
+        class Manager:
+            @contextmanager
+            def session_scope(self):
+                session = sessionmaker(bind=engine)()
+                try:
+                    yield session
+                    session.commit()
+                finally:
+                    session.close()
+
+        repo = PayrollRegisterRepository()
+        repo.db_manager = Manager()
+        assert repo.delete_by_recorder('timesheet', 1)
+        repo.write_records([
+            {'recorder_type': 'timesheet', 'recorder_id': 1, 'line_number': 1, 'period': date(2025, 1, 10),
+             'object_id': 1, 'employee_id': 1, 'work_date': date(2025, 1, 10), 'hours_worked': 9, 'amount': 990},
+        ])
+
+        assert repo.get_closed_through() == '2025-03'
+        totals = {row['employee_id']: row for row in repo.get_totals(['employee'])}
+        assert (totals[1]['hours_worked'], totals[1]['amount']) == (17, 1790)
+        assert totals[2]['record_count'] == 1
+        assert snapshot_totals(connection) == direct_totals(connection)
+
+
+def test_payroll_endpoints(connection, api_client):
+    api = api_client(registers.router, connection=connection)
+
+    closed = api.post('/api/registers/payroll/close?month=2025-01')
+    assert closed.status_code == 200
+    assert closed.json()['closed_through'] == '2025-01'
+
+    response = api.get('/api/registers/payroll?group_by=employee&period_to=2025-02-28')
+    assert response.status_code == 200
+    body = response.json()
+    assert body['closed_through'] == '2025-01'
+    assert [(row['employee_name'], row['hours_worked']) for row in body['data']] == [('Ivanov', 20), ('Petrov', 8)]
+
+    assert api.get('/api/registers/payroll?group_by=brigade').status_code == 400
+    assert api.post('/api/registers/payroll/close?month=2025-13').status_code == 422
+
+    api.user = UserInfo(id=2, username='user', role='user', is_active=True)
+    assert api.post('/api/registers/payroll/reopen?month=2025-01').status_code == 403
+
+
+def test_benchmark_three_years_of_payroll(connection):
+    connection.execute("DELETE FROM payroll_register")
+    rows = timesheet_rows(EMPLOYEES, YEARS)
+    connection.executemany(INSERT_RECORD, rows)
+    connection.commit()
+
+    start = time.perf_counter()
+    direct = direct_totals(connection)
+    direct_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    snapshots.close_period(connection, '2025-11')
+    connection.commit()
+    close_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    combined = snapshot_totals(connection)
+    combined_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    keys = snapshots.keys_of_recorder(connection, 'timesheet', 1)
+    connection.execute("UPDATE payroll_register SET amount = amount + 1 WHERE recorder_id = 1")
+    snapshots.refresh(connection, keys)
+    refresh_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{len(rows)} payroll records: register GROUP BY {direct_ms:.0f}ms, "
+          f"close 35 months {close_ms:.0f}ms, snapshots + open month {combined_ms:.1f}ms, "
+          f"repost refresh {refresh_ms:.1f}ms")
+
+    assert combined == direct
+    assert combined_ms * 2 < direct_ms
+    assert refresh_ms < direct_ms
+    assert snapshot_totals(connection) == direct_totals(connection)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
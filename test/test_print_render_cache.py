@@ -0,0 +1,275 @@
+"""Tests for the rendered print form cache"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.print_render_cache import (
+    PrintRenderCache, PrintRenderService, compute_document_hash, compute_template_fingerprint
+)
+from src.services.print_form_generator import FontStyleRegistry, PrintFormGenerator
+
+
+class FakeRenderer:
+    """Print form stand-in that records how often it renders"""
+
+    renders = 0
+    on_generate = None
+
+    def generate(self, document_id: int) -> bytes:
+        FakeRenderer.renders += 1
+        time.sleep(0.05)
+        if FakeRenderer.on_generate is not None:
+            FakeRenderer.on_generate()
+        return f"estimate {document_id} pid {os.getpid()}".encode('utf-8')
+
+
+class ListPrintForm(PrintFormGenerator):
+    """Print form of a document that is just a numbered title"""
+
+    BATCH_FILE_PREFIX = 'list'
+    EXISTING_IDS = {1, 2, 3}
+
+    def build_elements(self, document_id: int):
+        if document_id not in self.EXISTING_IDS:
+            return None
+        return [self.create_title(f"Документ №{document_id}"), self.create_table([["A", "B"], ["1", "2"]])]
+
+
+FAKE_RENDERERS = {('estimate', 'pdf'): f'{__name__}:FakeRenderer'}
+
+
+def _create_estimate_db():
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE counterparties (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE objects (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE organizations (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE persons (id INTEGER PRIMARY KEY, full_name TEXT);
+        CREATE TABLE works (id INTEGER PRIMARY KEY, name TEXT, code TEXT);
+        CREATE TABLE estimates (
+            id INTEGER PRIMARY KEY, number TEXT, customer_id INTEGER, object_id INTEGER,
+            contractor_id INTEGER, responsible_id INTEGER, modified_at TEXT
+        );
+        CREATE TABLE estimate_lines (
+            id INTEGER PRIMARY KEY, estimate_id INTEGER, line_number INTEGER,
+            work_id INTEGER, quantity REAL
+        );
+        INSERT INTO counterparties VALUES (1, 'Customer');
+        INSERT INTO persons VALUES (1, 'Ivanov I.I.');
+        INSERT INTO works VALUES (1, 'Masonry', 'W-1');
+        INSERT INTO estimates VALUES (1, 'E-1', 1, NULL, NULL, 1, '2025-01-01');
+        INSERT INTO estimate_lines VALUES (1, 1, 1, 1, 10);
+    """)
+    return conn
+
+
+class TestDocumentVersion:
+    """Tests for the document part of the cache key"""
+
+    def test_hash_changes_with_lines_and_references(self):
+        conn = _create_estimate_db()
+        original = compute_document_hash(conn, 'estimate', 1)
+        assert compute_document_hash(conn, 'estimate', 1) == original
+
+        conn.execute("UPDATE estimate_lines SET quantity = 12 WHERE id = 1")
+        changed_line = compute_document_hash(conn, 'estimate', 1)
+        assert changed_line != original
+
+        # Renaming a referenced work changes the printed output as well
+        conn.execute("UPDATE works SET name = 'Brickwork' WHERE id = 1")
+        assert compute_document_hash(conn, 'estimate', 1) != changed_line
+
+    def test_template_fingerprint_tracks_generator_modules(self):
+        fingerprint = compute_template_fingerprint(
+            'src.services.estimate_print_form:EstimatePrintForm'
+        )
+        # EstimatePrintForm and its PrintFormGenerator base
+        assert len(fingerprint) == 2
+
+        excel_fingerprint = compute_template_fingerprint(
+            'src.services.excel_estimate_print_form:ExcelEstimatePrintForm'
+        )
+        # Generator modules plus the Excel template
+        assert len(excel_fingerprint) == 3
+
+
+class TestPrintRenderCache:
+    """Tests for the disk cache"""
+
+    def test_put_get_and_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PrintRenderCache(cache_dir, max_size_bytes=300)
+            cache.put('a', b'a' * 100)
+            cache.put('b', b'b' * 100)
+            os.utime(os.path.join(cache_dir, 'a.bin'), (1, 1))
+            os.utime(os.path.join(cache_dir, 'b.bin'), (2, 2))
+
+            # A hit makes 'a' the most recently used entry
+            assert cache.get('a') == b'a' * 100
+            cache.put('c', b'c' * 150)
+
+            assert cache.get('b') is None
+            assert cache.get('a') == b'a' * 100
+            assert cache.get('c') == b'c' * 150
+
+            # Oversized content is not cached
+            cache.put('d', b'd' * 400)
+            assert cache.get('d') is None
+
+    def test_size_is_restored_from_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            PrintRenderCache(cache_dir, max_size_bytes=1000).put('a', b'a' * 100)
+            assert PrintRenderCache(cache_dir, max_size_bytes=1000)._total_size == 100
+
+
+class TestPrintRenderService:
+    """Tests for cached rendering"""
+
+    def setup_method(self):
+        FakeRenderer.renders = 0
+        FakeRenderer.on_generate = None
+
+    def test_renders_once_per_document_version(self):
+        conn = _create_estimate_db()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            service = PrintRenderService(
+                PrintRenderCache(cache_dir, 10 * 1024 * 1024),
+                max_workers=0,
+                renderers=FAKE_RENDERERS
+            )
+
+            async def render_concurrently():
+                return await asyncio.gather(*[
+                    service.render(conn, 'estimate', 1, 'pdf') for _ in range(5)
+                ])
+
+            results = asyncio.run(render_concurrently())
+            assert len(set(results)) == 1
+            assert FakeRenderer.renders == 1
+
+            asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            assert FakeRenderer.renders == 1
+
+            conn.execute("UPDATE estimates SET modified_at = '2025-01-02' WHERE id = 1")
+            asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            assert FakeRenderer.renders == 2
+
+    def test_edit_during_render_is_not_cached(self):
+        conn = _create_estimate_db()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            service = PrintRenderService(
+                PrintRenderCache(cache_dir, 10 * 1024 * 1024),
+                max_workers=0,
+                renderers=FAKE_RENDERERS
+            )
+
+            FakeRenderer.on_generate = lambda: conn.execute(
+                "UPDATE estimates SET modified_at = '2025-01-03' WHERE id = 1"
+            )
+            asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            FakeRenderer.on_generate = None
+
+            # Neither the old nor the new version was cached
+            assert os.listdir(cache_dir) == []
+            asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            assert FakeRenderer.renders == 2
+
+    def test_renders_in_worker_process(self):
+        conn = _create_estimate_db()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            service = PrintRenderService(
+                PrintRenderCache(cache_dir, 10 * 1024 * 1024),
+                max_workers=1,
+                renderers=FAKE_RENDERERS
+            )
+            try:
+                content = asyncio.run(service.render(conn, 'estimate', 1, 'pdf'))
+            finally:
+                service.shutdown()
+
+            assert content.startswith(b'estimate 1 pid ')
+            assert content != f"estimate 1 pid {os.getpid()}".encode('utf-8')
+            assert FakeRenderer.renders == 0
+
+
+class TestFontStyleRegistry:
+    """Tests for shared fonts/styles and batch rendering"""
+
+    def test_generators_share_registry(self):
+        first = ListPrintForm()
+        second = ListPrintForm(orientation='landscape')
+
+        assert first.styles is second.styles
+        assert first.font_name == FontStyleRegistry.get().font_name
+        assert 'CustomTitle' in first.styles
+
+    def test_batch_pdf_has_page_per_document(self):
+        content = ListPrintForm().generate_batch([3, 1, 404, 2], 'pdf')
+
+        assert content.startswith(b'%PDF')
+        assert content.count(b'/Type /Page\n') == 3
+
+    def test_batch_zip_has_file_per_document(self):
+        import io
+        import zipfile
+
+        content = ListPrintForm().generate_batch([1, 404, 2], 'zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            assert archive.namelist() == ['list_1.pdf', 'list_2.pdf']
+            assert archive.read('list_1.pdf').startswith(b'%PDF')
+
+    def test_batch_without_documents(self):
+        assert ListPrintForm().generate_batch([404], 'pdf') is None
+        with pytest.raises(ValueError):
+            ListPrintForm().generate_batch([1], 'docx')
+
+    def test_render_service_batch(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            service = PrintRenderService(
+                PrintRenderCache(cache_dir, 1024 * 1024),
+                max_workers=0,
+                renderers={('list', 'pdf'): f'{__name__}:ListPrintForm'}
+            )
+            content = asyncio.run(service.render_batch('list', [1, 2], 'zip'))
+            assert content.startswith(b'PK')
+
+    def test_batch_shares_setup_cost(self):
+        start = time.perf_counter()
+        FontStyleRegistry()
+        registry_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(30):
+            ListPrintForm()
+        generator_init = (time.perf_counter() - start) / 30
+
+        ListPrintForm.EXISTING_IDS = set(range(30))
+        try:
+            start = time.perf_counter()
+            for document_id in range(30):
+                ListPrintForm().generate(document_id)
+            separate = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ListPrintForm().generate_batch(list(range(30)), 'pdf')
+            batch = time.perf_counter() - start
+        finally:
+            ListPrintForm.EXISTING_IDS = {1, 2, 3}
+
+        print(f"\nfont/style registry build {registry_build * 1000:.2f}ms, "
+              f"generator init {generator_init * 1000:.3f}ms; "
+              f"30 documents: separate {separate * 1000:.1f}ms, batch {batch * 1000:.1f}ms")
+        assert generator_init < registry_build
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,141 @@
+"""Tests for the versioned reference data snapshots"""
+import os
+import sqlite3
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.models.sqlalchemy_models import Object, Person, Unit
+from src.services.reference_snapshot import (
+    ReferenceSnapshotCache, attach_reference_names, get_reference_snapshot_cache
+)
+
+
+@pytest.fixture
+def db_path(make_database):
+    path = make_database('refs.db', change_counters=True)
+    engine = create_engine(f'sqlite:///{path}')
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Person(id=1, full_name='Foreman'),
+        Person(id=2, full_name='Mason', parent_id=1),
+        Person(id=3, full_name='Retired', marked_for_deletion=True),
+        Object(id=1, name='Tower'),
+        Unit(id=1, name='m3'),
+    ])
+    session.commit()
+    session.close()
+    engine.dispose()
+    yield path
+
+
+@pytest.fixture
+def connection(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+class TestReferenceSnapshotCache:
+    """Tests for reloading on counter changes"""
+
+    def test_reloads_only_after_change(self, connection):
+        cache = ReferenceSnapshotCache()
+
+        first = cache.get(connection, 'persons')
+        assert cache.get(connection, 'persons') is first
+        assert cache.loads == 1
+
+        # Raw SQL writes bump the counter through the triggers
+        connection.execute("UPDATE persons SET full_name = 'Senior Mason' WHERE id = 2")
+        connection.commit()
+
+        second = cache.get(connection, 'persons')
+        assert second is not first
+        assert second.version == first.version + 1
+        assert second.name(2) == 'Senior Mason'
+        assert cache.loads == 2
+
+    def test_tables_are_versioned_separately(self, connection):
+        cache = ReferenceSnapshotCache()
+        cache.get_many(connection, ['persons', 'objects'])
+
+        connection.execute("UPDATE units SET name = 'kg' WHERE id = 1")
+        connection.commit()
+
+        cache.get_many(connection, ['persons', 'objects'])
+        assert cache.loads == 2
+
+    def test_sqlalchemy_session_shares_database_snapshot(self, db_path, connection):
+        cache = ReferenceSnapshotCache()
+        engine = create_engine(f'sqlite:///{db_path}')
+        session = sessionmaker(bind=engine)()
+        try:
+            snapshot = cache.get(session, 'persons')
+            assert [row['full_name'] for row in snapshot.active_rows()] == ['Foreman', 'Mason']
+            assert snapshot.parent_ids() == {1}
+        finally:
+            session.close()
+            engine.dispose()
+
+    def test_unknown_table_rejected(self, connection):
+        with pytest.raises(ValueError):
+            ReferenceSnapshotCache().get(connection, 'works')
+
+    def test_attach_reference_names(self, connection):
+        rows = [{'foreman_id': 1, 'object_id': 1}, {'foreman_id': 3, 'object_id': None}]
+        attach_reference_names(connection, rows, {
+            'foreman_id': ('persons', 'foreman_name'),
+            'object_id': ('objects', 'object_name'),
+        })
+
+        # Names of deleted references are still resolved
+        assert rows == [
+            {'foreman_id': 1, 'object_id': 1, 'foreman_name': 'Foreman', 'object_name': 'Tower'},
+            {'foreman_id': 3, 'object_id': None, 'foreman_name': 'Retired', 'object_name': None},
+        ]
+
+
+class TestSnapshotEndpoint:
+    """Tests for GET /references/snapshot"""
+
+    @pytest.fixture
+    def get(self, connection, api_client):
+        from api.endpoints import references
+
+        get_reference_snapshot_cache().clear()
+        client = api_client(references.router, connection=connection)
+        yield client.get
+        get_reference_snapshot_cache().clear()
+
+    def test_etag_and_not_modified(self, get, connection):
+        response = get('/api/references/snapshot?tables=persons,units')
+        assert response.status_code == 200
+        etag = response.headers['etag']
+        assert etag.startswith('W/')
+        tables = response.json()['data']['tables']
+        assert {item['full_name'] for item in tables['persons']['items']} == {'Foreman', 'Mason', 'Retired'}
+        assert 'hourly_rate' not in tables['persons']['items'][0]
+
+        response = get('/api/references/snapshot?tables=persons,units', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+        connection.execute("UPDATE units SET name = 'm³' WHERE id = 1")
+        connection.commit()
+
+        response = get('/api/references/snapshot?tables=persons,units', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+        assert response.json()['data']['tables']['units']['items'][0]['name'] == 'm³'
+
+    def test_unknown_table(self, get):
+        assert get('/api/references/snapshot?tables=users').status_code == 400
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -6,6 +6,7 @@ for large datasets (1000+ rows).
 """
 
 import pytest
+import threading
 import time
 from unittest.mock import Mock, patch, MagicMock
 from PyQt6.QtWidgets import QApplication, QTableWidget
@@ -15,6 +16,7 @@ from PyQt6.QtTest import QTest
 from src.services.table_part_virtualization_service import (
     TablePartVirtualizationService,
     VirtualizationOptions,
+    PLACEHOLDER_KEY,
     create_virtualization_service
 )
 from src.services.table_part_memory_optimizer import (
@@ -156,6 +158,71 @@ class TestTablePartVirtualization:
         assert data[0]['id'] == 25
         assert data[-1]['id'] == 74
 
+    
+    def test_background_page_load(self, virtualization_service):
+        """Test that requested pages load off the GUI thread with placeholders"""
+        placeholders = []
+        loaded = []
+        virtualization_service.placeholdersReady.connect(
+            lambda page, start, count: placeholders.append((page, start, count))
+        )
+        virtualization_service.dataLoaded.connect(lambda page, data: loaded.append(page))
+        
+        virtualization_service._request_page(3)
+        
+        # Placeholder is available before the worker finishes
+        assert placeholders == [(3, 150, 50)]
+        assert virtualization_service.pages[3].is_loading
+        rows = virtualization_service._get_data_range(150, 155, include_placeholders=True)
+        assert all(row[PLACEHOLDER_KEY] for row in rows)
+        
+        # Requesting the same page again is coalesced into the pending load
+        virtualization_service._request_page(3)
+        assert virtualization_service.total_requests == 1
+        
+        assert virtualization_service.wait_for_pending_loads(5000)
+        
+        assert loaded == [3]
+        assert virtualization_service.pages[3].is_loaded
+        assert virtualization_service.pages[3].data[0]['id'] == 150
+        assert virtualization_service.get_metrics().pending_page_loads == 0
+    
+    def test_stale_page_loads_cancelled(self, table_widget):
+        """Test that queued loads for pages scrolled out of view are dropped"""
+        release = threading.Event()
+        requested_pages = []
+        
+        def blocking_load(page: int, page_size: int):
+            requested_pages.append(page)
+            release.wait(5)
+            return [{'id': page * page_size}], 10000
+        
+        options = VirtualizationOptions(page_size=50, max_loader_threads=1)
+        service = create_virtualization_service(table_widget, blocking_load, options)
+        
+        service._request_page(0)  # Occupies the only loader thread
+        service._request_page(40)  # Queued behind page 0
+        
+        service._cancel_stale_loads(0, 1)
+        release.set()
+        assert service.wait_for_pending_loads(5000)
+        
+        assert service.pages[0].is_loaded
+        assert 40 not in service.pages
+        assert 40 not in requested_pages
+        assert service.get_metrics().cancelled_page_loads == 1
+        service.cleanup()
+    
+    def test_scroll_latency_metrics(self, virtualization_service):
+        """Test that scroll latency is recorded once visible pages arrive"""
+        virtualization_service._on_scroll(0)
+        assert virtualization_service.wait_for_pending_loads(5000)
+        
+        metrics = virtualization_service.get_metrics()
+        assert metrics.scroll_events == 1
+        assert metrics.last_scroll_latency_ms > 0
+        assert metrics.max_scroll_latency_ms >= metrics.average_scroll_latency_ms > 0
+
 
 class TestTablePartMemoryOptimizer:
     """Test memory optimization functionality"""
@@ -298,6 +365,96 @@ class TestTablePartMemoryOptimizer:
         result = memory_optimizer.get('non_existent')
         assert result is None
 
+    
+    def test_lfu_eviction_strategy(self):
+        """Test LFU eviction keeps frequently used entries"""
+        optimizer = create_memory_optimizer(MemoryOptimizationOptions(
+            max_memory_mb=0.05,
+            cleanup_threshold=0.8,
+            compression_enabled=False,
+            cache_strategy=CacheStrategy.LFU
+        ))
+        
+        for i in range(4):
+            optimizer.store(f'item_{i}', {'data': 'x' * 10000})
+        for _ in range(3):
+            optimizer.get('item_0')
+        
+        optimizer.store('item_4', {'data': 'x' * 10000})
+        
+        assert optimizer.has('item_0')
+        assert not optimizer.has('item_1')
+        assert optimizer.get_stats().evictions == 1
+    
+    def test_ttl_expiration(self, memory_optimizer):
+        """Test per-key time-to-live"""
+        memory_optimizer.store('short', {'value': 1}, ttl_seconds=0.01)
+        memory_optimizer.store('long', {'value': 2}, ttl_seconds=60)
+        
+        time.sleep(0.02)
+        
+        assert memory_optimizer.get('short') is None
+        assert memory_optimizer.get('long') == {'value': 2}
+        assert memory_optimizer.get_stats().expirations == 1
+        assert memory_optimizer.get_stats().cache_size == 1
+    
+    def test_purge_expired_skips_replaced_entries(self, memory_optimizer):
+        """Test that the expiry heap ignores entries replaced or deleted before expiring"""
+        memory_optimizer.store('replaced', {'value': 1}, ttl_seconds=0.01)
+        memory_optimizer.store('replaced', {'value': 2}, ttl_seconds=60)
+        memory_optimizer.store('deleted', {'value': 3}, ttl_seconds=0.01)
+        memory_optimizer.delete('deleted')
+        memory_optimizer.store('short', {'value': 4}, ttl_seconds=0.01)
+        
+        time.sleep(0.02)
+        
+        assert memory_optimizer.purge_expired() == 1
+        assert memory_optimizer.get('replaced') == {'value': 2}
+        assert memory_optimizer.get_stats().expirations == 1
+        
+        for i in range(500):
+            memory_optimizer.store('churn', {'value': i}, ttl_seconds=60)
+        assert len(memory_optimizer._expiry_heap) < 200
+    
+    def test_hit_miss_statistics(self, memory_optimizer):
+        """Test that hits and misses feed MemoryStats"""
+        memory_optimizer.store('present', {'value': 1})
+        
+        memory_optimizer.get('present')
+        memory_optimizer.get('present')
+        memory_optimizer.get('absent')
+        
+        stats = memory_optimizer.get_stats()
+        assert stats.hits == 2
+        assert stats.misses == 1
+        assert stats.hit_rate == pytest.approx(2 / 3)
+    
+    def test_incremental_size_tracking(self, memory_optimizer):
+        """Test that byte totals stay consistent across store, replace and delete"""
+        memory_optimizer.store('a', {'data': 'x' * 500})
+        memory_optimizer.store('b', {'data': 'y' * 500})
+        memory_optimizer.store('a', {'data': 'z' * 100})
+        memory_optimizer.delete('b')
+        
+        expected_bytes = sum(entry.size_bytes for entry in memory_optimizer.cache.values())
+        assert memory_optimizer.get_stats().used_memory_mb == pytest.approx(expected_bytes / (1024 * 1024))
+        assert memory_optimizer.get('a') == {'data': 'z' * 100}
+    
+    def test_background_compression(self, large_test_data):
+        """Test that large entries can be compressed off-thread"""
+        optimizer = create_memory_optimizer(MemoryOptimizationOptions(
+            compression_enabled=True,
+            background_compression=True
+        ))
+        
+        optimizer.store('large_data', large_test_data)
+        optimizer.wait_for_compression()
+        
+        entry = optimizer.cache['large_data']
+        assert entry.is_compressed
+        assert optimizer.get('large_data')['metadata']['count'] == 100
+        optimizer.cleanup_resources()
+
 
 class TestPerformanceIntegration:
     """Integration tests for performance optimization"""
@@ -386,6 +543,32 @@ class TestPerformanceIntegration:
         
         assert retrieved_count > 0  # Should have some items still cached
     
+    def test_memory_optimizer_throughput(self):
+        """Microbenchmark store/get throughput with constant eviction pressure"""
+        optimizer = create_memory_optimizer(MemoryOptimizationOptions(
+            max_memory_mb=1.0,
+            compression_enabled=False
+        ))
+        rows = [{'id': i, 'name': f'Row {i}', 'value': i * 1.5} for i in range(20)]
+        operations = 20000
+        
+        start_time = time.perf_counter()
+        for i in range(operations):
+            optimizer.store(f'page_{i}', rows)
+        store_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        for i in range(operations):
+            optimizer.get(f'page_{i}')
+        get_time = time.perf_counter() - start_time
+        
+        stats = optimizer.get_stats()
+        
+        assert stats.evictions > 0
+        assert stats.used_memory_mb <= optimizer.options.max_memory_mb
+        assert store_time < 5.0
+        assert get_time < 1.0
+    
     def test_virtualization_with_memory_optimization(self, app):
         """Test integration of virtualization and memory optimization"""
         table = QTableWidget()
@@ -0,0 +1,195 @@
+"""Tests and benchmark for plan-vs-fact variance over monthly register turnovers"""
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.repositories import work_execution_turnover_repository as turnovers
+from src.data.repositories.work_execution_turnover_repository import load_variance
+from api.endpoints import registers
+
+MOVEMENT_COUNT = 100000
+
+INSERT_MOVEMENT = """
+    INSERT INTO work_execution_register (
+        recorder_type, recorder_id, line_number, period, object_id, estimate_id, work_id,
+        quantity_income, quantity_expense, sum_income, sum_expense
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def movements(count):
+    """Estimates post plan (income) at the start of the year, daily reports post fact (expense)"""
+    generator = random.Random(42)
+    rows = []
+    for i in range(count):
+        object_id = generator.randint(1, 5)
+        estimate_id = object_id * 10 + generator.randint(0, 3)
+        work_id = generator.randint(1, 200)
+        if i % 4 == 0:
+            rows.append(('estimate', estimate_id, i, '2025-01-01', object_id, estimate_id, work_id, 10, 0, 1000, 0))
+        else:
+            period = f'2025-{generator.randint(1, 12):02d}-{generator.randint(1, 28):02d}'
+            rows.append(('daily_report', i, 1, period, object_id, estimate_id, work_id, 0, 2, 0, 200))
+    return rows
+
+
+@pytest.fixture
+def connection(make_database):
+    conn = sqlite3.connect(make_database('register.db'))
+    conn.row_factory = sqlite3.Row
+    turnovers.ensure_consistent(conn)
+    conn.executescript("""
+        INSERT INTO objects (id, name, uuid, updated_at, is_deleted, marked_for_deletion)
+        VALUES (1, 'Tower', 'o-1', CURRENT_TIMESTAMP, 0, 0), (2, 'Bridge', 'o-2', CURRENT_TIMESTAMP, 0, 0);
+        INSERT INTO works (id, name, uuid, updated_at, is_deleted, marked_for_deletion, is_group)
+        VALUES (1, 'Masonry', 'w-1', CURRENT_TIMESTAMP, 0, 0, 0), (2, 'Plaster', 'w-2', CURRENT_TIMESTAMP, 0, 0, 0);
+    """)
+    conn.executemany(INSERT_MOVEMENT, [
+        ('estimate', 1, 1, '2025-01-10', 1, 1, 1, 100, 0, 5000, 0),
+        ('estimate', 1, 2, '2025-01-10', 1, 1, 2, 40, 0, 800, 0),
+        ('daily_report', 1, 1, '2025-01-20', 1, 1, 1, 0, 30, 0, 1500),
+        ('daily_report', 2, 1, '2025-02-05', 1, 1, 1, 0, 20, 0, 1000),
+        ('daily_report', 3, 1, '2025-02-06', 2, None, 2, 0, 5, 0, 100),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def direct_turnovers(connection):
+    """Turnovers aggregated straight from the register"""
+    return {
+        tuple(row[:4]): tuple(row[4:]) for row in connection.execute("""
+            SELECT substr(period, 1, 7), COALESCE(object_id, 0), COALESCE(estimate_id, 0), COALESCE(work_id, 0),
+                   SUM(quantity_income), SUM(quantity_expense), SUM(sum_income), SUM(sum_expense), COUNT(*)
+            FROM work_execution_register
+            GROUP BY 1, 2, 3, 4
+        """)
+    }
+
+
+def stored_turnovers(connection):
+    return {
+        tuple(row[:4]): tuple(row[4:]) for row in connection.execute("""
+            SELECT month, object_id, estimate_id, work_id,
+                   quantity_income, quantity_expense, sum_income, sum_expense, movement_count
+            FROM work_execution_turnovers
+        """)
+    }
+
+
+class TestTurnoverMaintenance:
+    """Tests for keeping the monthly turnovers in step with the register"""
+
+    def test_triggers_follow_inserts_updates_and_deletes(self, connection):
+        assert stored_turnovers(connection) == direct_turnovers(connection)
+
+        connection.execute("UPDATE work_execution_register SET period = '2025-03-01' WHERE recorder_id = 2")
+        connection.execute("DELETE FROM work_execution_register WHERE recorder_type = 'estimate'")
+        connection.commit()
+
+        assert stored_turnovers(connection) == direct_turnovers(connection)
+        assert ('2025-02', 1, 1, 1) not in stored_turnovers(connection)
+
+    def test_rebuild_when_out_of_step(self, connection):
+        connection.execute("DELETE FROM work_execution_turnovers")
+        assert turnovers.ensure_consistent(connection) is True
+        assert stored_turnovers(connection) == direct_turnovers(connection)
+        assert turnovers.ensure_consistent(connection) is False
+
+
+class TestLoadVariance:
+    """Tests for variance grouping, drill-down, sorting and paging"""
+
+    def test_plan_fact_remainder(self, connection):
+        result = load_variance(connection, ['object', 'work'])
+
+        rows = {(row['object_name'], row['work_name']): row for row in result['rows']}
+        masonry = rows[('Tower', 'Masonry')]
+        assert (masonry['plan_quantity'], masonry['fact_quantity'], masonry['remaining_quantity']) == (100, 50, 50)
+        assert masonry['percent_complete'] == pytest.approx(50)
+        assert masonry['remaining_sum'] == 2500
+        assert rows[('Bridge', 'Plaster')]['percent_complete'] is None
+        assert result['total'] == 3
+        assert result['totals']['plan_sum'] == 5800
+        assert result['totals']['percent_complete'] == pytest.approx(55 / 140 * 100)
+
+    def test_drill_down_by_month(self, connection):
+        result = load_variance(connection, ['month'], {'estimate_id': 1, 'work_id': 1, 'month_from': '2025-02'})
+
+        assert [(row['month'], row['fact_quantity']) for row in result['rows']] == [('2025-02', 20)]
+        assert 'estimate_id' not in result['rows'][0]
+
+        past_end = load_variance(connection, ['work'], limit=10, offset=10)
+        assert (past_end['rows'], past_end['total'], past_end['totals']['plan_quantity']) == ([], 2, 140)
+
+    def test_sorting_and_paging(self, connection):
+        first = load_variance(connection, ['object', 'work'], sort_by='remaining_quantity', sort_order='desc', limit=2)
+        second = load_variance(connection, ['object', 'work'], sort_by='remaining_quantity', sort_order='desc',
+                               limit=2, offset=2)
+
+        remaining = [row['remaining_quantity'] for row in first['rows'] + second['rows']]
+        assert remaining == [50, 40, -5]
+        assert first['total'] == second['total'] == 3
+        assert load_variance(connection, ['object'], sort_by='object_name')['rows'][0]['object_name'] == 'Bridge'
+
+        with pytest.raises(ValueError):
+            load_variance(connection, ['brigade'])
+        with pytest.raises(ValueError):
+            load_variance(connection, ['work'], sort_by='object_name')
+
+
+def test_variance_endpoint(connection, api_client):
+    api = api_client(registers.router, connection=connection)
+
+    response = api.get(
+        '/api/registers/work-execution/variance?group_by=estimate,work&period_to=2025-01-31'
+        '&sort_by=fact_quantity&sort_order=desc&page_size=1'
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body['data'][0]['fact_quantity'] == 30
+    assert body['pagination']['total_items'] == 2
+    assert body['totals']['fact_quantity'] == 30
+
+    assert api.get('/api/registers/work-execution/variance?group_by=brigade').status_code == 400
+
+
+def test_benchmark_variance_on_100k_movements(connection):
+    connection.executemany(INSERT_MOVEMENT, movements(MOVEMENT_COUNT))
+    connection.commit()
+
+    start = time.perf_counter()
+    direct = connection.execute("""
+        SELECT object_id, estimate_id, work_id, SUM(quantity_income), SUM(quantity_expense)
+        FROM work_execution_register
+        GROUP BY object_id, estimate_id, work_id
+    """).fetchall()
+    direct_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    page = load_variance(connection, ['object', 'estimate', 'work'], sort_by='remaining_sum',
+                         sort_order='desc', limit=50)
+    variance_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    load_variance(connection, ['object', 'month'], {'month_from': '2025-03', 'month_to': '2025-06'})
+    drill_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{MOVEMENT_COUNT} movements: register GROUP BY {direct_ms:.0f}ms, "
+          f"variance page {variance_ms:.1f}ms, object/month drill-down {drill_ms:.1f}ms")
+
+    assert page['total'] == len(direct)
+    assert len(page['rows']) == 50
+    assert variance_ms < 100
+    assert drill_ms < 100
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v', '-s'])
@@ -1,6 +1,7 @@
 import apiClient from './client'
 import type { ApiResponse, PaginationParams } from '@/types/api'
 import type { Estimate, DailyReport, Timesheet, TimesheetLine } from '@/types/models'
+import { waitForJob } from './jobs'
 
 // Estimates
 export async function getEstimates(params?: PaginationParams): Promise<ApiResponse<Estimate[]>> {
@@ -37,11 +38,12 @@ export async function unpostEstimate(id: number): Promise<Estimate> {
   return response.data.data
 }
 
+// The import runs as a background job; resolves with the saved estimate once it finishes
 export async function importEstimateFromExcel(file: File): Promise<Estimate> {
   const formData = new FormData()
   formData.append('file', file)
   
-  const response = await apiClient.post<{ success: boolean; data: Estimate; message: string }>(
+  const response = await apiClient.post<{ success: boolean; data: { id: string }; message: string }>(
     '/documents/estimates/import-excel',
     formData,
     {
@@ -50,7 +52,8 @@ export async function importEstimateFromExcel(file: File): Promise<Estimate> {
       },
     }
   )
-  return response.data.data
+  const result = await waitForJob<{ estimate_id: number }>(response.data.data.id)
+  return getEstimate(result.estimate_id)
 }
 
 // Daily Reports
@@ -254,3 +257,65 @@ export async function bulkUnpostTimesheets(ids: number[]): Promise<BulkOperation
   const response = await apiClient.post<BulkOperationResponse>('/documents/timesheets/bulk-unpost', { ids })
   return response.data
 }
+
+// Batch fetch: several documents with lines in one request, keyed by id
+interface BatchGetResponse<T> {
+  success: boolean
+  data: Record<number, T>
+  missing: number[]
+}
+
+interface BatchGetOptions {
+  include_lines?: boolean
+  fields?: string[]
+}
+
+export async function batchGetEstimates(ids: number[], options?: BatchGetOptions): Promise<BatchGetResponse<Estimate>> {
+  const response = await apiClient.post<BatchGetResponse<Estimate>>('/documents/estimates/batch-get', { ids, ...options })
+  return response.data
+}
+
+export async function batchGetDailyReports(ids: number[], options?: BatchGetOptions): Promise<BatchGetResponse<DailyReport>> {
+  const response = await apiClient.post<BatchGetResponse<DailyReport>>('/documents/daily-reports/batch-get', { ids, ...options })
+  return response.data
+}
+
+export async function batchGetTimesheets(ids: number[], options?: BatchGetOptions): Promise<BatchGetResponse<Timesheet>> {
+  const response = await apiClient.post<BatchGetResponse<Timesheet>>('/documents/timesheets/batch-get', { ids, ...options })
+  return response.data
+}
+
+// Line patches: send only changed lines, keyed by line uuid
+export interface LinePatchOperation {
+  op: 'insert' | 'update' | 'delete' | 'move'
+  uuid: string
+  values?: Record<string, unknown>
+  line_number?: number
+}
+
+interface LinePatchResponse {
+  success: boolean
+  data: {
+    inserted: number
+    updated: number
+    deleted: number
+    moved: number
+    total_sum?: number
+    total_labor?: number
+  }
+}
+
+export async function patchEstimateLines(id: number, operations: LinePatchOperation[]): Promise<LinePatchResponse> {
+  const response = await apiClient.patch<LinePatchResponse>(`/documents/estimates/${id}/lines`, { operations })
+  return response.data
+}
+
+export async function patchDailyReportLines(id: number, operations: LinePatchOperation[]): Promise<LinePatchResponse> {
+  const response = await apiClient.patch<LinePatchResponse>(`/documents/daily-reports/${id}/lines`, { operations })
+  return response.data
+}
+
+export async function patchTimesheetLines(id: number, operations: LinePatchOperation[]): Promise<LinePatchResponse> {
+  const response = await apiClient.patch<LinePatchResponse>(`/documents/timesheets/${id}/lines`, { operations })
+  return response.data
+}
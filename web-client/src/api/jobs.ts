@@ -0,0 +1,35 @@
+import apiClient from './client'
+
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled'
+
+export interface Job<TResult = Record<string, unknown>> {
+  id: string
+  job_type: string
+  status: JobStatus
+  current: number | null
+  total: number | null
+  message: string | null
+  result: TResult | null
+  error: string | null
+}
+
+const FINISHED_STATUSES: JobStatus[] = ['succeeded', 'failed', 'cancelled']
+const POLL_INTERVAL_MS = 1000
+
+export async function getJob<TResult>(id: string): Promise<Job<TResult>> {
+  const response = await apiClient.get<{ data: Job<TResult> }>(`/jobs/${id}`)
+  return response.data.data
+}
+
+// Polls a background job until it finishes; rejects when it failed or was cancelled
+export async function waitForJob<TResult>(id: string): Promise<TResult> {
+  let job = await getJob<TResult>(id)
+  while (!FINISHED_STATUSES.includes(job.status)) {
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS))
+    job = await getJob<TResult>(id)
+  }
+  if (job.status !== 'succeeded' || !job.result) {
+    throw new Error(job.error || 'Задание не выполнено')
+  }
+  return job.result
+}
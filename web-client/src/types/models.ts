@@ -111,6 +111,7 @@ export interface Organization {
 // Document types
 export interface EstimateLine {
   id?: number
+  uuid?: string
   estimate_id?: number
   work_id: number | null
   work_name?: string
@@ -152,6 +153,7 @@ export interface Estimate {
 
 export interface DailyReportLine {
   id?: number
+  uuid?: string
   daily_report_id?: number
   line_number?: number
   estimate_line_id: number
@@ -182,6 +184,7 @@ export interface DailyReport {
 // Timesheet types
 export interface TimesheetLine {
   id?: number
+  uuid?: string
   timesheet_id?: number
   line_number: number
   employee_id: number